@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Load Test
+Usuários simultâneos executando step1 → status → step2 → step3 → resultados contra provedores locais,
+com rampa de concorrência, latências p50/p95/p99 e RSS/threads do servidor ao longo do tempo
+
+Uso (a partir de src/):
+    python benchmarks/load_test.py --levels 1,2,4,8
+    python benchmarks/load_test.py --levels 2,4 --server gunicorn --gunicorn-workers 2 --gunicorn-threads 8
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from benchmarks.metrics import HAS_PSUTIL, percentiles, process_stats
+from benchmarks.run_benchmarks import RESULTS_DIR, git_commit
+from benchmarks.stub_server import start_stub_process
+
+if HAS_PSUTIL:
+    import psutil
+
+logger = logging.getLogger('benchmarks.load_test')
+
+STEPS = [
+    ('step1', '/api/workflow/step1/start'),
+    ('step2', '/api/workflow/step2/start'),
+    ('step3', '/api/workflow/step3/start'),
+]
+
+
+class LatencyRecorder:
+    """Latências por endpoint e contagem de erros, compartilhado entre usuários virtuais"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def add(self, endpoint: str, seconds: float, ok: bool):
+        with self._lock:
+            self.samples[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                endpoint: {**percentiles(values), 'errors': self.errors.get(endpoint, 0)}
+                for endpoint, values in self.samples.items()
+            }
+
+
+class ServerSampler:
+    """Amostra RSS e threads do servidor (e dos workers, no gunicorn) em intervalos fixos"""
+
+    def __init__(self, pid: int, interval: float):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[List[float]] = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _pids(self) -> List[int]:
+        if HAS_PSUTIL:
+            try:
+                return [self.pid] + [child.pid for child in psutil.Process(self.pid).children(recursive=True)]
+            except psutil.Error:
+                return [self.pid]
+        try:
+            with open(f'/proc/{self.pid}/task/{self.pid}/children', 'r') as f:
+                return [self.pid] + [int(pid) for pid in f.read().split()]
+        except OSError:
+            return [self.pid]
+
+    def _run(self, started: float):
+        while not self._stop.is_set():
+            stats = [process_stats(pid) for pid in self._pids()]
+            self.samples.append([
+                round(time.monotonic() - started, 2),
+                round(sum(s['rss'] for s in stats) / 1048576, 1),
+                sum(s['threads'] for s in stats)
+            ])
+            self._stop.wait(self.interval)
+
+    def start(self) -> 'ServerSampler':
+        self._thread = threading.Thread(target=self._run, args=(time.monotonic(),), name='load-server-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop.set()
+        self._thread.join()
+        return {
+            'peak_rss_mb': max((s[1] for s in self.samples), default=0),
+            'peak_threads': max((s[2] for s in self.samples), default=0),
+            'samples': self.samples
+        }
+
+
+def _request(base_url: str, method: str, path: str, recorder: LatencyRecorder, endpoint: str,
+             payload: Optional[Dict[str, Any]] = None, timeout: float = 60) -> Optional[Dict[str, Any]]:
+    """Executa requisição medindo a latência até o corpo completo"""
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    request = urllib.request.Request(
+        f"{base_url}{path}", data=data, method=method, headers={'Content-Type': 'application/json'}
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+        recorder.add(endpoint, time.perf_counter() - start, True)
+        return json.loads(body) if body else {}
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        recorder.add(endpoint, time.perf_counter() - start, False)
+        logger.warning(f"⚠️ {endpoint} falhou: {e}")
+        return None
+
+
+def virtual_user(user_id: int, base_url: str, recorder: LatencyRecorder, args) -> Dict[str, Any]:
+    """Um cliente executando o workflow completo pela API, como a interface web faz"""
+    started = time.perf_counter()
+    outcome = {'user': user_id, 'status': 'completed', 'steps': {}}
+    session_id = None
+
+    for step, path in STEPS:
+        step_started = time.perf_counter()
+        payload = (
+            {'segmento': f"{args.segmento} {user_id}", 'produto': args.produto, 'publico': args.publico}
+            if step == 'step1' else {'session_id': session_id}
+        )
+        response = _request(base_url, 'POST', path, recorder, f"{step}_start", payload)
+        if not response or not response.get('success'):
+            outcome['status'] = f"{step}_rejected"
+            break
+        session_id = session_id or response.get('session_id')
+
+        deadline = time.monotonic() + args.workflow_timeout
+        state = 'pending'
+        while time.monotonic() < deadline:
+            time.sleep(args.poll_interval)
+            status = _request(base_url, 'GET', f"/api/workflow/status/{session_id}", recorder, 'status')
+            if not status:
+                continue
+            if status.get('error'):
+                state = 'error'
+                break
+            if status.get('step_status', {}).get(step) == 'completed':
+                state = 'completed'
+                break
+        else:
+            state = 'timeout'
+
+        outcome['steps'][step] = round(time.perf_counter() - step_started, 2)
+        if state != 'completed':
+            outcome['status'] = f"{step}_{state}"
+            break
+
+    if outcome['status'] == 'completed':
+        results = _request(base_url, 'GET', f"/api/workflow/results/{session_id}", recorder, 'results')
+        if results is None:
+            outcome['status'] = 'results_failed'
+
+    outcome['session_id'] = session_id
+    outcome['seconds'] = round(time.perf_counter() - started, 2)
+    return outcome
+
+
+def run_level(concurrency: int, base_url: str, server_pid: int, args) -> Dict[str, Any]:
+    """Dispara `concurrency` usuários ao mesmo tempo e aguarda todos terminarem"""
+    recorder = LatencyRecorder()
+    sampler = ServerSampler(server_pid, args.sample_interval).start()
+    barrier = threading.Barrier(concurrency)
+
+    def user(index: int):
+        barrier.wait()
+        return virtual_user(index, base_url, recorder, args)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='load-user') as executor:
+        outcomes = list(executor.map(user, range(concurrency)))
+    wall = time.perf_counter() - started
+
+    completed = [o for o in outcomes if o['status'] == 'completed']
+    return {
+        'concurrency': concurrency,
+        'completed': len(completed),
+        'failed': len(outcomes) - len(completed),
+        'error_rate': round((len(outcomes) - len(completed)) / len(outcomes), 3),
+        'wall_seconds': round(wall, 2),
+        'workflow_seconds': percentiles([o['seconds'] for o in completed]),
+        'latency': recorder.report(),
+        'server': sampler.stop(),
+        'users': outcomes
+    }
+
+
+def _level_ok(level: Dict[str, Any], args) -> bool:
+    status_p95 = level['latency'].get('status', {}).get('p95', 0)
+    results_p95 = level['latency'].get('results', {}).get('p95', 0)
+    return level['error_rate'] <= args.max_error_rate and max(status_p95, results_p95) <= args.slo_p95
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(args, stub_base: str, workdir: str, port: int) -> subprocess.Popen:
+    env = {**os.environ, 'BENCHMARK_STUB_URL': stub_base, 'BENCHMARK_WORKDIR': workdir}
+    if args.server == 'gunicorn':
+        command = [
+            'gunicorn', '-b', f"127.0.0.1:{port}",
+            '-w', str(args.gunicorn_workers), '--threads', str(args.gunicorn_threads),
+            '--timeout', '120', 'benchmarks.offline_server:build_app()'
+        ]
+    else:
+        command = [sys.executable, os.path.join(SRC_DIR, 'benchmarks', 'offline_server.py'), '--port', str(port)]
+
+    log = open(os.path.join(workdir, 'server.log'), 'ab')
+    return subprocess.Popen(command, cwd=SRC_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def _wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 180):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Servidor encerrou durante a inicialização (código {process.returncode})")
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/app_status", timeout=5):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(1)
+    raise RuntimeError("Servidor não respondeu a tempo")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Teste de carga do workflow em 3 etapas')
+    parser.add_argument('--levels', default='1,2,4,8', help='Níveis de concorrência da rampa')
+    parser.add_argument('--server', choices=['werkzeug', 'gunicorn'], default='werkzeug')
+    parser.add_argument('--gunicorn-workers', type=int, default=1)
+    parser.add_argument('--gunicorn-threads', type=int, default=8)
+    parser.add_argument('--segmento', default='Educação online')
+    parser.add_argument('--produto', default='Curso de marketing digital')
+    parser.add_argument('--publico', default='Empreendedores iniciantes')
+    parser.add_argument('--poll-interval', type=float, default=2.0)
+    parser.add_argument('--workflow-timeout', type=float, default=900, help='Tempo máximo por etapa (s)')
+    parser.add_argument('--sample-interval', type=float, default=1.0)
+    parser.add_argument('--slo-p95', type=float, default=1.0, help='p95 máximo de status/resultados (s)')
+    parser.add_argument('--max-error-rate', type=float, default=0.0)
+    parser.add_argument('--keep-going', action='store_true', help='Continua a rampa após um nível reprovado')
+    parser.add_argument('--llm-latency', type=float, default=0.2)
+    parser.add_argument('--llm-tps', type=float, default=400)
+    parser.add_argument('--llm-tokens', type=int, default=600)
+    parser.add_argument('--keep-workdir', action='store_true')
+    parser.add_argument('--output', help='Arquivo JSON de saída (padrão: benchmarks/results/load_<data>_<commit>.json)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    levels = [int(level) for level in args.levels.split(',') if level.strip()]
+    llm_config = {'latency': args.llm_latency, 'tokens_per_second': args.llm_tps, 'tokens': args.llm_tokens}
+    stub_process, stub_base = start_stub_process(llm_config)
+    workdir = tempfile.mkdtemp(prefix='arqv30_load_')
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = _start_server(args, stub_base, workdir, port)
+
+    results = []
+    capacity = 0
+    idle = {'rss': 0, 'threads': 0}
+    try:
+        _wait_ready(base_url, server)
+        idle = process_stats(server.pid)
+        for concurrency in levels:
+            logger.info(f"📈 Nível de concorrência {concurrency}")
+            level = run_level(concurrency, base_url, server.pid, args)
+            level['passed'] = _level_ok(level, args)
+            results.append(level)
+            if level['passed']:
+                capacity = concurrency
+            elif not args.keep_going:
+                break
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        stub_process.terminate()
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'benchmark': 'workflow_load',
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'config': {
+            'server': args.server,
+            'gunicorn_workers': args.gunicorn_workers if args.server == 'gunicorn' else None,
+            'gunicorn_threads': args.gunicorn_threads if args.server == 'gunicorn' else None,
+            'levels': levels,
+            'poll_interval': args.poll_interval,
+            'slo_p95': args.slo_p95,
+            'max_error_rate': args.max_error_rate,
+            'llm': llm_config
+        },
+        'idle_server': {'rss_mb': round(idle['rss'] / 1048576, 1), 'threads': idle['threads']},
+        'capacity': capacity,
+        'levels': results
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{report['commit'] or 'nogit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"\n🏋️ Teste de carga ({args.server}) — servidor ocioso: {report['idle_server']['rss_mb']} MB, {report['idle_server']['threads']} threads")
+    print(f"{'conc':>5}{'ok':>5}{'falhas':>8}{'status p50/p95/p99 (s)':>26}{'results p95':>13}{'rss(MB)':>9}{'threads':>9}")
+    for level in results:
+        status = level['latency'].get('status', {})
+        results_p95 = level['latency'].get('results', {}).get('p95', '-')
+        latency = f"{status.get('p50', '-')}/{status.get('p95', '-')}/{status.get('p99', '-')}"
+        print(
+            f"{level['concurrency']:>5}{level['completed']:>5}{level['failed']:>8}{latency:>26}{results_p95:>13}"
+            f"{level['server']['peak_rss_mb']:>9}{level['server']['peak_threads']:>9}{'' if level['passed'] else '  ❌'}"
+        )
+    print(f"\n✅ Capacidade estimada: {capacity} workflows simultâneos neste servidor")
+    print(f"💾 Resultado salvo em {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
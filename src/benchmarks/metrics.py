@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Benchmark Metrics
+Medição por fase: tempo de parede, CPU, pico de RSS, bytes escritos e arquivos criados
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, Tuple, List, Sequence
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+
+def current_rss() -> int:
+    """RSS atual do processo em bytes"""
+    if HAS_PSUTIL:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if HAS_RESOURCE:
+        # ru_maxrss é o pico do processo (KB no Linux) — melhor aproximação disponível
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return 0
+
+
+def io_write_bytes() -> int:
+    """Bytes escritos pelo processo segundo o sistema operacional (0 se indisponível)"""
+    if HAS_PSUTIL:
+        try:
+            return psutil.Process().io_counters().write_bytes
+        except (AttributeError, psutil.Error):
+            return 0
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                if line.startswith('write_bytes:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def process_stats(pid: int) -> Dict[str, int]:
+    """RSS (bytes) e número de threads de outro processo"""
+    if HAS_PSUTIL:
+        try:
+            process = psutil.Process(pid)
+            return {'rss': process.memory_info().rss, 'threads': process.num_threads()}
+        except psutil.Error:
+            return {'rss': 0, 'threads': 0}
+    stats = {'rss': 0, 'threads': 0}
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    stats['rss'] = int(line.split()[1]) * 1024
+                elif line.startswith('Threads:'):
+                    stats['threads'] = int(line.split()[1])
+    except OSError:
+        pass
+    return stats
+
+
+def percentiles(values: Sequence[float], points: Sequence[int] = (50, 95, 99)) -> Dict[str, float]:
+    """Percentis por posição (nearest-rank) mais contagem e máximo"""
+    ordered: List[float] = sorted(values)
+    if not ordered:
+        return {'count': 0}
+    result = {'count': len(ordered), 'max': round(ordered[-1], 4)}
+    for point in points:
+        rank = max(int(-(-point * len(ordered) // 100)), 1)
+        result[f'p{point}'] = round(ordered[rank - 1], 4)
+    return result
+
+
+def snapshot_tree(root: str) -> Dict[str, Tuple[int, int]]:
+    """Mapeia caminho relativo -> (tamanho, mtime_ns) de todos os arquivos sob root"""
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files[os.path.relpath(path, root)] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def diff_tree(before: Dict[str, Tuple[int, int]], after: Dict[str, Tuple[int, int]]) -> Dict[str, int]:
+    """Arquivos criados/modificados e bytes escritos entre dois snapshots"""
+    created = [path for path in after if path not in before]
+    modified = [path for path in after if path in before and after[path] != before[path]]
+    bytes_written = sum(after[path][0] for path in created)
+    bytes_written += sum(max(after[path][0] - before[path][0], 0) for path in modified)
+    return {
+        'files_created': len(created),
+        'files_modified': len(modified),
+        'files_total': len(after),
+        'bytes_written': bytes_written,
+        'bytes_on_disk': sum(size for size, _ in after.values())
+    }
+
+
+class PhaseMeter:
+    """Mede uma fase do pipeline; RSS amostrado em thread de fundo para capturar o pico"""
+
+    def __init__(self, root: str, interval: float = 0.05):
+        self.root = root
+        self.interval = interval
+        self._stop = threading.Event()
+        self._sampler = None
+        self.peak_rss = 0
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, current_rss())
+            self._stop.wait(self.interval)
+
+    def start(self) -> 'PhaseMeter':
+        self._tree = snapshot_tree(self.root)
+        self._io = io_write_bytes()
+        self._rss_start = current_rss()
+        self.peak_rss = self._rss_start
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample, name='bench-rss-sampler', daemon=True)
+        self._sampler.start()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def stop(self) -> Dict[str, Any]:
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        self._stop.set()
+        self._sampler.join()
+        self.peak_rss = max(self.peak_rss, current_rss())
+
+        return {
+            'wall_seconds': round(wall, 3),
+            'cpu_seconds': round(cpu, 3),
+            'cpu_utilization': round(cpu / wall, 3) if wall else 0.0,
+            'rss_start_mb': round(self._rss_start / 1048576, 1),
+            'peak_rss_mb': round(self.peak_rss / 1048576, 1),
+            'io_write_bytes': max(io_write_bytes() - self._io, 0),
+            **diff_tree(self._tree, snapshot_tree(self.root))
+        }
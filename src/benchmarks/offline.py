@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Benchmark Offline Mode
+Redireciona requests/aiohttp/httpx para o servidor stub e bloqueia qualquer conexão externa
+"""
+
+import os
+import errno
+import socket
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Any
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+LOOPBACK_HOSTS = frozenset(['127.0.0.1', 'localhost', '::1'])
+
+API_KEY_PROVIDERS = ['FIRECRAWL', 'JINA', 'GOOGLE', 'EXA', 'SERPER', 'YOUTUBE', 'SUPADATA', 'X']
+LLM_KEYS = ['GROQ_API_KEY', 'OPENAI_API_KEY', 'OPENROUTER_API_KEY', 'GEMINI_API_KEY']
+OTHER_KEYS = ['GOOGLE_SEARCH_KEY', 'RAPIDAPI_KEY', 'APIFY_API_KEY', 'SUPADATA_API_KEY']
+
+
+class OfflineGuard:
+    """Reescreve `https://host/caminho` em `http://127.0.0.1:porta/host/caminho`"""
+
+    def __init__(self, stub_base: str):
+        self.stub_base = stub_base.rstrip('/')
+        self._stub = urlsplit(self.stub_base)
+        self._lock = threading.Lock()
+        self.redirected = Counter()
+        self.blocked = Counter()
+        self._originals = []
+
+    def redirect(self, url: str, client: str) -> str:
+        parts = urlsplit(url)
+        if not parts.hostname or parts.hostname in LOOPBACK_HOSTS:
+            return url
+        with self._lock:
+            self.redirected[client] += 1
+        return urlunsplit((self._stub.scheme, self._stub.netloc, f"/{parts.hostname}{parts.path or '/'}", parts.query, ''))
+
+    def install(self):
+        """Aplica os redirecionamentos nas bibliotecas HTTP disponíveis e o bloqueio de sockets"""
+        guard = self
+
+        try:
+            import requests
+            original_request = requests.Session.request
+
+            def session_request(session, method, url, *args, **kwargs):
+                return original_request(session, method, guard.redirect(str(url), 'requests'), *args, **kwargs)
+
+            self._patch(requests.Session, 'request', session_request)
+        except ImportError:
+            pass
+
+        try:
+            import aiohttp
+            original_aiohttp = aiohttp.ClientSession._request
+
+            def aiohttp_request(session, method, str_or_url, **kwargs):
+                return original_aiohttp(session, method, guard.redirect(str(str_or_url), 'aiohttp'), **kwargs)
+
+            self._patch(aiohttp.ClientSession, '_request', aiohttp_request)
+        except ImportError:
+            pass
+
+        try:
+            import httpx
+            original_send = httpx.Client.send
+            original_async_send = httpx.AsyncClient.send
+
+            def rewrite(request):
+                request.url = httpx.URL(guard.redirect(str(request.url), 'httpx'))
+                request.headers['Host'] = request.url.netloc.decode('ascii')
+
+            def client_send(client, request, **kwargs):
+                rewrite(request)
+                return original_send(client, request, **kwargs)
+
+            async def async_client_send(client, request, **kwargs):
+                rewrite(request)
+                return await original_async_send(client, request, **kwargs)
+
+            self._patch(httpx.Client, 'send', client_send)
+            self._patch(httpx.AsyncClient, 'send', async_client_send)
+        except ImportError:
+            pass
+
+        original_connect = socket.socket.connect
+        original_connect_ex = socket.socket.connect_ex
+
+        def allowed(sock, address) -> bool:
+            if sock.family not in (socket.AF_INET, socket.AF_INET6):
+                return True
+            host = address[0] if isinstance(address, tuple) else str(address)
+            if host in LOOPBACK_HOSTS or host.startswith('127.'):
+                return True
+            with guard._lock:
+                guard.blocked[host] += 1
+            logger.warning(f"🚫 Conexão externa bloqueada no modo offline: {host}")
+            return False
+
+        def connect(sock, address):
+            if not allowed(sock, address):
+                raise ConnectionRefusedError(f"Modo offline: conexão para {address[0]} bloqueada")
+            return original_connect(sock, address)
+
+        def connect_ex(sock, address):
+            if not allowed(sock, address):
+                return errno.ECONNREFUSED
+            return original_connect_ex(sock, address)
+
+        self._patch(socket.socket, 'connect', connect)
+        self._patch(socket.socket, 'connect_ex', connect_ex)
+        logger.info(f"🧪 Modo offline ativo: tráfego HTTP redirecionado para {self.stub_base}")
+        return self
+
+    def _patch(self, owner, name: str, replacement):
+        self._originals.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, replacement)
+
+    def uninstall(self):
+        """Restaura as funções originais"""
+        while self._originals:
+            owner, name, original = self._originals.pop()
+            setattr(owner, name, original)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'redirected': dict(self.redirected), 'blocked_connections': dict(self.blocked)}
+
+
+def configure_environment(stub_base: str, workdir: str) -> Dict[str, str]:
+    """Variáveis de ambiente que ativam todos os provedores com chaves falsas e isolam a saída"""
+    env = {f"{provider}_API_KEY": 'bench-offline' for provider in API_KEY_PROVIDERS}
+    env.update({key: 'bench-offline' for key in LLM_KEYS + OTHER_KEYS})
+    env.update({
+        'GOOGLE_CSE_ID': 'bench-offline',
+        'SUPABASE_URL': 'https://bench.supabase.co',
+        'SUPABASE_ANON_KEY': 'bench-offline',
+        'FLASK_ENV': 'development',
+        'SECRET_KEY': 'bench-offline',
+        'HTTP_ENABLE_HTTP2': 'false',
+        'NO_PROXY': '127.0.0.1,localhost',
+        'SEARCH_CACHE_DIR': os.path.join(workdir, 'cache'),
+        'IMAGE_STORE_DIR': os.path.join(workdir, 'image_store'),
+        # Etapas em thread do próprio processo: o OfflineGuard e o PhaseMeter não alcançam os workers da fila
+        'WORKFLOW_EXECUTION_MODE': 'thread',
+        'BENCHMARK_STUB_URL': stub_base,
+        'BENCHMARK_WORKDIR': workdir
+    })
+    for proxy in ('HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 'ALL_PROXY'):
+        os.environ.pop(proxy, None)
+    os.environ.update(env)
+    return env
+
+
+def prepare_app(with_screenshots: bool = False):
+    """
+    Cria a aplicação Flask para execução offline (chamar após configure_environment e install)
+
+    O Gemini sai da lista de provedores porque o SDK usa gRPC, que não passa pelas bibliotecas
+    redirecionadas; a captura com Selenium abre um navegador real e fica desligada por padrão.
+    """
+    from run import create_app
+    app = create_app()
+
+    from services.ai_manager import ai_manager
+    from services.enhanced_ai_manager import enhanced_ai_manager
+    for manager in (ai_manager, enhanced_ai_manager):
+        manager.providers.pop('gemini', None)
+
+    if not with_screenshots:
+        import services.viral_content_analyzer as viral_content_analyzer_module
+        viral_content_analyzer_module.HAS_SELENIUM = False
+
+    return app
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Offline Server
+Sobe a aplicação Flask com os provedores redirecionados para o stub (usado pelo teste de carga)
+
+Requer BENCHMARK_STUB_URL e BENCHMARK_WORKDIR no ambiente:
+    python benchmarks/offline_server.py --port 5055
+    gunicorn -w 2 --threads 8 'benchmarks.offline_server:build_app()'
+"""
+
+import os
+import sys
+import logging
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from benchmarks.offline import OfflineGuard, configure_environment, prepare_app
+
+logger = logging.getLogger(__name__)
+
+
+def build_app():
+    """Factory da aplicação em modo offline (um guard por processo/worker)"""
+    stub_base = os.environ['BENCHMARK_STUB_URL']
+    workdir = os.environ.get('BENCHMARK_WORKDIR') or os.getcwd()
+    os.makedirs(workdir, exist_ok=True)
+
+    configure_environment(stub_base, workdir)
+    OfflineGuard(stub_base).install()
+    os.chdir(workdir)
+    return prepare_app(os.getenv('BENCHMARK_SCREENSHOTS', 'false').lower() == 'true')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Aplicação em modo offline para testes de carga')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    app = build_app()
+    logger.info(f"🧪 Servidor offline em http://{args.host}:{args.port}")
+    app.run(host=args.host, port=args.port, threaded=True, debug=False, use_reloader=False)
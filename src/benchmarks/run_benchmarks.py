@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Benchmark Suite
+Executa as três etapas do workflow contra provedores locais e grava métricas por fase em JSON
+
+Uso (a partir de src/):
+    python benchmarks/run_benchmarks.py --runs 3
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/<anterior>.json
+    python benchmarks/run_benchmarks.py --compare antigo.json novo.json
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from benchmarks.metrics import PhaseMeter
+from benchmarks.offline import OfflineGuard, configure_environment, prepare_app
+from benchmarks.stub_server import start_stub_process
+
+logger = logging.getLogger('benchmarks')
+
+RESULTS_DIR = os.path.join(SRC_DIR, 'benchmarks', 'results')
+
+PHASES = [
+    ('step1', '/api/workflow/step1/start', 'execute_collection', 'etapa1'),
+    ('step2', '/api/workflow/step2/start', 'execute_synthesis', 'etapa2'),
+    ('step3', '/api/workflow/step3/start', 'execute_generation', 'etapa3'),
+]
+
+# Métricas comparadas entre execuções (maior = pior)
+COMPARED_METRICS = ['wall_seconds', 'cpu_seconds', 'peak_rss_mb', 'bytes_written', 'files_created']
+
+def _stub_stats(stub_base: str) -> Dict[str, Any]:
+    with urllib.request.urlopen(f"{stub_base}/__stats", timeout=10) as response:
+        return json.loads(response.read())
+
+
+def _stub_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    delta = {}
+    for kind in ('requests', 'bytes'):
+        delta[kind] = {
+            route: value - before[kind].get(route, 0)
+            for route, value in after[kind].items()
+            if route != '__stats' and value - before[kind].get(route, 0)
+        }
+    return delta
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=SRC_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _phase_outcome(session_id: str, marker: str) -> Dict[str, Any]:
+    """Status da fase a partir dos arquivos salvos pelo workflow"""
+    session_dir = os.path.join('analyses_data', session_id)
+    if glob.glob(os.path.join(session_dir, f"{marker}_erro_*.json")):
+        return {'status': 'error'}
+    done = sorted(glob.glob(os.path.join(session_dir, f"{marker}_concluida_*.json")))
+    if not done:
+        return {'status': 'incomplete'}
+
+    outcome = {'status': 'completed'}
+    if marker == 'etapa3':
+        try:
+            with open(done[-1], 'r', encoding='utf-8') as f:
+                summary = json.load(f).get('modules_result', {}).get('processing_summary', {})
+            outcome['successful_modules'] = summary.get('successful_modules', 0)
+        except (OSError, ValueError, AttributeError):
+            pass
+    return outcome
+
+
+def _run_phase(client, workdir: str, stub_base: str, endpoint: str, target: str, marker: str,
+               payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """Dispara a etapa pela API e aguarda a thread de execução em segundo plano terminar"""
+    from routes.enhanced_workflow import running_stage_threads
+
+    stub_before = _stub_stats(stub_base)
+    meter = PhaseMeter(workdir).start()
+
+    response = client.post(endpoint, json=payload)
+    body = response.get_json(silent=True) or {}
+    if response.status_code != 200:
+        metrics = meter.stop()
+        return {**metrics, 'status': 'rejected', 'http_status': response.status_code, 'error': body.get('error')}
+
+    # Só as threads de etapa registradas pela rota; pools e supervisores são permanentes e não devem ser aguardados
+    session_id = body.get('session_id', payload.get('session_id'))
+    workers = [entry['thread'] for entry in running_stage_threads(session_id) if entry['target'] == target]
+    deadline = time.monotonic() + timeout
+    for worker in workers:
+        worker.join(max(deadline - time.monotonic(), 0))
+    timed_out = any(worker.is_alive() for worker in workers)
+
+    metrics = meter.stop()
+    outcome = {'status': 'timeout'} if timed_out else _phase_outcome(body.get('session_id', payload.get('session_id', '')), marker)
+    return {
+        **metrics,
+        **outcome,
+        'session_id': body.get('session_id'),
+        'stub': _stub_delta(stub_before, _stub_stats(stub_base))
+    }
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Mediana de cada métrica por fase"""
+    summary = {}
+    for name, _, _, _ in PHASES:
+        samples = [run['phases'][name] for run in runs if name in run['phases']]
+        if samples:
+            summary[name] = {
+                metric: statistics.median(sample[metric] for sample in samples)
+                for metric in COMPARED_METRICS + ['io_write_bytes']
+            }
+    return summary
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Compara resumos; marca regressão quando a métrica piora acima do limiar relativo"""
+    rows = []
+    for phase, metrics in current.get('summary', {}).items():
+        base_metrics = baseline.get('summary', {}).get(phase, {})
+        for metric in COMPARED_METRICS:
+            old, new = base_metrics.get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else (0.0 if new == old else float('inf'))
+            rows.append({
+                'phase': phase,
+                'metric': metric,
+                'baseline': old,
+                'current': new,
+                'change': change,
+                'regression': change > threshold
+            })
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]], baseline: Dict[str, Any], current: Dict[str, Any]):
+    print(f"\n📊 Comparação {baseline.get('commit') or '?'} → {current.get('commit') or '?'}")
+    print(f"{'fase':<8}{'métrica':<16}{'base':>14}{'atual':>14}{'Δ':>10}")
+    for row in rows:
+        flag = '  ⚠️' if row['regression'] else ''
+        change = 'novo' if row['change'] == float('inf') else f"{row['change'] * 100:+.1f}%"
+        print(f"{row['phase']:<8}{row['metric']:<16}{row['baseline']:>14}{row['current']:>14}{change:>10}{flag}")
+
+
+def print_summary(result: Dict[str, Any]):
+    print(f"\n⏱️ Benchmark do workflow ({result['config']['runs']} execução(ões), commit {result.get('commit') or '?'})")
+    print(f"{'fase':<8}{'parede(s)':>11}{'cpu(s)':>9}{'rss(MB)':>9}{'escrito(B)':>13}{'arquivos':>10}")
+    for phase, metrics in result['summary'].items():
+        print(
+            f"{phase:<8}{metrics['wall_seconds']:>11}{metrics['cpu_seconds']:>9}{metrics['peak_rss_mb']:>9}"
+            f"{int(metrics['bytes_written']):>13}{int(metrics['files_created']):>10}"
+        )
+    blocked = result['offline'].get('blocked_connections')
+    if blocked:
+        print(f"🚫 Conexões externas bloqueadas: {blocked}")
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    """Executa o benchmark completo e retorna o resultado serializável"""
+    llm_config = {'latency': args.llm_latency, 'tokens_per_second': args.llm_tps, 'tokens': args.llm_tokens}
+    stub_process, stub_base = start_stub_process(llm_config)
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix='arqv30_bench_')
+    os.makedirs(workdir, exist_ok=True)
+    original_cwd = os.getcwd()
+
+    configure_environment(stub_base, workdir)
+    guard = OfflineGuard(stub_base).install()
+    os.chdir(workdir)
+
+    try:
+        start = time.perf_counter()
+        app = prepare_app(args.with_screenshots)
+        startup_seconds = round(time.perf_counter() - start, 3)
+
+        client = app.test_client()
+        payload = {'segmento': args.segmento, 'produto': args.produto, 'publico': args.publico}
+        runs = []
+
+        for index in range(args.runs):
+            logger.info(f"🏁 Execução {index + 1}/{args.runs}")
+            phases = {}
+            session_id = None
+            for name, endpoint, target, marker in PHASES:
+                body = payload if name == 'step1' else {'session_id': session_id}
+                phases[name] = _run_phase(client, workdir, stub_base, endpoint, target, marker, body, args.phase_timeout)
+                session_id = session_id or phases[name].get('session_id')
+                if phases[name]['status'] != 'completed' and args.stop_on_error:
+                    break
+            runs.append({'run': index + 1, 'session_id': session_id, 'phases': phases})
+
+        return {
+            'benchmark': 'workflow_offline',
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': {
+                'runs': args.runs,
+                'llm': llm_config,
+                'payload': payload,
+                'with_screenshots': args.with_screenshots,
+                'phase_timeout': args.phase_timeout
+            },
+            'startup_seconds': startup_seconds,
+            'runs': runs,
+            'summary': summarize(runs),
+            'offline': guard.get_stats()
+        }
+    finally:
+        os.chdir(original_cwd)
+        guard.uninstall()
+        stub_process.terminate()
+        if not args.workdir and not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark offline do workflow em 3 etapas')
+    parser.add_argument('--runs', type=int, default=1, help='Número de execuções completas (mediana no resumo)')
+    parser.add_argument('--segmento', default='Educação online')
+    parser.add_argument('--produto', default='Curso de marketing digital')
+    parser.add_argument('--publico', default='Empreendedores iniciantes')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='Latência até o primeiro token do LLM falso (s)')
+    parser.add_argument('--llm-tps', type=float, default=400, help='Tokens por segundo do LLM falso')
+    parser.add_argument('--llm-tokens', type=int, default=600, help='Tamanho das respostas do LLM falso (tokens)')
+    parser.add_argument('--phase-timeout', type=float, default=900)
+    parser.add_argument('--workdir', help='Diretório de trabalho (padrão: temporário, removido ao final)')
+    parser.add_argument('--keep-workdir', action='store_true')
+    parser.add_argument('--with-screenshots', action='store_true', help='Mantém captura com Selenium (requer navegador)')
+    parser.add_argument('--stop-on-error', action='store_true')
+    parser.add_argument('--output', help='Arquivo JSON de saída (padrão: benchmarks/results/<data>_<commit>.json)')
+    parser.add_argument('--baseline', help='Resultado anterior para comparação')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Piora relativa considerada regressão')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help='Só compara dois resultados')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    logger.setLevel(logging.INFO)
+
+    if args.compare:
+        baseline, current = _load(args.compare[0]), _load(args.compare[1])
+        rows = compare(baseline, current, args.threshold)
+        print_comparison(rows, baseline, current)
+        return 1 if any(row['regression'] for row in rows) else 0
+
+    result = run_benchmark(args)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{result.get('commit') or 'nogit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    print_summary(result)
+    print(f"\n💾 Resultado salvo em {output}")
+
+    if args.baseline:
+        baseline = _load(args.baseline)
+        rows = compare(baseline, result, args.threshold)
+        print_comparison(rows, baseline, result)
+        return 1 if any(row['regression'] for row in rows) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
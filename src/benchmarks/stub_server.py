@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Benchmark Stub Server
+Servidor HTTP local que substitui os provedores externos (busca, Jina, Exa, YouTube, páginas e LLM)
+"""
+
+import os
+import json
+import time
+import uuid
+import zlib
+import random
+import struct
+import hashlib
+import logging
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# (host, prefixo do caminho) -> (rota, fixture, content-type)
+ROUTES = [
+    ('google.serper.dev', '/images', 'serper_images', 'serper_images.json', 'application/json'),
+    ('google.serper.dev', '/videos', 'serper_videos', 'serper_videos.json', 'application/json'),
+    ('google.serper.dev', '/', 'serper_search', 'serper_search.json', 'application/json'),
+    ('api.exa.ai', '/', 'exa', 'exa_search.json', 'application/json'),
+    ('www.googleapis.com', '/youtube/v3/search', 'youtube_search', 'youtube_search.json', 'application/json'),
+    ('www.googleapis.com', '/youtube/v3/videos', 'youtube_videos', 'youtube_videos.json', 'application/json'),
+    ('www.googleapis.com', '/customsearch/v1', 'google_cse', 'google_cse.json', 'application/json'),
+    ('r.jina.ai', '/', 'jina', 'jina_reader.md', 'text/plain; charset=utf-8'),
+    ('s.jina.ai', '/', 'jina', 'jina_reader.md', 'text/plain; charset=utf-8'),
+]
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+LLM_SECTIONS = [
+    "Resumo executivo",
+    "Perfil do público",
+    "Dores e desejos",
+    "Objeções principais",
+    "Oportunidades de posicionamento",
+    "Plano de ação"
+]
+
+
+def _png(seed: str, size: int = 64) -> bytes:
+    """PNG RGB determinístico (ruído) — distinto por URL para não colapsar na deduplicação"""
+    rng = random.Random(seed)
+    raw = b''.join(b'\x00' + rng.randbytes(size * 3) for _ in range(size))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b'')
+
+
+def _llm_text(prompt: str, tokens: int) -> str:
+    """Texto canônico com aproximadamente `tokens` palavras; JSON quando o prompt pede JSON"""
+    seed = int(hashlib.md5(prompt.encode('utf-8', 'ignore')).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    vocabulary = (
+        "público mercado estratégia conversão autoridade prova resultado oferta objeção gatilho "
+        "desejo dor transformação conteúdo engajamento posicionamento diferencial confiança escala"
+    ).split()
+
+    sections = []
+    per_section = max(tokens // len(LLM_SECTIONS), 10)
+    for title in LLM_SECTIONS:
+        words = ' '.join(rng.choice(vocabulary) for _ in range(per_section))
+        sections.append((title, words.capitalize() + '.'))
+
+    if 'json' in prompt.lower():
+        return json.dumps({
+            key.lower().replace(' ', '_'): text for key, text in sections
+        }, ensure_ascii=False, indent=2)
+    return '\n\n'.join(f"## {title}\n\n{text}" for title, text in sections)
+
+
+class StubState:
+    """Configuração do LLM falso e contadores de requisições por rota"""
+
+    def __init__(self, llm_config: Dict[str, Any], fixtures_dir: str = FIXTURES_DIR):
+        self.llm = {
+            'latency': float(llm_config.get('latency', 0.2)),
+            'tokens_per_second': float(llm_config.get('tokens_per_second', 400)),
+            'tokens': int(llm_config.get('tokens', 600))
+        }
+        self.fixtures_dir = fixtures_dir
+        self._fixtures: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self.counts = Counter()
+        self.bytes_sent = Counter()
+        with open(os.path.join(fixtures_dir, 'pages', 'article.html'), 'r', encoding='utf-8') as f:
+            self.page_template = f.read()
+
+    def fixture(self, name: str) -> bytes:
+        if name not in self._fixtures:
+            with open(os.path.join(self.fixtures_dir, name), 'rb') as f:
+                self._fixtures[name] = f.read()
+        return self._fixtures[name]
+
+    def record(self, route: str, size: int):
+        with self._lock:
+            self.counts[route] += 1
+            self.bytes_sent[route] += size
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'requests': dict(self.counts), 'bytes': dict(self.bytes_sent)}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Roteia `/<host>/<caminho>` (URLs reescritas pelo modo offline) para fixtures ou LLM falso"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'ARQV30Stub/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self) -> StubState:
+        return self.server.state
+
+    def _target(self) -> Tuple[str, str]:
+        parts = urlsplit(self.path)
+        host, _, path = parts.path.lstrip('/').partition('/')
+        return host.lower(), '/' + path
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, route: str, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+        self.state.record(route, len(body))
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        if self.path == '/__stats':
+            return self._send('__stats', 200, json.dumps(self.state.snapshot()).encode(), 'application/json')
+        self._dispatch(b'')
+
+    def do_POST(self):
+        self._dispatch(self._body())
+
+    def _dispatch(self, body: bytes):
+        host, path = self._target()
+
+        if path.endswith('/chat/completions'):
+            return self._chat_completion(body)
+        if ':generateContent' in path or ':streamGenerateContent' in path:
+            return self._gemini(body)
+
+        for route_host, prefix, route, fixture, content_type in ROUTES:
+            if host == route_host and path.startswith(prefix):
+                return self._send(route, 200, self.state.fixture(fixture), content_type)
+
+        if host == 'api.firecrawl.dev':
+            markdown = self.state.fixture('jina_reader.md').decode('utf-8')
+            payload = {'success': True, 'data': {'markdown': markdown, 'html': f"<pre>{markdown}</pre>"}}
+            return self._send('firecrawl', 200, json.dumps(payload, ensure_ascii=False).encode(), 'application/json')
+
+        if urlsplit(path).path.lower().endswith(IMAGE_EXTENSIONS) or 'cdn' in host or host.startswith(('scontent', 'i.ytimg')):
+            return self._send('images', 200, _png(host + path), 'image/png')
+
+        if self.command == 'POST' or host.startswith('api.') or 'supabase' in host:
+            # APIs sem gravação: resposta vazia válida para os clientes tratarem como "sem resultados"
+            return self._send('other_api', 200, b'{}', 'application/json')
+
+        return self._page(host, path)
+
+    def _page(self, host: str, path: str):
+        slug = path.strip('/').split('/')[-1] or 'inicio'
+        title = slug.replace('-', ' ').strip().capitalize() or host
+        rng = random.Random(host + path)
+        sentences = [
+            "O mercado brasileiro mostra crescimento consistente, puxado por consumidores que buscam resultado rápido.",
+            "Empresas que investem em prova social e conteúdo educativo convertem até três vezes mais.",
+            "A principal objeção continua sendo o preço, seguida da falta de tempo para aplicar o que aprendem.",
+            "Criadores de conteúdo se tornaram o canal mais barato de aquisição para pequenos negócios.",
+            "Pesquisas apontam que a confiança na marca pesa mais que o desconto na decisão final.",
+            "O ticket médio sobe quando a oferta inclui acompanhamento e comunidade."
+        ]
+        paragraphs = '\n        '.join(
+            '<p>' + ' '.join(rng.sample(sentences, 4)) + '</p>' for _ in range(6)
+        )
+        html = self.state.page_template.format(
+            title=title, summary=sentences[0], host=host, slug=slug, paragraphs=paragraphs
+        )
+        return self._send('pages', 200, html.encode('utf-8'), 'text/html; charset=utf-8')
+
+    def _prompt(self, body: bytes, gemini: bool = False) -> Tuple[str, Dict[str, Any]]:
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            payload = {}
+        if gemini:
+            parts = [p.get('text', '') for c in payload.get('contents', []) for p in c.get('parts', [])]
+            return '\n'.join(parts), payload
+        messages = payload.get('messages') or []
+        return '\n'.join(str(m.get('content', '')) for m in messages), payload
+
+    def _chat_completion(self, body: bytes):
+        """Endpoint compatível com OpenAI/Groq/OpenRouter, com latência e vazão configuráveis"""
+        prompt, payload = self._prompt(body)
+        llm = self.state.llm
+        tokens = min(llm['tokens'], int(payload.get('max_tokens') or llm['tokens']))
+        text = _llm_text(prompt, tokens)
+        model = payload.get('model', 'stub-llm')
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        time.sleep(llm['latency'])
+
+        if not payload.get('stream'):
+            time.sleep(tokens / llm['tokens_per_second'])
+            response = {
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': created,
+                'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': len(prompt.split()), 'completion_tokens': tokens, 'total_tokens': len(prompt.split()) + tokens}
+            }
+            return self._send('llm', 200, json.dumps(response, ensure_ascii=False).encode(), 'application/json')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        words = text.split(' ')
+        step = 8
+        sent = 0
+        for start in range(0, len(words), step):
+            piece = ' '.join(words[start:start + step]) + (' ' if start + step < len(words) else '')
+            chunk = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': created,
+                'model': model,
+                'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]
+            }
+            data = f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode()
+            self.wfile.write(data)
+            self.wfile.flush()
+            sent += len(data)
+            time.sleep(step / llm['tokens_per_second'])
+
+        final = {
+            'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+            'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]
+        }
+        tail = f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode()
+        self.wfile.write(tail)
+        self.state.record('llm_stream', sent + len(tail))
+
+    def _gemini(self, body: bytes):
+        """Endpoint REST generateContent (transporte REST do SDK do Gemini)"""
+        prompt, _ = self._prompt(body, gemini=True)
+        llm = self.state.llm
+        time.sleep(llm['latency'] + llm['tokens'] / llm['tokens_per_second'])
+        response = {
+            'candidates': [{
+                'content': {'parts': [{'text': _llm_text(prompt, llm['tokens'])}], 'role': 'model'},
+                'finishReason': 'STOP',
+                'index': 0
+            }],
+            'usageMetadata': {'promptTokenCount': len(prompt.split()), 'candidatesTokenCount': llm['tokens']}
+        }
+        return self._send('llm', 200, json.dumps(response, ensure_ascii=False).encode(), 'application/json')
+
+
+def create_server(llm_config: Dict[str, Any], port: int = 0, fixtures_dir: str = FIXTURES_DIR) -> ThreadingHTTPServer:
+    """Cria o servidor stub em 127.0.0.1 (porta 0 = escolhida pelo sistema)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(llm_config, fixtures_dir)
+    return server
+
+
+def serve(port_queue, llm_config: Dict[str, Any], port: int = 0, fixtures_dir: Optional[str] = None):
+    """Ponto de entrada do processo do stub: publica a porta na fila e atende até ser encerrado"""
+    server = create_server(llm_config, port, fixtures_dir or FIXTURES_DIR)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_stub_process(llm_config: Dict[str, Any]):
+    """Sobe o stub em processo separado (sua CPU não entra nas medições); retorna (processo, URL base)"""
+    import multiprocessing
+
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(port_queue, llm_config), daemon=True)
+    process.start()
+    port = port_queue.get(timeout=30)
+    return process, f"http://127.0.0.1:{port}"
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Servidor stub dos provedores externos')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--llm-latency', type=float, default=0.2)
+    parser.add_argument('--llm-tps', type=float, default=400)
+    parser.add_argument('--llm-tokens', type=int, default=600)
+    args = parser.parse_args()
+
+    httpd = create_server({'latency': args.llm_latency, 'tokens_per_second': args.llm_tps, 'tokens': args.llm_tokens}, args.port)
+    print(f"🧪 Stub server em http://127.0.0.1:{httpd.server_address[1]}")
+    httpd.serve_forever()
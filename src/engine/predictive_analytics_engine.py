@@ -55,25 +55,12 @@ try:
 except ImportError:
     HAS_GENSIM = False
 
-try:
-    from PIL import Image
-    import pytesseract
-    HAS_OCR = True
-except ImportError:
-    HAS_OCR = False
-
 try:
     import cv2
     HAS_OPENCV = True
 except ImportError:
     HAS_OPENCV = False
 
-try:
-    from prophet import Prophet
-    HAS_PROPHET = True
-except ImportError:
-    HAS_PROPHET = False
-
 try:
     import plotly.graph_objects as go
     import plotly.express as px
@@ -82,13 +69,10 @@ try:
 except ImportError:
     HAS_PLOTLY = False
 
-try:
-    import networkx as nx
-    HAS_NETWORKX = True
-except ImportError:
-    HAS_NETWORKX = False
-
 from services.auto_save_manager import salvar_etapa, salvar_erro
+from services.visual_analysis_pipeline import visual_analysis_pipeline
+from services.forecasting import forecast_engine, to_series, detect_anomalies_iqr
+from services.network_analyzer import network_analyzer, HAS_NETWORKX
 
 logger = logging.getLogger(__name__)
 
@@ -449,7 +433,7 @@ class PredictiveAnalyticsEngine:
                 results["anomaly_detection"] = anomalies
                 
                 # Modelos de previsão
-                if HAS_PROPHET and len(df) >= 10:
+                if len(df) >= 10:
                     forecast = self._create_forecast_models(df)
                     results["forecast_models"] = forecast
 
@@ -474,58 +458,67 @@ class PredictiveAnalyticsEngine:
             "accessibility_metrics": {}
         }
 
-        if not HAS_OCR:
+        if not visual_analysis_pipeline.available:
             logger.warning("⚠️ OCR não disponível - análise visual limitada")
             return results
 
+        session_id = session_dir.name
         files_dir = Path(f"analyses_data/files/{session_id}")
         if not files_dir.exists():
             logger.info("📂 Diretório de screenshots não encontrado")
             return results
 
         extracted_texts = []
-        visual_features = []
 
-        for img_file in files_dir.glob("*.png"):
+        # OCR/cores em pool de processos, com cache por hash perceptual e descarte de quase-duplicatas
+        analyses = await asyncio.to_thread(
+            visual_analysis_pipeline.analyze,
+            sorted(files_dir.glob("*.png")),
+            HAS_OPENCV
+        )
+
+        for analysis in analyses:
+            file_name = analysis["file"]
             try:
-                logger.info(f"🔍 Analisando imagem: {img_file.name}")
-                
-                # Carrega imagem
-                image = Image.open(img_file)
-                
-                # OCR para extração de texto
-                ocr_text = pytesseract.image_to_string(image, lang='por')
-                if ocr_text.strip():
+                ocr_text = analysis.get("ocr_text", "")
+
+                if analysis["source"] == "duplicate":
+                    results.setdefault("near_duplicates_skipped", []).append({
+                        "file": file_name,
+                        "duplicate_of": analysis["duplicate_of"]
+                    })
+                elif ocr_text.strip():
                     extracted_texts.append(ocr_text)
                     results["text_extracted_ocr"].append({
-                        "file": img_file.name,
+                        "file": file_name,
                         "text": ocr_text[:500],  # Limita para armazenamento
-                        "word_count": len(ocr_text.split())
+                        "word_count": len(ocr_text.split()),
+                        "cached": analysis["source"] == "cache"
                     })
-                
-                # Análise de cores (se OpenCV disponível)
-                if HAS_OPENCV:
-                    color_analysis = self._analyze_image_colors(img_file)
-                    results["color_analysis"][img_file.name] = color_analysis
-                
+
+                if analysis.get("color_analysis"):
+                    results["color_analysis"][file_name] = analysis["color_analysis"]
+
                 # Análise de layout e elementos UI
                 ui_elements = self._detect_ui_elements(ocr_text)
-                results["ui_elements_identified"][img_file.name] = ui_elements
-                
+                results["ui_elements_identified"][file_name] = ui_elements
+
                 # Elementos de marca
                 brand_elements = self._detect_brand_elements(ocr_text)
-                results["brand_elements"][img_file.name] = brand_elements
-                
+                results["brand_elements"][file_name] = brand_elements
+
                 # Indicadores emocionais visuais
                 emotional_cues = self._extract_visual_emotional_cues(ocr_text)
-                results["emotional_visual_cues"][img_file.name] = emotional_cues
-                
+                results["emotional_visual_cues"][file_name] = emotional_cues
+
                 results["screenshots_processed"] += 1
-                
+
             except Exception as e:
-                logger.error(f"❌ Erro na análise visual de {img_file.name}: {e}")
+                logger.error(f"❌ Erro na análise visual de {file_name}: {e}")
                 continue
 
+        results["pipeline_stats"] = visual_analysis_pipeline.get_stats()
+
         # Análise agregada do texto extraído
         if extracted_texts:
             combined_text = " ".join(extracted_texts)
@@ -563,49 +556,12 @@ class PredictiveAnalyticsEngine:
             # Carrega dados de entidades e relacionamentos
             entities_data = self._extract_entities_relationships(session_dir)
             
-            if not entities_data:
+            if not entities_data or not entities_data.get('entities'):
                 logger.warning("⚠️ Dados insuficientes para análise de rede")
                 return results
 
-            # Cria grafo
-            G = nx.Graph()
-            
-            # Adiciona nós (entidades)
-            for entity in entities_data['entities']:
-                G.add_node(entity['name'], **entity['attributes'])
-            
-            # Adiciona arestas (relacionamentos)
-            for relationship in entities_data['relationships']:
-                G.add_edge(
-                    relationship['source'], 
-                    relationship['target'], 
-                    weight=relationship['strength']
-                )
-
-            results["network_nodes"] = G.number_of_nodes()
-            results["network_edges"] = G.number_of_edges()
-            results["network_density"] = nx.density(G)
-
-            # Métricas de centralidade
-            if G.number_of_nodes() > 0:
-                centrality = {
-                    "betweenness": dict(nx.betweenness_centrality(G)),
-                    "closeness": dict(nx.closeness_centrality(G)),
-                    "degree": dict(nx.degree_centrality(G)),
-                    "eigenvector": dict(nx.eigenvector_centrality(G, max_iter=1000))
-                }
-                results["centrality_metrics"] = centrality
-                
-                # Detecção de comunidades
-                communities = list(nx.community.greedy_modularity_communities(G))
-                results["community_detection"] = {
-                    "num_communities": len(communities),
-                    "modularity": nx.community.modularity(G, communities),
-                    "communities": [list(community) for community in communities]
-                }
-                
-                # Coeficiente de clustering
-                results["clustering_coefficient"] = nx.average_clustering(G)
+            # Grafo podado, centralidade aproximada e orçamento de tempo por métrica
+            results.update(await asyncio.to_thread(network_analyzer.analyze, entities_data))
 
         except Exception as e:
             logger.error(f"❌ Erro na análise de rede: {e}")
@@ -1129,78 +1085,28 @@ class PredictiveAnalyticsEngine:
 
 
     def _detect_anomalies(self, temporal_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Detecta anomalias em dados temporais usando um método simples (e.g., IQR)."""
-        if not temporal_data or len(temporal_data) < 5:
-            return []
-
-        df = pd.DataFrame(temporal_data)
-        df["timestamp"] = pd.to_datetime(df["timestamp"])
-        df = df.set_index("timestamp").sort_index()
-
-        anomalies = []
-        if "value" in df.columns:
-            Q1 = df["value"].quantile(0.25)
-            Q3 = df["value"].quantile(0.75)
-            IQR = Q3 - Q1
-            
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-
-            for index, row in df.iterrows():
-                if row["value"] < lower_bound or row["value"] > upper_bound:
-                    anomalies.append({"timestamp": index.isoformat(), "value": row["value"], "type": "outlier"})
-
-        return anomalies
-
-
-
+        """Detecta anomalias em dados temporais usando IQR (vetorizado)."""
+        ts, values = to_series(temporal_data)
+        return detect_anomalies_iqr(ts, values)
 
     def _create_forecast_models(self, temporal_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Cria modelos de previsão usando Prophet (se disponível) ou regressão linear."""
-        forecast_models = {}
-        if not temporal_data or len(temporal_data) < self.config["min_data_points_prediction"]:
+        """Cria modelos de previsão (tendência linear e Prophet) com cache por série."""
+        if temporal_data is None or len(temporal_data) < self.config["min_data_points_prediction"]:
             logger.warning("⚠️ Dados insuficientes para criar modelos de previsão.")
-            return forecast_models
+            return {}
 
         df = pd.DataFrame(temporal_data)
-        df["ds"] = pd.to_datetime(df["timestamp"])
-        df["y"] = df["value"]
-
-        if HAS_PROPHET:
-            try:
-                m = Prophet()
-                m.fit(df)
-                future = m.make_future_dataframe(periods=self.config["prediction_horizon_days"])
-                forecast = m.predict(future)
-                forecast_models["prophet_forecast"] = forecast[["ds", "yhat", "yhat_lower", "yhat_upper"]].to_dict(orient="records")
-                logger.info("✅ Modelo Prophet criado e previsão gerada.")
-            except Exception as e:
-                logger.error(f"❌ Erro ao criar modelo Prophet: {e}")
-        
-        if HAS_SKLEARN:
-            try:
-                # Regressão Linear como fallback ou modelo adicional
-                df["ordinal_date"] = df["ds"].apply(lambda date: date.toordinal())
-                X = df[["ordinal_date"]]
-                y = df["y"]
+        horizon = self.config["prediction_horizon_days"]
 
-                if len(X) > 1:
-                    model = LinearRegression()
-                    model.fit(X, y)
-
-                    # Prever para o futuro
-                    last_date_ordinal = df["ordinal_date"].max()
-                    future_dates_ordinal = np.array([last_date_ordinal + i for i in range(1, self.config["prediction_horizon_days"] + 1)]).reshape(-1, 1)
-                    future_predictions = model.predict(future_dates_ordinal)
-                    
-                    forecast_models["linear_regression_forecast"] = [
-                        {"ds": datetime.fromordinal(int(d)).isoformat(), "yhat": p}
-                        for d, p in zip(future_dates_ordinal.flatten(), future_predictions)
-                    ]
-                    logger.info("✅ Modelo de Regressão Linear criado e previsão gerada.")
-            except Exception as e:
-                logger.error(f"❌ Erro ao criar modelo de Regressão Linear: {e}")
+        # Várias métricas na mesma sessão são previstas em paralelo
+        if "metric" in df.columns and df["metric"].nunique() > 1:
+            series = {str(name): group for name, group in df.groupby("metric")}
+            forecast_models = {"series": forecast_engine.forecast_many(series, horizon)}
+        else:
+            forecast_models = forecast_engine.forecast(df, horizon)
 
+        forecast_models["engine_stats"] = forecast_engine.get_stats()
+        logger.info("✅ Modelos de previsão gerados.")
         return forecast_models
 
 
@@ -9,12 +9,14 @@ import logging
 import time
 import uuid
 import asyncio
+import io
 import os
 import glob
 import json
 import re
+import threading
 from datetime import datetime
-from typing import Dict, Any  # Import necessário para Dict e Any
+from typing import Dict, Any, List, Optional  # Import necessário para Dict e Any
 from pathlib import Path
 from flask import Blueprint, request, jsonify, send_file
 
@@ -26,6 +28,13 @@ from services.enhanced_synthesis_engine import enhanced_synthesis_engine
 from services.enhanced_module_processor import enhanced_module_processor
 from services.comprehensive_report_generator_v3 import comprehensive_report_generator_v3
 from services.auto_save_manager import salvar_etapa
+from services.tracing import tracer
+from services.job_queue import job_queue, worker_pool
+from services.session_persistence_manager import session_manager
+from services.delta_analysis import delta_analyzer
+from services.session_archive import session_archive, RESERVED_DIRS
+from services.http_client_pool import http_client_pool
+from services.url_canonicalizer import NearDuplicateFilter, session_deduplicator
 # Import the ViralImageFinder CLASS
 from services.viral_integration_service import ViralImageFinder
 
@@ -33,6 +42,13 @@ logger = logging.getLogger(__name__)
 
 enhanced_workflow_bp = Blueprint('enhanced_workflow', __name__)
 
+# 'queue': etapas rodam em processos workers via fila durável; 'thread': execução em thread do processo web
+WORKFLOW_EXECUTION_MODE = os.getenv('WORKFLOW_EXECUTION_MODE', 'queue').lower()
+
+# Etapa 1: busca viral e busca massiva em paralelo, com prazo comum para as fases de coleta
+STEP1_CONCURRENT = os.getenv('STEP1_CONCURRENT', 'true').lower() == 'true'
+STEP1_DEADLINE_SECONDS = float(os.getenv('STEP1_DEADLINE_SECONDS', '900'))
+
 # --- CREATE AN INSTANCE OF THE SERVICE ---
 # Create an instance of ViralImageFinder to use its methods.
 # Using the default config loading from the class __init__.
@@ -49,8 +65,19 @@ def start_step1_collection():
     try:
         data = request.get_json()
 
-        # Gera session_id único
-        session_id = f"session_{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}"
+        # Reutiliza session_id informado para retomar uma coleta interrompida; senão gera um novo.
+        # Só aceita sessões que já existem: um id arbitrário criaria pastas fora do padrão em analyses_data
+        session_id = data.get('session_id')
+        if session_id:
+            if (
+                not isinstance(session_id, str)
+                or session_id in RESERVED_DIRS
+                or not session_manager.has_persisted_state(session_id)
+            ):
+                return jsonify({"error": "session_id inválido ou sem estado salvo para retomar"}), 400
+        else:
+            session_id = f"session_{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}"
+        _apply_resume_mode(data, session_id, 'step1')
 
         # Extrai parâmetros
         segmento = data.get('segmento', '').strip()
@@ -79,6 +106,9 @@ def start_step1_collection():
             "workflow_type": "enhanced_v3"
         }
 
+        # Modo delta: compara com a última execução do mesmo nicho e reaproveita o que não mudou
+        delta_analyzer.register_session(session_id, context, enabled=data.get('delta', True) is not False)
+
         logger.info(f"🚀 ETAPA 1 INICIADA - Sessão: {session_id}")
         logger.info(f"🔍 Query: {query}")
 
@@ -90,123 +120,13 @@ def start_step1_collection():
             "timestamp": datetime.now().isoformat()
         }, categoria="workflow", session_id=session_id)
 
-        # Executa coleta massiva em thread separada
-        def execute_collection():
-            try:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-
-                try:
-                    # PRIMEIRA ETAPA: Busca viral (nova integração)
-                    logger.info(f"🔥 Executando busca viral para: {query}")
-                    # --- CORRECTED CALL ---
-                    # Call the find_viral_images method which returns a list and filepath
-                    viral_data = loop.run_until_complete(
-                        viral_integration_service.find_viral_images(query=query)
-                    )
-                    # The method returns a tuple (List[ViralImage], str), extract list
-                    viral_results_list = viral_data[0] if viral_data and len(viral_data) > 0 else []
-                    # Convert ViralImage dataclass objects to dictionaries for JSON serialization
-                    viral_results_dicts = [img.__dict__ for img in viral_results_list]
-
-                    # Package results into a dictionary structure similar to the old function's expected output
-                    viral_results = {
-                         "search_completed_at": datetime.now().isoformat(),
-                         "total_images_found": len(viral_results_list),
-                         # Assuming image_path is populated if saved
-                         "total_images_saved": len([img for img in viral_results_list if img.image_path]),
-                         "platforms_searched": list(set(img.platform for img in viral_results_list)), # Unique platforms
-                         "aggregated_metrics": {
-                             "total_engagement_score": sum(img.engagement_score for img in viral_results_list),
-                             "average_engagement": sum(img.engagement_score for img in viral_results_list) / len(viral_results_list) if viral_results_list else 0,
-                             "total_estimated_views": sum(img.views_estimate for img in viral_results_list),
-                             "total_estimated_likes": sum(img.likes_estimate for img in viral_results_list),
-                             "top_performing_platform": max(set(img.platform for img in viral_results_list), key=[img.platform for img in viral_results_list].count) if viral_results_list else None
-                         },
-                         "viral_images": viral_results_dicts,
-                         "fallback_used": False # Assuming success means no fallback for now
-                     }
-
-                    # Salva resultados do viral
-                    salvar_etapa("viral_search_completed", {
-                        "session_id": session_id,
-                        "viral_results": viral_results,
-                        "timestamp": datetime.now().isoformat()
-                    }, categoria="workflow", session_id=session_id)
-
-                    # SEGUNDA ETAPA: Busca massiva real
-                    logger.info(f"🌐 Executando busca massiva para: {query}")
-                    search_results = loop.run_until_complete(
-                        real_search_orchestrator.execute_massive_real_search(
-                            query=query,
-                            context=context,
-                            session_id=session_id
-                        )
-                    )
-
-                    # TERCEIRA ETAPA: Analisa e captura conteúdo viral adicional
-                    logger.info(f"📸 Analisando conteúdo viral adicional")
-                    viral_analysis = loop.run_until_complete(
-                        viral_content_analyzer.analyze_and_capture_viral_content(
-                            search_results=search_results,
-                            session_id=session_id,
-                            max_captures=15
-                        )
-                    )
-
-                finally:
-                    loop.close()
-
-                # Gera relatório de coleta incluindo dados do viral
-                collection_report = _generate_collection_report(
-                    search_results, viral_analysis, session_id, context, viral_results
-                )
-
-                # Salva relatório
-                _save_collection_report(collection_report, session_id)
-
-                # Consolida TODOS os dados da etapa 1 em um JSON massivo
-                massive_data_json = _consolidate_step1_massive_data(
-                    search_results, viral_analysis, viral_results, collection_report, session_id, context
-                )
-                
-                # Salva o JSON massivo consolidado
-                salvar_etapa("etapa1_massive_data", massive_data_json, categoria="consolidated", session_id=session_id)
-
-                # Salva resultado da etapa 1
-                salvar_etapa("etapa1_concluida", {
-                    "session_id": session_id,
-                    "search_results": search_results,
-                    "viral_analysis": viral_analysis,
-                    "viral_results": viral_results,
-                    "collection_report_generated": True,
-                    "massive_data_consolidated": True,
-                    "timestamp": datetime.now().isoformat()
-                }, categoria="workflow", session_id=session_id)
-
-                logger.info(f"✅ ETAPA 1 CONCLUÍDA - Sessão: {session_id}")
-                logger.info(f"📊 JSON Massivo consolidado com {len(str(massive_data_json))} caracteres")
-                
-                # Salva a sessão no sistema de persistência
-                from services.session_persistence_manager import session_manager
-                session_manager.save_session_from_analyses_data(session_id)
-
-            except Exception as e:
-                logger.error(f"❌ Erro na execução da Etapa 1: {e}")
-                salvar_etapa("etapa1_erro", {
-                    "session_id": session_id,
-                    "error": str(e),
-                    "timestamp": datetime.now().isoformat()
-                }, categoria="workflow", session_id=session_id)
-
-        # Inicia execução em background
-        import threading
-        thread = threading.Thread(target=execute_collection, daemon=True)
-        thread.start()
+        # Enfileira na fila durável (ou inicia thread no modo legado)
+        job = _dispatch_stage('step1', session_id, query=query, context=context)
 
         return jsonify({
             "success": True,
             "session_id": session_id,
+            "job_id": job['id'] if job else None,
             "message": "Etapa 1 iniciada: Coleta massiva de dados",
             "query": query,
             "estimated_duration": "3-5 minutos",
@@ -232,6 +152,8 @@ def start_step2_synthesis():
         if not session_id:
             return jsonify({"error": "session_id é obrigatório"}), 400
 
+        _apply_resume_mode(data, session_id, 'step2')
+
         logger.info(f"🧠 ETAPA 2 INICIADA - Síntese para sessão: {session_id}")
 
         # Salva início da etapa 2
@@ -240,101 +162,13 @@ def start_step2_synthesis():
             "timestamp": datetime.now().isoformat()
         }, categoria="workflow", session_id=session_id)
 
-        # Executa síntese em thread separada
-        def execute_synthesis():
-            try:
-                # Carrega o JSON massivo consolidado da etapa 1
-                massive_data_json = _load_step1_massive_data(session_id)
-                
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-
-                try:
-                    if massive_data_json:
-                        # MODO PREFERIDO: Usa JSON massivo consolidado
-                        data_size = massive_data_json.get('consolidated_statistics', {}).get('total_data_size', len(str(massive_data_json)))
-                        logger.info(f"📊 Carregado JSON massivo com {data_size} caracteres")
-                        
-                        # Executa síntese master com o JSON massivo
-                        synthesis_result = loop.run_until_complete(
-                            enhanced_synthesis_engine.execute_enhanced_synthesis_with_massive_data(
-                                session_id=session_id,
-                                massive_data=massive_data_json,
-                                synthesis_type="master_synthesis"
-                            )
-                        )
-
-                        # Executa síntese comportamental com o JSON massivo
-                        behavioral_result = loop.run_until_complete(
-                            enhanced_synthesis_engine.execute_behavioral_synthesis_with_massive_data(
-                                session_id=session_id,
-                                massive_data=massive_data_json
-                            )
-                        )
-
-                        # Executa síntese de mercado com o JSON massivo
-                        market_result = loop.run_until_complete(
-                            enhanced_synthesis_engine.execute_market_synthesis_with_massive_data(
-                                session_id=session_id,
-                                massive_data=massive_data_json
-                            )
-                        )
-                    else:
-                        # MODO FALLBACK: Usa método tradicional
-                        logger.warning(f"⚠️ JSON massivo não encontrado, usando método tradicional para sessão: {session_id}")
-                        
-                        # Executa síntese master tradicional
-                        synthesis_result = loop.run_until_complete(
-                            enhanced_synthesis_engine.execute_enhanced_synthesis(
-                                session_id=session_id,
-                                synthesis_type="master_synthesis"
-                            )
-                        )
-
-                        # Executa síntese comportamental tradicional
-                        behavioral_result = loop.run_until_complete(
-                            enhanced_synthesis_engine.execute_behavioral_synthesis(session_id)
-                        )
-
-                        # Executa síntese de mercado tradicional
-                        market_result = loop.run_until_complete(
-                            enhanced_synthesis_engine.execute_market_synthesis(session_id)
-                        )
-
-                finally:
-                    loop.close()
-
-                # Salva resultado da etapa 2
-                salvar_etapa("etapa2_concluida", {
-                    "session_id": session_id,
-                    "synthesis_result": synthesis_result,
-                    "behavioral_result": behavioral_result,
-                    "market_result": market_result,
-                    "timestamp": datetime.now().isoformat()
-                }, categoria="workflow", session_id=session_id)
-
-                logger.info(f"✅ ETAPA 2 CONCLUÍDA - Sessão: {session_id}")
-                
-                # Salva a sessão no sistema de persistência
-                from services.session_persistence_manager import session_manager
-                session_manager.save_session_from_analyses_data(session_id)
-
-            except Exception as e:
-                logger.error(f"❌ Erro na execução da Etapa 2: {e}")
-                salvar_etapa("etapa2_erro", {
-                    "session_id": session_id,
-                    "error": str(e),
-                    "timestamp": datetime.now().isoformat()
-                }, categoria="workflow", session_id=session_id)
-
-        # Inicia execução em background
-        import threading
-        thread = threading.Thread(target=execute_synthesis, daemon=True)
-        thread.start()
+        # Enfileira na fila durável (ou inicia thread no modo legado)
+        job = _dispatch_stage('step2', session_id)
 
         return jsonify({
             "success": True,
             "session_id": session_id,
+            "job_id": job['id'] if job else None,
             "message": "Etapa 2 iniciada: Síntese com IA e busca ativa",
             "estimated_duration": "2-4 minutos",
             "next_step": "/api/workflow/step3/start",
@@ -359,6 +193,8 @@ def start_step3_generation():
         if not session_id:
             return jsonify({"error": "session_id é obrigatório"}), 400
 
+        _apply_resume_mode(data, session_id, 'step3')
+
         logger.info(f"📝 ETAPA 3 INICIADA - Geração para sessão: {session_id}")
 
         # Salva início da etapa 3
@@ -367,98 +203,13 @@ def start_step3_generation():
             "timestamp": datetime.now().isoformat()
         }, categoria="workflow", session_id=session_id)
 
-        # Executa geração em thread separada
-        def execute_generation():
-            try:
-                # Carrega dados das etapas anteriores com validação robusta
-                session_data = _load_session_data(session_id)
-                
-                # Validação crítica dos dados
-                if not session_data:
-                    logger.error("❌ ERRO CRÍTICO: Dados das etapas anteriores não encontrados")
-                    logger.error("❌ As etapas 1 e 2 devem ser concluídas antes da etapa 3")
-                    raise Exception("Dados das etapas anteriores não encontrados. Execute as etapas 1 e 2 primeiro.")
-                
-                # Verifica se os dados essenciais estão presentes
-                search_results = session_data.get('search_results', {})
-                logger.info(f"🔍 DEBUG: search_results type: {type(search_results)}, length: {len(str(search_results))}")
-                logger.info(f"🔍 DEBUG: session_data keys: {list(session_data.keys())}")
-                
-                # Validação mais flexível - aceita se há qualquer dado de pesquisa
-                if not search_results and not session_data.get('viral_results') and not session_data.get('viral_analysis'):
-                    logger.error("❌ ERRO CRÍTICO: Nenhum dado de pesquisa encontrado da etapa 1")
-                    raise Exception("Dados de pesquisa da etapa 1 não encontrados. Execute a etapa 1 novamente.")
-                
-                # Se search_results está vazio mas temos outros dados, usa eles
-                if not search_results:
-                    search_results = {
-                        'viral_results': session_data.get('viral_results', {}),
-                        'viral_analysis': session_data.get('viral_analysis', {}),
-                        'collection_report_generated': session_data.get('collection_report_generated', False)
-                    }
-                    logger.info("✅ Usando dados alternativos da etapa 1 (viral_results + viral_analysis)")
-                
-                context = session_data.get('context', {})
-                if not context or not context.get('session_id'):
-                    logger.warning("⚠️ Contexto incompleto, usando dados padrão")
-                    context = {
-                        'session_id': session_id,
-                        'segmento': 'Análise Geral',
-                        'produto': 'Produto/Serviço',
-                        'publico': 'Público-alvo geral'
-                    }
-                
-                # Extrai dados necessários
-                massive_data = search_results
-                logger.info(f"✅ Dados carregados: {len(str(massive_data))} chars de dados massivos")
-                
-                # Gera todos os 16 módulos
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-
-                try:
-                    modules_result = enhanced_module_processor.process_all_modules_from_massive_data(
-                        massive_data=massive_data, 
-                        context=context, 
-                        session_id=session_id
-                    )
-                finally:
-                    loop.close()
-
-                # Compila relatório final
-                final_report = comprehensive_report_generator_v3.compile_final_markdown_report(session_id)
-
-                # Salva resultado da etapa 3
-                salvar_etapa("etapa3_concluida", {
-                    "session_id": session_id,
-                    "modules_result": modules_result,
-                    "final_report": final_report,
-                    "timestamp": datetime.now().isoformat()
-                }, categoria="workflow", session_id=session_id)
-
-                logger.info(f"✅ ETAPA 3 CONCLUÍDA - Sessão: {session_id}")
-                logger.info(f"📊 {modules_result.get('processing_summary', {}).get('successful_modules', 0)}/16 módulos gerados")
-                
-                # Salva a sessão no sistema de persistência
-                from services.session_persistence_manager import session_manager
-                session_manager.save_session_from_analyses_data(session_id)
-
-            except Exception as e:
-                logger.error(f"❌ Erro na execução da Etapa 3: {e}")
-                salvar_etapa("etapa3_erro", {
-                    "session_id": session_id,
-                    "error": str(e),
-                    "timestamp": datetime.now().isoformat()
-                }, categoria="workflow", session_id=session_id)
-
-        # Inicia execução em background
-        import threading
-        thread = threading.Thread(target=execute_generation, daemon=True)
-        thread.start()
+        # Enfileira na fila durável (ou inicia thread no modo legado)
+        job = _dispatch_stage('step3', session_id)
 
         return jsonify({
             "success": True,
             "session_id": session_id,
+            "job_id": job['id'] if job else None,
             "message": "Etapa 3 iniciada: Geração de 16 módulos",
             "estimated_duration": "4-6 minutos",
             "modules_to_generate": 16,
@@ -484,126 +235,13 @@ def execute_complete_workflow():
 
         logger.info(f"🚀 WORKFLOW COMPLETO INICIADO - Sessão: {session_id}")
 
-        # Executa workflow completo em thread separada
-        def execute_full_workflow():
-            try:
-                # ETAPA 1: Coleta
-                logger.info("🌊 Executando Etapa 1: Coleta massiva")
-
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-
-                try:
-                    # Constrói query
-                    segmento = data.get('segmento', '').strip()
-                    produto = data.get('produto', '').strip()
-                    query = f"{segmento} {produto} Brasil 2024 mercado".strip()
-                    context = {
-                        "segmento": segmento,
-                        "produto": produto,
-                        "publico": data.get('publico', ''),
-                        "preco": data.get('preco', ''),
-                        "objetivo_receita": data.get('objetivo_receita', ''),
-                        "workflow_type": "complete"
-                    }
-
-                    # PRIMEIRA ETAPA: Busca viral
-                    logger.info(f"🔥 Executando busca viral para: {query}")
-                    # --- CORRECTED CALL ---
-                    viral_data = loop.run_until_complete(
-                        viral_integration_service.find_viral_images(query=query)
-                    )
-                    viral_results_list = viral_data[0] if viral_data and len(viral_data) > 0 else []
-                    viral_results_dicts = [img.__dict__ for img in viral_results_list]
-                    viral_results = {
-                         "search_completed_at": datetime.now().isoformat(),
-                         "total_images_found": len(viral_results_list),
-                         "total_images_saved": len([img for img in viral_results_list if img.image_path]),
-                         "platforms_searched": list(set(img.platform for img in viral_results_list)),
-                         "aggregated_metrics": {
-                             "total_engagement_score": sum(img.engagement_score for img in viral_results_list),
-                             "average_engagement": sum(img.engagement_score for img in viral_results_list) / len(viral_results_list) if viral_results_list else 0,
-                             "total_estimated_views": sum(img.views_estimate for img in viral_results_list),
-                             "total_estimated_likes": sum(img.likes_estimate for img in viral_results_list),
-                             "top_performing_platform": max(set(img.platform for img in viral_results_list), key=[img.platform for img in viral_results_list].count) if viral_results_list else None
-                         },
-                         "viral_images": viral_results_dicts,
-                         "fallback_used": False
-                     }
-
-                    # SEGUNDA ETAPA: Executa busca massiva
-                    logger.info(f"🌐 Executando busca massiva para: {query}")
-                    search_results = loop.run_until_complete(
-                        real_search_orchestrator.execute_massive_real_search(
-                            query=query,
-                            context=context,
-                            session_id=session_id
-                        )
-                    )
-
-                    # TERCEIRA ETAPA: Analisa conteúdo viral adicional
-                    logger.info(f"📸 Analisando conteúdo viral adicional")
-                    viral_analysis = loop.run_until_complete(
-                        viral_content_analyzer.analyze_and_capture_viral_content(
-                            search_results=search_results,
-                            session_id=session_id
-                        )
-                    )
-
-                    # Gera relatório de coleta incluindo dados do viral
-                    collection_report = _generate_collection_report(
-                        search_results, viral_analysis, session_id, context, viral_results
-                    )
-                    _save_collection_report(collection_report, session_id)
-
-                    # ETAPA 2: Síntese
-                    logger.info("🧠 Executando Etapa 2: Síntese com IA")
-
-                    synthesis_result = loop.run_until_complete(
-                        enhanced_synthesis_engine.execute_enhanced_synthesis(session_id)
-                    )
-
-                    # ETAPA 3: Geração de módulos
-                    logger.info("📝 Executando Etapa 3: Geração de módulos")
-
-                    modules_result = enhanced_module_processor.process_all_modules_from_massive_data(massive_data=search_results, context=context, session_id=session_id)
-
-                    # Compila relatório final
-                    final_report = comprehensive_report_generator_v3.compile_final_markdown_report(session_id)
-
-                finally:
-                    loop.close()
-
-                # Salva resultado final
-                salvar_etapa("workflow_completo", {
-                    "session_id": session_id,
-                    "search_results": search_results,
-                    "viral_analysis": viral_analysis,
-                    "viral_results": viral_results,
-                    "synthesis_result": synthesis_result,
-                    "modules_result": modules_result,
-                    "final_report": final_report,
-                    "timestamp": datetime.now().isoformat()
-                }, categoria="workflow", session_id=session_id)
-
-                logger.info(f"✅ WORKFLOW COMPLETO CONCLUÍDO - Sessão: {session_id}")
-
-            except Exception as e:
-                logger.error(f"❌ Erro no workflow completo: {e}")
-                salvar_etapa("workflow_erro", {
-                    "session_id": session_id,
-                    "error": str(e),
-                    "timestamp": datetime.now().isoformat()
-                }, categoria="workflow", session_id=session_id)
-
-        # Inicia execução em background
-        import threading
-        thread = threading.Thread(target=execute_full_workflow, daemon=True)
-        thread.start()
+        # Enfileira na fila durável (ou inicia thread no modo legado)
+        job = _dispatch_stage('complete', session_id, data=data)
 
         return jsonify({
             "success": True,
             "session_id": session_id,
+            "job_id": job['id'] if job else None,
             "message": "Workflow completo iniciado",
             "estimated_total_duration": "8-15 minutos",
             "steps": [
@@ -641,19 +279,19 @@ def get_workflow_status(session_id):
         }
 
         # Verifica se etapa 1 foi concluída
-        if os.path.exists(f"analyses_data/{session_id}/relatorio_coleta.md"):
+        if session_archive.exists(f"analyses_data/{session_id}/relatorio_coleta.md"):
             status["step_status"]["step1"] = "completed"
             status["current_step"] = 1
             status["progress_percentage"] = 33
 
         # Verifica se etapa 2 foi concluída
-        if os.path.exists(f"analyses_data/{session_id}/resumo_sintese.json"):
+        if session_archive.exists(f"analyses_data/{session_id}/resumo_sintese.json"):
             status["step_status"]["step2"] = "completed"
             status["current_step"] = 2
             status["progress_percentage"] = 66
 
         # Verifica se etapa 3 foi concluída
-        if os.path.exists(f"analyses_data/{session_id}/relatorio_final.md"):
+        if session_archive.exists(f"analyses_data/{session_id}/relatorio_final.md"):
             status["step_status"]["step3"] = "completed"
             status["current_step"] = 3
             status["progress_percentage"] = 100
@@ -667,10 +305,16 @@ def get_workflow_status(session_id):
         ]
 
         for pattern in error_files:
-            if glob.glob(pattern):
+            if session_archive.glob(pattern):
                 status["error"] = "Erro detectado em uma das etapas"
                 break
 
+        # Jobs da sessão na fila (estado de execução, tentativas e erros)
+        status["jobs"] = [
+            {key: job[key] for key in ("id", "stage", "status", "attempts", "error", "created_at", "started_at", "finished_at")}
+            for job in job_queue.list_jobs(session_id=session_id, limit=20)
+        ]
+
         return jsonify(status), 200
 
     except Exception as e:
@@ -681,6 +325,91 @@ def get_workflow_status(session_id):
             "status": "error"
         }), 500
 
+@enhanced_workflow_bp.route('/workflow/jobs', methods=['GET'])
+def list_workflow_jobs():
+    """Lista jobs da fila (filtros: session_id, status)"""
+    try:
+        jobs = job_queue.list_jobs(
+            session_id=request.args.get('session_id'),
+            status=request.args.get('status'),
+            limit=min(int(request.args.get('limit', 50)), 500)
+        )
+        return jsonify({
+            "success": True,
+            "jobs": jobs,
+            "queue": job_queue.get_stats(),
+            "workers": worker_pool.get_stats()
+        }), 200
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao listar jobs: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@enhanced_workflow_bp.route('/workflow/jobs/<job_id>', methods=['GET'])
+def get_workflow_job(job_id):
+    """Obtém estado de um job"""
+    try:
+        job = job_queue.get(job_id)
+        if not job:
+            return jsonify({"success": False, "error": "Job não encontrado"}), 404
+        return jsonify({"success": True, "job": job}), 200
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao obter job {job_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@enhanced_workflow_bp.route('/workflow/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_workflow_job(job_id):
+    """Cancela um job (na fila: imediato; em execução: o worker é interrompido)"""
+    try:
+        job = job_queue.cancel(job_id)
+        if not job:
+            return jsonify({"success": False, "error": "Job não encontrado"}), 404
+
+        logger.info(f"🛑 Cancelamento solicitado para job {job_id[:8]} (status: {job['status']})")
+        return jsonify({
+            "success": True,
+            "job": job,
+            "message": "Job cancelado" if job['status'] == 'cancelled' else "Cancelamento solicitado"
+        }), 200
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao cancelar job {job_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@enhanced_workflow_bp.route('/workflow/checkpoints/<session_id>', methods=['GET'])
+def get_workflow_checkpoints(session_id):
+    """Unidades concluídas (provedores, lotes de URLs, sínteses, módulos) que serão puladas ao retomar"""
+    try:
+        return jsonify({"success": True, **session_manager.get_resume_status(session_id)}), 200
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao obter checkpoints: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@enhanced_workflow_bp.route('/workflow/checkpoints/<session_id>', methods=['DELETE'])
+def clear_workflow_checkpoints(session_id):
+    """Remove checkpoints da sessão (opcional: ?kind=search&kind=module)"""
+    try:
+        removed = session_manager.clear_checkpoints(session_id, request.args.getlist('kind') or None)
+        return jsonify({"success": True, "session_id": session_id, "removed": removed}), 200
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao remover checkpoints: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@enhanced_workflow_bp.route('/workflow/delta/<session_id>', methods=['GET'])
+def get_workflow_delta(session_id):
+    """Relatório do modo delta: mudanças na coleta e unidades reaproveitadas da execução anterior do nicho"""
+    try:
+        report = delta_analyzer.get_report(session_id)
+        if report is None:
+            return jsonify({"success": False, "error": "Sessão sem registro no modo delta"}), 404
+        return jsonify({"success": True, **report}), 200
+    except Exception as e:
+        logger.error(f"❌ Erro ao obter relatório delta: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @enhanced_workflow_bp.route('/workflow/results/<session_id>', methods=['GET'])
 def get_workflow_results(session_id):
     """Obtém resultados do workflow"""
@@ -696,37 +425,36 @@ def get_workflow_results(session_id):
 
         # Verifica relatório final
         final_report_path = f"analyses_data/{session_id}/relatorio_final.md"
-        if os.path.exists(final_report_path):
+        if session_archive.exists(final_report_path):
             results["final_report_available"] = True
             results["final_report_path"] = final_report_path
 
         # Conta módulos gerados
         modules_dir = f"analyses_data/{session_id}/modules"
-        if os.path.exists(modules_dir):
-            modules = [f for f in os.listdir(modules_dir) if f.endswith('.md')]
+        modules = [os.path.basename(f) for f, _ in session_archive.iter_files(modules_dir)
+                   if os.path.dirname(os.path.relpath(f, modules_dir)) == '' and f.endswith('.md')]
+        if modules:
             results["modules_generated"] = len(modules)
             results["modules_list"] = modules
 
         # Conta screenshots
         files_dir = f"analyses_data/files/{session_id}"
-        if os.path.exists(files_dir):
-            screenshots = [f for f in os.listdir(files_dir) if f.endswith('.png')]
+        screenshots = [os.path.basename(f) for f, _ in session_archive.iter_files(files_dir)
+                       if os.path.dirname(os.path.relpath(f, files_dir)) == '' and f.endswith('.png')]
+        if screenshots:
             results["screenshots_captured"] = len(screenshots)
             results["screenshots_list"] = screenshots
 
-        # Lista todos os arquivos disponíveis
+        # Lista todos os arquivos disponíveis (em disco ou no arquivo compactado da sessão)
         session_dir = f"analyses_data/{session_id}"
-        if os.path.exists(session_dir):
-            for root, dirs, files in os.walk(session_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(file_path, session_dir)
-                    results["available_files"].append({
-                        "name": file,
-                        "path": relative_path,
-                        "size": os.path.getsize(file_path),
-                        "type": file.split('.')[-1] if '.' in file else 'unknown'
-                    })
+        for file_path, file_size in session_archive.iter_files(session_dir):
+            file = os.path.basename(file_path)
+            results["available_files"].append({
+                "name": file,
+                "path": os.path.relpath(file_path, session_dir),
+                "size": file_size,
+                "type": file.split('.')[-1] if '.' in file else 'unknown'
+            })
 
         return jsonify(results), 200
 
@@ -742,7 +470,7 @@ def get_viral_results(session_id):
     """Obtém resultados específicos do módulo viral"""
     try:
         # Verifica se existem dados salvos do viral
-        viral_data_files = glob.glob(f"relatorios_intermediarios/workflow/viral_search_completed*{session_id}*")
+        viral_data_files = session_archive.glob(f"relatorios_intermediarios/workflow/viral_search_completed*{session_id}*")
 
         if not viral_data_files:
             return jsonify({
@@ -752,11 +480,10 @@ def get_viral_results(session_id):
             }), 404
 
         # Carrega o arquivo mais recente
-        latest_file = max(viral_data_files, key=os.path.getctime)
+        latest_file = max(viral_data_files, key=session_archive.getmtime)
 
         try:
-            with open(latest_file, 'r', encoding='utf-8') as f:
-                viral_data = json.load(f)
+            viral_data = session_archive.read_json(latest_file)
 
             viral_results = viral_data.get('viral_results', {})
 
@@ -894,7 +621,7 @@ def download_workflow_file(session_id, file_type):
         if file_type == "final_report":
             # Tenta primeiro o relatorio_final.md, depois o completo como fallback
             file_path = os.path.join(base_path, "relatorio_final.md")
-            if not os.path.exists(file_path):
+            if not session_archive.exists(file_path):
                 file_path = os.path.join(base_path, "relatorio_final_completo.md")
             filename = f"relatorio_final_{session_id}.md"
         elif file_type == "complete_report":
@@ -903,20 +630,631 @@ def download_workflow_file(session_id, file_type):
         else:
             return jsonify({"error": "Tipo de relatório inválido"}), 400
 
-        if not os.path.exists(file_path):
+        if not session_archive.exists(file_path):
             return jsonify({"error": "Arquivo não encontrado"}), 404
 
         return send_file(
-            file_path,
+            io.BytesIO(session_archive.read_bytes(file_path)),
             as_attachment=True,
-            download_name=filename
+            download_name=filename,
+            mimetype='text/markdown'
         )
 
     except Exception as e:
         logger.error(f"❌ Erro no download: {e}")
         return jsonify({"error": str(e)}), 500
 
+# --- Execução das etapas (jobs) ---
+def execute_collection(session_id: str, query: str, context: Dict[str, Any]):
+    """Executa a Etapa 1 (coleta massiva) — roda em worker da fila ou em thread"""
+    try:
+        # Sessão compactada volta ao disco antes de ser reprocessada
+        session_archive.ensure_restored(session_id)
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        try:
+            if STEP1_CONCURRENT:
+                # Busca viral e busca massiva são independentes: rodam juntas sob o mesmo prazo
+                viral_data, search_results, viral_analysis = _run_phase(
+                    loop, 'step1_concurrent_collection',
+                    _collect_step1_concurrently(query, context, session_id, max_captures=15)
+                )
+                viral_results = _package_viral_results(viral_data)
+            else:
+                # PRIMEIRA ETAPA: Busca viral (nova integração)
+                logger.info(f"🔥 Executando busca viral para: {query}")
+                viral_data = _run_phase(loop, 'viral_search',
+                    viral_integration_service.find_viral_images(query=query, session_id=session_id)
+                )
+                viral_results = _package_viral_results(viral_data)
+
+                # SEGUNDA ETAPA: Busca massiva real
+                logger.info(f"🌐 Executando busca massiva para: {query}")
+                search_results = _run_phase(loop, 'massive_search',
+                    real_search_orchestrator.execute_massive_real_search(
+                        query=query,
+                        context=context,
+                        session_id=session_id
+                    )
+                )
+
+                # TERCEIRA ETAPA: Analisa e captura conteúdo viral adicional
+                logger.info(f"📸 Analisando conteúdo viral adicional")
+                viral_analysis = _run_phase(loop, 'viral_analysis',
+                    viral_content_analyzer.analyze_and_capture_viral_content(
+                        search_results=search_results,
+                        session_id=session_id,
+                        max_captures=15
+                    )
+                )
+
+            # Salva resultados do viral
+            salvar_etapa("viral_search_completed", {
+                "session_id": session_id,
+                "viral_results": viral_results,
+                "timestamp": datetime.now().isoformat()
+            }, categoria="workflow", session_id=session_id)
+
+        finally:
+            loop.run_until_complete(http_client_pool.close_current())
+            loop.close()
+            session_deduplicator.release(session_id)
+
+        _record_step1_delta(session_id, search_results, viral_results)
+
+        # Gera relatório de coleta incluindo dados do viral
+        collection_report = _generate_collection_report(
+            search_results, viral_analysis, session_id, context, viral_results
+        )
+
+        # Salva relatório
+        _save_collection_report(collection_report, session_id)
+
+        # Consolida TODOS os dados da etapa 1 em um JSON massivo
+        massive_data_json = _consolidate_step1_massive_data(
+            search_results, viral_analysis, viral_results, collection_report, session_id, context
+        )
+
+        # Salva o JSON massivo consolidado
+        salvar_etapa("etapa1_massive_data", massive_data_json, categoria="consolidated", session_id=session_id)
+
+        # Salva resultado da etapa 1
+        salvar_etapa("etapa1_concluida", {
+            "session_id": session_id,
+            "search_results": search_results,
+            "viral_analysis": viral_analysis,
+            "viral_results": viral_results,
+            "collection_report_generated": True,
+            "massive_data_consolidated": True,
+            "timestamp": datetime.now().isoformat()
+        }, categoria="workflow", session_id=session_id)
+
+        logger.info(f"✅ ETAPA 1 CONCLUÍDA - Sessão: {session_id}")
+        logger.info(f"📊 JSON Massivo consolidado com {len(str(massive_data_json))} caracteres")
+
+        # Salva a sessão no sistema de persistência
+        from services.session_persistence_manager import session_manager
+        session_manager.save_session_from_analyses_data(session_id)
+
+    except Exception as e:
+        logger.error(f"❌ Erro na execução da Etapa 1: {e}")
+        salvar_etapa("etapa1_erro", {
+            "session_id": session_id,
+            "error": str(e),
+            "timestamp": datetime.now().isoformat()
+        }, categoria="workflow", session_id=session_id)
+        raise
+
+def execute_synthesis(session_id: str):
+    """Executa a Etapa 2 (síntese com IA) — roda em worker da fila ou em thread"""
+    try:
+        session_archive.ensure_restored(session_id)
+
+        # Carrega o JSON massivo consolidado da etapa 1
+        massive_data_json = _load_step1_massive_data(session_id)
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        try:
+            if massive_data_json:
+                # MODO PREFERIDO: Usa JSON massivo consolidado
+                data_size = massive_data_json.get('consolidated_statistics', {}).get('total_data_size', len(str(massive_data_json)))
+                logger.info(f"📊 Carregado JSON massivo com {data_size} caracteres")
+
+                # Executa síntese master com o JSON massivo
+                synthesis_result = _run_phase(loop, 'master_synthesis',
+                    enhanced_synthesis_engine.execute_enhanced_synthesis_with_massive_data(
+                        session_id=session_id,
+                        massive_data=massive_data_json,
+                        synthesis_type="master_synthesis"
+                    )
+                )
+
+                # Executa síntese comportamental com o JSON massivo
+                behavioral_result = _run_phase(loop, 'behavioral_synthesis',
+                    enhanced_synthesis_engine.execute_behavioral_synthesis_with_massive_data(
+                        session_id=session_id,
+                        massive_data=massive_data_json
+                    )
+                )
+
+                # Executa síntese de mercado com o JSON massivo
+                market_result = _run_phase(loop, 'market_synthesis',
+                    enhanced_synthesis_engine.execute_market_synthesis_with_massive_data(
+                        session_id=session_id,
+                        massive_data=massive_data_json
+                    )
+                )
+            else:
+                # MODO FALLBACK: Usa método tradicional
+                logger.warning(f"⚠️ JSON massivo não encontrado, usando método tradicional para sessão: {session_id}")
+
+                # Executa síntese master tradicional
+                synthesis_result = _run_phase(loop, 'master_synthesis',
+                    enhanced_synthesis_engine.execute_enhanced_synthesis(
+                        session_id=session_id,
+                        synthesis_type="master_synthesis"
+                    )
+                )
+
+                # Executa síntese comportamental tradicional
+                behavioral_result = _run_phase(loop, 'behavioral_synthesis',
+                    enhanced_synthesis_engine.execute_behavioral_synthesis(session_id)
+                )
+
+                # Executa síntese de mercado tradicional
+                market_result = _run_phase(loop, 'market_synthesis',
+                    enhanced_synthesis_engine.execute_market_synthesis(session_id)
+                )
+
+        finally:
+            loop.run_until_complete(http_client_pool.close_current())
+            loop.close()
+
+        # Salva resultado da etapa 2
+        salvar_etapa("etapa2_concluida", {
+            "session_id": session_id,
+            "synthesis_result": synthesis_result,
+            "behavioral_result": behavioral_result,
+            "market_result": market_result,
+            "timestamp": datetime.now().isoformat()
+        }, categoria="workflow", session_id=session_id)
+
+        logger.info(f"✅ ETAPA 2 CONCLUÍDA - Sessão: {session_id}")
+
+        # Salva a sessão no sistema de persistência
+        from services.session_persistence_manager import session_manager
+        session_manager.save_session_from_analyses_data(session_id)
+
+    except Exception as e:
+        logger.error(f"❌ Erro na execução da Etapa 2: {e}")
+        salvar_etapa("etapa2_erro", {
+            "session_id": session_id,
+            "error": str(e),
+            "timestamp": datetime.now().isoformat()
+        }, categoria="workflow", session_id=session_id)
+        raise
+
+def execute_generation(session_id: str):
+    """Executa a Etapa 3 (módulos e relatório final) — roda em worker da fila ou em thread"""
+    try:
+        session_archive.ensure_restored(session_id)
+
+        # Carrega dados das etapas anteriores com validação robusta
+        session_data = _load_session_data(session_id)
+
+        # Validação crítica dos dados
+        if not session_data:
+            logger.error("❌ ERRO CRÍTICO: Dados das etapas anteriores não encontrados")
+            logger.error("❌ As etapas 1 e 2 devem ser concluídas antes da etapa 3")
+            raise Exception("Dados das etapas anteriores não encontrados. Execute as etapas 1 e 2 primeiro.")
+
+        # Verifica se os dados essenciais estão presentes
+        search_results = session_data.get('search_results', {})
+        logger.info(f"🔍 DEBUG: search_results type: {type(search_results)}, length: {len(str(search_results))}")
+        logger.info(f"🔍 DEBUG: session_data keys: {list(session_data.keys())}")
+
+        # Validação mais flexível - aceita se há qualquer dado de pesquisa
+        if not search_results and not session_data.get('viral_results') and not session_data.get('viral_analysis'):
+            logger.error("❌ ERRO CRÍTICO: Nenhum dado de pesquisa encontrado da etapa 1")
+            raise Exception("Dados de pesquisa da etapa 1 não encontrados. Execute a etapa 1 novamente.")
+
+        # Se search_results está vazio mas temos outros dados, usa eles
+        if not search_results:
+            search_results = {
+                'viral_results': session_data.get('viral_results', {}),
+                'viral_analysis': session_data.get('viral_analysis', {}),
+                'collection_report_generated': session_data.get('collection_report_generated', False)
+            }
+            logger.info("✅ Usando dados alternativos da etapa 1 (viral_results + viral_analysis)")
+
+        context = session_data.get('context', {})
+        if not context or not context.get('session_id'):
+            logger.warning("⚠️ Contexto incompleto, usando dados padrão")
+            context = {
+                'session_id': session_id,
+                'segmento': 'Análise Geral',
+                'produto': 'Produto/Serviço',
+                'publico': 'Público-alvo geral'
+            }
+
+        # Extrai dados necessários
+        massive_data = search_results
+        logger.info(f"✅ Dados carregados: {len(str(massive_data))} chars de dados massivos")
+
+        # Gera todos os 16 módulos
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        try:
+            modules_result = enhanced_module_processor.process_all_modules_from_massive_data(
+                massive_data=massive_data, 
+                context=context, 
+                session_id=session_id
+            )
+        finally:
+            loop.run_until_complete(http_client_pool.close_current())
+            loop.close()
+
+        # Compila relatório final
+        final_report = comprehensive_report_generator_v3.compile_final_markdown_report(session_id)
+
+        # Salva resultado da etapa 3
+        salvar_etapa("etapa3_concluida", {
+            "session_id": session_id,
+            "modules_result": modules_result,
+            "final_report": final_report,
+            "timestamp": datetime.now().isoformat()
+        }, categoria="workflow", session_id=session_id)
+
+        logger.info(f"✅ ETAPA 3 CONCLUÍDA - Sessão: {session_id}")
+        logger.info(f"📊 {modules_result.get('processing_summary', {}).get('successful_modules', 0)}/16 módulos gerados")
+
+        # Salva a sessão no sistema de persistência
+        from services.session_persistence_manager import session_manager
+        session_manager.save_session_from_analyses_data(session_id)
+
+    except Exception as e:
+        logger.error(f"❌ Erro na execução da Etapa 3: {e}")
+        salvar_etapa("etapa3_erro", {
+            "session_id": session_id,
+            "error": str(e),
+            "timestamp": datetime.now().isoformat()
+        }, categoria="workflow", session_id=session_id)
+        raise
+
+def execute_full_workflow(session_id: str, data: Dict[str, Any]):
+    """Executa as 3 etapas em sequência — roda em worker da fila ou em thread"""
+    try:
+        session_archive.ensure_restored(session_id)
+
+        # ETAPA 1: Coleta
+        logger.info("🌊 Executando Etapa 1: Coleta massiva")
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        try:
+            # Constrói query
+            segmento = data.get('segmento', '').strip()
+            produto = data.get('produto', '').strip()
+            query = f"{segmento} {produto} Brasil 2024 mercado".strip()
+            context = {
+                "segmento": segmento,
+                "produto": produto,
+                "publico": data.get('publico', ''),
+                "preco": data.get('preco', ''),
+                "objetivo_receita": data.get('objetivo_receita', ''),
+                "workflow_type": "complete"
+            }
+            delta_analyzer.register_session(session_id, context, enabled=data.get('delta', True) is not False)
+
+            if STEP1_CONCURRENT:
+                # Busca viral e busca massiva em paralelo sob o mesmo prazo
+                viral_data, search_results, viral_analysis = _run_phase(
+                    loop, 'step1_concurrent_collection',
+                    _collect_step1_concurrently(query, context, session_id)
+                )
+                viral_results = _package_viral_results(viral_data)
+            else:
+                # PRIMEIRA ETAPA: Busca viral
+                logger.info(f"🔥 Executando busca viral para: {query}")
+                viral_data = _run_phase(loop, 'viral_search',
+                    viral_integration_service.find_viral_images(query=query, session_id=session_id)
+                )
+                viral_results = _package_viral_results(viral_data)
+
+                # SEGUNDA ETAPA: Executa busca massiva
+                logger.info(f"🌐 Executando busca massiva para: {query}")
+                search_results = _run_phase(loop, 'massive_search',
+                    real_search_orchestrator.execute_massive_real_search(
+                        query=query,
+                        context=context,
+                        session_id=session_id
+                    )
+                )
+
+                # TERCEIRA ETAPA: Analisa conteúdo viral adicional
+                logger.info(f"📸 Analisando conteúdo viral adicional")
+                viral_analysis = _run_phase(loop, 'viral_analysis',
+                    viral_content_analyzer.analyze_and_capture_viral_content(
+                        search_results=search_results,
+                        session_id=session_id
+                    )
+                )
+
+            _record_step1_delta(session_id, search_results, viral_results)
+
+            # Gera relatório de coleta incluindo dados do viral
+            collection_report = _generate_collection_report(
+                search_results, viral_analysis, session_id, context, viral_results
+            )
+            _save_collection_report(collection_report, session_id)
+
+            # ETAPA 2: Síntese
+            logger.info("🧠 Executando Etapa 2: Síntese com IA")
+
+            synthesis_result = _run_phase(loop, 'master_synthesis',
+                enhanced_synthesis_engine.execute_enhanced_synthesis(session_id)
+            )
+
+            # ETAPA 3: Geração de módulos
+            logger.info("📝 Executando Etapa 3: Geração de módulos")
+
+            modules_result = enhanced_module_processor.process_all_modules_from_massive_data(massive_data=search_results, context=context, session_id=session_id)
+
+            # Compila relatório final
+            final_report = comprehensive_report_generator_v3.compile_final_markdown_report(session_id)
+
+        finally:
+            loop.run_until_complete(http_client_pool.close_current())
+            loop.close()
+            session_deduplicator.release(session_id)
+
+        # Salva resultado final
+        salvar_etapa("workflow_completo", {
+            "session_id": session_id,
+            "search_results": search_results,
+            "viral_analysis": viral_analysis,
+            "viral_results": viral_results,
+            "synthesis_result": synthesis_result,
+            "modules_result": modules_result,
+            "final_report": final_report,
+            "timestamp": datetime.now().isoformat()
+        }, categoria="workflow", session_id=session_id)
+
+        logger.info(f"✅ WORKFLOW COMPLETO CONCLUÍDO - Sessão: {session_id}")
+
+    except Exception as e:
+        logger.error(f"❌ Erro no workflow completo: {e}")
+        salvar_etapa("workflow_erro", {
+            "session_id": session_id,
+            "error": str(e),
+            "timestamp": datetime.now().isoformat()
+        }, categoria="workflow", session_id=session_id)
+        raise
+
+WORKFLOW_STAGES = {
+    'step1': ('etapa1_coleta', execute_collection),
+    'step2': ('etapa2_sintese', execute_synthesis),
+    'step3': ('etapa3_geracao', execute_generation),
+    'complete': ('workflow_completo', execute_full_workflow)
+}
+
+# Tipos de checkpoint produzidos por cada etapa (ver SessionPersistenceManager.checkpoint)
+STAGE_CHECKPOINT_KINDS = {
+    'step1': ['search', 'extraction'],
+    'step2': ['synthesis'],
+    'step3': ['module']
+}
+
+# Threads de etapa em execução no modo 'thread' (consultadas pelo harness de benchmark e pelo monitoramento)
+_stage_threads: Dict[threading.Thread, Dict[str, str]] = {}
+_stage_threads_lock = threading.Lock()
+
+def running_stage_threads(session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Threads de etapa ainda vivas, com sessão, etapa e função alvo"""
+    with _stage_threads_lock:
+        entries = [{**info, 'thread': thread} for thread, info in _stage_threads.items()]
+    return [entry for entry in entries if session_id is None or entry['session_id'] == session_id]
+
 # --- Funções auxiliares ---
+def _package_viral_results(viral_data) -> Dict[str, Any]:
+    """Empacota a lista de ViralImage retornada por find_viral_images no formato salvo/reportado"""
+    # The method returns a tuple (List[ViralImage], str), extract list
+    viral_results_list = viral_data[0] if viral_data and len(viral_data) > 0 else []
+    return {
+        "search_completed_at": datetime.now().isoformat(),
+        "total_images_found": len(viral_results_list),
+        # Assuming image_path is populated if saved
+        "total_images_saved": len([img for img in viral_results_list if img.image_path]),
+        "platforms_searched": list(set(img.platform for img in viral_results_list)), # Unique platforms
+        "aggregated_metrics": {
+            "total_engagement_score": sum(img.engagement_score for img in viral_results_list),
+            "average_engagement": sum(img.engagement_score for img in viral_results_list) / len(viral_results_list) if viral_results_list else 0,
+            "total_estimated_views": sum(img.views_estimate for img in viral_results_list),
+            "total_estimated_likes": sum(img.likes_estimate for img in viral_results_list),
+            "top_performing_platform": max(set(img.platform for img in viral_results_list), key=[img.platform for img in viral_results_list].count) if viral_results_list else None
+        },
+        # Convert ViralImage dataclass objects to dictionaries for JSON serialization
+        "viral_images": [img.__dict__ for img in viral_results_list],
+        "fallback_used": False # Assuming success means no fallback for now
+    }
+
+def _empty_search_results(query: str, session_id: str) -> Dict[str, Any]:
+    """Estrutura vazia da busca massiva (usada quando a fase falha ou estoura o prazo)"""
+    return {
+        'query': query,
+        'session_id': session_id,
+        'search_started': datetime.now().isoformat(),
+        'providers_used': [],
+        'web_results': [],
+        'social_results': [],
+        'youtube_results': [],
+        'viral_content': [],
+        'screenshots_captured': [],
+        'statistics': {
+            'total_sources': 0,
+            'unique_urls': 0,
+            'content_extracted': 0,
+            'api_calls_made': 0,
+            'search_duration': 0
+        }
+    }
+
+def _record_step1_delta(session_id: str, search_results: Dict[str, Any], viral_results: Dict[str, Any]):
+    """Registra a coleta da etapa 1 no modo delta (URL + hash de conteúdo) e anexa o diff aos resultados"""
+    items = [
+        *search_results.get('web_results', []),
+        *search_results.get('youtube_results', []),
+        *search_results.get('social_results', []),
+        *viral_results.get('viral_images', [])
+    ]
+    delta = delta_analyzer.record_collection(session_id, items)
+    if delta:
+        search_results['delta'] = delta
+
+async def _collect_step1_concurrently(query: str, context: Dict[str, Any], session_id: str, **analysis_kwargs):
+    """
+    Executa busca viral e busca massiva em paralelo, depois a análise viral, todas sob um prazo comum
+
+    Fase que falha ou não termina até o prazo é cancelada e substituída por resultado vazio marcado
+    como parcial; as demais seguem normalmente.
+
+    Returns:
+        (viral_data, search_results, viral_analysis)
+    """
+    deadline = time.monotonic() + STEP1_DEADLINE_SECONDS
+    phase_report = {}
+
+    logger.info(f"⚡ Executando busca viral e busca massiva em paralelo para: {query} (prazo {STEP1_DEADLINE_SECONDS}s)")
+    tasks = {
+        'viral_search': asyncio.ensure_future(tracer.trace_coro(
+            'viral_search', viral_integration_service.find_viral_images(query=query, session_id=session_id)
+        )),
+        'massive_search': asyncio.ensure_future(tracer.trace_coro(
+            'massive_search', real_search_orchestrator.execute_massive_real_search(
+                query=query, context=context, session_id=session_id
+            )
+        ))
+    }
+    started = time.monotonic()
+    await asyncio.wait(tasks.values(), timeout=max(deadline - time.monotonic(), 0))
+
+    results = {}
+    for phase, task in tasks.items():
+        if not task.done():
+            task.cancel()
+            phase_report[phase] = {'status': 'timeout'}
+            logger.warning(f"⏱️ Fase {phase} excedeu o prazo da etapa 1; seguindo com resultados parciais")
+        elif task.exception() is not None:
+            phase_report[phase] = {'status': 'error', 'error': str(task.exception())}
+            logger.error(f"❌ Fase {phase} falhou: {task.exception()}")
+        else:
+            results[phase] = task.result()
+            phase_report[phase] = {'status': 'completed'}
+    # Aguarda o cancelamento terminar para não deixar tasks penduradas no loop
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+    logger.info(f"⚡ Fases paralelas concluídas em {time.monotonic() - started:.1f}s: "
+                f"{ {phase: report['status'] for phase, report in phase_report.items()} }")
+
+    viral_data = results.get('viral_search') or ([], "")
+    search_results = results.get('massive_search') or _empty_search_results(query, session_id)
+
+    # Análise viral depende da busca massiva: usa o que resta do prazo
+    remaining = deadline - time.monotonic()
+    viral_analysis = None
+    if remaining > 0:
+        logger.info(f"📸 Analisando conteúdo viral adicional ({remaining:.0f}s restantes)")
+        try:
+            viral_analysis = await asyncio.wait_for(
+                tracer.trace_coro('viral_analysis', viral_content_analyzer.analyze_and_capture_viral_content(
+                    search_results=search_results, session_id=session_id, **analysis_kwargs
+                )),
+                timeout=remaining
+            )
+            phase_report['viral_analysis'] = {'status': 'completed'}
+        except asyncio.TimeoutError:
+            phase_report['viral_analysis'] = {'status': 'timeout'}
+            logger.warning("⏱️ Análise viral excedeu o prazo da etapa 1")
+        except Exception as e:
+            phase_report['viral_analysis'] = {'status': 'error', 'error': str(e)}
+            logger.error(f"❌ Análise viral falhou: {e}")
+    else:
+        phase_report['viral_analysis'] = {'status': 'skipped'}
+
+    if viral_analysis is None:
+        viral_analysis = {
+            'session_id': session_id,
+            'viral_content_identified': [],
+            'screenshots_captured': [],
+            'viral_metrics': {},
+            'platform_analysis': {},
+            'top_performers': [],
+            'engagement_insights': {}
+        }
+
+    partial = any(report['status'] != 'completed' for report in phase_report.values())
+    search_results['step1_phases'] = phase_report
+    search_results['partial'] = partial
+    if partial:
+        salvar_etapa("etapa1_parcial", {
+            "session_id": session_id,
+            "phases": phase_report,
+            "timestamp": datetime.now().isoformat()
+        }, categoria="workflow", session_id=session_id)
+
+    return viral_data, search_results, viral_analysis
+
+def _apply_resume_mode(data: Dict[str, Any], session_id: str, stage: str):
+    """
+    Por padrão a etapa reexecutada pula unidades já concluídas; com "resume": false refaz tudo.
+    Checkpoints das etapas seguintes sempre caem: foram gerados a partir da saída que será refeita.
+    """
+    stages = list(STAGE_CHECKPOINT_KINDS)
+    downstream = [kind for later in stages[stages.index(stage) + 1:] for kind in STAGE_CHECKPOINT_KINDS[later]]
+    own = STAGE_CHECKPOINT_KINDS[stage] if data.get('resume', True) is False else []
+    if own or downstream:
+        session_manager.clear_checkpoints(session_id, own + downstream)
+
+def _run_phase(loop, name, coro):
+    """Executa a corrotina no loop da thread dentro de um span de fase"""
+    return loop.run_until_complete(tracer.trace_coro(name, coro, kind='phase'))
+
+def _dispatch_stage(stage: str, session_id: str, **kwargs) -> Optional[Dict[str, Any]]:
+    """Enfileira a etapa na fila durável; no modo 'thread' mantém a execução em thread do processo web"""
+    span_name, func = WORKFLOW_STAGES[stage]
+
+    if WORKFLOW_EXECUTION_MODE == 'queue':
+        job = job_queue.enqueue(
+            f"{__name__}:{func.__name__}", {'session_id': session_id, **kwargs},
+            session_id=session_id, stage=span_name
+        )
+        worker_pool.ensure_started()
+        return job
+
+    def run():
+        try:
+            func(session_id=session_id, **kwargs)
+        except Exception:
+            # Erro já registrado pela etapa (log + arquivo *_erro)
+            pass
+        finally:
+            with _stage_threads_lock:
+                _stage_threads.pop(threading.current_thread(), None)
+
+    thread = threading.Thread(
+        target=tracer.bind(run, span_name, kind='stage', session_id=session_id),
+        name=f"stage-{span_name}", daemon=True
+    )
+    with _stage_threads_lock:
+        _stage_threads[thread] = {'session_id': session_id, 'stage': span_name, 'target': func.__name__}
+    thread.start()
+    return None
+
 def _consolidate_step1_massive_data(search_results, viral_analysis, viral_results, collection_report, session_id, context):
     """
     Consolida TODOS os dados da etapa 1 em um JSON massivo único
@@ -1054,6 +1392,12 @@ def _extract_all_text_content(search_results, viral_analysis, viral_results, add
     for file_name, file_data in additional_data.items():
         text_content["additional_content"].append(f"Arquivo {file_name}: {str(file_data)}")
     
+    # Remove corpos quase duplicados antes da síntese
+    content_filter = NearDuplicateFilter()
+    text_content["search_content"] = content_filter.filter(text_content["search_content"])
+    if content_filter.dropped:
+        logger.info(f"🧹 {content_filter.dropped} conteúdos quase duplicados removidos antes da síntese")
+    
     return text_content
 
 def _load_step1_massive_data(session_id):
@@ -1069,8 +1413,6 @@ def _load_step1_massive_data(session_id):
     
     try:
         # Busca pelo arquivo do JSON massivo em múltiplos locais
-        import glob
-        
         # Padrões de busca para o arquivo JSON massivo
         search_patterns = [
             f"relatorios_intermediarios/consolidated/{session_id}/etapa1_massive_data*.json",
@@ -1081,7 +1423,7 @@ def _load_step1_massive_data(session_id):
         
         massive_data_files = []
         for pattern in search_patterns:
-            files = glob.glob(pattern, recursive=True)
+            files = session_archive.glob(pattern, recursive=True)
             massive_data_files.extend(files)
         
         if not massive_data_files:
@@ -1090,10 +1432,9 @@ def _load_step1_massive_data(session_id):
             return None
         
         # Carrega o arquivo mais recente
-        latest_file = max(massive_data_files, key=os.path.getctime)
+        latest_file = max(massive_data_files, key=session_archive.getmtime)
         
-        with open(latest_file, 'r', encoding='utf-8') as f:
-            massive_data = json.load(f)
+        massive_data = session_archive.read_json(latest_file)
         
         logger.info(f"✅ JSON massivo carregado: {latest_file}")
         logger.info(f"📊 Dados carregados: {len(str(massive_data))} caracteres")
@@ -6,10 +6,13 @@ Endpoints para gerenciamento de arquivos locais das análises
 """
 
 import os
+import re
 import logging
 from datetime import datetime
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
 from services.local_file_manager import local_file_manager
+from services.zip_stream import ZipStream, DEFAULT_COMPRESSION
+from services.session_archive import session_archive, RESERVED_DIRS
 from database import db_manager
 
 logger = logging.getLogger(__name__)
@@ -17,6 +20,16 @@ logger = logging.getLogger(__name__)
 # Cria blueprint
 files_bp = Blueprint('files', __name__)
 
+
+def _as_bool(value, default: bool) -> bool:
+    """Interpreta flags do JSON que podem chegar como string ("false", "0", "no")"""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        value = value.strip().lower()
+        return default if not value else value not in ('false', '0', 'no', 'off', 'nao', 'não')
+    return bool(value)
+
 @files_bp.route('/list_local_analyses', methods=['GET'])
 def list_local_analyses():
     """Lista análises salvas localmente"""
@@ -196,39 +209,76 @@ def get_file_content():
 
 @files_bp.route('/export_analysis/<analysis_id>', methods=['GET'])
 def export_analysis(analysis_id):
-    """Exporta análise completa como ZIP"""
+    """Exporta análise completa como ZIP em streaming (aceita Range para retomada)"""
     
     try:
-        import zipfile
-        import tempfile
-        
-        # Busca diretório da análise
-        analysis_dir = local_file_manager.get_analysis_directory(analysis_id)
+        files = local_file_manager.get_export_file_list(analysis_id)
         
-        if not analysis_dir:
+        if not files:
             return jsonify({
                 'error': 'Análise não encontrada'
             }), 404
         
-        # Cria arquivo ZIP temporário
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tmp_file:
-            zip_path = tmp_file.name
+        try:
+            compression = int(request.args.get('compression', DEFAULT_COMPRESSION))
+            zip_stream = ZipStream(files, compression)
+        except ValueError:
+            return jsonify({
+                'error': 'Parâmetro inválido',
+                'message': 'compression deve ser um inteiro entre 0 e 9'
+            }), 400
         
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Adiciona todos os arquivos da análise
-            for root, dirs, files in os.walk(local_file_manager.base_dir):
-                for file in files:
-                    if analysis_id[:8] in file:
-                        file_path = os.path.join(root, file)
-                        # Nome no ZIP será relativo ao diretório base
-                        arcname = os.path.relpath(file_path, local_file_manager.base_dir)
-                        zipf.write(file_path, arcname)
+        # Nome estável entre retomadas: usa o arquivo mais recente da análise
+        latest_mtime = max(session_archive.getmtime(path) for path, _ in files)
+        download_name = f"analise_{analysis_id[:8]}_{datetime.fromtimestamp(latest_mtime).strftime('%Y%m%d_%H%M%S')}.zip"
+        
+        headers = {
+            'Content-Disposition': f'attachment; filename="{download_name}"',
+            'Accept-Ranges': 'bytes',
+            'ETag': f'"{zip_stream.etag}"',
+            'Cache-Control': 'no-cache'
+        }
+        
+        # If-Range com ETag diferente: conteúdo mudou, envia o ZIP completo. Pedidos com várias
+        # faixas (multipart/byteranges) não são suportados e também recebem o ZIP completo (200)
+        if_range = request.headers.get('If-Range')
+        use_range = request.range is not None and len(request.range.ranges) == 1 and (
+            not if_range or if_range.strip().removeprefix('W/').strip('"') == zip_stream.etag
+        )
         
-        return send_file(
-            zip_path,
-            as_attachment=True,
-            download_name=f"analise_{analysis_id[:8]}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
-            mimetype='application/zip'
+        if use_range:
+            total_size = zip_stream.total_size()
+            byte_range = request.range.range_for_length(total_size)
+            
+            # Faixa única fora do tamanho do ZIP
+            if byte_range is None:
+                headers['Content-Range'] = f'bytes */{total_size}'
+                return Response(status=416, headers=headers)
+            
+            start, stop = byte_range
+            headers['Content-Range'] = f'bytes {start}-{stop - 1}/{total_size}'
+            headers['Content-Length'] = str(stop - start)
+            logger.info(f"📦 Retomando exportação {analysis_id}: bytes {start}-{stop - 1}/{total_size}")
+            
+            return Response(
+                stream_with_context(zip_stream.iter_range(start, stop)),
+                status=206,
+                mimetype='application/zip',
+                headers=headers,
+                direct_passthrough=True
+            )
+        
+        known_size = zip_stream.known_size
+        if known_size is not None:
+            headers['Content-Length'] = str(known_size)
+        
+        logger.info(f"📦 Exportando análise {analysis_id}: {len(files)} arquivos (compressão {compression})")
+        
+        return Response(
+            stream_with_context(zip_stream.iter_bytes()),
+            mimetype='application/zip',
+            headers=headers,
+            direct_passthrough=True
         )
         
     except Exception as e:
@@ -286,6 +336,7 @@ def get_storage_stats():
                 'total_size_gb': round(total_size / (1024 * 1024 * 1024), 3),
                 'type_breakdown': type_stats
             },
+            'archive_stats': session_archive.get_stats(),
             'supabase_connected': db_manager.supabase.is_connected(),
             'timestamp': datetime.now().isoformat()
         })
@@ -304,7 +355,7 @@ def cleanup_old_files():
     try:
         data = request.get_json() or {}
         days_old = int(data.get('days_old', 30))
-        dry_run = data.get('dry_run', True)  # Por padrão, apenas simula
+        dry_run = _as_bool(data.get('dry_run'), True)  # Por padrão, apenas simula
         
         from datetime import timedelta
         cutoff_date = datetime.now() - timedelta(days=days_old)
@@ -357,6 +408,71 @@ def cleanup_old_files():
             'message': str(e)
         }), 500
 
+@files_bp.route('/compact_sessions', methods=['POST'])
+def compact_sessions():
+    """Compacta sessões finalizadas em um arquivo por sessão (deduplicando snapshots)"""
+    
+    try:
+        data = request.get_json() or {}
+        min_age_hours = data.get('min_age_hours')
+        dry_run = _as_bool(data.get('dry_run'), True)  # Por padrão, apenas simula
+        session_ids = data.get('session_ids')
+        if session_ids is not None:
+            if not isinstance(session_ids, list) or not all(
+                isinstance(sid, str) and re.fullmatch(r'[\w\-]+', sid) and sid not in RESERVED_DIRS
+                for sid in session_ids
+            ):
+                return jsonify({
+                    'error': 'session_ids inválidos'
+                }), 400
+        
+        result = session_archive.compact_finished(
+            min_age_hours=float(min_age_hours) if min_age_hours is not None else None,
+            dry_run=dry_run,
+            session_ids=session_ids
+        )
+        
+        return jsonify({
+            'success': True,
+            'action': "Simulação de compactação" if dry_run else "Compactação executada",
+            **result,
+            'original_mb': round(result['original_bytes'] / (1024 * 1024), 2),
+            'reclaimed_mb': round(result['reclaimed_bytes'] / (1024 * 1024), 2),
+            'archive_stats': session_archive.get_stats()
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro na compactação de sessões: {str(e)}")
+        return jsonify({
+            'error': 'Erro na compactação de sessões',
+            'message': str(e)
+        }), 500
+
+@files_bp.route('/restore_session/<session_id>', methods=['POST'])
+def restore_session(session_id):
+    """Extrai uma sessão compactada de volta para os diretórios originais"""
+    
+    try:
+        if not session_archive.is_archived(session_id):
+            return jsonify({
+                'error': 'Sessão não está compactada'
+            }), 404
+        
+        restored = session_archive.restore_session(session_id)
+        
+        return jsonify({
+            'success': True,
+            'session_id': session_id,
+            'restored_files': restored
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro ao restaurar sessão {session_id}: {str(e)}")
+        return jsonify({
+            'error': 'Erro ao restaurar sessão',
+            'message': str(e)
+        }), 500
+
 @files_bp.route('/backup_to_supabase', methods=['POST'])
 def backup_to_supabase():
     """Faz backup de análises locais para Supabase"""
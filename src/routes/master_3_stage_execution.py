@@ -16,6 +16,7 @@ import uuid
 
 # Importa o orquestrador principal
 from services.master_3_stage_orchestrator import master_3_stage_orchestrator
+from services.job_queue import job_queue, worker_pool
 
 # Imports condicionais
 try:
@@ -122,6 +123,77 @@ async def execute_complete_analysis():
             "timestamp": datetime.now().isoformat()
         }), 500
 
+@master_3_stage_bp.route('/execute_complete_analysis/enqueue', methods=['POST'])
+def enqueue_complete_analysis():
+    """Enfileira a análise completa das 3 etapas para um processo worker (não bloqueia a requisição)"""
+
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({
+                "success": False,
+                "error": "Dados da requisição não fornecidos"
+            }), 400
+
+        produto = data.get('produto', '').strip()
+        nicho = data.get('nicho', '').strip()
+        publico = data.get('publico', '').strip()
+
+        if not any([produto, nicho, publico]):
+            return jsonify({
+                "success": False,
+                "error": "Pelo menos um dos campos (produto, nicho, publico) deve ser preenchido"
+            }), 400
+
+        session_id = f"3stage_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{str(uuid.uuid4())[:8]}"
+
+        job = job_queue.enqueue(
+            f"{__name__}:run_complete_3_stage_analysis",
+            {"session_id": session_id, "produto": produto, "nicho": nicho, "publico": publico},
+            session_id=session_id,
+            stage="execucao_3_etapas"
+        )
+        worker_pool.ensure_started()
+
+        logger.info(f"📥 Execução completa 3 etapas enfileirada - Sessão: {session_id}")
+
+        return jsonify({
+            "success": True,
+            "session_id": session_id,
+            "job_id": job['id'],
+            "status_endpoint": f"/api/workflow/jobs/{job['id']}",
+            "cancel_endpoint": f"/api/workflow/jobs/{job['id']}/cancel"
+        }), 202
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao enfileirar execução completa: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+def run_complete_3_stage_analysis(session_id: str, produto: str, nicho: str, publico: str) -> Dict[str, Any]:
+    """Job da fila: executa as 3 etapas e retorna o resumo (resultado completo fica nos arquivos da sessão)"""
+    results = asyncio.run(master_3_stage_orchestrator.execute_complete_3_stage_analysis(
+        produto=produto,
+        nicho=nicho,
+        publico=publico,
+        session_id=session_id
+    ))
+
+    if not results.get("success"):
+        raise Exception(f"Execução 3 etapas falhou: {results.get('errors', [])}")
+
+    return {
+        "session_id": session_id,
+        "total_execution_time_minutes": results.get("execution_stats", {}).get("total_execution_time_minutes", 0),
+        "stage_1_json_size_kb": results.get("stage_1_results", {}).get("json_size_kb", 0),
+        "stage_2_phases_completed": results.get("stage_2_results", {}).get("phases_completed", 0),
+        "stage_3_report_path": results.get("stage_3_results", {}).get("report_path", ""),
+        "errors": results.get("errors", [])
+    }
+
 @master_3_stage_bp.route('/execute_stage_1_only', methods=['POST'])
 async def execute_stage_1_only():
     """Executa apenas a ETAPA 1: Coleta Massiva Real"""
@@ -209,4 +209,149 @@ def app_status():
             "error": "Internal server error",
             "status": "error",
             "timestamp": datetime.now().isoformat()
-        }), 500
\ No newline at end of file
+        }), 500
+
+@monitoring_bp.route('/api/search_cache', methods=['GET'])
+def search_cache_stats():
+    """Retorna estatísticas do cache de busca (taxa de acerto por provedor)"""
+    try:
+        from services.search_cache import search_cache
+
+        return jsonify({
+            'success': True,
+            'stats': search_cache.get_stats(),
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"❌ Erro ao obter estatísticas do cache: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@monitoring_bp.route('/api/image_store', methods=['GET'])
+def image_store_stats():
+    """Retorna estatísticas do store de imagens (downloads evitados e bytes economizados)"""
+    try:
+        from services.image_store import image_store
+
+        return jsonify({
+            'success': True,
+            'stats': image_store.get_stats(),
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"❌ Erro ao obter estatísticas do store de imagens: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@monitoring_bp.route('/api/job_queue', methods=['GET'])
+def job_queue_stats():
+    """Retorna estatísticas da fila de jobs e do pool de workers"""
+    try:
+        from services.job_queue import job_queue, worker_pool
+
+        return jsonify({
+            'success': True,
+            'stats': {
+                'queue': job_queue.get_stats(),
+                'workers': worker_pool.get_stats()
+            },
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"❌ Erro ao obter estatísticas da fila de jobs: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@monitoring_bp.route('/api/routing', methods=['GET'])
+def routing_stats():
+    """Retorna latência (p50/p90/p99, histograma), erros e saúde por provedor e chave do roteador"""
+    try:
+        from services.provider_router import provider_router
+
+        pool = request.args.get('pool')
+        stats = provider_router.get_stats(pool)
+        if pool and not stats:
+            return jsonify({
+                'success': False,
+                'error': f'Pool {pool} não registrado'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'stats': stats,
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"❌ Erro ao obter estatísticas de roteamento: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@monitoring_bp.route('/api/circuit_breakers', methods=['GET'])
+def circuit_breakers_status():
+    """Retorna estado (fechado/aberto/meio-aberto) e contadores dos disjuntores por provedor"""
+    try:
+        from services.circuit_breaker import circuit_breakers
+
+        return jsonify({
+            'success': True,
+            'stats': circuit_breakers.get_status(),
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"❌ Erro ao obter estado dos disjuntores: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@monitoring_bp.route('/api/circuit_breakers/reset', methods=['POST'])
+def reset_circuit_breakers():
+    """Fecha manualmente um disjuntor (?name=) ou todos"""
+    try:
+        from services.circuit_breaker import circuit_breakers
+
+        circuit_breakers.reset(request.args.get('name'))
+        return jsonify({
+            'success': True,
+            'stats': circuit_breakers.get_status(),
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"❌ Erro ao resetar disjuntores: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@monitoring_bp.route('/api/traces/<session_id>', methods=['GET'])
+def session_trace(session_id):
+    """Retorna o waterfall de spans da sessão e o resumo do caminho crítico"""
+    try:
+        from services.tracing import tracer
+
+        trace = tracer.get_trace(session_id)
+        if not trace['span_count']:
+            return jsonify({
+                'success': False,
+                'error': f'Nenhum trace encontrado para a sessão {session_id}'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'trace': trace,
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"❌ Erro ao obter trace da sessão {session_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
@@ -10,7 +10,7 @@ import os
 import logging
 import time
 import json
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Union, AsyncIterator, Callable, Iterator
 import requests
 from datetime import datetime, timedelta
 
@@ -39,6 +39,11 @@ try:
 except ImportError:
     HAS_SEARCH_MANAGER = False
 
+from services.llm_streaming import stream_with_persistence, llm_stream_metrics, ResumedPartial
+from services.tracing import tracer
+from services.provider_router import provider_router
+from services.circuit_breaker import circuit_breakers, CircuitBreaker
+
 logger = logging.getLogger(__name__)
 
 class AIManager:
@@ -50,7 +55,6 @@ class AIManager:
         self.last_used_provider = None
         self.error_counts = {}
         self.performance_metrics = {}
-        self.circuit_breaker = {}
         
         self._initialize_providers()
         logger.info(f"✅ AI Manager inicializado com {len(self.providers)} provedores")
@@ -66,12 +70,12 @@ class AIManager:
                     genai.configure(api_key=api_key)
                     self.providers['gemini'] = {
                         'client': genai,
+                        'api_key': api_key,
                         'available': True,
                         'model': 'gemini-2.0-flash-exp',
                         'priority': 1,
                         'error_count': 0,
                         'consecutive_failures': 0,
-                        'max_errors': 5,
                         'last_success': None,
                         'supports_tools': True
                     }
@@ -91,12 +95,12 @@ class AIManager:
                     openai.api_key = api_key
                     self.providers['openai'] = {
                         'client': openai,
+                        'api_key': api_key,
                         'available': True,
                         'model': 'gpt-4-0125-preview',
                         'priority': 2,
                         'error_count': 0,
                         'consecutive_failures': 0,
-                        'max_errors': 3,
                         'last_success': None,
                         'supports_tools': True
                     }
@@ -113,12 +117,12 @@ class AIManager:
             if HAS_GROQ_CLIENT and groq_client and groq_client.is_enabled():
                 self.providers['groq'] = {
                     'client': groq_client,
+                    'api_key': groq_client.api_key,
                     'available': True,
                     'model': 'llama3-70b-8192',
                     'priority': 3,
                     'error_count': 0,
                     'consecutive_failures': 0,
-                    'max_errors': 3,
                     'last_success': None,
                     'supports_tools': False
                 }
@@ -128,8 +132,16 @@ class AIManager:
         except Exception as e:
             logger.warning(f"ℹ️ Groq não disponível: {str(e)}")
 
-    def _get_available_provider(self, require_tools: bool = False) -> Optional[str]:
-        """Seleciona o melhor provedor disponível"""
+        # Pools no roteador adaptativo (mesmas estatísticas usadas pelos demais gerenciadores)
+        for name, provider in self.providers.items():
+            provider_router.register_pool(name, [provider['api_key']])
+
+    def _breaker(self, provider_name: str) -> CircuitBreaker:
+        """Disjuntor do provedor, compartilhado com os demais chamadores do processo"""
+        return circuit_breakers.for_key(provider_name, self.providers[provider_name]['api_key'])
+
+    def _rank_providers(self, require_tools: bool = False) -> List[str]:
+        """Provedores com circuito fechado (ou sonda livre), do melhor para o pior"""
         available_providers = []
         
         for name, provider in self.providers.items():
@@ -139,17 +151,52 @@ class AIManager:
             if require_tools and not provider.get('supports_tools', False):
                 continue
                 
-            if provider['consecutive_failures'] >= provider['max_errors']:
+            if not self._breaker(name).available():
                 continue
                 
             available_providers.append((name, provider['priority']))
         
         if not available_providers:
-            return None
+            return []
             
-        # Ordena por prioridade (menor número = maior prioridade)
-        available_providers.sort(key=lambda x: x[1])
-        return available_providers[0][0]
+        # Mais rápido e saudável primeiro; prioridade (menor número = maior prioridade) desempata
+        return provider_router.rank([name for name, _ in available_providers], dict(available_providers))
+
+    def _get_available_provider(self, require_tools: bool = False) -> Optional[str]:
+        """Seleciona o melhor provedor disponível"""
+        ranked = self._rank_providers(require_tools)
+        return ranked[0] if ranked else None
+
+    def _unavailable_error(self) -> Exception:
+        """Erro imediato quando todos os circuitos estão abertos (sem esperar timeouts)"""
+        open_circuits = [
+            f"{name} ({self._breaker(name).retry_in():.0f}s)"
+            for name in self.providers if not self._breaker(name).available()
+        ]
+        if open_circuits:
+            return Exception(f"Nenhum provedor de IA disponível; circuitos abertos: {', '.join(open_circuits)}")
+        return Exception("Nenhum provedor de IA disponível")
+
+    def _acquire(self, provider_name: str) -> bool:
+        """Reserva a chamada no disjuntor e abre a chamada em andamento no roteador (fechada por _record_*)"""
+        if not self._breaker(provider_name).allow():
+            return False
+        provider_router.choose_key(provider_name, lease=True)
+        return True
+
+    def _record_success(self, provider_name: str, elapsed: float):
+        provider = self.providers[provider_name]
+        provider['last_success'] = datetime.now()
+        provider['consecutive_failures'] = 0
+        provider_router.record(provider_name, provider['api_key'], elapsed, True)
+        self._breaker(provider_name).record_success()
+
+    def _record_failure(self, provider_name: str, elapsed: float, error: Exception):
+        provider = self.providers[provider_name]
+        provider['error_count'] += 1
+        provider['consecutive_failures'] += 1
+        provider_router.record(provider_name, provider['api_key'], elapsed, False, error=str(error))
+        self._breaker(provider_name).record_failure(error)
 
     async def google_search_tool(self, query: str) -> Dict[str, Any]:
         """Ferramenta de busca Google para uso pela IA"""
@@ -234,15 +281,23 @@ class AIManager:
             iteration += 1
             logger.info(f"🔄 Iteração {iteration}/{max_iterations}")
             
+            if provider_name not in ('gemini', 'openai') or not self._acquire(provider_name):
+                # Fallback para geração normal (provedor sem ferramentas ou circuito aberto)
+                return await self.generate_text(full_prompt)
+            
+            start_time = time.time()
             try:
                 if provider_name == 'gemini':
                     result = await self._execute_gemini_with_tools(full_prompt, tools, conversation_history)
-                elif provider_name == 'openai':
-                    result = await self._execute_openai_with_tools(full_prompt, tools, conversation_history)
                 else:
-                    # Fallback para geração normal
-                    return await self.generate_text(full_prompt)
-                
+                    result = await self._execute_openai_with_tools(full_prompt, tools, conversation_history)
+            except Exception as e:
+                self._record_failure(provider_name, time.time() - start_time, e)
+                logger.error(f"❌ Erro na iteração {iteration}: {e}")
+                break
+            self._record_success(provider_name, time.time() - start_time)
+            
+            try:
                 if result['type'] == 'text':
                     logger.info(f"✅ Resposta final gerada em {iteration} iterações")
                     return result['content']
@@ -402,49 +457,45 @@ class AIManager:
         return formatted
 
     async def generate_text(self, prompt: str, max_tokens: int = 8192, temperature: float = 0.7) -> str:
-        """Gera texto usando o melhor provedor disponível"""
-        provider_name = self._get_available_provider()
-        
-        if not provider_name:
-            raise Exception("Nenhum provedor de IA disponível")
-        
-        provider = self.providers[provider_name]
-        
-        try:
+        """Gera texto usando o melhor provedor disponível, com fallback pelos circuitos fechados"""
+        last_error = None
+
+        # Cada provedor é tentado no máximo uma vez; circuitos abertos são pulados sem custo
+        for provider_name in self._rank_providers():
+            if not self._acquire(provider_name):
+                continue
+
+            provider = self.providers[provider_name]
             start_time = time.time()
-            
-            if provider_name == 'gemini':
-                result = await self._generate_gemini(prompt, max_tokens, temperature)
-            elif provider_name == 'openai':
-                result = await self._generate_openai(prompt, max_tokens, temperature)
-            elif provider_name == 'groq':
-                result = provider['client'].generate(prompt, max_tokens)
-            else:
-                raise Exception(f"Provedor {provider_name} não implementado")
-            
-            # Registra sucesso
-            provider['last_success'] = datetime.now()
-            provider['consecutive_failures'] = 0
-            
+
+            try:
+                with tracer.span('llm.generate', kind='call', provider=provider_name,
+                                 prompt_chars=len(prompt), max_tokens=max_tokens) as span:
+                    if provider_name == 'gemini':
+                        result = await self._generate_gemini(prompt, max_tokens, temperature)
+                    elif provider_name == 'openai':
+                        result = await self._generate_openai(prompt, max_tokens, temperature)
+                    elif provider_name == 'groq':
+                        result = provider['client'].generate(prompt, max_tokens)
+                    else:
+                        raise Exception(f"Provedor {provider_name} não implementado")
+                    span.set(response_chars=len(result or ''), tokens_estimate=len(result or '') // 4)
+
+            except Exception as e:
+                self._record_failure(provider_name, time.time() - start_time, e)
+                logger.error(f"❌ Erro no {provider_name}: {e}")
+                last_error = e
+                continue
+
             processing_time = time.time() - start_time
+            self._record_success(provider_name, processing_time)
             logger.info(f"✅ {provider_name} gerou {len(result)} caracteres em {processing_time:.2f}s")
-            
+
             return result
-            
-        except Exception as e:
-            # Registra falha
-            provider['error_count'] += 1
-            provider['consecutive_failures'] += 1
-            
-            logger.error(f"❌ Erro no {provider_name}: {e}")
-            
-            # Tenta próximo provedor se houver falhas consecutivas
-            if provider['consecutive_failures'] >= provider['max_errors']:
-                provider['available'] = False
-                logger.warning(f"⚠️ {provider_name} desabilitado temporariamente")
-                return await self.generate_text(prompt, max_tokens, temperature)
-            
-            raise
+
+        if last_error is not None:
+            raise last_error
+        raise self._unavailable_error()
 
     async def _generate_gemini(self, prompt: str, max_tokens: int, temperature: float) -> str:
         """Gera texto usando Gemini"""
@@ -473,24 +524,165 @@ class AIManager:
         
         return response.choices[0].message.content
 
-    def generate_analysis(self, prompt: str, max_tokens: int = 8192, temperature: float = 0.7) -> str:
+    def _stream_factory(self, provider_name: str, max_tokens: int, temperature: float) -> Callable[[str], Callable[[], Iterator[str]]]:
+        """Retorna fábrica de iteradores de chunks do SDK do provedor"""
+        provider = self.providers[provider_name]
+
+        def gemini_chunks(prompt: str) -> Iterator[str]:
+            model = genai.GenerativeModel('gemini-2.0-flash-exp')
+            generation_config = genai.types.GenerationConfig(
+                max_output_tokens=max_tokens,
+                temperature=temperature,
+            )
+            for chunk in model.generate_content(prompt, generation_config=generation_config, stream=True):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk sem partes de texto (ex.: apenas metadados de segurança)
+                    continue
+                if text:
+                    yield text
+
+        def openai_chunks(prompt: str) -> Iterator[str]:
+            response = openai.ChatCompletion.create(
+                model="gpt-4-0125-preview",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True
+            )
+            for chunk in response:
+                choices = chunk['choices'] if isinstance(chunk, dict) else chunk.choices
+                if not choices:
+                    continue
+                delta = choices[0]['delta'] if isinstance(choices[0], dict) else choices[0].delta
+                content = delta.get('content') if isinstance(delta, dict) else getattr(delta, 'content', None)
+                if content:
+                    yield content
+
+        if provider_name == 'gemini':
+            chunks = gemini_chunks
+        elif provider_name == 'openai':
+            chunks = openai_chunks
+        elif provider_name == 'groq':
+            chunks = lambda prompt: provider['client'].stream(prompt, max_tokens)
+        else:
+            raise Exception(f"Provedor {provider_name} não implementado")
+
+        return lambda prompt: (lambda: chunks(prompt))
+
+    async def generate_text_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 8192,
+        temperature: float = 0.7,
+        session_id: Optional[str] = None,
+        stream_key: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Gera texto em streaming usando o melhor provedor disponível
+
+        Com session_id e stream_key, a saída parcial é persistida em disco e publicada
+        no progresso da sessão; uma geração interrompida é retomada a partir do parcial.
+        """
+        last_error = None
+        partial_replayed = False
+
+        for provider_name in self._rank_providers():
+            if not self._acquire(provider_name):
+                continue
+
+            # Só chunks do provedor atual contam: o parcial retomado não impede a troca de provedor
+            emitted = False
+            # Span não ativado: o gerador é suspenso a cada chunk e não deve vazar como span corrente
+            span = tracer.span('llm.stream', kind='call', session_id=session_id, activate=False,
+                               provider=provider_name, prompt_chars=len(prompt), stream_key=stream_key)
+            chunks = chars = 0
+            start_time = time.time()
+
+            try:
+                with span:
+                    async for chunk in stream_with_persistence(
+                        provider_name,
+                        prompt,
+                        self._stream_factory(provider_name, max_tokens, temperature),
+                        session_id=session_id,
+                        stream_key=stream_key,
+                        replay_partial=not partial_replayed
+                    ):
+                        if isinstance(chunk, ResumedPartial):
+                            partial_replayed = True
+                        else:
+                            emitted = True
+                        chunks += 1
+                        chars += len(chunk)
+                        span.set(chunks=chunks, response_chars=chars, tokens_estimate=chars // 4)
+                        yield chunk
+
+            except Exception as e:
+                self._record_failure(provider_name, time.time() - start_time, e)
+                logger.error(f"❌ Erro no streaming {provider_name}: {e}")
+
+                # Só troca de provedor se nada foi entregue; senão o parcial salvo é retomado na próxima chamada
+                if emitted:
+                    raise
+                last_error = e
+                continue
+
+            self._record_success(provider_name, time.time() - start_time)
+            return
+
+        if last_error is not None:
+            raise last_error
+        raise self._unavailable_error()
+
+    async def generate_text_streaming(
+        self,
+        prompt: str,
+        max_tokens: int = 8192,
+        temperature: float = 0.7,
+        session_id: Optional[str] = None,
+        stream_key: Optional[str] = None
+    ) -> str:
+        """Consome o streaming e retorna o texto completo"""
+        parts = []
+        async for chunk in self.generate_text_stream(prompt, max_tokens, temperature, session_id, stream_key):
+            parts.append(chunk)
+        return ''.join(parts)
+
+    def generate_analysis(
+        self,
+        prompt: str,
+        max_tokens: int = 8192,
+        temperature: float = 0.7,
+        session_id: Optional[str] = None,
+        stream_key: Optional[str] = None
+    ) -> str:
         """Gera análise usando o melhor provedor disponível - método compatível com módulos"""
         try:
             # Executa de forma síncrona usando asyncio
             import asyncio
+
+            def make_coro():
+                if session_id and stream_key:
+                    # Streaming: persiste parcial em disco e publica progresso da sessão
+                    return self.generate_text_streaming(prompt, max_tokens, temperature, session_id, stream_key)
+                return self.generate_text(prompt, max_tokens, temperature)
+
             try:
                 loop = asyncio.get_event_loop()
                 if loop.is_running():
                     # Se já há um loop rodando, cria uma nova task
                     import concurrent.futures
                     with concurrent.futures.ThreadPoolExecutor() as executor:
-                        future = executor.submit(asyncio.run, self.generate_text(prompt, max_tokens, temperature))
-                        return future.result(timeout=60)
+                        future = executor.submit(tracer.wrap(asyncio.run), make_coro())
+                        # Em streaming o timeout total é maior: o progresso é visível e o parcial é persistido
+                        return future.result(timeout=300 if session_id and stream_key else 60)
                 else:
-                    return loop.run_until_complete(self.generate_text(prompt, max_tokens, temperature))
+                    return loop.run_until_complete(make_coro())
             except RuntimeError:
                 # Se não há loop, cria um novo
-                return asyncio.run(self.generate_text(prompt, max_tokens, temperature))
+                return asyncio.run(make_coro())
         except Exception as e:
             logger.error(f"❌ Erro na geração de análise: {e}")
             # Retorna resposta de fallback em caso de erro
@@ -500,19 +692,23 @@ class AIManager:
         """Retorna status dos provedores"""
         status = {
             'total_providers': len(self.providers),
-            'available_providers': sum(1 for p in self.providers.values() if p['available']),
+            'available_providers': len(self._rank_providers()),
             'providers': {}
         }
         
         for name, provider in self.providers.items():
+            circuit = self._breaker(name).get_status()
             status['providers'][name] = {
-                'available': provider['available'],
+                'available': provider['available'] and circuit['state'] != 'open',
                 'model': provider['model'],
                 'error_count': provider['error_count'],
                 'consecutive_failures': provider['consecutive_failures'],
                 'last_success': provider['last_success'].isoformat() if provider['last_success'] else None,
-                'supports_tools': provider.get('supports_tools', False)
+                'supports_tools': provider.get('supports_tools', False),
+                'circuit': circuit
             }
+
+        status['streaming'] = llm_stream_metrics.get_stats()
         
         return status
 
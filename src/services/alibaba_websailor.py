@@ -8,19 +8,31 @@ Agente de navegação web inteligente com busca profunda e análise contextual
 import os
 import logging
 import time
+import asyncio
 import requests
 import json
 import random
-from typing import Dict, List, Optional, Any
+import threading
+from typing import Dict, List, Optional, Any, Callable, AsyncIterator
 from urllib.parse import quote_plus, urljoin, urlparse
 from bs4 import BeautifulSoup
 from datetime import datetime
 import re
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from services.auto_save_manager import salvar_etapa, salvar_erro
+from services.url_canonicalizer import canonicalize_url, session_deduplicator
+from services.search_cache import search_cache
+from services.session_persistence_manager import session_manager
+from services.delta_analysis import delta_analyzer
+from services.http_client_pool import http_client_pool
 
 logger = logging.getLogger(__name__)
 
+
+class ResearchCancelled(Exception):
+    """Navegação interrompida pelo consumidor (stop_event)"""
+
+
 class AlibabaWebSailorAgent:
     """Agente WebSailor inteligente para navegação e análise web profunda"""
 
@@ -70,34 +82,8 @@ class AlibabaWebSailorAgent:
             "mercadolivre.com.br", "olx.com.br", "booking.com", "airbnb.com"
         }
 
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
-        # Configuração SSL mais robusta
-        self.session.verify = True  # Mantém verificação SSL por padrão
-        
-        # Configuração de timeout e retry
-        from requests.adapters import HTTPAdapter
-        from urllib3.util.retry import Retry
-        
-        try:
-            # Tenta usar o parâmetro novo (urllib3 >= 1.26.0)
-            retry_strategy = Retry(
-                total=3,
-                status_forcelist=[429, 500, 502, 503, 504],
-                allowed_methods=["HEAD", "GET", "OPTIONS"],
-                backoff_factor=1
-            )
-        except TypeError:
-            # Fallback para versões antigas do urllib3
-            retry_strategy = Retry(
-                total=3,
-                status_forcelist=[429, 500, 502, 503, 504],
-                method_whitelist=["HEAD", "GET", "OPTIONS"],
-                backoff_factor=1
-            )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        # Sessão com headers próprios sobre o pool de conexões compartilhado (com retry)
+        self.session = http_client_pool.create_sync_session(self.headers)
 
         # Estatísticas de navegação
         self.navigation_stats = {
@@ -118,9 +104,21 @@ class AlibabaWebSailorAgent:
         context: Dict[str, Any],
         max_pages: int = 25,
         depth_levels: int = 3,
-        session_id: str = None
+        session_id: str = None,
+        on_page: Optional[Callable[[Dict[str, Any]], None]] = None,
+        stop_event: Optional[threading.Event] = None
     ) -> Dict[str, Any]:
-        """Navegação e pesquisa profunda com múltiplos níveis"""
+        """
+        Navegação e pesquisa profunda com múltiplos níveis
+
+        on_page, se informado, recebe cada página aceita assim que é extraída (usado por research_stream).
+        stop_event, se sinalizado, interrompe a navegação na próxima página: nada mais é salvo nem
+        checkpointado e o retorno é None
+        """
+
+        def check_stop():
+            if stop_event is not None and stop_event.is_set():
+                raise ResearchCancelled()
 
         try:
             logger.info(f"🚀 INICIANDO NAVEGAÇÃO PROFUNDA para: {query}")
@@ -137,6 +135,10 @@ class AlibabaWebSailorAgent:
             all_content = []
             search_engines_used = []
 
+            # URLs e corpos já vistos na sessão: evita extrair o mesmo artigo duas vezes
+            seen_urls = session_deduplicator.urls(session_id)
+            content_filter = session_deduplicator.contents(session_id)
+
             # NÍVEL 1: BUSCA MASSIVA MULTI-ENGINE
             logger.info("🔍 NÍVEL 1: Busca massiva com múltiplos engines")
 
@@ -150,9 +152,29 @@ class AlibabaWebSailorAgent:
             ]
 
             for engine_name, search_func in search_engines:
+                check_stop()
                 try:
+                    # Lote de URLs deste engine já extraído numa execução anterior da sessão: restaura e pula
+                    batch_key = f"{engine_name}:{query}"
+                    saved_batch = session_manager.load_checkpoint(session_id, 'extraction', batch_key)
+                    if saved_batch is not None:
+                        for url in saved_batch['urls']:
+                            seen_urls.add(url)
+                        for item in saved_batch['content']:
+                            content_filter.is_duplicate(item['content'])
+                            all_content.append(item)
+                            self._emit_page(on_page, item)
+                        search_engines_used.append(engine_name)
+                        logger.info(f"⏭️ {engine_name}: {len(saved_batch['content'])} extrações retomadas do checkpoint")
+                        continue
+
                     logger.info(f"🔍 Executando {engine_name}...")
-                    results = search_func(query, max_pages // len(search_engines))
+                    max_results = max_pages // len(search_engines)
+                    results = search_cache.get_or_fetch(
+                        f"websailor_{search_func.__name__}", query, {'max_results': max_results},
+                        lambda func=search_func: func(query, max_results)
+                    )
+                    batch_urls, batch_content = [], []
 
                     if results:
                         search_engines_used.append(engine_name)
@@ -160,16 +182,31 @@ class AlibabaWebSailorAgent:
 
                         # Extrai conteúdo de cada resultado
                         for result in results:
-                            content_data = self._extract_intelligent_content(
-                                result['url'], result.get('title', ''), result.get('snippet', ''), context
-                            )
-
-                            if content_data and content_data['success']:
+                            check_stop()
+                            if not seen_urls.add(result['url']):
+                                continue
+                            batch_urls.append(result['url'])
+
+                            # Modo delta: URL com o mesmo título/snippet da execução anterior do nicho não é reextraída
+                            fingerprint = {'title': result.get('title', ''), 'snippet': result.get('snippet', '')}
+                            extraction_key = canonicalize_url(result['url'])
+                            content_data = delta_analyzer.lookup(session_id, 'extraction', extraction_key, fingerprint)
+                            if content_data is None:
+                                content_data = self._extract_intelligent_content(
+                                    result['url'], result.get('title', ''), result.get('snippet', ''), context
+                                )
+                                if content_data and content_data['success']:
+                                    delta_analyzer.store(session_id, 'extraction', extraction_key, fingerprint, content_data)
+                                time.sleep(0.5)  # Rate limiting (só quando houve requisição)
+
+                            if content_data and content_data['success'] and not content_filter.is_duplicate(content_data['content']):
                                 all_content.append({
                                     **content_data,
                                     'search_engine': engine_name,
                                     'search_result': result
                                 })
+                                batch_content.append(all_content[-1])
+                                self._emit_page(on_page, all_content[-1])
 
                                 # Salva cada extração bem-sucedida
                                 salvar_etapa(f"websailor_extracao_{len(all_content)}", {
@@ -179,10 +216,15 @@ class AlibabaWebSailorAgent:
                                     "quality_score": content_data['quality_score']
                                 }, categoria="pesquisa_web")
 
-                            time.sleep(0.5)  # Rate limiting
+                        session_manager.save_checkpoint(session_id, 'extraction', batch_key, {
+                            "urls": batch_urls,
+                            "content": batch_content
+                        })
 
                     time.sleep(1)  # Delay entre engines
 
+                except ResearchCancelled:
+                    raise
                 except Exception as e:
                     logger.error(f"❌ Erro em {engine_name}: {str(e)}")
                     continue
@@ -198,12 +240,17 @@ class AlibabaWebSailorAgent:
                     internal_links = self._extract_internal_links(page['url'], page['content'])
 
                     for link in internal_links[:3]:  # Top 3 links por página
+                        check_stop()
+                        if not seen_urls.add(link):
+                            continue
+
                         internal_content = self._extract_intelligent_content(link, "", "", context)
 
-                        if internal_content and internal_content['success']:
+                        if internal_content and internal_content['success'] and not content_filter.is_duplicate(internal_content['content']):
                             internal_content['search_engine'] = f"{page['search_engine']} (Internal)"
                             internal_content['parent_url'] = page['url']
                             all_content.append(internal_content)
+                            self._emit_page(on_page, internal_content)
 
                             time.sleep(0.3)
 
@@ -215,24 +262,35 @@ class AlibabaWebSailorAgent:
 
                 for related_query in related_queries[:3]:
                     try:
-                        related_results = self._google_search_deep(related_query, 5)
+                        related_results = search_cache.get_or_fetch(
+                            "websailor__google_search_deep", related_query, {'max_results': 5},
+                            lambda rq=related_query: self._google_search_deep(rq, 5)
+                        )
 
                         for result in related_results:
+                            check_stop()
+                            if not seen_urls.add(result['url']):
+                                continue
+
                             related_content = self._extract_intelligent_content(
                                 result['url'], result.get('title', ''), result.get('snippet', ''), context
                             )
 
-                            if related_content and related_content['success']:
+                            if related_content and related_content['success'] and not content_filter.is_duplicate(related_content['content']):
                                 related_content['search_engine'] = "Google (Related Query)"
                                 related_content['related_query'] = related_query
                                 all_content.append(related_content)
+                                self._emit_page(on_page, related_content)
 
                                 time.sleep(0.4)
+                    except ResearchCancelled:
+                        raise
                     except Exception as e:
                         logger.warning(f"⚠️ Erro em query relacionada '{related_query}': {str(e)}")
                         continue
 
             # PROCESSAMENTO E ANÁLISE FINAL
+            check_stop()
             processed_research = self._process_and_analyze_content(all_content, query, context)
 
             # Atualiza estatísticas
@@ -248,11 +306,77 @@ class AlibabaWebSailorAgent:
 
             return processed_research
 
+        except ResearchCancelled:
+            logger.info(f"⏹️ Navegação WebSailor interrompida pelo consumidor: {query}")
+            return None
         except Exception as e:
             logger.error(f"❌ ERRO CRÍTICO na navegação WebSailor: {str(e)}")
             salvar_erro("websailor_critico", e, contexto={"query": query})
             return self._generate_emergency_research(query, context)
 
+    def _emit_page(self, on_page: Optional[Callable[[Dict[str, Any]], None]], page: Dict[str, Any]):
+        """Entrega a página ao consumidor sem deixar erros dele interromperem a navegação"""
+        if on_page is None:
+            return
+        try:
+            on_page(page)
+        except Exception as e:
+            logger.warning(f"⚠️ Consumidor de páginas WebSailor falhou: {e}")
+
+    async def research_stream(
+        self,
+        query: str,
+        context: Dict[str, Any],
+        max_pages: int = 25,
+        depth_levels: int = 3,
+        session_id: str = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Produtor assíncrono da navegação profunda
+
+        A navegação (requests + pausas de rate limiting) roda numa thread via asyncio.to_thread; cada
+        página aceita chega como {'type': 'page', 'page': ...} e o resultado final como
+        {'type': 'done', 'research': ...}. O event loop nunca bloqueia. Se o consumidor parar antes do
+        fim (ou for cancelado), a thread é sinalizada e para na próxima página, sem salvar mais nada.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop_event = threading.Event()
+
+        def on_page(page: Dict[str, Any]):
+            if stop_event.is_set() or loop.is_closed():
+                return
+            loop.call_soon_threadsafe(queue.put_nowait, ('page', page))
+
+        async def produce():
+            try:
+                research = await asyncio.to_thread(
+                    self.navigate_and_research_deep, query, context, max_pages, depth_levels, session_id,
+                    on_page, stop_event
+                )
+                # Páginas foram agendadas antes da conclusão da thread: 'done' chega por último
+                queue.put_nowait(('done', research))
+            except BaseException as e:
+                queue.put_nowait(('error', e))
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+
+        producer = asyncio.ensure_future(produce())
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == 'page':
+                    yield {'type': 'page', 'page': value}
+                elif kind == 'done':
+                    yield {'type': 'done', 'research': value}
+                    return
+                else:
+                    raise value
+        finally:
+            stop_event.set()
+            if not producer.done():
+                producer.cancel()
+
     def _google_search_deep(self, query: str, max_results: int) -> List[Dict[str, Any]]:
         """Busca profunda usando Google Custom Search API"""
 
@@ -276,7 +400,7 @@ class AlibabaWebSailorAgent:
                 "filter": "1"  # Remove duplicatas
             }
 
-            response = requests.get(
+            response = http_client_pool.get_sync_session().get(
                 self.google_search_url,
                 params=params,
                 headers=self.headers,
@@ -331,7 +455,7 @@ class AlibabaWebSailorAgent:
                 'page': 1
             }
 
-            response = requests.post(
+            response = http_client_pool.get_sync_session().post(
                 self.serper_url,
                 json=payload,
                 headers=headers,
@@ -587,7 +711,7 @@ class AlibabaWebSailorAgent:
 
             jina_url = f"{self.jina_reader_url}{url}"
 
-            response = requests.get(jina_url, headers=headers, timeout=60)
+            response = http_client_pool.get_sync_session().get(jina_url, headers=headers, timeout=60)
 
             if response.status_code == 200:
                 content = response.text
@@ -949,9 +1073,7 @@ class AlibabaWebSailorAgent:
             logger.warning(f"⚠️ Erro SSL ao extrair links de {base_url}: {str(ssl_error)}")
             # Tenta novamente sem verificação SSL como fallback
             try:
-                temp_session = requests.Session()
-                temp_session.headers.update(self.headers)
-                temp_session.verify = False
+                temp_session = http_client_pool.create_sync_session(self.headers, verify=False)
                 import urllib3
                 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
                 
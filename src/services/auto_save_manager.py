@@ -12,6 +12,9 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 
+from services.tracing import tracer
+from services.session_archive import session_archive
+
 logger = logging.getLogger(__name__)
 
 def serializar_dados_seguros(dados: Any) -> Dict[str, Any]:
@@ -84,6 +87,10 @@ class AutoSaveManager:
             except Exception as e:
                 logger.error(f"❌ Erro ao criar diretório {directory}: {e}")
 
+    @tracer.traced('salvar_etapa', kind='io',
+                   attributes=lambda self, nome_etapa, dados=None, categoria="analise_completa", session_id=None: {
+                       'etapa': nome_etapa, 'categoria': categoria, 'session_id': session_id},
+                   result=lambda path: {'bytes': os.path.getsize(path) if path and os.path.exists(path) else 0})
     def salvar_etapa(self, nome_etapa: str, dados: Any, categoria: str = "analise_completa", session_id: str = None) -> str:
         """Salva uma etapa do processo com timestamp"""
         try:
@@ -262,11 +269,12 @@ class AutoSaveManager:
                     categoria_path = f"{base_dir}/{categoria}"
                     if os.path.isdir(categoria_path):
                         session_path = f"{categoria_path}/{session_id}"
-                        if os.path.exists(session_path):
-                            for arquivo in os.listdir(session_path):
-                                if arquivo.endswith(('.json', '.txt')):
-                                    nome_etapa = arquivo.split('_')[0]
-                                    etapas[nome_etapa] = f"{session_path}/{arquivo}"
+                        # Inclui etapas de sessões já compactadas
+                        for caminho, _ in session_archive.iter_files(session_path):
+                            arquivo = os.path.basename(caminho)
+                            if os.path.dirname(os.path.relpath(caminho, session_path)) == '' and arquivo.endswith(('.json', '.txt')):
+                                nome_etapa = arquivo.split('_')[0]
+                                etapas[nome_etapa] = f"{session_path}/{arquivo}"
 
         except Exception as e:
             logger.error(f"❌ Erro ao listar etapas: {e}")
@@ -282,12 +290,10 @@ class AutoSaveManager:
                 arquivo = etapas[nome_etapa]
 
                 if arquivo.endswith('.json'):
-                    with open(arquivo, 'r', encoding='utf-8') as f:
-                        dados = json.load(f)
+                    dados = session_archive.read_json(arquivo)
                     return {"status": "sucesso", "dados": dados}
                 else:
-                    with open(arquivo, 'r', encoding='utf-8') as f:
-                        dados = f.read()
+                    dados = session_archive.read_text(arquivo)
                     return {"status": "sucesso", "dados": dados}
 
             return {"status": "erro", "mensagem": "Etapa não encontrada"}
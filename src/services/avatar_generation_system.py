@@ -11,6 +11,7 @@ from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, asdict
 from datetime import datetime, date
 import logging
+import contextlib
 # from enhanced_api_rotation_manager import get_api_manager # Assumindo que este módulo existe
 
 # --- SIMULAÇÃO DO API MANAGER PARA TESTE ---
@@ -69,6 +70,8 @@ class MockAPIManager:
         return MockAPI()
     def get_fallback_model(self, model_name: str):
         return None, MockAPI()
+    def measure(self, api):
+        return contextlib.nullcontext(api)
 
 def get_api_manager():
     """Retorna o gerenciador de APIs (simulado ou real)."""
@@ -733,7 +736,8 @@ class AvatarGenerationSystem:
         """
         try:
             # Chama o método `generate` da instância da API (MockAPI ou real)
-            response = await api.generate(prompt, max_tokens=2048, temperature=0.7)
+            with self.api_manager.measure(api):
+                response = await api.generate(prompt, max_tokens=2048, temperature=0.7)
             return response.strip()
         except Exception as e:
             logger.error(f"❌ Erro na geração com IA: {e}")
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Circuit Breaker
+Disjuntores por provedor (fechado, aberto, meio-aberto) compartilhados por todo o processo:
+falhas seguidas abrem o circuito, chamadas falham na hora enquanto ele está aberto e,
+após o tempo de recuperação, um número limitado de sondas decide se ele fecha de novo
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+from services.provider_router import provider_router
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Chamada recusada porque o circuito do provedor está aberto"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuito {name} aberto (nova tentativa em {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+# Padrões globais e por provedor; o ambiente (CIRCUIT_<OPÇÃO> e CIRCUIT_<PROVEDOR>_<OPÇÃO>) tem precedência
+DEFAULTS = {
+    'failure_threshold': 5,
+    'recovery_timeout': 30.0,
+    'max_recovery_timeout': 300.0,
+    'half_open_max_calls': 1,
+    'success_threshold': 1
+}
+PROVIDER_DEFAULTS = {
+    'gemini': {'failure_threshold': 5},
+    'openai': {'failure_threshold': 3},
+    'groq': {'failure_threshold': 3}
+}
+
+
+def _config(name: str, option: str) -> float:
+    """Resolve uma opção do disjuntor: CIRCUIT_<PROVEDOR>_<OPÇÃO>, CIRCUIT_<OPÇÃO>, padrão do provedor, padrão global"""
+    provider = name.split(':', 1)[0].lower()
+    key = ''.join(char if char.isalnum() else '_' for char in provider.upper())
+    value = os.getenv(f"CIRCUIT_{key}_{option.upper()}") or os.getenv(f"CIRCUIT_{option.upper()}")
+    if value:
+        return float(value)
+    return PROVIDER_DEFAULTS.get(provider, {}).get(option, DEFAULTS[option])
+
+
+class CircuitBreaker:
+    """Disjuntor de um provedor com sondagem limitada no estado meio-aberto"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.failure_threshold = int(_config(name, 'failure_threshold'))
+        self.base_recovery_timeout = _config(name, 'recovery_timeout')
+        self.max_recovery_timeout = _config(name, 'max_recovery_timeout')
+        self.half_open_max_calls = int(_config(name, 'half_open_max_calls'))
+        self.success_threshold = int(_config(name, 'success_threshold'))
+
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.half_open_successes = 0
+        self.recovery_timeout = self.base_recovery_timeout
+        self.opened_at = 0.0
+        self._probes: list = []  # início das sondas em andamento no meio-aberto
+        self.stats = {'calls': 0, 'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+        self.last_error: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # Transições
+    # ------------------------------------------------------------------
+
+    def _refresh(self, now: float):
+        """Aberto → meio-aberto após o tempo de recuperação; libera sondas sem resposta"""
+        if self.state == OPEN and now - self.opened_at >= self.recovery_timeout:
+            self.state = HALF_OPEN
+            self.half_open_successes = 0
+            self._probes = []
+            logger.info(f"🟡 Circuito {self.name} meio-aberto: liberando até {self.half_open_max_calls} sonda(s)")
+        if self.state == HALF_OPEN:
+            self._probes = [started for started in self._probes if now - started < self.recovery_timeout]
+
+    def _open(self, now: float, reason: str):
+        if self.state == HALF_OPEN:
+            # Sonda falhou: o provedor ainda não voltou, espera mais antes da próxima
+            self.recovery_timeout = min(self.max_recovery_timeout, self.recovery_timeout * 2)
+        self.state = OPEN
+        self.opened_at = now
+        self._probes = []
+        self.stats['opened'] += 1
+        logger.warning(f"🔴 Circuito {self.name} aberto por {self.recovery_timeout:.0f}s ({reason})")
+
+    def available(self) -> bool:
+        """Consulta sem reservar: o circuito aceitaria uma chamada agora?"""
+        with self._lock:
+            self._refresh(time.time())
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN:
+                return len(self._probes) < self.half_open_max_calls
+            return False
+
+    def allow(self) -> bool:
+        """Reserva uma chamada; no meio-aberto ocupa uma das vagas de sonda"""
+        with self._lock:
+            now = time.time()
+            self._refresh(now)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and len(self._probes) < self.half_open_max_calls:
+                self._probes.append(now)
+                return True
+            self.stats['rejected'] += 1
+            return False
+
+    def release(self):
+        """Devolve a vaga de sonda reservada por allow() sem registrar resultado (chamada não feita)"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes:
+                self._probes.pop(0)
+
+    def retry_in(self) -> float:
+        with self._lock:
+            return max(0.0, self.opened_at + self.recovery_timeout - time.time()) if self.state == OPEN else 0.0
+
+    def record_success(self):
+        with self._lock:
+            self.stats['calls'] += 1
+            self.stats['successes'] += 1
+            self.consecutive_failures = 0
+            if self.state == HALF_OPEN:
+                if self._probes:
+                    self._probes.pop(0)
+                self.half_open_successes += 1
+                if self.half_open_successes >= self.success_threshold:
+                    self.state = CLOSED
+                    self.recovery_timeout = self.base_recovery_timeout
+                    logger.info(f"🟢 Circuito {self.name} fechado: provedor recuperado")
+
+    def record_failure(self, error: Optional[Any] = None):
+        with self._lock:
+            now = time.time()
+            self.stats['calls'] += 1
+            self.stats['failures'] += 1
+            self.consecutive_failures += 1
+            self.last_error = str(error)[:200] if error else None
+            if self.state == HALF_OPEN:
+                self._open(now, f"sonda falhou: {self.last_error}")
+            elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._open(now, f"{self.consecutive_failures} falhas seguidas")
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.recovery_timeout = self.base_recovery_timeout
+            self._probes = []
+
+    # ------------------------------------------------------------------
+    # Execução protegida
+    # ------------------------------------------------------------------
+
+    def call(self, func: Callable[[], Any]) -> Any:
+        """Executa func protegida pelo circuito (CircuitOpenError se aberto)"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+        try:
+            result = func()
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Versão assíncrona de call (func é uma fábrica de corrotina)"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+        try:
+            result = await func()
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh(time.time())
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'recovery_timeout': self.recovery_timeout,
+                'retry_in': round(max(0.0, self.opened_at + self.recovery_timeout - time.time()), 1)
+                if self.state == OPEN else 0.0,
+                'probes_in_flight': len(self._probes),
+                'half_open_max_calls': self.half_open_max_calls,
+                'last_error': self.last_error,
+                **self.stats
+            }
+
+
+class CircuitBreakerRegistry:
+    """Registro único de disjuntores do processo (mesmo nome → mesmo disjuntor)"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        """Obtém (ou cria) o disjuntor; limites sempre resolvidos pelo nome do provedor"""
+        name = name.lower()
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name)
+                self._breakers[name] = breaker
+            return breaker
+
+    def for_key(self, provider: str, api_key: str) -> CircuitBreaker:
+        """Disjuntor da chave de um provedor; o mesmo para todo gerenciador que usa a chave"""
+        return self.get(f"{provider}:{provider_router.key_id(api_key)}")
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.get_status() for breaker in breakers}
+
+    def reset(self, name: Optional[str] = None):
+        """Fecha um disjuntor (ou todos) manualmente"""
+        with self._lock:
+            if name:
+                breakers = [self._breakers[name.lower()]] if name.lower() in self._breakers else []
+            else:
+                breakers = list(self._breakers.values())
+        for breaker in breakers:
+            breaker.reset()
+
+
+# Instância global
+circuit_breakers = CircuitBreakerRegistry()
@@ -5,13 +5,54 @@ ARQV30 Enhanced v2.0 - Content Quality Validator
 Validador de qualidade de conteúdo extraído
 """
 
+import os
 import logging
 import re
-from typing import Dict, Any, List, Optional
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
+
 logger = logging.getLogger(__name__)
 
+_NUMBER_RE = re.compile(r'\d+(?:\.\d+)?%?')
+_MONEY_RE = re.compile(r'R\$\s*[\d,\.]+')
+
+
+class PhraseMatcher:
+    """Casamento simultâneo de várias frases em uma única passada (Aho-Corasick)"""
+
+    def __init__(self, phrases: List[str]):
+        self.order = {phrase: i for i, phrase in enumerate(phrases)}
+        if HAS_AHOCORASICK:
+            self._automaton = ahocorasick.Automaton()
+            for phrase in phrases:
+                self._automaton.add_word(phrase, phrase)
+            self._automaton.make_automaton()
+            self._regex = None
+        else:
+            self._regex = re.compile('|'.join(re.escape(p) for p in sorted(phrases, key=len, reverse=True)))
+
+    def find_all(self, text: str) -> List[str]:
+        """Retorna frases encontradas, na ordem em que foram cadastradas"""
+        if self._regex is None:
+            found = {phrase for _, phrase in self._automaton.iter(text)}
+            return sorted(found, key=self.order.__getitem__)
+
+        # Sem autômato: uma varredura decide o caso comum (nenhuma ocorrência);
+        # havendo ocorrência, resolve frases sobrepostas com busca exata
+        if not self._regex.search(text):
+            return []
+        return [phrase for phrase in self.order if phrase in text]
+
+
 class ContentQualityValidator:
     """Validador de qualidade de conteúdo"""
     
@@ -56,7 +97,27 @@ class ContentQualityValidator:
             'empresa', 'negócio', 'investimento', 'receita', 'lucro'
         ]
         
-        logger.info("Content Quality Validator inicializado")
+        # Palavras comuns em português
+        self.portuguese_words = [
+            'que', 'não', 'uma', 'para', 'com', 'mais', 'como',
+            'mas', 'foi', 'pelo', 'pela', 'até', 'isso', 'ela',
+            'entre', 'depois', 'sem', 'mesmo', 'aos', 'seus',
+            'quem', 'nas', 'me', 'esse', 'eles', 'você', 'tinha',
+            'foram', 'essa', 'num', 'nem', 'suas', 'meu', 'às',
+            'minha', 'numa', 'pelos', 'elas', 'qual', 'nós', 'deles'
+        ]
+        
+        # Vocabulários compilados: pertinência O(1) e frases em passada única
+        self._navigation_set = frozenset(self.navigation_words)
+        self._quality_set = frozenset(self.quality_indicators)
+        self._portuguese_set = frozenset(self.portuguese_words)
+        self._error_matcher = PhraseMatcher(self.error_indicators)
+        
+        self.batch_workers = int(os.getenv('QUALITY_VALIDATOR_WORKERS', str(os.cpu_count() or 1)))
+        self.parallel_batch_threshold = int(os.getenv('QUALITY_VALIDATOR_PARALLEL_THRESHOLD', '200'))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        
+        logger.info(f"Content Quality Validator inicializado (Aho-Corasick {'ativo' if HAS_AHOCORASICK else 'via regex'})")
     
     def validate_content(self, content: str, url: str = "", context: Dict[str, Any] = None) -> Dict[str, Any]:
         """Valida qualidade do conteúdo extraído"""
@@ -69,15 +130,17 @@ class ContentQualityValidator:
                 'details': {}
             }
         
-        # Executa todas as validações
+        # Uma única passada extrai as features usadas por todas as verificações
+        features = self._extract_features(content, context or {})
+        
         validations = {
-            'length_check': self._check_content_length(content),
-            'error_page_check': self._check_error_page(content),
-            'navigation_ratio_check': self._check_navigation_ratio(content),
-            'information_density_check': self._check_information_density(content),
-            'language_check': self._check_language(content),
-            'structure_check': self._check_content_structure(content),
-            'relevance_check': self._check_relevance(content, context or {})
+            'length_check': self._check_content_length(features),
+            'error_page_check': self._check_error_page(features),
+            'navigation_ratio_check': self._check_navigation_ratio(features),
+            'information_density_check': self._check_information_density(features),
+            'language_check': self._check_language(features),
+            'structure_check': self._check_content_structure(features),
+            'relevance_check': self._check_relevance(features, context or {})
         }
         
         # Calcula score geral
@@ -105,14 +168,49 @@ class ContentQualityValidator:
             'score': round(final_score, 2),
             'reason': main_reason,
             'details': validations,
-            'content_stats': self._get_content_stats(content),
+            'content_stats': self._get_content_stats(features),
             'url': url,
             'validated_at': datetime.now().isoformat()
         }
     
-    def _check_content_length(self, content: str) -> Dict[str, Any]:
+    def _extract_features(self, content: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Extrai vetor de features do conteúdo em uma única tokenização"""
+        content_lower = content.lower()
+        words = content_lower.split()
+        
+        # Contagem em C (Counter) e soma apenas sobre os vocabulários
+        word_counts = Counter(words)
+        navigation_count = sum(word_counts[w] for w in self._navigation_set if w in word_counts)
+        quality_count = sum(word_counts[w] for w in self._quality_set if w in word_counts)
+        portuguese_count = sum(word_counts[w] for w in self._portuguese_set if w in word_counts)
+        
+        lines = content.split('\n')
+        paragraph_count = sum(1 for line in lines if len(line.strip()) > 50)
+        
+        # Termos do contexto (segmento, produto, público)
+        relevance_score = 0
+        for key in ('segmento', 'produto', 'publico'):
+            term = str(context[key]).lower() if context.get(key) else ''
+            if term and len(term) > 2:
+                relevance_score += content_lower.count(term) * 10
+        
+        return {
+            'length': len(content),
+            'word_count': len(words),
+            'navigation_count': navigation_count,
+            'quality_count': quality_count,
+            'portuguese_count': portuguese_count,
+            'error_matches': self._error_matcher.find_all(content_lower),
+            'line_count': len(lines),
+            'paragraph_count': paragraph_count,
+            'number_count': len(_NUMBER_RE.findall(content)),
+            'money_value_count': len(_MONEY_RE.findall(content)),
+            'relevance_score': relevance_score
+        }
+    
+    def _check_content_length(self, features: Dict[str, Any]) -> Dict[str, Any]:
         """Verifica comprimento do conteúdo"""
-        length = len(content)
+        length = features['length']
         
         if length >= self.min_content_length:
             score = min(100, (length / 2000) * 100)  # Score baseado em 2000 chars como ideal
@@ -133,14 +231,9 @@ class ContentQualityValidator:
                 'value': length
             }
     
-    def _check_error_page(self, content: str) -> Dict[str, Any]:
+    def _check_error_page(self, features: Dict[str, Any]) -> Dict[str, Any]:
         """Verifica se é página de erro"""
-        content_lower = content.lower()
-        
-        found_errors = []
-        for indicator in self.error_indicators:
-            if indicator in content_lower:
-                found_errors.append(indicator)
+        found_errors = features['error_matches']
         
         if found_errors:
             return {
@@ -159,11 +252,11 @@ class ContentQualityValidator:
                 'value': []
             }
     
-    def _check_navigation_ratio(self, content: str) -> Dict[str, Any]:
+    def _check_navigation_ratio(self, features: Dict[str, Any]) -> Dict[str, Any]:
         """Verifica proporção de palavras de navegação"""
-        words = content.lower().split()
+        word_count = features['word_count']
         
-        if len(words) == 0:
+        if word_count == 0:
             return {
                 'passed': False,
                 'score': 0,
@@ -172,8 +265,7 @@ class ContentQualityValidator:
                 'value': 0
             }
         
-        navigation_count = sum(1 for word in words if word in self.navigation_words)
-        navigation_ratio = navigation_count / len(words)
+        navigation_ratio = features['navigation_count'] / word_count
         
         if navigation_ratio <= self.max_navigation_ratio:
             score = (1 - navigation_ratio) * 100
@@ -194,11 +286,11 @@ class ContentQualityValidator:
                 'value': navigation_ratio
             }
     
-    def _check_information_density(self, content: str) -> Dict[str, Any]:
+    def _check_information_density(self, features: Dict[str, Any]) -> Dict[str, Any]:
         """Verifica densidade de informação"""
-        words = content.lower().split()
+        word_count = features['word_count']
         
-        if len(words) == 0:
+        if word_count == 0:
             return {
                 'passed': False,
                 'score': 0,
@@ -207,9 +299,8 @@ class ContentQualityValidator:
                 'value': 0
             }
         
-        # Conta palavras informativas
-        info_count = sum(1 for word in words if word in self.quality_indicators)
-        info_density = info_count / len(words)
+        # Proporção de palavras informativas
+        info_density = features['quality_count'] / word_count
         
         if info_density >= self.min_information_density:
             score = min(100, info_density * 1000)  # Amplifica score
@@ -230,21 +321,11 @@ class ContentQualityValidator:
                 'value': info_density
             }
     
-    def _check_language(self, content: str) -> Dict[str, Any]:
+    def _check_language(self, features: Dict[str, Any]) -> Dict[str, Any]:
         """Verifica se o conteúdo está em português"""
-        # Palavras comuns em português
-        portuguese_words = [
-            'que', 'não', 'uma', 'para', 'com', 'mais', 'como',
-            'mas', 'foi', 'pelo', 'pela', 'até', 'isso', 'ela',
-            'entre', 'depois', 'sem', 'mesmo', 'aos', 'seus',
-            'quem', 'nas', 'me', 'esse', 'eles', 'você', 'tinha',
-            'foram', 'essa', 'num', 'nem', 'suas', 'meu', 'às',
-            'minha', 'numa', 'pelos', 'elas', 'qual', 'nós', 'deles'
-        ]
-        
-        words = content.lower().split()
+        word_count = features['word_count']
         
-        if len(words) == 0:
+        if word_count == 0:
             return {
                 'passed': False,
                 'score': 0,
@@ -253,8 +334,7 @@ class ContentQualityValidator:
                 'value': 0
             }
         
-        portuguese_count = sum(1 for word in words if word in portuguese_words)
-        portuguese_ratio = portuguese_count / len(words)
+        portuguese_ratio = features['portuguese_count'] / word_count
         
         if portuguese_ratio >= 0.05:  # Pelo menos 5% de palavras em português
             score = min(100, portuguese_ratio * 500)
@@ -274,32 +354,31 @@ class ContentQualityValidator:
                 'value': portuguese_ratio
             }
     
-    def _check_content_structure(self, content: str) -> Dict[str, Any]:
+    def _check_content_structure(self, features: Dict[str, Any]) -> Dict[str, Any]:
         """Verifica estrutura do conteúdo"""
-        lines = content.split('\n')
-        paragraphs = [line.strip() for line in lines if len(line.strip()) > 50]
+        paragraph_count = features['paragraph_count']
         
         # Verifica se tem parágrafos substanciais
-        if len(paragraphs) >= 3:
-            score = min(100, len(paragraphs) * 10)
+        if paragraph_count >= 3:
+            score = min(100, paragraph_count * 10)
             return {
                 'passed': True,
                 'score': score,
                 'weight': 10,
-                'message': f'Boa estrutura: {len(paragraphs)} parágrafos',
-                'value': len(paragraphs)
+                'message': f'Boa estrutura: {paragraph_count} parágrafos',
+                'value': paragraph_count
             }
         else:
-            score = len(paragraphs) * 33
+            score = paragraph_count * 33
             return {
                 'passed': False,
                 'score': score,
                 'weight': 10,
-                'message': f'Estrutura pobre: {len(paragraphs)} parágrafos',
-                'value': len(paragraphs)
+                'message': f'Estrutura pobre: {paragraph_count} parágrafos',
+                'value': paragraph_count
             }
     
-    def _check_relevance(self, content: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    def _check_relevance(self, features: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
         """Verifica relevância do conteúdo para o contexto"""
         if not context:
             return {
@@ -310,26 +389,7 @@ class ContentQualityValidator:
                 'value': 0
             }
         
-        content_lower = content.lower()
-        relevance_score = 0
-        
-        # Verifica termos do contexto
-        context_terms = []
-        
-        if context.get('segmento'):
-            context_terms.append(str(context['segmento']).lower())
-        
-        if context.get('produto'):
-            context_terms.append(str(context['produto']).lower())
-        
-        if context.get('publico'):
-            context_terms.append(str(context['publico']).lower())
-        
-        # Conta ocorrências dos termos
-        for term in context_terms:
-            if term and len(term) > 2:
-                occurrences = content_lower.count(term)
-                relevance_score += occurrences * 10
+        relevance_score = features['relevance_score']
         
         # Normaliza score
         normalized_score = min(100, relevance_score)
@@ -351,40 +411,55 @@ class ContentQualityValidator:
                 'value': relevance_score
             }
     
-    def _get_content_stats(self, content: str) -> Dict[str, Any]:
+    def _get_content_stats(self, features: Dict[str, Any]) -> Dict[str, Any]:
         """Obtém estatísticas do conteúdo"""
-        words = content.split()
-        lines = content.split('\n')
-        paragraphs = [line.strip() for line in lines if len(line.strip()) > 50]
-        
-        # Conta números e percentuais
-        numbers = re.findall(r'\d+(?:\.\d+)?%?', content)
-        
-        # Conta valores monetários
-        money_values = re.findall(r'R\$\s*[\d,\.]+', content)
+        word_count = features['word_count']
+        paragraph_count = features['paragraph_count']
         
         return {
-            'character_count': len(content),
-            'word_count': len(words),
-            'line_count': len(lines),
-            'paragraph_count': len(paragraphs),
-            'number_count': len(numbers),
-            'money_value_count': len(money_values),
-            'avg_words_per_paragraph': len(words) / max(len(paragraphs), 1),
-            'avg_chars_per_word': len(content) / max(len(words), 1)
+            'character_count': features['length'],
+            'word_count': word_count,
+            'line_count': features['line_count'],
+            'paragraph_count': paragraph_count,
+            'number_count': features['number_count'],
+            'money_value_count': features['money_value_count'],
+            'avg_words_per_paragraph': word_count / max(paragraph_count, 1),
+            'avg_chars_per_word': features['length'] / max(word_count, 1)
         }
     
-    def validate_batch(self, content_list: List[Dict[str, Any]], context: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Valida múltiplos conteúdos em lote"""
-        results = []
-        
-        for i, content_item in enumerate(content_list):
-            content = content_item.get('content', '')
-            url = content_item.get('url', f'item_{i}')
-            
-            validation = self.validate_content(content, url, context)
+    def validate_batch(
+        self,
+        content_list: List[Dict[str, Any]],
+        context: Dict[str, Any] = None,
+        parallel: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """Valida múltiplos conteúdos em lote (em pool de processos para lotes grandes)"""
+        items = [
+            (item.get('content', ''), item.get('url', f'item_{i}'))
+            for i, item in enumerate(content_list)
+        ]
+        
+        if parallel is None:
+            parallel = self.batch_workers > 1 and len(items) >= self.parallel_batch_threshold
+        
+        results = None
+        if parallel:
+            try:
+                chunksize = max(1, len(items) // (self.batch_workers * 4))
+                results = list(self._get_executor().map(
+                    _validate_item, items, [context] * len(items), chunksize=chunksize
+                ))
+            except Exception as e:
+                logger.warning(f"⚠️ Validação em paralelo falhou, usando modo sequencial: {e}")
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = None
+        
+        if results is None:
+            results = [self.validate_content(content, url, context) for content, url in items]
+        
+        for i, validation in enumerate(results):
             validation['item_index'] = i
-            results.append(validation)
         
         # Estatísticas do lote
         valid_count = sum(1 for r in results if r['valid'])
@@ -438,5 +513,19 @@ class ContentQualityValidator:
         
         return '\n'.join(report)
 
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Pool de processos reaproveitado entre lotes"""
+        if self._executor is None:
+            # spawn, como a fila de jobs: fork de processo com threads (servidor web) pode herdar travas presas
+            self._executor = ProcessPoolExecutor(max_workers=self.batch_workers, mp_context=get_context('spawn'))
+        return self._executor
+
+
+def _validate_item(item: Tuple[str, str], context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Valida um item no processo worker usando a instância global do módulo"""
+    content, url = item
+    return content_quality_validator.validate_content(content, url, context)
+
+
 # Instância global
 content_quality_validator = ContentQualityValidator()
\ No newline at end of file
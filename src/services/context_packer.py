@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Context Packer
+Seleção de contexto por relevância (BM25) com orçamento de tokens por modelo
+"""
+
+import os
+import re
+import math
+import logging
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple
+
+from services.url_canonicalizer import NearDuplicateFilter
+
+logger = logging.getLogger(__name__)
+
+# Orçamento de tokens de contexto (dados) por modelo; reserva espaço para prompt e resposta
+MODEL_CONTEXT_BUDGETS = {
+    'gemini': 60000,
+    'gpt-4o': 40000,
+    'gpt-4': 24000,
+    'qwen': 20000,
+    'llama3-70b-8192': 3500,
+    'llama': 6000,
+    'default': 12000
+}
+
+STOPWORDS = frozenset("""
+a o os as um uma uns umas de do da dos das em no na nos nas por para pelo pela pelos pelas com sem
+e ou que se mais menos como mas ao aos à às é são ser foi era está estão ter tem têm há isso isto
+este esta estes estas esse essa esses essas seu sua seus suas nosso nossa não sim já também muito
+the of and to in for on with is are was be by at from this that it as an or
+""".split())
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa rápida de tokens (~4 caracteres por token)"""
+    return max(1, math.ceil(len(text) / 4)) if text else 0
+
+
+def get_model_budget(model: Optional[str]) -> int:
+    """Retorna orçamento de tokens de contexto para o modelo alvo"""
+    override = os.getenv('SYNTHESIS_CONTEXT_TOKENS')
+    if override:
+        return int(override)
+
+    model = (model or '').lower()
+    for key in sorted(MODEL_CONTEXT_BUDGETS, key=len, reverse=True):
+        if key != 'default' and key in model:
+            return MODEL_CONTEXT_BUDGETS[key]
+    return MODEL_CONTEXT_BUDGETS['default']
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokeniza para pontuação, removendo stopwords e tokens curtos"""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 2 and t not in STOPWORDS]
+
+
+def chunk_text(text: str, max_chars: int = 1200) -> List[str]:
+    """Divide texto em blocos por parágrafos/frases respeitando tamanho máximo"""
+    text = (text or '').strip()
+    if not text:
+        return []
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks = []
+    current = ''
+    for paragraph in _PARAGRAPH_RE.split(text):
+        pieces = [paragraph] if len(paragraph) <= max_chars else _SENTENCE_RE.split(paragraph)
+        for piece in pieces:
+            while len(piece) > max_chars:
+                if current:
+                    chunks.append(current)
+                    current = ''
+                chunks.append(piece[:max_chars])
+                piece = piece[max_chars:]
+            if len(current) + len(piece) + 1 > max_chars and current:
+                chunks.append(current)
+                current = ''
+            current = f"{current} {piece}".strip() if current else piece.strip()
+    if current:
+        chunks.append(current)
+    return [c for c in chunks if c.strip()]
+
+
+class BM25Scorer:
+    """Pontuação BM25 de blocos contra uma query"""
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_freqs = [Counter(doc) for doc in documents]
+        self.doc_lengths = [len(doc) for doc in documents]
+        self.avg_length = (sum(self.doc_lengths) / len(documents)) if documents else 0.0
+
+        df = Counter()
+        for doc in documents:
+            df.update(set(doc))
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    def score(self, query_terms: List[str], index: int) -> float:
+        freqs = self.doc_freqs[index]
+        length = self.doc_lengths[index]
+        norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+        total = 0.0
+        for term in query_terms:
+            tf = freqs.get(term, 0)
+            if tf:
+                total += self.idf.get(term, 0.0) * tf * (self.k1 + 1) / (tf + norm)
+        return total
+
+
+class ContextPacker:
+    """Empacota o corpus consolidado no orçamento de tokens priorizando relevância"""
+
+    def __init__(self, chunk_chars: int = 1200, max_chunks_per_source: int = 3):
+        self.chunk_chars = chunk_chars
+        self.max_chunks_per_source = max_chunks_per_source
+
+    def pack(
+        self,
+        sections: Dict[str, List[str]],
+        query: str,
+        budget_tokens: int
+    ) -> Tuple[Dict[str, List[str]], Dict[str, Any]]:
+        """
+        Seleciona blocos mais relevantes de cada seção até o orçamento
+
+        Args:
+            sections: Textos por categoria (ex.: {'search_content': [...], 'viral_content': [...]})
+            query: Query de relevância (segmento, produto, público)
+            budget_tokens: Orçamento de tokens para o contexto
+
+        Returns:
+            Tuple[Dict, Dict]: Blocos selecionados por categoria e relatório do que foi incluído
+        """
+        candidates = []
+        for category, texts in sections.items():
+            for source_index, text in enumerate(texts or []):
+                for chunk_index, chunk in enumerate(chunk_text(str(text), self.chunk_chars)):
+                    candidates.append({
+                        'category': category,
+                        'source': source_index,
+                        'chunk': chunk_index,
+                        'text': chunk,
+                        'tokens': estimate_tokens(chunk)
+                    })
+
+        report = {
+            'budget_tokens': budget_tokens,
+            'candidate_chunks': len(candidates),
+            'included_chunks': 0,
+            'included_tokens': 0,
+            'dropped_duplicates': 0,
+            'dropped_over_budget': 0,
+            'corpus_tokens': sum(c['tokens'] for c in candidates),
+            'by_category': {},
+            'included': []
+        }
+        if not candidates:
+            return {}, report
+
+        query_terms = tokenize(query)
+        scorer = BM25Scorer([tokenize(c['text']) for c in candidates])
+        for index, candidate in enumerate(candidates):
+            # Pequeno bônus para o início de cada fonte (título/lead costuma ser mais informativo)
+            candidate['score'] = scorer.score(query_terms, index) + (0.1 if candidate['chunk'] == 0 else 0.0)
+
+        ranked = sorted(candidates, key=lambda c: c['score'], reverse=True)
+        dedup = NearDuplicateFilter(min_length=80)
+        per_source = Counter()
+        selected = []
+        used_tokens = 0
+        deferred = []
+
+        for candidate in ranked:
+            if dedup.is_duplicate(candidate['text']):
+                report['dropped_duplicates'] += 1
+                continue
+            # Limita blocos por fonte na primeira passada para aumentar cobertura
+            source_key = (candidate['category'], candidate['source'])
+            if per_source[source_key] >= self.max_chunks_per_source:
+                deferred.append(candidate)
+                continue
+            if used_tokens + candidate['tokens'] > budget_tokens:
+                report['dropped_over_budget'] += 1
+                continue
+            selected.append(candidate)
+            per_source[source_key] += 1
+            used_tokens += candidate['tokens']
+
+        for candidate in deferred:
+            if used_tokens + candidate['tokens'] > budget_tokens:
+                report['dropped_over_budget'] += 1
+                continue
+            selected.append(candidate)
+            used_tokens += candidate['tokens']
+
+        # Ordem de leitura: categoria, fonte e posição original
+        category_order = {name: i for i, name in enumerate(sections)}
+        selected.sort(key=lambda c: (category_order[c['category']], c['source'], c['chunk']))
+
+        packed = {}
+        for candidate in selected:
+            packed.setdefault(candidate['category'], []).append(candidate)
+            stats = report['by_category'].setdefault(candidate['category'], {'chunks': 0, 'tokens': 0, 'sources': set()})
+            stats['chunks'] += 1
+            stats['tokens'] += candidate['tokens']
+            stats['sources'].add(candidate['source'])
+            report['included'].append({
+                'category': candidate['category'],
+                'source': candidate['source'],
+                'chunk': candidate['chunk'],
+                'score': round(candidate['score'], 3),
+                'tokens': candidate['tokens']
+            })
+
+        for stats in report['by_category'].values():
+            stats['sources'] = len(stats['sources'])
+
+        report['included_chunks'] = len(selected)
+        report['included_tokens'] = used_tokens
+
+        parts = {name: [c['text'] for c in chunks] for name, chunks in packed.items()}
+        return parts, report
+
+
+# Instância global
+context_packer = ContextPacker()
@@ -686,6 +686,8 @@ class CPLDevastadorProtocol:
         try:
             # Implementar chamada para API específica
             # Por enquanto, retorna um exemplo
+            # Sem chamada real ao provedor: devolve a reserva da chave sem registrar resultado
+            self.api_manager.release(api)
             return '{"exemplo": "dados"}'
         except Exception as e:
             logger.error(f"❌ Erro na geração com IA: {e}")
@@ -545,6 +545,8 @@ class DeepAIAnalysisEngine:
         try:
             # Implementar chamada real para API
             # Por enquanto retorna exemplo
+            # Sem chamada real ao provedor: devolve a reserva da chave sem registrar resultado
+            self.api_manager.release(api)
             return '{"expert_conclusions": [{"conclusion": "Exemplo", "evidence": "Dados", "implication": "Estratégia", "confidence": 0.9}]}'
         except Exception as e:
             logger.error(f"❌ Erro na geração: {e}")
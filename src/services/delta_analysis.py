@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Delta Analysis Manager
+Reanálise incremental de nichos repetidos: compara a coleta com a execução anterior
+do mesmo nicho (URL + hash de conteúdo) e reaproveita extrações, sínteses e módulos
+cujas entradas não mudaram
+"""
+
+import os
+import re
+import json
+import uuid
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable, Awaitable, Iterable
+
+from services.file_lock import FileLock
+from services.url_canonicalizer import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+# Campos que identificam o conteúdo de um item coletado (o primeiro presente compõe o hash)
+CONTENT_FIELDS = ('title', 'snippet', 'description', 'content', 'text', 'caption')
+
+
+class DeltaAnalysisManager:
+    """Armazena por nicho o manifesto da última coleta e as unidades geradas, endereçadas pelo hash das entradas"""
+
+    def __init__(self):
+        """Inicializa o gerenciador de análise incremental"""
+        self.enabled = os.getenv('DELTA_MODE', 'true').lower() == 'true'
+        self.base_path = os.getenv('DELTA_DIR', 'sessions_data/delta')
+        # Leituras-modificações-escritas de índices e registros: web e workers da fila são processos distintos
+        self._lock = FileLock(f"{self.base_path}/.lock")
+        os.makedirs(f"{self.base_path}/sessions", exist_ok=True)
+
+        logger.info(f"♻️ Delta Analysis Manager inicializado (habilitado: {self.enabled})")
+
+    # ------------------------------------------------------------------
+    # Hashes e manifesto
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def content_hash(value: Any) -> str:
+        """Hash estável de texto ou estrutura serializável"""
+        if not isinstance(value, str):
+            value = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def niche_key(context: Dict[str, Any]) -> str:
+        """Identificador do nicho: segmento/nicho, produto e público normalizados"""
+        parts = [
+            context.get('segmento') or context.get('nicho') or '',
+            context.get('produto') or '',
+            context.get('publico') or ''
+        ]
+        normalized = '|'.join(re.sub(r'\s+', ' ', str(part)).strip().lower() for part in parts)
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+    def build_manifest(self, items: Iterable[Any]) -> Dict[str, str]:
+        """Mapa URL canônica -> hash do conteúdo; itens sem URL entram pelo próprio hash"""
+        manifest = {}
+        for item in items:
+            if not isinstance(item, dict):
+                item = {'content': item}
+            body = {field: item[field] for field in CONTENT_FIELDS if item.get(field)}
+            url = item.get('url') or item.get('link') or item.get('post_url')
+            digest = self.content_hash(body or item)
+            if url:
+                manifest[canonicalize_url(url)] = digest
+            else:
+                manifest[f"content:{digest[:20]}"] = digest
+        return manifest
+
+    # ------------------------------------------------------------------
+    # Registro de sessões
+    # ------------------------------------------------------------------
+
+    def _niche_dir(self, niche: str, kind: Optional[str] = None) -> str:
+        for part in (niche, kind):
+            if part is not None and not re.fullmatch(r'[\w\-]+', part):
+                raise ValueError(f"Identificador inválido para delta: {part!r}")
+        base = f"{self.base_path}/niches/{niche}"
+        return f"{base}/{kind}" if kind else base
+
+    def _session_file(self, session_id: str) -> str:
+        if not re.fullmatch(r'[\w\-]+', session_id or ''):
+            raise ValueError(f"session_id inválido para delta: {session_id!r}")
+        return f"{self.base_path}/sessions/{session_id}.json"
+
+    def _read_json(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ Arquivo delta ilegível {path}: {e}")
+            return None
+
+    def _write_json(self, path: str, data: Dict[str, Any]):
+        """Escrita atômica (leitores nunca veem arquivo parcial); atualizações seguram self._lock"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_file = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp_file, path)
+
+    def register_session(self, session_id: str, context: Dict[str, Any], enabled: bool = True) -> Optional[Dict[str, Any]]:
+        """Associa a sessão ao nicho (idempotente: reexecuções da mesma sessão mantêm o registro)"""
+        if not session_id:
+            return None
+        try:
+            session_file = self._session_file(session_id)
+            with self._lock:
+                record = self._read_json(session_file)
+                if record is None:
+                    niche = self.niche_key(context)
+                    index = self._read_json(f"{self._niche_dir(niche)}/index.json") or {}
+                    record = {
+                        "session_id": session_id,
+                        "niche_key": niche,
+                        "enabled": bool(enabled and self.enabled),
+                        "previous_session_id": index.get('last_session_id'),
+                        "registered_at": datetime.now().isoformat(),
+                        "collection": None,
+                        "reused": {},
+                        "recomputed": {}
+                    }
+                    self._write_json(session_file, record)
+                    if record['enabled'] and record['previous_session_id']:
+                        logger.info(f"♻️ Modo delta: sessão {session_id} comparada com {record['previous_session_id']}")
+            return record
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao registrar sessão no modo delta: {e}")
+            return None
+
+    def _session_record(self, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Registro da sessão se o modo delta estiver ativo para ela"""
+        if not self.enabled or not session_id:
+            return None
+        try:
+            record = self._read_json(self._session_file(session_id))
+        except ValueError:
+            return None
+        return record if record and record.get('enabled') else None
+
+    def _update_session(self, session_id: str, update: Callable[[Dict[str, Any]], None]):
+        with self._lock:
+            session_file = self._session_file(session_id)
+            record = self._read_json(session_file)
+            if record is None:
+                return
+            update(record)
+            self._write_json(session_file, record)
+
+    # ------------------------------------------------------------------
+    # Diferença da coleta
+    # ------------------------------------------------------------------
+
+    def record_collection(self, session_id: str, items: Iterable[Any]) -> Optional[Dict[str, Any]]:
+        """Compara a coleta com a última do nicho e passa a usá-la como referência"""
+        record = self._session_record(session_id)
+        if record is None:
+            return None
+        try:
+            niche = record['niche_key']
+            manifest = self.build_manifest(items)
+            index_file = f"{self._niche_dir(niche)}/index.json"
+
+            with self._lock:
+                index = self._read_json(index_file) or {}
+                # Reexecução da própria sessão compara com a referência anterior a ela
+                previous = index.get('previous_sources', {}) if index.get('last_session_id') == session_id \
+                    else index.get('sources', {})
+
+                added = [url for url in manifest if url not in previous]
+                changed = [url for url in manifest if url in previous and previous[url] != manifest[url]]
+                removed = [url for url in previous if url not in manifest]
+                unchanged = len(manifest) - len(added) - len(changed)
+
+                self._write_json(index_file, {
+                    "niche_key": niche,
+                    "last_session_id": session_id,
+                    "updated_at": datetime.now().isoformat(),
+                    "sources": manifest,
+                    "previous_sources": previous
+                })
+
+            diff = {
+                "previous_session_id": record.get('previous_session_id'),
+                "fingerprint": self.content_hash(sorted(manifest.items())),
+                "total_sources": len(manifest),
+                "added": len(added),
+                "changed": len(changed),
+                "removed": len(removed),
+                "unchanged": unchanged,
+                "added_urls": added[:50],
+                "changed_urls": changed[:50],
+                "removed_urls": removed[:50],
+                "recorded_at": datetime.now().isoformat()
+            }
+            self._update_session(session_id, lambda r: r.update(collection=diff))
+
+            logger.info(
+                f"♻️ Delta da coleta: {diff['added']} novas, {diff['changed']} alteradas, "
+                f"{diff['removed']} removidas, {diff['unchanged']} inalteradas"
+            )
+            return diff
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao calcular delta da coleta: {e}")
+            return None
+
+    def stage_inputs(self, session_id: str, **extra) -> Optional[Dict[str, Any]]:
+        """Entradas de síntese/módulos: impressão digital da coleta + parâmetros da unidade (None sem coleta registrada)"""
+        record = self._session_record(session_id)
+        if not record or not record.get('collection'):
+            return None
+        return {"collection": record['collection']['fingerprint'], **extra}
+
+    # ------------------------------------------------------------------
+    # Reaproveitamento de unidades
+    # ------------------------------------------------------------------
+
+    def _unit_file(self, niche: str, kind: str, key: str) -> str:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+        return f"{self._niche_dir(niche, kind)}/{digest}.json"
+
+    def lookup(self, session_id: str, kind: str, key: str, inputs: Any) -> Optional[Any]:
+        """Resultado da unidade gerado com as mesmas entradas em execução anterior do nicho (ou None)"""
+        record = self._session_record(session_id)
+        if record is None or inputs is None:
+            return None
+        try:
+            entry = self._read_json(self._unit_file(record['niche_key'], kind, key))
+            if not entry or entry.get('input_hash') != self.content_hash(inputs):
+                return None
+            self._track(session_id, 'reused', kind, key, entry.get('session_id'))
+            logger.info(f"♻️ Reaproveitando {kind}/{key} da sessão {entry.get('session_id')}")
+            return entry.get('data')
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao consultar delta {kind}/{key}: {e}")
+            return None
+
+    def store(self, session_id: str, kind: str, key: str, inputs: Any, data: Any) -> bool:
+        """Registra o resultado da unidade para as próximas execuções do nicho"""
+        record = self._session_record(session_id)
+        if record is None or inputs is None:
+            return False
+        try:
+            self._write_json(self._unit_file(record['niche_key'], kind, key), {
+                "kind": kind,
+                "key": key,
+                "input_hash": self.content_hash(inputs),
+                "session_id": session_id,
+                "saved_at": datetime.now().isoformat(),
+                "data": data
+            })
+            self._track(session_id, 'recomputed', kind, key)
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao salvar delta {kind}/{key}: {e}")
+            return False
+
+    def reuse(self, session_id: str, kind: str, key: str, inputs: Any, compute: Callable[[], Any],
+              is_valid: Callable[[Any], bool] = bool) -> Any:
+        """Retorna a unidade reaproveitada se as entradas não mudaram; senão executa compute e registra"""
+        saved = self.lookup(session_id, kind, key, inputs)
+        if saved is not None:
+            return saved
+        result = compute()
+        if is_valid(result):
+            self.store(session_id, kind, key, inputs, result)
+        return result
+
+    async def areuse(self, session_id: str, kind: str, key: str, inputs: Any, compute: Callable[[], Awaitable[Any]],
+                     is_valid: Callable[[Any], bool] = bool) -> Any:
+        """Versão assíncrona de reuse (compute retorna corrotina)"""
+        saved = self.lookup(session_id, kind, key, inputs)
+        if saved is not None:
+            return saved
+        result = await compute()
+        if is_valid(result):
+            self.store(session_id, kind, key, inputs, result)
+        return result
+
+    def _track(self, session_id: str, outcome: str, kind: str, key: str, source_session: Optional[str] = None):
+        def update(record):
+            units = record.setdefault(outcome, {}).setdefault(kind, {})
+            units[key] = source_session or session_id
+        try:
+            self._update_session(session_id, update)
+        except Exception as e:
+            logger.debug(f"Falha ao registrar {outcome} {kind}/{key}: {e}")
+
+    # ------------------------------------------------------------------
+    # Relatório
+    # ------------------------------------------------------------------
+
+    def get_report(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """O que mudou na coleta e quais unidades foram reaproveitadas ou refeitas na sessão"""
+        record = self._read_json(self._session_file(session_id))
+        if record is None:
+            return None
+        reused = record.get('reused', {})
+        recomputed = record.get('recomputed', {})
+        kinds = sorted(set(reused) | set(recomputed))
+        summary = {
+            kind: {
+                "reused": len(reused.get(kind, {})),
+                "recomputed": len(recomputed.get(kind, {})),
+            }
+            for kind in kinds
+        }
+        total_reused = sum(entry['reused'] for entry in summary.values())
+        total_units = total_reused + sum(entry['recomputed'] for entry in summary.values())
+        return {
+            "session_id": session_id,
+            "niche_key": record.get('niche_key'),
+            "delta_enabled": record.get('enabled', False),
+            "previous_session_id": record.get('previous_session_id'),
+            "collection": record.get('collection'),
+            "summary": summary,
+            "reuse_rate": round(total_reused / total_units * 100, 1) if total_units else 0.0,
+            "reused": {kind: sorted(units) for kind, units in reused.items()},
+            "recomputed": {kind: sorted(units) for kind, units in recomputed.items()}
+        }
+
+
+# Instância global
+delta_analyzer = DeltaAnalysisManager()
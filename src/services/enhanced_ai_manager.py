@@ -9,7 +9,7 @@ import os
 import logging
 import asyncio
 import json
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Union, AsyncIterator, Iterator
 from datetime import datetime
 
 # Imports condicionais
@@ -170,10 +170,13 @@ class EnhancedAIManager:
         prompt: str,
         context: str = "",
         session_id: str = None,
-        max_search_iterations: int = 3
+        max_search_iterations: int = 3,
+        stream_key: Optional[str] = None
     ) -> str:
         """
         Gera conteúdo com busca ativa - IA pode buscar informações online
+
+        Com session_id e stream_key, a geração sem ferramentas é feita em streaming e persistida
         """
         logger.info("🔍 Iniciando geração com busca ativa")
 
@@ -186,7 +189,7 @@ class EnhancedAIManager:
             provider_name = self._get_best_provider(require_tools=True)
             if not provider_name:
                 logger.warning("⚠️ Nenhum provedor com ferramentas disponível - usando fallback")
-                return await self.generate_text(prompt + "\n\n" + context)
+                return await self.generate_text(prompt + "\n\n" + context, session_id=session_id, stream_key=stream_key)
 
         provider = self.providers[provider_name]
         logger.info(f"🤖 Usando {provider_name} com busca ativa")
@@ -215,12 +218,12 @@ IMPORTANTE: Gere uma análise completa mesmo sem ferramentas de busca, baseando-
                 return await self._generate_openai_with_tools(enhanced_prompt, max_search_iterations, session_id)
             else:
                 # Para Qwen/OpenRouter e outros, usa geração simples
-                return await self.generate_text(enhanced_prompt)
+                return await self.generate_text(enhanced_prompt, session_id=session_id, stream_key=stream_key)
         except Exception as e:
             logger.error(f"❌ Erro com {provider_name}: {e}")
             # Fallback para geração simples com Qwen/OpenRouter
             logger.info("🔄 Usando fallback para Qwen/OpenRouter")
-            return await self.generate_text(enhanced_prompt)
+            return await self.generate_text(enhanced_prompt, session_id=session_id, stream_key=stream_key)
 
     async def _generate_gemini_with_tools(
         self,
@@ -510,65 +513,88 @@ Fontes encontradas: {total_sources}
 
         return formatted
 
-    # Método dummy para 'generate_text' caso seja chamado sem provedor com tools
-    async def generate_text(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> str:
-        """Gera texto usando o melhor provedor disponível"""
+    async def generate_text(
+        self,
+        prompt: str,
+        max_tokens: int = 4000,
+        temperature: float = 0.7,
+        session_id: Optional[str] = None,
+        stream_key: Optional[str] = None
+    ) -> str:
+        """Gera texto usando o melhor provedor disponível (via streaming, com parcial persistido quando há sessão)"""
+        if not self._get_best_provider(require_tools=False):
+            logger.warning("⚠️ Nenhum provedor disponível")
+            return "Erro: Nenhum provedor de IA disponível para gerar texto."
+
+        parts = []
+        try:
+            async for chunk in self.generate_text_stream(
+                prompt, max_tokens, temperature, session_id=session_id, stream_key=stream_key
+            ):
+                parts.append(chunk)
+        except Exception as e:
+            logger.error(f"❌ Erro na geração de texto: {e}")
+            return f"Erro na geração: {str(e)}"
+
+        return ''.join(parts)
+
+    async def generate_text_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 4000,
+        temperature: float = 0.7,
+        session_id: Optional[str] = None,
+        stream_key: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Gera texto em streaming, com saída parcial persistida e publicada no progresso da sessão"""
+        from services.llm_streaming import stream_with_persistence
+
         provider_name = self._get_best_provider(require_tools=False)
 
         if not provider_name:
-            logger.warning("⚠️ Nenhum provedor disponível")
-            return "Erro: Nenhum provedor de IA disponível para gerar texto."
+            raise Exception("Nenhum provedor de IA disponível")
 
         provider = self.providers[provider_name]
-        logger.info(f"🤖 Usando {provider_name} para geração de texto")
-
-        try:
-            if provider_name == "openrouter":
-                client = provider["client"]
-                response = client.chat.completions.create(
-                    model=provider["model"],
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=max_tokens,
-                    temperature=temperature
-                )
-                return response.choices[0].message.content
+        logger.info(f"🤖 Usando {provider_name} para geração de texto em streaming")
 
-            elif provider_name == "gemini":
+        def chunks(effective_prompt: str) -> Iterator[str]:
+            if provider_name == "gemini":
                 model = genai.GenerativeModel("gemini-2.0-flash-exp")
-                response = model.generate_content(
-                    prompt,
+                for chunk in model.generate_content(
+                    effective_prompt,
                     generation_config=genai.types.GenerationConfig(
                         max_output_tokens=max_tokens,
                         temperature=temperature,
-                    )
-                )
-                return response.text
-
-            elif provider_name == "groq":
-                client = provider["client"]
-                response = client.chat.completions.create(
-                    model=provider["model"],
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=max_tokens,
-                    temperature=temperature
-                )
-                return response.choices[0].message.content
-
-            elif provider_name == "openai":
-                client = provider["client"]
-                response = client.chat.completions.create(
+                    ),
+                    stream=True
+                ):
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        continue
+                    if text:
+                        yield text
+            else:
+                # openrouter, groq e openai usam a mesma API de chat compatível com OpenAI
+                response = provider["client"].chat.completions.create(
                     model=provider["model"],
-                    messages=[{"role": "user", "content": prompt}],
+                    messages=[{"role": "user", "content": effective_prompt}],
                     max_tokens=max_tokens,
-                    temperature=temperature
+                    temperature=temperature,
+                    stream=True
                 )
-                return response.choices[0].message.content
-
-        except Exception as e:
-            logger.error(f"❌ Erro na geração de texto com {provider_name}: {e}")
-            return f"Erro na geração: {str(e)}"
-
-        return "Erro: Método de geração não implementado para este provedor"
+                for chunk in response:
+                    if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+
+        async for chunk in stream_with_persistence(
+            provider_name,
+            prompt,
+            lambda effective_prompt: (lambda: chunks(effective_prompt)),
+            session_id=session_id,
+            stream_key=stream_key
+        ):
+            yield chunk
 
 
 # Instância global
@@ -14,11 +14,15 @@ from enum import Enum
 import json
 from datetime import datetime, timedelta
 import threading
+from contextlib import contextmanager
 import requests
 import asyncio
 import aiohttp
 from dotenv import load_dotenv
 
+from services.provider_router import provider_router
+from services.circuit_breaker import circuit_breakers, CircuitBreaker
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -41,6 +45,7 @@ class APIEndpoint:
     rate_limit_reset: datetime = None
     requests_made: int = 0
     max_requests_per_minute: int = 60
+    service: str = ''
 
 class EnhancedAPIRotationManager:
     """
@@ -79,7 +84,6 @@ class EnhancedAPIRotationManager:
             'content_extraction': [['firecrawl'], ['jina'], ['scrapingant'], ['serper'], ['rapidapi']],
             'url_analysis': [['firecrawl'], ['jina'], ['exa'], ['serper'], ['serpapi']]
         }
-        self.current_api_index = {}
         self.lock = threading.Lock()
         self.health_check_interval = 300  # 5 minutos
         self.last_health_check = {}
@@ -297,9 +301,15 @@ class EnhancedAPIRotationManager:
                 ))
                 logger.info("✅ RapidAPI carregada")
             
-            # Inicializar índices
-            for service in self.apis:
-                self.current_api_index[service] = 0
+            # Registra os pools no roteador adaptativo (estatísticas compartilhadas entre gerenciadores)
+            for service, apis in self.apis.items():
+                for api in apis:
+                    api.service = service
+                if apis:
+                    provider_router.register_pool(
+                        service, [api.api_key for api in apis],
+                        quota_per_minute=min(api.max_requests_per_minute for api in apis)
+                    )
                 
             total_apis = sum(len(apis) for apis in self.apis.values())
             logger.info(f"✅ APIs carregadas: {total_apis} endpoints")
@@ -328,9 +338,13 @@ class EnhancedAPIRotationManager:
         for service in self.apis:
             self.last_health_check[service] = datetime.now() - timedelta(minutes=10)
     
-    def get_active_api(self, service: str, force_check: bool = False) -> Optional[APIEndpoint]:
+    def get_active_api(self, service: str, force_check: bool = False, lease: bool = True) -> Optional[APIEndpoint]:
         """
-        Retorna API ativa para o serviço especificado com rotação automática
+        Retorna API ativa para o serviço especificado; entre as disponíveis, o roteador
+        escolhe a chave mais rápida e saudável dentro da cota
+
+        Com lease=True (padrão) a chamada fica reservada no disjuntor e no roteador e o resultado
+        deve ser registrado com measure(api); lease=False só consulta (ex.: chave para configurar um cliente).
         """
         with self.lock:
             if service not in self.apis or not self.apis[service]:
@@ -341,33 +355,28 @@ class EnhancedAPIRotationManager:
             if force_check or self._needs_health_check(service):
                 self._perform_health_check(service)
             
-            # Encontrar API ativa com rotação automática
-            apis = self.apis[service]
-            start_index = self.current_api_index[service]
-            
-            # Verificar se a API atual está disponível
-            current_api = apis[start_index]
-            if self._is_api_available(current_api):
-                current_api.last_used = datetime.now()
-                current_api.requests_made += 1
-                logger.info(f"🔄 Continuando com API {current_api.name} para {service}")
-                return current_api
-            
-            # Se API atual não está disponível, rotar automaticamente
-            logger.info(f"🔄 API atual indisponível, rotacionando {service}...")
-            for i in range(1, len(apis)):  # Começar da próxima API
-                index = (start_index + i) % len(apis)
-                api = apis[index]
-                
-                if self._is_api_available(api):
-                    self.current_api_index[service] = index
-                    api.last_used = datetime.now()
-                    api.requests_made += 1
-                    logger.info(f"✅ Rotação automática: API {api.name} para {service}")
-                    return api
+            available = [api for api in self.apis[service] if self._is_api_available(service, api)]
+            if not available:
+                logger.error(f"❌ Nenhuma API disponível para {service} após rotação")
+                return None
             
-            logger.error(f"❌ Nenhuma API disponível para {service} após rotação")
-            return None
+            while available:
+                key = provider_router.choose_key(service, [api.api_key for api in available], lease=lease)
+                api = next((api for api in available if api.api_key == key), available[0])
+                if not lease or self._breaker(service, api).allow():
+                    break
+                # Vaga de sonda tomada por outro chamador entre a consulta e a reserva: tenta outra chave
+                provider_router.release(service, api.api_key)
+                logger.debug(f"⚡ Circuito de {api.name} sem vaga de sonda")
+                available.remove(api)
+            else:
+                logger.error(f"❌ Nenhuma API disponível para {service} (circuitos abertos)")
+                return None
+            
+            api.last_used = datetime.now()
+            api.requests_made += 1
+            logger.debug(f"🔄 API {api.name} selecionada para {service}")
+            return api
     
     def _needs_health_check(self, service: str) -> bool:
         """Verifica se precisa fazer health check"""
@@ -399,7 +408,7 @@ class EnhancedAPIRotationManager:
         except Exception as e:
             logger.error(f"❌ Erro no health check de {service}: {e}")
     
-    def _is_api_available(self, api: APIEndpoint) -> bool:
+    def _is_api_available(self, service: str, api: APIEndpoint) -> bool:
         """Verifica se API está disponível para uso"""
         if api.status == APIStatus.OFFLINE:
             return False
@@ -411,59 +420,62 @@ class EnhancedAPIRotationManager:
                 return True
             return False
         
-        if api.status == APIStatus.ERROR and api.error_count > 5:
-            return False
-        
-        return True
+        # Recuperação de chaves com erro decidida pelo disjuntor compartilhado (sondas no meio-aberto)
+        return self._breaker(service, api).available()
     
-    def mark_api_error(self, service: str, api_name: str, error: Exception):
-        """Marca API como com erro e força rotação imediata"""
+    def _breaker(self, service: str, api: APIEndpoint) -> CircuitBreaker:
+        """Disjuntor da chave, o mesmo usado pelo AI Manager e demais chamadores"""
+        return circuit_breakers.for_key(service, api.api_key)
+    
+    def mark_api_error(self, service: str, api_name: str, error: Exception, latency: Optional[float] = None):
+        """Marca API como com erro; a próxima escolha já evita a chave e o disjuntor decide a volta"""
         with self.lock:
-            for i, api in enumerate(self.apis[service]):
+            for api in self.apis[service]:
                 if api.name == api_name:
                     api.error_count += 1
-                    
-                    # Rotação IMEDIATA na primeira falha para garantir disponibilidade
                     api.status = APIStatus.ERROR
+                    provider_router.record(service, api.api_key, latency, False, error=str(error))
+                    self._breaker(service, api).record_failure(error)
                     logger.warning(f"⚠️ API {api_name} marcada como ERROR - ROTAÇÃO IMEDIATA")
-                    
-                    # Forçar rotação para próxima API disponível
-                    if len(self.apis[service]) > 1:
-                        # Encontrar próxima API ativa
-                        next_api_found = False
-                        for j in range(1, len(self.apis[service])):
-                            next_index = (i + j) % len(self.apis[service])
-                            next_api = self.apis[service][next_index]
-                            
-                            # Verificar se a próxima API está disponível
-                            if self._is_api_available(next_api) or next_api.status != APIStatus.ERROR:
-                                self.current_api_index[service] = next_index
-                                logger.info(f"🔄 ROTAÇÃO AUTOMÁTICA: {service} → {next_api.name}")
-                                next_api_found = True
-                                break
-                        
-                        if not next_api_found:
-                            logger.error(f"❌ Nenhuma API alternativa disponível para {service}")
-                    
-                    # Recuperação mais rápida - 1 minuto para tentar novamente
-                    self._schedule_api_recovery(service, api_name, recovery_time=60)
                     break
     
-    def _schedule_api_recovery(self, service: str, api_name: str, recovery_time: int = 60):
-        """Agenda recuperação automática da API após período de cooldown"""
-        def recover_api():
-            time.sleep(recovery_time)  # Cooldown configurável (padrão 1 minuto)
-            with self.lock:
-                for api in self.apis[service]:
-                    if api.name == api_name:
+    def mark_api_success(self, service: str, api_name: str, latency: Optional[float] = None):
+        """Marca chamada bem-sucedida; fecha o circuito quando era uma sonda"""
+        with self.lock:
+            for api in self.apis[service]:
+                if api.name == api_name:
+                    if api.status == APIStatus.ERROR:
                         api.status = APIStatus.ACTIVE
                         api.error_count = 0
-                        logger.info(f"✅ API {api_name} RECUPERADA automaticamente após {recovery_time}s")
-                        break
-        
-        import threading
-        threading.Thread(target=recover_api, daemon=True).start()
-        logger.info(f"⏱️ Recuperação de {api_name} agendada para {recovery_time} segundos")
+                        logger.info(f"✅ API {api_name} recuperada")
+                    provider_router.record(service, api.api_key, latency, True)
+                    self._breaker(service, api).record_success()
+                    break
+    
+    @contextmanager
+    def measure(self, api: Optional[APIEndpoint]):
+        """
+        Registra o resultado da chamada feita com a API obtida em get_active_api: exceção conta
+        como erro, saída normal como sucesso (fecha a reserva no disjuntor e no roteador)
+        """
+        if not isinstance(api, APIEndpoint) or not api.service:
+            # Clientes simulados ou APIs de fora do gerenciador
+            yield api
+            return
+        started = time.perf_counter()
+        try:
+            yield api
+        except Exception as e:
+            self.mark_api_error(api.service, api.name, e, latency=time.perf_counter() - started)
+            raise
+        self.mark_api_success(api.service, api.name, latency=time.perf_counter() - started)
+    
+    def release(self, api: Optional[APIEndpoint]):
+        """Devolve a reserva de get_active_api (roteador e sonda do disjuntor) sem registrar resultado"""
+        if not isinstance(api, APIEndpoint) or not api.service:
+            return
+        provider_router.release(api.service, api.api_key)
+        self._breaker(api.service, api).release()
     
     def mark_api_rate_limited(self, service: str, api_name: str, reset_time: Optional[datetime] = None):
         """Marca API como rate limited"""
@@ -472,6 +484,10 @@ class EnhancedAPIRotationManager:
                 if api.name == api_name:
                     api.status = APIStatus.RATE_LIMITED
                     api.rate_limit_reset = reset_time or (datetime.now() + timedelta(minutes=1))
+                    provider_router.record(
+                        service, api.api_key, None, False, error='rate limited', rate_limited=True,
+                        retry_after=(api.rate_limit_reset - datetime.now()).total_seconds()
+                    )
                     logger.warning(f"⚠️ API {api_name} rate limited até {api.rate_limit_reset}")
                     break
     
@@ -493,15 +509,18 @@ class EnhancedAPIRotationManager:
                     start_index = i + 1
                     break
         
-        # Percorrer cadeia de fallback a partir do índice calculado
-        for i in range(start_index, len(chain)):
-            for service_name in chain[i]:
-                if service_name in self.apis and self.apis[service_name]:
-                    # Usar get_active_api para obter API disponível
-                    api = self.get_active_api(service_name)
-                    if api:
-                        logger.info(f"🔄 Fallback para {service_name} (tipo: {service_type})")
-                        return api
+        # Serviços restantes da cadeia: o roteador põe os saudáveis e mais rápidos na frente,
+        # mantendo a ordem da cadeia como desempate
+        remaining = [
+            service_name for services in chain[start_index:] for service_name in services
+            if service_name in self.apis and self.apis[service_name]
+        ]
+        for service_name in provider_router.rank(remaining):
+            # Usar get_active_api para obter API disponível
+            api = self.get_active_api(service_name)
+            if api:
+                logger.info(f"🔄 Fallback para {service_name} (tipo: {service_type})")
+                return api
         
         logger.error(f"❌ Nenhum fallback disponível para {service_type}")
         return None
@@ -560,6 +579,7 @@ class EnhancedAPIRotationManager:
                     'name': api.name,
                     'status': api.status.value,
                     'error_count': api.error_count,
+                    'circuit': self._breaker(service, api).get_status()['state'],
                     'requests_made': api.requests_made,
                     'last_used': api.last_used.isoformat() if api.last_used else None
                 })
@@ -577,6 +597,7 @@ class EnhancedAPIRotationManager:
                 api.error_count = 0
                 if api.status == APIStatus.ERROR:
                     api.status = APIStatus.ACTIVE
+                self._breaker(svc, api).reset()
         
         logger.info(f"✅ Erros resetados para: {', '.join(services_to_reset)}")
 
@@ -14,6 +14,9 @@ from typing import Dict, List, Any, Optional, Callable
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from services.ai_manager import ai_manager
 from services.auto_save_manager import salvar_etapa, salvar_erro
+from services.tracing import tracer
+from services.session_persistence_manager import session_manager
+from services.delta_analysis import delta_analyzer
 from services.avatar_generation_system import AvatarGenerationSystem
 from services.mental_drivers_architect import MentalDriversArchitect
 from services.mental_drivers_system import MentalDriversSystem
@@ -199,9 +202,20 @@ class EnhancedModuleProcessor:
 
                 logger.info(f"🔧 Processando módulo {i}/{total_modules}: {module_name}")
 
-                # Processa módulo com dados massivos
-                module_result = self._process_single_module_complete(
-                    module_name, module_config, massive_data, context, session_id
+                # Processa módulo com dados massivos (módulo válido de execução anterior é retomado do checkpoint;
+                # no modo delta, módulo cujas entradas não mudaram desde a última execução do nicho é reaproveitado)
+                is_valid = lambda result: self._validate_module_result(module_name, result, module_config)["is_valid"]
+                module_result = session_manager.checkpoint(
+                    session_id, 'module', module_name,
+                    lambda: delta_analyzer.reuse(
+                        session_id, 'module', module_name,
+                        delta_analyzer.stage_inputs(session_id, module=module_name, context=self._delta_context(context)),
+                        lambda: self._process_single_module_complete(
+                            module_name, module_config, massive_data, context, session_id
+                        ),
+                        is_valid=is_valid
+                    ),
+                    is_valid=is_valid
                 )
 
                 # Valida resultado do módulo
@@ -262,6 +276,10 @@ class EnhancedModuleProcessor:
 
         return processing_results
 
+    def _delta_context(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Parâmetros do contexto que definem as entradas do módulo (sem identificadores da execução)"""
+        return {key: value for key, value in context.items() if key not in ('session_id', 'timestamp', 'etapa')}
+
     def _save_module_to_session_directory(self, session_id: str, module_name: str, module_result: Dict[str, Any]):
         """
         Salva módulo no diretório modules da sessão
@@ -286,6 +304,9 @@ class EnhancedModuleProcessor:
         except Exception as e:
             logger.error(f"❌ Erro ao salvar módulo {module_name} no diretório da sessão: {e}")
 
+    @tracer.traced('module', kind='phase',
+                   attributes=lambda self, module_name, module_config, massive_data, context, session_id: {
+                       'module': module_name, 'session_id': session_id})
     def _process_single_module_complete(
         self,
         module_name: str,
@@ -554,7 +575,7 @@ CRÍTICO: Use APENAS dados REAIS extraídos da pesquisa massiva. Personalize o n
 """
 
             # Gera avatar com IA
-            avatar_response = ai_manager.generate_analysis(avatar_prompt, max_tokens=4000)
+            avatar_response = ai_manager.generate_analysis(avatar_prompt, max_tokens=4000, session_id=session_id, stream_key='avatar')
 
             if avatar_response:
                 try:
@@ -708,7 +729,7 @@ RETORNE JSON com EXATAMENTE 19 drivers COMPLETOS:
 }}
 """
 
-            drivers_response = ai_manager.generate_analysis(drivers_prompt, max_tokens=8000)
+            drivers_response = ai_manager.generate_analysis(drivers_prompt, max_tokens=8000, session_id=session_id, stream_key='drivers')
 
             if drivers_response:
                 drivers_data = self._parse_json_response(drivers_response, "drivers")
@@ -825,7 +846,7 @@ RETORNE JSON com sistema anti-objeção COMPLETO:
 }}
 """
 
-            anti_objecao_response = ai_manager.generate_analysis(anti_objecao_prompt, max_tokens=4000)
+            anti_objecao_response = ai_manager.generate_analysis(anti_objecao_prompt, max_tokens=4000, session_id=session_id, stream_key='anti_objecao')
 
             if anti_objecao_response:
                 anti_objecao_data = self._parse_json_response(anti_objecao_response, "anti_objecao")
@@ -894,7 +915,7 @@ RETORNE JSON com arsenal COMPLETO:
 }}
 """
 
-            provas_response = ai_manager.generate_analysis(provas_prompt, max_tokens=3000)
+            provas_response = ai_manager.generate_analysis(provas_prompt, max_tokens=3000, session_id=session_id, stream_key='provas')
 
             if provas_response:
                 provas_data = self._parse_json_response(provas_response, "provas_visuais")
@@ -956,7 +977,7 @@ RETORNE JSON com pré-pitch COMPLETO:
 }}
 """
 
-            pre_pitch_response = ai_manager.generate_analysis(pre_pitch_prompt, max_tokens=3000)
+            pre_pitch_response = ai_manager.generate_analysis(pre_pitch_prompt, max_tokens=3000, session_id=session_id, stream_key='pre_pitch')
 
             if pre_pitch_response:
                 pre_pitch_data = self._parse_json_response(pre_pitch_response, "pre_pitch")
@@ -1020,7 +1041,7 @@ RETORNE JSON com predições COMPLETAS:
 }}
 """
 
-            predicoes_response = ai_manager.generate_analysis(predicoes_prompt, max_tokens=3000)
+            predicoes_response = ai_manager.generate_analysis(predicoes_prompt, max_tokens=3000, session_id=session_id, stream_key='predicoes')
 
             if predicoes_response:
                 predicoes_data = self._parse_json_response(predicoes_response, "predicoes")
@@ -1072,7 +1093,7 @@ RETORNE JSON com análise COMPLETA:
   "completeness_level": "CONCORRENCIA_COMPLETA"
 }}
 """
-            concorrencia_response = ai_manager.generate_analysis(concorrencia_prompt, max_tokens=3000)
+            concorrencia_response = ai_manager.generate_analysis(concorrencia_prompt, max_tokens=3000, session_id=session_id, stream_key='concorrencia')
             if concorrencia_response:
                 concorrencia_data = self._parse_json_response(concorrencia_response, "concorrencia")
                 return {
@@ -1112,7 +1133,7 @@ RETORNE JSON com estratégia COMPLETA:
   "completeness_level": "PALAVRAS_CHAVE_COMPLETAS"
 }}
 """
-            pk_response = ai_manager.generate_analysis(pk_prompt, max_tokens=3000)
+            pk_response = ai_manager.generate_analysis(pk_prompt, max_tokens=3000, session_id=session_id, stream_key='pk')
             if pk_response:
                 pk_data = self._parse_json_response(pk_response, "palavras_chave")
                 return {
@@ -1171,7 +1192,7 @@ RETORNE JSON com funil COMPLETO:
   "completeness_level": "FUNIL_COMPLETO"
 }}
 """
-            funil_response = ai_manager.generate_analysis(funil_prompt, max_tokens=3000)
+            funil_response = ai_manager.generate_analysis(funil_prompt, max_tokens=3000, session_id=session_id, stream_key='funil')
             if funil_response:
                 funil_data = self._parse_json_response(funil_response, "funil_vendas")
 
@@ -1246,7 +1267,7 @@ RETORNE JSON com métricas COMPLETAS:
   "completeness_level": "METRICAS_COMPLETAS"
 }}
 """
-            metricas_response = ai_manager.generate_analysis(metricas_prompt, max_tokens=3000)
+            metricas_response = ai_manager.generate_analysis(metricas_prompt, max_tokens=3000, session_id=session_id, stream_key='metricas')
             if metricas_response:
                 metricas_data = self._parse_json_response(metricas_response, "metricas")
                 return {
@@ -1345,7 +1366,7 @@ RETORNE JSON com plano COMPLETO:
   "completeness_level": "PLANO_ACAO_COMPLETO"
 }}
 """
-            plano_response = ai_manager.generate_analysis(plano_prompt, max_tokens=3000)
+            plano_response = ai_manager.generate_analysis(plano_prompt, max_tokens=3000, session_id=session_id, stream_key='plano')
             if plano_response:
                 plano_data = self._parse_json_response(plano_response, "plano_acao")
                 return {
@@ -1384,7 +1405,7 @@ RETORNE JSON com posicionamento COMPLETO:
   "completeness_level": "POSICIONAMENTO_COMPLETO"
 }}
 """
-            posicionamento_response = ai_manager.generate_analysis(posicionamento_prompt, max_tokens=3000)
+            posicionamento_response = ai_manager.generate_analysis(posicionamento_prompt, max_tokens=3000, session_id=session_id, stream_key='posicionamento')
             if posicionamento_response:
                 posicionamento_data = self._parse_json_response(posicionamento_response, "posicionamento")
                 return {
@@ -1474,7 +1495,17 @@ RETORNE JSON com posicionamento COMPLETO:
                         "synthesis": synthesis_data
                     }
                     
-                    module_result = method(fake_massive_data, context, session_id)
+                    is_valid = lambda result: result.get('processing_status') == 'SUCCESS'
+                    module_result = session_manager.checkpoint(
+                        session_id, 'module', f"modular:{module_name}",
+                        lambda: delta_analyzer.reuse(
+                            session_id, 'module', f"modular:{module_name}",
+                            delta_analyzer.stage_inputs(session_id, module=module_name, topic=topic),
+                            lambda: method(fake_massive_data, context, session_id),
+                            is_valid=is_valid
+                        ),
+                        is_valid=is_valid
+                    )
                     
                     if module_result.get('processing_status') == 'SUCCESS':
                         modules_generated.append({
@@ -14,6 +14,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from services.exa_client import exa_client
 from services.production_search_manager import production_search_manager
 from services.auto_save_manager import salvar_etapa, salvar_erro
+from services.http_client_pool import http_client_pool
 
 logger = logging.getLogger(__name__)
 
@@ -261,8 +262,6 @@ class EnhancedSearchCoordinator:
             if not google_api_key or not google_cse_id:
                 raise Exception("Google API não configurada")
             
-            import requests
-            
             params = {
                 'key': google_api_key,
                 'cx': google_cse_id,
@@ -274,7 +273,7 @@ class EnhancedSearchCoordinator:
                 'dateRestrict': 'm12'  # Últimos 12 meses
             }
             
-            response = requests.get(
+            response = http_client_pool.get_sync_session().get(
                 'https://www.googleapis.com/customsearch/v1',
                 params=params,
                 timeout=30
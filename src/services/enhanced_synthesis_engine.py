@@ -13,6 +13,10 @@ from typing import Dict, Any, Optional
 from datetime import datetime
 from pathlib import Path
 
+from services.context_packer import context_packer, get_model_budget
+from services.session_persistence_manager import session_manager
+from services.delta_analysis import delta_analyzer
+
 logger = logging.getLogger(__name__)
 
 class EnhancedSynthesisEngine:
@@ -22,6 +26,7 @@ class EnhancedSynthesisEngine:
         """Inicializa o motor de síntese"""
         self.synthesis_prompts = self._load_enhanced_prompts()
         self.ai_manager = None
+        self.context_reports = {}
         self._initialize_ai_manager()
         
         logger.info("🧠 Enhanced Synthesis Engine inicializado")
@@ -284,11 +289,24 @@ DADOS PARA ANÁLISE:
             if not self.ai_manager:
                 raise Exception("AI Manager não disponível")
             
-            synthesis_result = await self.ai_manager.generate_with_active_search(
-                prompt=base_prompt,
-                context=full_context,
-                session_id=session_id,
-                max_search_iterations=5
+            # Modo delta: coleta e prompt iguais aos da execução anterior do nicho reaproveitam a síntese
+            delta_inputs = delta_analyzer.stage_inputs(
+                session_id, synthesis_type=synthesis_type, prompt=delta_analyzer.content_hash(base_prompt)
+            )
+            synthesis_result = await session_manager.acheckpoint(
+                session_id, 'synthesis', f"{synthesis_type}:report",
+                lambda: delta_analyzer.areuse(
+                    session_id, 'synthesis', f"{synthesis_type}:report", delta_inputs,
+                    lambda: self.ai_manager.generate_with_active_search(
+                        prompt=base_prompt,
+                        context=full_context,
+                        session_id=session_id,
+                        max_search_iterations=5,
+                        stream_key=f"synthesis_{synthesis_type}_report"
+                    ),
+                    is_valid=self._is_valid_synthesis
+                ),
+                is_valid=self._is_valid_synthesis
             )
             
             # 6. Processa e valida resultado
@@ -384,6 +402,16 @@ DADOS PARA ANÁLISE:
         
         return context
 
+    @staticmethod
+    def _is_valid_synthesis(result: Any) -> bool:
+        """Só sínteses reais viram checkpoint/unidade reaproveitável (não mensagens de erro ou de limite)"""
+        if isinstance(result, dict):
+            return bool(result) and result.get('status') != 'error' and not result.get('error')
+        if isinstance(result, str):
+            text = result.strip()
+            return len(text) >= 200 and not text.startswith('Erro')
+        return False
+
     def _process_synthesis_result(self, synthesis_result: str) -> Dict[str, Any]:
         """Processa resultado da síntese"""
         try:
@@ -657,27 +685,43 @@ DADOS PARA ANÁLISE:
 ### CONTEÚDO DE BUSCA
 """
         
-        # Adiciona conteúdo de busca
+        # Seleciona blocos por relevância dentro do orçamento de tokens do modelo alvo
         text_content = massive_data.get('consolidated_text_content', {})
-        search_content = text_content.get('search_content', [])
-        
-        for i, content in enumerate(search_content[:10]):  # Limita a 10 primeiros
-            context += f"\n**Fonte {i+1}**: {content[:1000]}...\n"
-        
+        session_context = massive_data.get('session_metadata', {}).get('context', {}) or {}
+        if isinstance(session_context, dict):
+            relevance_query = ' '.join(str(session_context.get(k, '')) for k in ('segmento', 'produto', 'publico', 'query_original'))
+        else:
+            relevance_query = str(session_context)
+
+        target_model = self._get_target_model()
+        packed, report = context_packer.pack(
+            {
+                'search_content': text_content.get('search_content', []),
+                'viral_content': text_content.get('viral_content', []),
+                'additional_content': text_content.get('additional_content', [])
+            },
+            relevance_query,
+            get_model_budget(target_model)
+        )
+        report['target_model'] = target_model
+        self.context_reports[session_id] = report
+
+        for i, content in enumerate(packed.get('search_content', [])):
+            context += f"\n**Fonte {i+1}**: {content}\n"
+
         context += "\n### CONTEÚDO VIRAL\n"
-        
-        # Adiciona conteúdo viral
-        viral_content = text_content.get('viral_content', [])
-        for i, content in enumerate(viral_content[:5]):  # Limita a 5 primeiros
-            context += f"\n**Viral {i+1}**: {content[:500]}...\n"
-        
+        for i, content in enumerate(packed.get('viral_content', [])):
+            context += f"\n**Viral {i+1}**: {content}\n"
+
         context += "\n### DADOS ADICIONAIS\n"
-        
-        # Adiciona dados adicionais
-        additional_content = text_content.get('additional_content', [])
-        for i, content in enumerate(additional_content[:5]):  # Limita a 5 primeiros
-            context += f"\n**Adicional {i+1}**: {content[:500]}...\n"
-        
+        for i, content in enumerate(packed.get('additional_content', [])):
+            context += f"\n**Adicional {i+1}**: {content}\n"
+
+        logger.info(
+            f"📦 Contexto empacotado para {target_model}: {report['included_chunks']}/{report['candidate_chunks']} blocos, "
+            f"{report['included_tokens']}/{report['budget_tokens']} tokens ({report['dropped_duplicates']} duplicados removidos)"
+        )
+
         # Adiciona metadados de qualidade
         quality_metrics = massive_data.get('data_quality_metrics', {})
         context += f"""
@@ -694,6 +738,16 @@ DADOS PARA ANÁLISE:
         logger.info(f"✅ Contexto preparado: {len(context)} caracteres")
         return context
 
+    def _get_target_model(self) -> Optional[str]:
+        """Retorna o modelo que receberá o contexto (mesma seleção de generate_with_active_search)"""
+        if not self.ai_manager or not getattr(self.ai_manager, 'providers', None):
+            return None
+        providers = self.ai_manager.providers
+        if "openrouter" in providers and providers["openrouter"].get("available"):
+            return providers["openrouter"].get("model")
+        provider_name = self.ai_manager._get_best_provider(require_tools=True)
+        return providers[provider_name].get("model") if provider_name else None
+
     async def _execute_ai_synthesis_with_massive_data(
         self, 
         synthesis_context: str, 
@@ -745,11 +799,23 @@ Analise profundamente TODOS os dados fornecidos e crie uma síntese estruturada,
                 raise Exception("AI Manager não disponível")
             
             # Executa síntese com busca ativa
-            synthesis_result = await self.ai_manager.generate_with_active_search(
-                prompt=massive_prompt,
-                context=synthesis_context,
-                session_id=session_id,
-                max_search_iterations=3  # Reduzido pois já temos dados massivos
+            delta_inputs = delta_analyzer.stage_inputs(
+                session_id, synthesis_type=synthesis_type, prompt=delta_analyzer.content_hash(base_prompt)
+            )
+            synthesis_result = await session_manager.acheckpoint(
+                session_id, 'synthesis', f"{synthesis_type}:massive",
+                lambda: delta_analyzer.areuse(
+                    session_id, 'synthesis', f"{synthesis_type}:massive", delta_inputs,
+                    lambda: self.ai_manager.generate_with_active_search(
+                        prompt=massive_prompt,
+                        context=synthesis_context,
+                        session_id=session_id,
+                        max_search_iterations=3,  # Reduzido pois já temos dados massivos
+                        stream_key=f"synthesis_{synthesis_type}_massive"
+                    ),
+                    is_valid=self._is_valid_synthesis
+                ),
+                is_valid=self._is_valid_synthesis
             )
             
             # Processa resultado
@@ -764,6 +830,7 @@ Analise profundamente TODOS os dados fornecidos e crie uma síntese estruturada,
                     "additional_files": massive_data['consolidated_statistics']['additional_files_count'],
                     "total_data_size": massive_data['consolidated_statistics']['total_data_size']
                 },
+                "context_packing": self.context_reports.pop(session_id, None),
                 "timestamp": datetime.now().isoformat(),
                 "massive_data_used": True
             }
@@ -7,10 +7,10 @@ Cliente para integração com Exa API para pesquisa avançada
 
 import os
 import logging
-import requests
 import json
 from typing import Dict, List, Optional, Any
 from datetime import datetime
+from services.http_client_pool import http_client_pool
 
 logger = logging.getLogger(__name__)
 
@@ -83,7 +83,7 @@ class ExaClient:
             if end_published_date:
                 payload["endPublishedDate"] = end_published_date
             
-            response = requests.post(
+            response = http_client_pool.get_sync_session().post(
                 f"{self.base_url}/search",
                 headers=self.headers,
                 json=payload,
@@ -122,7 +122,7 @@ class ExaClient:
                 "summary": summary
             }
             
-            response = requests.post(
+            response = http_client_pool.get_sync_session().post(
                 f"{self.base_url}/contents",
                 headers=self.headers,
                 json=payload,
@@ -159,7 +159,7 @@ class ExaClient:
                 "excludeSourceDomain": exclude_source_domain
             }
             
-            response = requests.post(
+            response = http_client_pool.get_sync_session().post(
                 f"{self.base_url}/findSimilar",
                 headers=self.headers,
                 json=payload,
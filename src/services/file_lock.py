@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - File Lock
+Trava entre processos (flock em um arquivo .lock; msvcrt.locking no Windows) combinada com trava
+reentrante entre threads, para leituras-modificações-escritas de arquivos compartilhados pelo servidor
+web e pelos workers da fila
+"""
+
+import os
+import logging
+import threading
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+try:
+    import msvcrt
+    HAS_MSVCRT = True
+except ImportError:
+    HAS_MSVCRT = False
+
+logger = logging.getLogger(__name__)
+
+# Há trava entre processos nesta plataforma (workers da fila dependem dela)
+HAS_PROCESS_LOCK = HAS_FCNTL or HAS_MSVCRT
+
+
+def _lock_fd(fd: int):
+    if HAS_FCNTL:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return
+    # LK_LOCK desiste após ~10 tentativas de 1s: repete até conseguir, como o flock bloqueante
+    os.lseek(fd, 0, os.SEEK_SET)
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _unlock_fd(fd: int):
+    if HAS_FCNTL:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """Trava reentrante: só a aquisição mais externa de cada thread toma a trava do arquivo"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+        if not HAS_PROCESS_LOCK:
+            logger.warning(f"⚠️ Sem fcntl/msvcrt: {path} protegido apenas entre threads deste processo")
+
+    def acquire(self):
+        self._lock.acquire()
+        if self._depth == 0 and HAS_PROCESS_LOCK:
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                _lock_fd(self._fd)
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            try:
+                _unlock_fd(self._fd)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        self._lock.release()
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Forecasting
+Previsões com cache de modelos/resultados, ajuste paralelo do Prophet e caminho rápido em NumPy
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+try:
+    from prophet import Prophet
+    from prophet.serialize import model_to_json, model_from_json
+    HAS_PROPHET = True
+except ImportError:
+    HAS_PROPHET = False
+
+logger = logging.getLogger(__name__)
+
+_NS_PER_DAY = 86400 * 10**9
+# Dia ordinal (date.toordinal) da época Unix
+_EPOCH_ORDINAL = 719163
+
+
+def to_series(temporal_data) -> Tuple[np.ndarray, np.ndarray]:
+    """Converte DataFrame ou lista de registros (timestamp, value) em arrays ordenados (ns, float)"""
+    if temporal_data is None or len(temporal_data) == 0:
+        return np.array([], dtype='int64'), np.array([], dtype=float)
+
+    if hasattr(temporal_data, 'columns'):
+        timestamps = temporal_data['timestamp'] if 'timestamp' in temporal_data.columns else temporal_data['ds']
+        values = temporal_data['value'] if 'value' in temporal_data.columns else temporal_data['y']
+        ts = np.asarray(timestamps, dtype='datetime64[ns]').astype('int64')
+        vals = np.asarray(values, dtype=float)
+    else:
+        ts = np.array([np.datetime64(item['timestamp'], 'ns') for item in temporal_data]).astype('int64')
+        vals = np.array([item['value'] for item in temporal_data], dtype=float)
+
+    order = np.argsort(ts, kind='stable')
+    return ts[order], vals[order]
+
+
+def _iso(ns: int) -> str:
+    return datetime.utcfromtimestamp(ns / 1e9).isoformat()
+
+
+def detect_anomalies_iqr(ts: np.ndarray, values: np.ndarray, k: float = 1.5) -> List[Dict[str, Any]]:
+    """Detecção vetorizada de outliers por IQR"""
+    if len(values) < 5:
+        return []
+    q1, q3 = np.percentile(values, [25, 75])
+    iqr = q3 - q1
+    mask = (values < q1 - k * iqr) | (values > q3 + k * iqr)
+    return [
+        {"timestamp": _iso(t), "value": float(v), "type": "outlier"}
+        for t, v in zip(ts[mask].tolist(), values[mask].tolist())
+    ]
+
+
+def linear_trend_forecast(ts: np.ndarray, values: np.ndarray, horizon_days: int) -> List[Dict[str, Any]]:
+    """Tendência linear em forma fechada (mínimos quadrados) sobre dias ordinais"""
+    ordinals = ts // _NS_PER_DAY + _EPOCH_ORDINAL
+    if len(ordinals) < 2 or np.ptp(ordinals) == 0:
+        return []
+    x_mean = ordinals.mean()
+    y_mean = values.mean()
+    slope = np.dot(ordinals - x_mean, values - y_mean) / np.dot(ordinals - x_mean, ordinals - x_mean)
+    intercept = y_mean - slope * x_mean
+
+    future = ordinals.max() + np.arange(1, horizon_days + 1)
+    predictions = intercept + slope * future
+    return [
+        {"ds": datetime.fromordinal(int(d)).isoformat(), "yhat": float(p)}
+        for d, p in zip(future.tolist(), predictions.tolist())
+    ]
+
+
+def _prophet_forecast(ts: List[int], values: List[float], horizon_days: int, model_json: Optional[str]) -> Dict[str, Any]:
+    """Ajusta (ou reaproveita) modelo Prophet e gera previsão (executado no worker)"""
+    import pandas as pd
+
+    if model_json:
+        model = model_from_json(model_json)
+    else:
+        model = Prophet()
+        model.fit(pd.DataFrame({'ds': pd.to_datetime(ts), 'y': values}))
+        model_json = model_to_json(model)
+
+    forecast = model.predict(model.make_future_dataframe(periods=horizon_days))
+    forecast['ds'] = forecast['ds'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+    return {
+        'records': forecast[["ds", "yhat", "yhat_lower", "yhat_upper"]].to_dict(orient="records"),
+        'model_json': model_json
+    }
+
+
+class ForecastEngine:
+    """Camada de previsão com cache por hash da série e ajuste paralelo"""
+
+    def __init__(self):
+        """Inicializa com configuração do ambiente"""
+        self.cache_dir = os.path.join(os.getenv('SEARCH_CACHE_DIR', 'cache'), 'forecasts')
+        self.prophet_min_points = int(os.getenv('FORECAST_PROPHET_MIN_POINTS', '30'))
+        self.workers = int(os.getenv('FORECAST_WORKERS', str(min(4, os.cpu_count() or 1))))
+        self.memory_limit = 256
+
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.stats = {'cache_hits': 0, 'model_reuses': 0, 'prophet_fits': 0, 'fast_path': 0, 'failures': 0}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def series_key(ts: np.ndarray, values: np.ndarray) -> str:
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(ts, dtype='int64').tobytes())
+        digest.update(np.ascontiguousarray(values, dtype='float64').tobytes())
+        return digest.hexdigest()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def _load(self, name: str) -> Optional[Any]:
+        with self._lock:
+            if name in self._memory:
+                self._memory.move_to_end(name)
+                return self._memory[name]
+        path = self._path(name)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._remember(name, value)
+        return value
+
+    def _store(self, name: str, value: Any):
+        self._remember(name, value)
+        tmp_path = f"{self._path(name)}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f)
+            os.replace(tmp_path, self._path(name))
+        except OSError as e:
+            logger.warning(f"⚠️ Falha ao gravar cache de previsão: {e}")
+
+    def _remember(self, name: str, value: Any):
+        with self._lock:
+            self._memory[name] = value
+            self._memory.move_to_end(name)
+            while len(self._memory) > self.memory_limit:
+                self._memory.popitem(last=False)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def forecast_many(self, series: Dict[str, Any], horizon_days: int) -> Dict[str, Dict[str, Any]]:
+        """
+        Gera previsões para várias séries
+
+        Args:
+            series: Nome -> DataFrame/lista de registros com timestamp e value
+            horizon_days: Horizonte de previsão em dias
+
+        Returns:
+            Dict: Nome -> {'linear_regression_forecast': [...], 'prophet_forecast': [...]}
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = []
+
+        for name, data in series.items():
+            ts, values = to_series(data)
+            if len(ts) < 2:
+                results[name] = {}
+                continue
+
+            key = self.series_key(ts, values)
+            forecast_name = f"{key}_{horizon_days}"
+            cached = self._load(forecast_name)
+            if cached is not None:
+                self.stats['cache_hits'] += 1
+                results[name] = cached
+                continue
+
+            # Caminho rápido: tendência em forma fechada, sempre calculada
+            results[name] = {'linear_regression_forecast': linear_trend_forecast(ts, values, horizon_days)}
+            self.stats['fast_path'] += 1
+
+            if HAS_PROPHET and len(ts) >= self.prophet_min_points:
+                model = self._load(f"{key}_model")
+                if model is not None:
+                    self.stats['model_reuses'] += 1
+                pending.append((name, key, forecast_name, ts, values, model))
+            else:
+                self._store(forecast_name, results[name])
+
+        if pending:
+            outputs = self._run_prophet(pending, horizon_days)
+            for (name, key, forecast_name, _, _, model), output in zip(pending, outputs):
+                # Prophet falhou: devolve só a tendência linear sem cachear, para tentar de novo na próxima chamada
+                if output is None:
+                    continue
+                results[name]['prophet_forecast'] = output['records']
+                if model is None:
+                    self.stats['prophet_fits'] += 1
+                    self._store(f"{key}_model", output['model_json'])
+                self._store(forecast_name, results[name])
+
+        # Cópias rasas: o chamador pode anotar o resultado sem alterar o cache em memória
+        return {name: dict(result) for name, result in results.items()}
+
+    def _run_prophet(self, pending: List[tuple], horizon_days: int) -> List[Optional[Dict[str, Any]]]:
+        """Ajusta modelos Prophet; em paralelo quando há mais de uma série"""
+        args = [(ts.tolist(), values.tolist(), horizon_days, model) for _, _, _, ts, values, model in pending]
+
+        if len(args) == 1 or self.workers <= 1:
+            futures = None
+        else:
+            try:
+                executor = self._get_executor()
+                futures = [executor.submit(_prophet_forecast, *a) for a in args]
+            except Exception as e:
+                logger.warning(f"⚠️ Pool de previsão indisponível, ajustando sequencialmente: {e}")
+                futures = None
+
+        outputs = []
+        for i, a in enumerate(args):
+            try:
+                outputs.append(futures[i].result() if futures else _prophet_forecast(*a))
+            except Exception as e:
+                self.stats['failures'] += 1
+                logger.error(f"❌ Erro ao criar modelo Prophet ({pending[i][0]}): {e}")
+                outputs.append(None)
+        return outputs
+
+    def forecast(self, temporal_data, horizon_days: int) -> Dict[str, Any]:
+        """Previsão de uma única série"""
+        return self.forecast_many({'value': temporal_data}, horizon_days)['value']
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'prophet_available': HAS_PROPHET, 'workers': self.workers}
+
+
+# Instância global
+forecast_engine = ForecastEngine()
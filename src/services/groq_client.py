@@ -7,7 +7,7 @@ Cliente para interagir com a API da Groq, servindo como um provedor de IA de alt
 import os
 import logging
 import time
-from typing import Optional
+from typing import Optional, Iterator
 
 try:
     from groq import Groq
@@ -97,5 +97,30 @@ class GroqClient:
             logger.error(f"❌ Erro na chamada da API Groq: {e}", exc_info=True)
             raise
 
+    def stream(self, prompt: str, max_tokens: int = 8192) -> Iterator[str]:
+        """
+        Gera texto em streaming, entregando os chunks conforme chegam.
+
+        Args:
+            prompt (str): O prompt para a geração de texto.
+            max_tokens (int): O número máximo de tokens a serem gerados.
+
+        Yields:
+            str: Trechos de texto gerados.
+        """
+        if not self.is_enabled():
+            raise Exception("Cliente Groq não está habilitado ou configurado corretamente.")
+
+        completion = self.client.chat.completions.create(
+            messages=[{"role": "user", "content": prompt}],
+            model="llama3-70b-8192",
+            max_tokens=max_tokens,
+            temperature=0.4,
+            stream=True,
+        )
+        for chunk in completion:
+            if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
 # Instância singleton
 groq_client = GroqClient()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - HTTP Client Pool
+Pool compartilhado de conexões HTTP para todas as chamadas externas
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+try:
+    import aiofiles
+    HAS_AIOFILES = True
+except ImportError:
+    HAS_AIOFILES = False
+
+try:
+    import httpx
+    # HTTP/2 no httpx depende do pacote h2 instalado
+    HAS_HTTP2 = importlib.util.find_spec('h2') is not None
+except ImportError:
+    HAS_HTTP2 = False
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+# Mesmos métodos que o adapter síncrono repete: reenviar POST poderia duplicar efeitos
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+
+class _RetryingRequest:
+    """Context manager de resposta com retry do pool; substitui o _RequestContextManager do aiohttp"""
+
+    def __init__(self, pool: 'HTTPClientPool', session, method: str, url: str, kwargs: Dict[str, Any]):
+        self._pool = pool
+        self._session = session
+        self._method = method
+        self._url = url
+        self._kwargs = kwargs
+        self._response = None
+
+    async def __aenter__(self):
+        self._response = await self._pool._send(self._session, self._method, self._url, **self._kwargs)
+        return self._response
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._response.release()
+
+
+class _SessionView:
+    """Visão sobre a sessão compartilhada que aplica timeout/headers padrão e retry por chamada"""
+
+    def __init__(self, pool: 'HTTPClientPool', session, timeout=None, headers: Optional[Dict[str, str]] = None, ssl=None):
+        self._pool = pool
+        self._session = session
+        self._timeout = timeout
+        self._headers = headers or {}
+        self._ssl = ssl
+
+    def _merge(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        if self._timeout is not None:
+            kwargs.setdefault('timeout', self._timeout)
+        if self._headers:
+            kwargs['headers'] = {**self._headers, **(kwargs.get('headers') or {})}
+        if self._ssl is not None:
+            kwargs.setdefault('ssl', self._ssl)
+        return kwargs
+
+    def request(self, method: str, url: str, **kwargs) -> _RetryingRequest:
+        return _RetryingRequest(self._pool, self._session, method, url, self._merge(kwargs))
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def head(self, url: str, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    @property
+    def closed(self) -> bool:
+        return self._session.closed
+
+
+class HTTPClientPool:
+    """Mantém uma sessão aiohttp por event loop e uma sessão síncrona compartilhada"""
+
+    def __init__(self):
+        """Inicializa o pool com configuração do ambiente"""
+        self.config = {
+            'limit': int(os.getenv('HTTP_POOL_LIMIT', '100')),
+            'limit_per_host': int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '10')),
+            'dns_ttl': int(os.getenv('HTTP_DNS_CACHE_TTL', '300')),
+            'keepalive_timeout': float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30')),
+            'total_timeout': float(os.getenv('HTTP_TIMEOUT_TOTAL', '30')),
+            'connect_timeout': float(os.getenv('HTTP_TIMEOUT_CONNECT', '10')),
+            'max_retries': int(os.getenv('HTTP_MAX_RETRIES', '2')),
+            'retry_backoff': float(os.getenv('HTTP_RETRY_BACKOFF', '0.5')),
+            'http2': os.getenv('HTTP_ENABLE_HTTP2', 'true').lower() == 'true'
+        }
+
+        self._sessions: Dict[int, Tuple[asyncio.AbstractEventLoop, Any]] = {}
+        self._lock = threading.Lock()
+        self._sync_session: Optional[requests.Session] = None
+        self._sync_adapter: Optional[HTTPAdapter] = None
+        self._sync_client = None
+
+        self.stats = {
+            'sessions_created': 0,
+            'requests': 0,
+            'retries': 0,
+            'failures': 0,
+            'bytes_downloaded': 0
+        }
+
+        logger.info(
+            f"🔌 HTTP Client Pool inicializado (limite {self.config['limit']}, "
+            f"{self.config['limit_per_host']}/host, HTTP/2 {'ativo' if HAS_HTTP2 and self.config['http2'] else 'indisponível'})"
+        )
+
+    def _default_timeout(self):
+        return aiohttp.ClientTimeout(
+            total=self.config['total_timeout'],
+            connect=self.config['connect_timeout']
+        )
+
+    def _create_session(self):
+        """Cria sessão aiohttp com connector ajustado (DNS cache, limites por host, keep-alive)"""
+        connector = aiohttp.TCPConnector(
+            limit=self.config['limit'],
+            limit_per_host=self.config['limit_per_host'],
+            ttl_dns_cache=self.config['dns_ttl'],
+            use_dns_cache=True,
+            keepalive_timeout=self.config['keepalive_timeout'],
+            enable_cleanup_closed=True
+        )
+        self.stats['sessions_created'] += 1
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=self._default_timeout(),
+            trust_env=True
+        )
+
+    def _prune_closed_loops(self):
+        """Descarta sessões de event loops já encerrados"""
+        for key, (loop, session) in list(self._sessions.items()):
+            if loop.is_closed():
+                self._sessions.pop(key, None)
+                try:
+                    if session.connector is not None and not session.connector.closed:
+                        session.connector.close()
+                except Exception:
+                    pass
+
+    async def get_session(self):
+        """Retorna a sessão aiohttp compartilhada do event loop atual"""
+        if not HAS_AIOHTTP:
+            raise RuntimeError("aiohttp não está instalado")
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._prune_closed_loops()
+            entry = self._sessions.get(id(loop))
+            if entry and entry[0] is loop and not entry[1].closed:
+                return entry[1]
+
+            session = self._create_session()
+            self._sessions[id(loop)] = (loop, session)
+            logger.debug(f"🔌 Nova sessão HTTP para event loop {id(loop)}")
+            return session
+
+    @asynccontextmanager
+    async def session(self, timeout=None, headers: Optional[Dict[str, str]] = None, verify_ssl: bool = True):
+        """Context manager que entrega a sessão compartilhada sem fechá-la ao sair"""
+        shared = await self.get_session()
+        yield _SessionView(self, shared, timeout=timeout, headers=headers, ssl=None if verify_ssl else False)
+
+    async def _send(self, session, method: str, url: str, retries: Optional[int] = None, **kwargs):
+        """
+        Envia a requisição e devolve a resposta aberta (o chamador a libera).
+        Métodos idempotentes repetem com backoff em erros de rede, 429 e 5xx; os demais têm uma tentativa
+        """
+        method = method.upper()
+        max_retries = (self.config['max_retries'] if retries is None else retries) if method in IDEMPOTENT_METHODS else 0
+
+        for attempt in range(max_retries + 1):
+            self.stats['requests'] += 1
+            try:
+                response = await session.request(method, url, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt >= max_retries:
+                    self.stats['failures'] += 1
+                    raise
+                self.stats['retries'] += 1
+                await asyncio.sleep(self.config['retry_backoff'] * (2 ** attempt))
+                continue
+
+            if response.status in RETRY_STATUS_CODES and attempt < max_retries:
+                retry_after = response.headers.get('Retry-After', '')
+                delay = float(retry_after) if retry_after.isdigit() else self.config['retry_backoff'] * (2 ** attempt)
+                response.release()
+                self.stats['retries'] += 1
+                logger.debug(f"🔄 {method} {url} retornou {response.status}, nova tentativa em {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status >= 400:
+                self.stats['failures'] += 1
+            return response
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        expect: str = 'json',
+        retries: Optional[int] = None,
+        **kwargs
+    ) -> Tuple[int, Any]:
+        """Executa requisição (com retry/backoff se idempotente) e retorna (status, corpo)"""
+        session = await self.get_session()
+        response = await self._send(session, method, url, retries=retries, **kwargs)
+        try:
+            if expect == 'json':
+                body = await response.json(content_type=None)
+            elif expect == 'text':
+                body = await response.text()
+            else:
+                body = await response.read()
+            return response.status, body
+        finally:
+            response.release()
+
+    async def stream_download(
+        self,
+        url: str,
+        dest_path: str,
+        max_bytes: int,
+        headers: Optional[Dict[str, str]] = None,
+        timeout=None,
+        verify_ssl: bool = True,
+        chunk_size: int = 65536
+    ) -> Dict[str, Any]:
+        """Baixa arquivo em streaming direto para disco respeitando limite de tamanho"""
+        session = await self.get_session()
+        tmp_path = f"{dest_path}.part"
+        kwargs: Dict[str, Any] = {'headers': headers or {}}
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        if not verify_ssl:
+            kwargs['ssl'] = False
+
+        received = False
+        try:
+            async with _RetryingRequest(self, session, 'GET', url, kwargs) as response:
+                received = True
+                if response.status != 200:
+                    return {'success': False, 'status': response.status, 'error': f'HTTP {response.status}'}
+
+                content_type = response.headers.get('content-type', '').lower()
+                content_length = response.headers.get('content-length')
+                if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                    return {'success': False, 'status': response.status, 'error': f'Arquivo muito grande: {content_length} bytes'}
+
+                size = 0
+                if HAS_AIOFILES:
+                    async with aiofiles.open(tmp_path, 'wb') as f:
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            size += len(chunk)
+                            if size > max_bytes:
+                                break
+                            await f.write(chunk)
+                else:
+                    with open(tmp_path, 'wb') as f:
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            size += len(chunk)
+                            if size > max_bytes:
+                                break
+                            f.write(chunk)
+
+                if size > max_bytes:
+                    os.remove(tmp_path)
+                    return {'success': False, 'status': response.status, 'error': f'Download excedeu {max_bytes} bytes'}
+
+                os.replace(tmp_path, dest_path)
+                self.stats['bytes_downloaded'] += size
+                return {
+                    'success': True,
+                    'status': response.status,
+                    'path': dest_path,
+                    'size': size,
+                    'content_type': content_type
+                }
+
+        except Exception as e:
+            # Falhas da própria requisição já foram contadas em _send
+            if received:
+                self.stats['failures'] += 1
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return {'success': False, 'error': str(e)}
+
+    async def close_current(self):
+        """Fecha a sessão do event loop atual (chamar antes de loop.close())"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._sessions.pop(id(loop), None)
+        if entry and not entry[1].closed:
+            await entry[1].close()
+
+    def _get_sync_adapter(self) -> HTTPAdapter:
+        """Adapter único (pool de conexões + retry para GET/HEAD/OPTIONS) montado em todas as sessões síncronas"""
+        if self._sync_adapter is None:
+            with self._lock:
+                if self._sync_adapter is None:
+                    retry = Retry(
+                        total=self.config['max_retries'],
+                        backoff_factor=self.config['retry_backoff'],
+                        status_forcelist=list(RETRY_STATUS_CODES),
+                        allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS'])
+                    )
+                    self._sync_adapter = HTTPAdapter(
+                        pool_connections=self.config['limit_per_host'] * 2,
+                        pool_maxsize=self.config['limit'],
+                        max_retries=retry
+                    )
+        return self._sync_adapter
+
+    def create_sync_session(self, headers: Optional[Dict[str, str]] = None, verify: bool = True) -> requests.Session:
+        """
+        Nova requests.Session com headers/cookies próprios (para serviços que configuram a sessão),
+        mas sobre o pool de conexões compartilhado
+        """
+        adapter = self._get_sync_adapter()
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.verify = verify
+        if headers:
+            session.headers.update(headers)
+        return session
+
+    def get_sync_session(self) -> requests.Session:
+        """Retorna requests.Session compartilhada com pool de conexões e retry"""
+        if self._sync_session is None:
+            session = self.create_sync_session()
+            with self._lock:
+                if self._sync_session is None:
+                    self._sync_session = session
+        return self._sync_session
+
+    def get_sync_client(self):
+        """Retorna cliente síncrono HTTP/2 (httpx) quando disponível, senão a requests.Session"""
+        if not (HAS_HTTP2 and self.config['http2']):
+            return self.get_sync_session()
+
+        if self._sync_client is None:
+            with self._lock:
+                if self._sync_client is None:
+                    self._sync_client = httpx.Client(
+                        http2=True,
+                        timeout=httpx.Timeout(self.config['total_timeout'], connect=self.config['connect_timeout']),
+                        limits=httpx.Limits(
+                            max_connections=self.config['limit'],
+                            max_keepalive_connections=self.config['limit_per_host'] * 2,
+                            keepalive_expiry=self.config['keepalive_timeout']
+                        ),
+                        follow_redirects=True
+                    )
+        return self._sync_client
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do pool"""
+        with self._lock:
+            active = sum(1 for loop, s in self._sessions.values() if not loop.is_closed() and not s.closed)
+        return {
+            **self.stats,
+            'active_sessions': active,
+            'http2_enabled': HAS_HTTP2 and self.config['http2'],
+            'config': self.config,
+            'timestamp': time.time()
+        }
+
+
+# Instância global
+http_client_pool = HTTPClientPool()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Image Store
+Armazenamento de imagens endereçado por conteúdo (SHA-256), com índice por URL e deduplicação
+perceptual restrita à sessão
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+from services.http_client_pool import http_client_pool
+from services.url_canonicalizer import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/jpg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif'
+}
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_dhash(path: str) -> Optional[int]:
+    """dHash de 64 bits para detectar a mesma imagem recodificada/redimensionada"""
+    if not HAS_PIL:
+        return None
+    try:
+        with Image.open(path) as image:
+            image.draft('L', (256, 256))
+            pixels = list(image.convert('L').resize((9, 8)).getdata())
+    except Exception:
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (1 if pixels[row * 9 + col] > pixels[row * 9 + col + 1] else 0)
+    return value
+
+
+def _informative(phash: int) -> bool:
+    """Imagens lisas/degradês geram dHash quase todo 0 (ou 1) e colidiriam entre si"""
+    return 8 <= bin(phash).count('1') <= 56
+
+
+class ImageStore:
+    """Blobs por SHA-256 compartilhados entre sessões; sessões referenciam via hardlink e manifesto"""
+
+    def __init__(self):
+        """Inicializa store com configuração do ambiente"""
+        self.root = os.getenv('IMAGE_STORE_DIR', 'image_store')
+        self.blob_dir = os.path.join(self.root, 'blobs')
+        self.tmp_dir = os.path.join(self.root, 'tmp')
+        self.db_path = os.path.join(self.root, 'index.sqlite3')
+        self.max_bytes = int(os.getenv('IMAGE_STORE_MAX_IMAGE_MB', '15')) * 1024 * 1024
+        self.min_bytes = 1024
+        self.phash_distance = int(os.getenv('IMAGE_STORE_PHASH_DISTANCE', '4'))
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # dHash dos blobs vistos em cada sessão: similaridade perceptual só vale dentro da sessão
+        self._session_phashes: Dict[str, List[Tuple[int, str]]] = {}
+        self.max_tracked_sessions = 64
+        self.stats = {
+            'url_hits': 0,
+            'downloads': 0,
+            'exact_duplicates': 0,
+            'perceptual_duplicates': 0,
+            'bytes_downloaded': 0,
+            'bytes_saved': 0
+        }
+
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._init_db()
+        logger.info(f"🗄️ Image Store inicializado em {self.root}")
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexão SQLite por thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                ext TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                content_type TEXT,
+                phash TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+
+    def blob_path(self, sha256: str, ext: str) -> str:
+        return os.path.join(self.blob_dir, sha256[:2], sha256[2:4], f"{sha256}.{ext}")
+
+    def _blob(self, sha256: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT sha256, ext, size, content_type FROM blobs WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+        if not row:
+            return None
+        path = self.blob_path(row[0], row[1])
+        if not os.path.exists(path):
+            return None
+        return {'sha256': row[0], 'ext': row[1], 'size': row[2], 'content_type': row[3], 'path': path}
+
+    def lookup_url(self, url: str) -> Optional[Dict[str, Any]]:
+        """Retorna blob já baixado para a URL (canônica), se existir"""
+        row = self._conn().execute("SELECT sha256 FROM urls WHERE url = ?", (canonicalize_url(url),)).fetchone()
+        return self._blob(row[0]) if row else None
+
+    def _near_duplicate(self, session_id: Optional[str], phash: Optional[int]) -> Optional[str]:
+        """Blob da mesma sessão perceptualmente igual (nunca entre sessões, nunca para imagens lisas)"""
+        if not session_id or phash is None or not _informative(phash):
+            return None
+        with self._lock:
+            for known, sha in self._session_phashes.get(session_id, []):
+                if bin(known ^ phash).count('1') <= self.phash_distance:
+                    return sha
+        return None
+
+    def _remember(self, session_id: Optional[str], phash: Optional[int], sha256: str):
+        """Registra o dHash do blob na sessão (mantém só as sessões mais recentes em memória)"""
+        if not session_id or phash is None or not _informative(phash):
+            return
+        with self._lock:
+            known = self._session_phashes.pop(session_id, [])
+            if all(sha != sha256 for _, sha in known):
+                known.append((phash, sha256))
+            self._session_phashes[session_id] = known
+            while len(self._session_phashes) > self.max_tracked_sessions:
+                self._session_phashes.pop(next(iter(self._session_phashes)))
+
+    def _blob_phash(self, sha256: str) -> Optional[int]:
+        row = self._conn().execute("SELECT phash FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        return int(row[0], 16) if row and row[0] else None
+
+    def ingest(self, tmp_path: str, url: str, content_type: str, session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Move arquivo baixado para o store (ou descarta se duplicado) e indexa a URL.
+        Duplicata perceptual só é reaproveitada dentro da mesma sessão e não entra no índice de URLs,
+        já que o conteúdo da URL não é o do blob reaproveitado
+        """
+        size = os.path.getsize(tmp_path)
+        sha256 = _file_sha256(tmp_path)
+        blob = self._blob(sha256)
+
+        if blob:
+            self.stats['exact_duplicates'] += 1
+            self.stats['bytes_saved'] += size
+            os.remove(tmp_path)
+            self._remember(session_id, self._blob_phash(sha256), sha256)
+        else:
+            phash = _file_dhash(tmp_path)
+            twin = self._near_duplicate(session_id, phash)
+            blob = self._blob(twin) if twin else None
+            if blob:
+                self.stats['perceptual_duplicates'] += 1
+                self.stats['bytes_saved'] += size
+                os.remove(tmp_path)
+                return blob
+            else:
+                ext = EXTENSIONS.get(content_type, 'jpg')
+                path = self.blob_path(sha256, ext)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+                self._conn().execute(
+                    "INSERT OR REPLACE INTO blobs(sha256, ext, size, content_type, phash, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (sha256, ext, size, content_type, f"{phash:016x}" if phash is not None else None, time.time())
+                )
+                self._remember(session_id, phash, sha256)
+                blob = {'sha256': sha256, 'ext': ext, 'size': size, 'content_type': content_type, 'path': path}
+
+        self._conn().execute(
+            "INSERT OR REPLACE INTO urls(url, sha256, fetched_at) VALUES (?, ?, ?)",
+            (canonicalize_url(url), blob['sha256'], time.time())
+        )
+        return blob
+
+    async def fetch(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout=None,
+        verify_ssl: bool = True,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Obtém imagem pelo store: URL já conhecida não é baixada de novo; novos downloads
+        são feitos em streaming com limite de tamanho e deduplicados por conteúdo
+
+        Returns:
+            Dict: success, blob (sha256, path, ...), source ('cache'|'download'), error
+        """
+        blob = self.lookup_url(url)
+        if blob:
+            self.stats['url_hits'] += 1
+            self.stats['bytes_saved'] += blob['size']
+            return {'success': True, 'blob': blob, 'source': 'cache'}
+
+        tmp_path = os.path.join(self.tmp_dir, uuid.uuid4().hex)
+        download = await http_client_pool.stream_download(
+            url, tmp_path, self.max_bytes, headers=headers, timeout=timeout, verify_ssl=verify_ssl
+        )
+        if not download.get('success'):
+            return {'success': False, 'error': download.get('error'), 'content_type': download.get('content_type')}
+
+        content_type = download['content_type'].split(';')[0].strip()
+        if 'image' not in content_type or download['size'] <= self.min_bytes:
+            os.remove(tmp_path)
+            return {'success': False, 'error': f"Conteúdo inválido ({content_type}, {download['size']} bytes)", 'content_type': content_type}
+
+        self.stats['downloads'] += 1
+        self.stats['bytes_downloaded'] += download['size']
+        blob = await asyncio.to_thread(self.ingest, tmp_path, url, content_type, session_id)
+        return {'success': True, 'blob': blob, 'source': 'download'}
+
+    def store_bytes(self, data: bytes, url: str, content_type: str, session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Ingere conteúdo já em memória (caminho síncrono)"""
+        if len(data) <= self.min_bytes or len(data) > self.max_bytes:
+            return None
+        tmp_path = os.path.join(self.tmp_dir, uuid.uuid4().hex)
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        self.stats['downloads'] += 1
+        self.stats['bytes_downloaded'] += len(data)
+        return self.ingest(tmp_path, url, content_type.split(';')[0].strip(), session_id)
+
+    def link_into_session(self, blob: Dict[str, Any], session_dir: str, source_url: str = '') -> str:
+        """Referencia o blob no diretório da sessão (hardlink) e registra no manifesto"""
+        os.makedirs(session_dir, exist_ok=True)
+        filename = f"{blob['sha256'][:16]}.{blob['ext']}"
+        target = os.path.join(session_dir, filename)
+
+        if not os.path.exists(target):
+            try:
+                os.link(blob['path'], target)
+            except OSError:
+                # Sistemas sem hardlink (ou outro volume): copia, para o arquivo ficar no diretório servido
+                shutil.copy2(blob['path'], target)
+
+        manifest_path = os.path.join(session_dir, 'manifest.json')
+        with self._lock:
+            manifest = {}
+            if os.path.exists(manifest_path):
+                try:
+                    with open(manifest_path, 'r', encoding='utf-8') as f:
+                        manifest = json.load(f)
+                except (OSError, ValueError):
+                    manifest = {}
+            entry = manifest.setdefault(blob['sha256'], {
+                'file': os.path.relpath(target, session_dir) if target.startswith(session_dir) else target,
+                'blob': blob['path'],
+                'size': blob['size'],
+                'content_type': blob['content_type'],
+                'source_urls': []
+            })
+            if source_url and source_url not in entry['source_urls']:
+                entry['source_urls'].append(source_url)
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+        return target
+
+    def cleanup_tmp(self, max_age: float = 3600):
+        """Remove downloads temporários órfãos"""
+        cutoff = time.time() - max_age
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do store"""
+        blobs, total_size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        urls = self._conn().execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        return {**self.stats, 'blobs': blobs, 'blob_bytes': total_size, 'indexed_urls': urls}
+
+
+# Instância global
+image_store = ImageStore()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Job Queue
+Fila durável em SQLite para as etapas do workflow e pool de processos workers que a consome
+"""
+
+import os
+import json
+import time
+import uuid
+import atexit
+import sqlite3
+import logging
+import importlib
+import threading
+import multiprocessing
+from typing import Dict, Any, Optional, List
+
+from services.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+
+
+class JobQueue:
+    """Jobs persistidos em SQLite; workers reservam com lease renovado por heartbeat"""
+
+    def __init__(self):
+        """Inicializa fila com configuração do ambiente"""
+        self.db_path = os.getenv('JOB_QUEUE_DB', os.path.join('jobs', 'queue.sqlite3'))
+        self.lease_seconds = int(os.getenv('JOB_LEASE_SECONDS', '60'))
+        self.max_attempts = int(os.getenv('JOB_MAX_ATTEMPTS', '2'))
+        self.max_result_chars = 20000
+
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._init_db()
+        logger.info(f"📬 Job Queue inicializada em {self.db_path}")
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexão SQLite por thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                task TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                session_id TEXT,
+                stage TEXT,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                heartbeat_at REAL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                error TEXT,
+                result TEXT
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_pending ON jobs (status, priority, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_session ON jobs (session_id)")
+
+    def _row(self, row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        return job
+
+    def enqueue(
+        self,
+        task: str,
+        payload: Dict[str, Any],
+        session_id: Optional[str] = None,
+        stage: Optional[str] = None,
+        priority: int = 0,
+        max_attempts: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Enfileira um job
+
+        Args:
+            task: Função no formato 'modulo:funcao', chamada com **payload no worker
+            payload: Argumentos serializáveis em JSON
+            priority: Maior valor é reservado primeiro
+        """
+        job_id = uuid.uuid4().hex
+        self._conn().execute(
+            """INSERT INTO jobs (id, task, payload, session_id, stage, status, priority, max_attempts, created_at)
+               VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)""",
+            (job_id, task, json.dumps(payload, ensure_ascii=False, default=str), session_id, stage,
+             priority, max_attempts or self.max_attempts, time.time())
+        )
+        logger.info(f"📥 Job {job_id[:8]} enfileirado: {stage or task} (sessão {session_id})")
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._row(self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list_jobs(self, session_id: Optional[str] = None, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Jobs mais recentes, opcionalmente filtrados por sessão e status"""
+        clauses, params = [], []
+        if session_id:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn().execute(
+            f"SELECT * FROM jobs {where} ORDER BY created_at DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancela job na fila imediatamente; job em execução é interrompido pelo heartbeat do worker"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+            (now, job_id)
+        )
+        conn.execute(
+            "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'",
+            (job_id,)
+        )
+        return self.get(job_id)
+
+    def _expire_leases(self, conn: sqlite3.Connection, now: float):
+        """Jobs de workers mortos (heartbeat vencido) voltam para a fila ou falham após o limite de tentativas"""
+        stale = now - self.lease_seconds
+        conn.execute(
+            """UPDATE jobs SET status = 'cancelled', finished_at = ?, worker = NULL
+               WHERE status = 'running' AND heartbeat_at < ? AND cancel_requested = 1""",
+            (now, stale)
+        )
+        conn.execute(
+            """UPDATE jobs SET status = 'failed', finished_at = ?, error = 'Worker perdido (lease expirado)'
+               WHERE status = 'running' AND heartbeat_at < ? AND attempts >= max_attempts""",
+            (now, stale)
+        )
+        requeued = conn.execute(
+            """UPDATE jobs SET status = 'queued', worker = NULL
+               WHERE status = 'running' AND heartbeat_at < ? AND attempts < max_attempts""",
+            (stale,)
+        ).rowcount
+        if requeued:
+            logger.warning(f"♻️ {requeued} job(s) de workers perdidos devolvidos à fila")
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Reserva atomicamente o próximo job da fila para o worker"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._expire_leases(conn, now)
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at LIMIT 1"
+            ).fetchone()
+            if row:
+                conn.execute(
+                    """UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1,
+                       started_at = ?, heartbeat_at = ?, error = NULL WHERE id = ?""",
+                    (worker_id, now, now, row['id'])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row['id']) if row else None
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Renova o lease; retorna True se o job deve ser interrompido (cancelado ou não pertence mais ao worker)"""
+        conn = self._conn()
+        conn.execute(
+            "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time(), job_id, worker_id)
+        )
+        row = conn.execute("SELECT status, worker, cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(not row or row['cancel_requested'] or row['status'] != 'running' or row['worker'] != worker_id)
+
+    def finish(self, job_id: str, worker_id: str, result: Any = None):
+        encoded = json.dumps(result, ensure_ascii=False, default=str) if result is not None else None
+        if encoded and len(encoded) > self.max_result_chars:
+            encoded = json.dumps({'truncated': True, 'preview': encoded[:self.max_result_chars]})
+        self._conn().execute(
+            """UPDATE jobs SET status = 'succeeded', finished_at = ?, result = ?
+               WHERE id = ? AND worker = ? AND status = 'running'""",
+            (time.time(), encoded, job_id, worker_id)
+        )
+
+    def fail(self, job_id: str, worker_id: str, error: str):
+        """Registra falha; volta para a fila enquanto houver tentativas"""
+        self._conn().execute(
+            """UPDATE jobs SET error = ?, worker = NULL,
+                   status = CASE WHEN attempts < max_attempts AND cancel_requested = 0 THEN 'queued' ELSE 'failed' END,
+                   finished_at = CASE WHEN attempts < max_attempts AND cancel_requested = 0 THEN NULL ELSE ? END
+               WHERE id = ? AND worker = ? AND status = 'running'""",
+            (error[:2000], time.time(), job_id, worker_id)
+        )
+
+    def mark_cancelled(self, job_id: str, worker_id: str):
+        self._conn().execute(
+            """UPDATE jobs SET status = 'cancelled', finished_at = ?, worker = NULL
+               WHERE id = ? AND worker = ? AND status = 'running'""",
+            (time.time(), job_id, worker_id)
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        counts = {status: 0 for status in JOB_STATUSES}
+        for row in conn.execute("SELECT status, COUNT(*) AS total FROM jobs GROUP BY status"):
+            counts[row['status']] = row['total']
+        oldest = conn.execute("SELECT MIN(created_at) AS oldest FROM jobs WHERE status = 'queued'").fetchone()['oldest']
+        return {
+            'db_path': self.db_path,
+            'jobs': counts,
+            'oldest_queued_seconds': round(time.time() - oldest, 1) if oldest else 0,
+            'lease_seconds': self.lease_seconds,
+            'max_attempts': self.max_attempts
+        }
+
+
+def _resolve_task(task: str):
+    module_name, _, func_name = task.partition(':')
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _run_job(job: Dict[str, Any], worker_id: str):
+    """Executa o job com heartbeat; cancelamento encerra o processo (o supervisor cria outro)"""
+    done = threading.Event()
+    interval = max(job_queue.lease_seconds / 4, 1)
+
+    def beat():
+        while not done.wait(interval):
+            try:
+                if job_queue.heartbeat(job['id'], worker_id):
+                    job_queue.mark_cancelled(job['id'], worker_id)
+                    logger.warning(f"🛑 Job {job['id'][:8]} interrompido (cancelado ou reatribuído); reiniciando worker {worker_id}")
+                    os._exit(3)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Falha no heartbeat do job {job['id'][:8]}: {e}")
+
+    threading.Thread(target=beat, name=f'job-heartbeat-{worker_id}', daemon=True).start()
+    try:
+        func = _resolve_task(job['task'])
+        with tracer.span(job['stage'] or job['task'], kind='stage', session_id=job['session_id'],
+                         job_id=job['id'], attempt=job['attempts'], worker=worker_id):
+            result = func(**job['payload'])
+        job_queue.finish(job['id'], worker_id, result)
+        logger.info(f"✅ Job {job['id'][:8]} concluído ({job['stage'] or job['task']})")
+    except Exception as e:
+        job_queue.fail(job['id'], worker_id, f"{type(e).__name__}: {e}")
+        logger.error(f"❌ Job {job['id'][:8]} falhou (tentativa {job['attempts']}/{job['max_attempts']}): {e}")
+    finally:
+        done.set()
+
+
+def worker_main(worker_id: str, parent_pid: int, poll_interval: float):
+    """Loop do processo worker: reserva, executa e repete enquanto o processo pai existir"""
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logger.info(f"👷 Worker {worker_id} iniciado (pid {os.getpid()})")
+
+    while os.getppid() == parent_pid:
+        try:
+            job = job_queue.claim(worker_id)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Worker {worker_id} não conseguiu reservar job: {e}")
+            job = None
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        _run_job(job, worker_id)
+
+    logger.info(f"👋 Worker {worker_id} encerrado (processo pai finalizado)")
+
+
+class WorkerPool:
+    """Processos workers supervisionados: workers mortos (ou cancelados) são recriados"""
+
+    def __init__(self):
+        """Inicializa pool com configuração do ambiente"""
+        self.size = int(os.getenv('JOB_WORKERS', str(min(os.cpu_count() or 2, 4))))
+        self.poll_interval = float(os.getenv('JOB_POLL_SECONDS', '1.0'))
+        # Embutido, cada processo web sobe seu próprio pool de JOB_WORKERS processos (spawn): com gunicorn
+        # -w N são N pools. Em produção com vários workers web use JOB_WORKERS_EMBEDDED=false e rode worker.py
+        self.embedded = os.getenv('JOB_WORKERS_EMBEDDED', 'true').lower() == 'true'
+
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context('spawn')
+        self._workers: Dict[str, Any] = {}
+        self._stop = threading.Event()
+        self._supervisor = None
+        self.restarts = 0
+
+    def _spawn(self, worker_id: str):
+        process = self._context.Process(
+            target=worker_main, args=(worker_id, os.getpid(), self.poll_interval), name=f'arqv30-{worker_id}'
+        )
+        process.start()
+        self._workers[worker_id] = process
+
+    def _supervise(self):
+        while not self._stop.wait(2.0):
+            with self._lock:
+                for worker_id, process in list(self._workers.items()):
+                    if not process.is_alive() and not self._stop.is_set():
+                        logger.warning(f"♻️ Worker {worker_id} saiu (código {process.exitcode}); recriando")
+                        self.restarts += 1
+                        self._spawn(worker_id)
+
+    def start(self):
+        """Sobe os processos workers e o supervisor (idempotente)"""
+        with self._lock:
+            if self._supervisor is not None:
+                return
+            self._stop.clear()
+            prefix = f"w{os.getpid()}"
+            for index in range(self.size):
+                self._spawn(f"{prefix}-{index}")
+            self._supervisor = threading.Thread(target=self._supervise, name='job-supervisor', daemon=True)
+            self._supervisor.start()
+        atexit.register(self.stop)
+        logger.info(f"👷 Pool de {self.size} workers iniciado")
+
+    def ensure_started(self):
+        """
+        Sobe o pool embutido no processo web, exceto quando os workers rodam à parte (worker.py).
+        O pool é por processo: cada worker do gunicorn que enfileirar uma etapa inicia JOB_WORKERS processos
+        """
+        if self.embedded and self._supervisor is None:
+            self.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Encerra os workers; jobs interrompidos voltam para a fila quando o lease vencer"""
+        with self._lock:
+            if self._supervisor is None:
+                return
+            self._stop.set()
+            for process in self._workers.values():
+                process.terminate()
+            for process in self._workers.values():
+                process.join(timeout)
+            self._workers.clear()
+            self._supervisor = None
+        logger.info("👷 Pool de workers encerrado")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            workers = {worker_id: {'pid': process.pid, 'alive': process.is_alive()}
+                       for worker_id, process in self._workers.items()}
+        return {
+            'size': self.size,
+            'embedded': self.embedded,
+            'running': self._supervisor is not None,
+            'restarts': self.restarts,
+            'workers': workers
+        }
+
+
+# Instâncias globais
+job_queue = JobQueue()
+worker_pool = WorkerPool()
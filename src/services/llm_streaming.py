@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - LLM Streaming
+Suporte a geração em streaming: métricas TTFT/tokens por segundo, saída parcial em disco e barramento de progresso
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable, Iterator, AsyncIterator
+
+logger = logging.getLogger(__name__)
+
+_SENTINEL = object()
+
+# Chunks são agrupados antes de ir para a fila de progresso (no máximo uma publicação por intervalo)
+PUBLISH_INTERVAL = float(os.getenv('LLM_STREAM_PUBLISH_INTERVAL', '0.5'))
+PROGRESS_QUEUE_LIMIT = 100
+
+
+class ResumedPartial(str):
+    """Saída parcial de uma geração anterior reemitida na retomada (não veio do provedor atual)"""
+
+
+class StreamMetrics:
+    """Métricas de streaming por provedor (time-to-first-token e tokens/s)"""
+
+    def __init__(self, window: int = 100):
+        self._samples: Dict[str, deque] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, ttft: Optional[float], chars: int, duration: float, success: bool = True):
+        """Registra uma geração em streaming"""
+        tokens = chars / 4.0
+        generation_time = max(1e-6, duration - (ttft or 0.0))
+        with self._lock:
+            samples = self._samples.setdefault(provider, deque(maxlen=self._window))
+            samples.append({
+                'ttft': ttft,
+                'tokens': tokens,
+                'tokens_per_sec': tokens / generation_time if tokens else 0.0,
+                'duration': duration,
+                'success': success,
+                'timestamp': time.time()
+            })
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna médias e p90 por provedor"""
+        stats = {}
+        with self._lock:
+            for provider, samples in self._samples.items():
+                ttfts = sorted(s['ttft'] for s in samples if s['ttft'] is not None)
+                rates = [s['tokens_per_sec'] for s in samples if s['success'] and s['tokens']]
+                stats[provider] = {
+                    'samples': len(samples),
+                    'failures': sum(1 for s in samples if not s['success']),
+                    'avg_ttft': round(sum(ttfts) / len(ttfts), 3) if ttfts else None,
+                    'p90_ttft': round(ttfts[min(len(ttfts) - 1, int(len(ttfts) * 0.9))], 3) if ttfts else None,
+                    'avg_tokens_per_sec': round(sum(rates) / len(rates), 1) if rates else None
+                }
+        return stats
+
+
+class PartialOutputStore:
+    """Persiste saída parcial em disco durante o streaming para retomada"""
+
+    def __init__(self, base_dir: str = 'analyses_data'):
+        self.base_dir = base_dir
+
+    def _path(self, session_id: str, key: str) -> str:
+        safe_key = ''.join(c if c.isalnum() or c in '-_' else '_' for c in key)
+        return os.path.join(self.base_dir, session_id, 'partial', f"{safe_key}.md")
+
+    def load(self, session_id: str, key: str) -> str:
+        """Carrega saída parcial existente"""
+        path = self._path(session_id, key)
+        if not os.path.exists(path):
+            return ''
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def open_for_append(self, session_id: str, key: str):
+        """Abre arquivo parcial para escrita incremental"""
+        path = self._path(session_id, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path, 'a', encoding='utf-8')
+
+    def clear(self, session_id: str, key: str):
+        """Remove saída parcial após geração concluída"""
+        path = self._path(session_id, key)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def build_continuation_prompt(prompt: str, partial: str, tail_chars: int = 4000) -> str:
+    """Monta prompt para continuar uma geração interrompida sem repetir o texto já gerado"""
+    return (
+        f"{prompt}\n\n"
+        f"IMPORTANTE: uma geração anterior foi interrompida. O trecho abaixo já foi produzido "
+        f"e será mantido. Continue EXATAMENTE de onde ele parou, sem repetir nada:\n\n"
+        f"---\n{partial[-tail_chars:]}\n---"
+    )
+
+
+def publish_chunk(session_id: Optional[str], key: Optional[str], provider: str, chunk: str, total_chars: int):
+    """Encaminha chunk (já agrupado) para a fila de progresso da sessão (consumida por /api/poll)"""
+    if not session_id:
+        return
+    try:
+        from routes.progress import progress_queues
+    except ImportError:
+        return
+
+    queue = progress_queues.get(session_id)
+    if queue is None:
+        return
+    try:
+        # Mesmo limite do progress tracker: fila muito cheia (ninguém consumindo) é descartada
+        if queue.qsize() > PROGRESS_QUEUE_LIMIT:
+            while not queue.empty():
+                try:
+                    queue.get_nowait()
+                except Exception:
+                    break
+        queue.put_nowait({
+            'type': 'llm_stream',
+            'session_id': session_id,
+            'stream_key': key,
+            'provider': provider,
+            'chunk': chunk,
+            'total_chars': total_chars,
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.debug(f"⚠️ Falha ao publicar chunk no progresso: {e}")
+
+
+async def iterate_in_thread(factory: Callable[[], Iterator[str]]) -> AsyncIterator[str]:
+    """Consome iterador bloqueante de SDK em thread, entregando chunks ao event loop"""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def worker():
+        try:
+            for item in factory():
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _SENTINEL)
+
+    threading.Thread(target=worker, daemon=True).start()
+
+    while True:
+        item = await queue.get()
+        if item is _SENTINEL:
+            break
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+async def stream_with_persistence(
+    provider: str,
+    prompt: str,
+    factory_for: Callable[[str], Callable[[], Iterator[str]]],
+    session_id: Optional[str] = None,
+    stream_key: Optional[str] = None,
+    on_chunk: Optional[Callable[[str], None]] = None,
+    replay_partial: bool = True
+) -> AsyncIterator[str]:
+    """
+    Executa geração em streaming com retomada, persistência incremental e métricas
+
+    Args:
+        provider: Nome do provedor (para métricas)
+        prompt: Prompt original
+        factory_for: Recebe o prompt efetivo e retorna fábrica do iterador de chunks do SDK
+        session_id: Sessão (habilita persistência parcial e progresso)
+        stream_key: Identificador da geração (ex.: nome do módulo)
+        on_chunk: Callback opcional por chunk
+        replay_partial: Reemite o parcial salvo (como ResumedPartial) antes dos chunks novos;
+            False quando o consumidor já o recebeu numa tentativa anterior com outro provedor
+    """
+    persist = bool(session_id and stream_key)
+    partial = partial_output_store.load(session_id, stream_key) if persist else ''
+    effective_prompt = build_continuation_prompt(prompt, partial) if partial else prompt
+
+    if partial:
+        logger.info(f"🔄 Retomando {stream_key} a partir de {len(partial)} caracteres parciais")
+        if replay_partial:
+            yield ResumedPartial(partial)
+
+    start_time = time.time()
+    first_token_at = None
+    total_chars = 0
+    pending = []
+    last_publish = 0.0
+    handle = partial_output_store.open_for_append(session_id, stream_key) if persist else None
+
+    try:
+        async for chunk in iterate_in_thread(factory_for(effective_prompt)):
+            if not chunk:
+                continue
+            if first_token_at is None:
+                first_token_at = time.time()
+            total_chars += len(chunk)
+            if handle:
+                handle.write(chunk)
+                handle.flush()
+            pending.append(chunk)
+            if time.time() - last_publish >= PUBLISH_INTERVAL:
+                publish_chunk(session_id, stream_key, provider, ''.join(pending), len(partial) + total_chars)
+                pending.clear()
+                last_publish = time.time()
+            if on_chunk:
+                on_chunk(chunk)
+            yield chunk
+    except Exception:
+        llm_stream_metrics.record(
+            provider, (first_token_at - start_time) if first_token_at else None,
+            total_chars, time.time() - start_time, success=False
+        )
+        raise
+    finally:
+        if handle:
+            handle.close()
+        if pending:
+            publish_chunk(session_id, stream_key, provider, ''.join(pending), len(partial) + total_chars)
+
+    duration = time.time() - start_time
+    ttft = (first_token_at - start_time) if first_token_at else None
+    llm_stream_metrics.record(provider, ttft, total_chars, duration)
+    if persist:
+        partial_output_store.clear(session_id, stream_key)
+
+    logger.info(
+        f"✅ {provider} stream: {total_chars} caracteres em {duration:.2f}s"
+        f" (TTFT {ttft:.2f}s)" if ttft is not None else f"✅ {provider} stream: sem conteúdo em {duration:.2f}s"
+    )
+
+
+# Instâncias globais
+llm_stream_metrics = StreamMetrics()
+partial_output_store = PartialOutputStore()
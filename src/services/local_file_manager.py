@@ -6,13 +6,16 @@ Gerenciador de arquivos locais para análises ultra-detalhadas
 """
 
 import os
+import re
 import logging
 import json
 import time
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import uuid
 
+from services.session_archive import session_archive
+
 logger = logging.getLogger(__name__)
 
 class LocalFileManager:
@@ -256,6 +259,49 @@ class LocalFileManager:
         
         return None
     
+    def get_export_file_list(self, analysis_id: str) -> List[Tuple[str, str]]:
+        """Lista exata de arquivos de uma análise como (caminho, nome no ZIP)"""
+
+        if not analysis_id or not re.fullmatch(r'[\w\-]+', analysis_id):
+            return []
+
+        base_dir = os.path.realpath(self.base_dir)
+        selected: Dict[str, str] = {}
+
+        def _add(path: str):
+            real_path = os.path.realpath(path)
+            if real_path.startswith(base_dir + os.sep) and (os.path.isfile(real_path) or session_archive.exists(path)):
+                selected[real_path] = os.path.relpath(real_path, base_dir).replace(os.sep, '/')
+
+        # Análises salvas localmente: os metadados registram os arquivos gerados
+        metadata_dir = os.path.join(base_dir, 'metadata')
+        if os.path.isdir(metadata_dir):
+            prefix = f"{analysis_id[:8]}_"
+            for filename in os.listdir(metadata_dir):
+                if not (filename.startswith(prefix) and filename.endswith('_metadata.json')):
+                    continue
+                metadata_path = os.path.join(metadata_dir, filename)
+                try:
+                    with open(metadata_path, 'r', encoding='utf-8') as f:
+                        metadata = json.load(f)
+                except Exception as e:
+                    logger.warning(f"⚠️ Metadata ilegível {filename}: {str(e)}")
+                    continue
+                if metadata.get('analysis_id') != analysis_id:
+                    continue
+                for entry in metadata.get('files_saved', []):
+                    if entry.get('type') and entry.get('name'):
+                        _add(os.path.join(base_dir, entry['type'], os.path.basename(entry['name'])))
+                _add(metadata_path)
+
+        # Sessões do workflow: diretório da sessão e capturas associadas; arquivos de sessões
+        # compactadas entram pelo caminho original, reconstruídos a partir do arquivo da sessão
+        for session_dir in (os.path.join(base_dir, analysis_id), os.path.join(base_dir, 'files', analysis_id)):
+            for path, _ in session_archive.iter_files(session_dir):
+                _add(path)
+
+        return sorted(selected.items(), key=lambda item: item[1])
+
     def delete_local_analysis(self, analysis_id: str) -> bool:
         """Remove análise local por ID"""
         
@@ -18,6 +18,7 @@ from concurrent.futures import ThreadPoolExecutor
 from services.enhanced_search_coordinator import enhanced_search_coordinator
 from services.social_media_extractor import social_media_extractor
 from services.auto_save_manager import salvar_etapa, salvar_erro
+from services.delta_analysis import delta_analyzer
 
 # Importa novos serviços da Etapa 1
 from services.search_api_manager import search_api_manager
@@ -114,10 +115,13 @@ class MassiveDataCollector:
             }
         }
 
+        # Modo delta: a coleta é comparada com a última execução do mesmo nicho
+        delta_analyzer.register_session(session_id, context)
+
         try:
             # FASE 1: Busca Web Intercalada com Rotação de APIs
             logger.info("🔍 FASE 1: Executando busca web intercalada...")
-            web_results = await search_api_manager.interleaved_search(query)
+            web_results = await search_api_manager.interleaved_search(query, session_id=session_id)
             massive_data["web_search_data"] = web_results
 
             # FASE 2: Coleta de Tendências via TrendFinder MCP
@@ -236,6 +240,11 @@ class MassiveDataCollector:
 
             massive_data["extracted_content"] = all_results
 
+            # Diferença em relação à coleta anterior do nicho (URL + hash de conteúdo)
+            delta = delta_analyzer.record_collection(session_id, all_results)
+            if delta:
+                massive_data["delta"] = delta
+
             # Calcula estatísticas finais
             collection_time = time.time() - start_time
             total_sources = len(all_results)
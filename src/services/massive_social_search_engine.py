@@ -9,7 +9,6 @@ import json
 import time
 import asyncio
 import aiohttp
-import requests
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
@@ -27,10 +26,27 @@ try:
 except ImportError:
     get_api_manager = None
 from services.playwright_social_extractor import PlaywrightSocialExtractor, extract_viral_content_massive
+from services.post_store import PostStore, HAS_NUMPY
+from services.http_client_pool import http_client_pool
+
+try:
+    import numpy as np
+    import scipy.sparse as sp
+    from scipy.sparse.csgraph import connected_components
+    from services.network_analyzer import pagerank_csr
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+try:
+    import networkx as nx
+    HAS_NETWORKX = True
+except ImportError:
+    HAS_NETWORKX = False
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(slots=True)
 class SocialPost:
     platform: str
     post_id: str
@@ -49,7 +65,7 @@ class SocialPost:
     timestamp: datetime
     location: Optional[str] = None
     
-@dataclass
+@dataclass(slots=True)
 class SocialProfile:
     platform: str
     username: str
@@ -99,7 +115,8 @@ class MassiveSocialSearchEngine:
             self.insta_loader = instaloader.Instaloader()
             
             # YouTube API
-            youtube_api = self.api_manager.get_active_api('youtube')
+            # Só a chave para configurar o cliente: sem reserva de chamada no disjuntor/roteador
+            youtube_api = self.api_manager.get_active_api('youtube', lease=False)
             if youtube_api:
                 self.youtube_service = build('youtube', 'v3', developerKey=youtube_api.api_key)
             
@@ -211,11 +228,17 @@ class MassiveSocialSearchEngine:
             )
             all_posts.append(social_post)
         
-        # Filtrar por engajamento mínimo
-        filtered_posts = [p for p in all_posts if (p.likes + p.comments + p.shares + p.views) >= min_engagement]
-        
-        # Ordenar por engajamento
-        filtered_posts.sort(key=lambda x: x.engagement_rate, reverse=True)
+        if HAS_NUMPY and all_posts:
+            # Filtro e ordenação vetorizados sobre as colunas
+            store = PostStore.from_posts(all_posts)
+            total_engagement = store.column('likes') + store.column('comments') + store.column('shares') + store.column('views')
+            filtered_posts = store.top_items('engagement_rate', mask=total_engagement >= min_engagement)
+        else:
+            # Filtrar por engajamento mínimo
+            filtered_posts = [p for p in all_posts if (p.likes + p.comments + p.shares + p.views) >= min_engagement]
+            
+            # Ordenar por engajamento
+            filtered_posts.sort(key=lambda x: x.engagement_rate, reverse=True)
         
         search_results = SearchResults(
             query=query,
@@ -522,27 +545,38 @@ class MassiveSocialSearchEngine:
         return posts, profiles
     
     def _calculate_engagement_stats(self, posts: List[SocialPost]) -> Dict[str, float]:
-        """Calcula estatísticas de engajamento"""
+        """Calcula estatísticas de engajamento (agregação por plataforma em uma única passada)"""
         if not posts:
             return {}
         
-        total_likes = sum(p.likes for p in posts)
-        total_comments = sum(p.comments for p in posts)
-        total_shares = sum(p.shares for p in posts)
-        total_views = sum(p.views for p in posts)
-        
-        avg_engagement = sum(p.engagement_rate for p in posts) / len(posts)
-        
-        # Calcular por plataforma
-        platform_stats = {}
-        for platform in set(p.platform for p in posts):
-            platform_posts = [p for p in posts if p.platform == platform]
-            platform_stats[platform] = {
-                'posts': len(platform_posts),
-                'avg_likes': sum(p.likes for p in platform_posts) / len(platform_posts),
-                'avg_comments': sum(p.comments for p in platform_posts) / len(platform_posts),
-                'avg_engagement': sum(p.engagement_rate for p in platform_posts) / len(platform_posts)
+        if HAS_NUMPY:
+            return PostStore.from_posts(posts).engagement_stats()
+        else:
+            # Sem NumPy: acumula por plataforma em uma única varredura
+            accumulator = {}
+            for p in posts:
+                acc = accumulator.setdefault(p.platform, [0, 0, 0, 0, 0, 0.0])
+                acc[0] += 1
+                acc[1] += p.likes
+                acc[2] += p.comments
+                acc[3] += p.shares
+                acc[4] += p.views
+                acc[5] += p.engagement_rate
+            
+            platform_stats = {
+                platform: {
+                    'posts': acc[0],
+                    'avg_likes': acc[1] / acc[0],
+                    'avg_comments': acc[2] / acc[0],
+                    'avg_engagement': acc[5] / acc[0]
+                }
+                for platform, acc in accumulator.items()
             }
+            total_likes = sum(acc[1] for acc in accumulator.values())
+            total_comments = sum(acc[2] for acc in accumulator.values())
+            total_shares = sum(acc[3] for acc in accumulator.values())
+            total_views = sum(acc[4] for acc in accumulator.values())
+            avg_engagement = sum(acc[5] for acc in accumulator.values()) / len(posts)
         
         return {
             'total_posts': len(posts),
@@ -569,7 +603,7 @@ class MassiveSocialSearchEngine:
                 
                 for i, img_url in enumerate(post.image_urls):
                     try:
-                        response = requests.get(img_url, timeout=10)
+                        response = http_client_pool.get_sync_session().get(img_url, timeout=10)
                         if response.status_code == 200:
                             filename = f"{post.post_id}_{i}.jpg"
                             filepath = os.path.join(platform_dir, filename)
@@ -643,14 +677,106 @@ class MassiveSocialSearchEngine:
             'platform_preferences': {}
         }
     
-    def _build_hashtag_network(self, posts: List[SocialPost]) -> Dict[str, Any]:
-        """Constrói rede de relacionamento entre hashtags"""
-        return {
+    def _build_hashtag_network(self, posts: List[SocialPost], max_nodes: int = 300, max_edges: int = 1000) -> Dict[str, Any]:
+        """Constrói rede de coocorrência de hashtags via produto esparso post×hashtag"""
+        network = {
             'nodes': [],
             'edges': [],
             'clusters': [],
             'centrality_scores': {}
         }
+        
+        # Interna hashtags normalizadas para ids inteiros
+        vocabulary: Dict[str, int] = {}
+        rows, cols = [], []
+        for row, post in enumerate(posts):
+            for tag in {h.lower().lstrip('#') for h in (post.hashtags or []) if h and h.strip('#')}:
+                rows.append(row)
+                cols.append(vocabulary.setdefault(tag, len(vocabulary)))
+        
+        if not vocabulary:
+            return network
+        
+        if not HAS_SCIPY:
+            logger.warning("⚠️ SciPy não disponível - rede de hashtags desabilitada")
+            return network
+        
+        tags = np.array(list(vocabulary), dtype=object)
+        engagement = np.array([p.likes + p.comments + p.shares for p in posts], dtype=float)
+        incidence = sp.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(posts), len(vocabulary))
+        )
+        
+        frequency = np.asarray(incidence.sum(axis=0)).ravel()
+        tag_engagement = incidence.T @ engagement
+        
+        # Mantém as hashtags mais frequentes antes do produto para limitar o tamanho da rede
+        keep = np.argsort(-frequency, kind='stable')[:max_nodes]
+        incidence = incidence[:, keep]
+        tags, frequency, tag_engagement = tags[keep], frequency[keep], tag_engagement[keep]
+        
+        # Coocorrência: (hashtag×post)·(post×hashtag), sem a diagonal
+        cooccurrence = (incidence.T @ incidence).tocsr()
+        cooccurrence = (cooccurrence - sp.diags(cooccurrence.diagonal())).tocsr()
+        cooccurrence.eliminate_zeros()
+        
+        pagerank = pagerank_csr(cooccurrence)
+        weighted_degree = np.asarray(cooccurrence.sum(axis=1)).ravel()
+        
+        # Comunidades: Louvain quando NetworkX disponível, senão componentes conexos
+        communities: List[List[int]] = []
+        if HAS_NETWORKX and cooccurrence.nnz and hasattr(nx.community, 'louvain_communities'):
+            graph = nx.from_scipy_sparse_array(cooccurrence)
+            communities = [sorted(c) for c in nx.community.louvain_communities(graph, weight='weight', seed=42)]
+        else:
+            n_components, labels = connected_components(cooccurrence, directed=False)
+            communities = [np.flatnonzero(labels == c).tolist() for c in range(n_components)]
+        communities = sorted((c for c in communities if len(c) > 1), key=len, reverse=True)
+        
+        cluster_of = {}
+        for cluster_id, members in enumerate(communities):
+            for member in members:
+                cluster_of[member] = cluster_id
+        
+        network['nodes'] = [
+            {
+                'id': f"#{tags[i]}",
+                'frequency': int(frequency[i]),
+                'engagement': float(tag_engagement[i]),
+                'weighted_degree': float(weighted_degree[i]),
+                'cluster': cluster_of.get(i)
+            }
+            for i in range(len(tags))
+        ]
+        
+        upper = sp.triu(cooccurrence, k=1).tocoo()
+        strongest = np.argsort(-upper.data, kind='stable')[:max_edges]
+        network['edges'] = [
+            {'source': f"#{tags[upper.row[e]]}", 'target': f"#{tags[upper.col[e]]}", 'weight': int(upper.data[e])}
+            for e in strongest
+        ]
+        
+        network['clusters'] = [
+            {
+                'id': cluster_id,
+                'size': len(members),
+                'hashtags': [f"#{tags[m]}" for m in sorted(members, key=lambda m: -frequency[m])[:20]]
+            }
+            for cluster_id, members in enumerate(communities)
+        ]
+        
+        network['centrality_scores'] = {
+            f"#{tags[i]}": {'pagerank': float(pagerank[i]), 'weighted_degree': float(weighted_degree[i])}
+            for i in np.argsort(-pagerank, kind='stable')[:50]
+        }
+        network['stats'] = {
+            'total_hashtags': len(vocabulary),
+            'hashtags_in_network': len(tags),
+            'cooccurrence_pairs': int(upper.nnz)
+        }
+        
+        return network
     
     def _analyze_content_patterns(self, posts: List[SocialPost]) -> Dict[str, Any]:
         """Analisa padrões de conteúdo"""
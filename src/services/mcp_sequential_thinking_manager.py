@@ -1,6 +1,7 @@
 import os
 import requests
 import logging
+from services.http_client_pool import http_client_pool
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +24,7 @@ class MCPSequentialThinkingManager:
             "initial_context": initial_context if initial_context else {}
         }
         try:
-            response = requests.post(endpoint, json=payload)
+            response = http_client_pool.get_sync_session().post(endpoint, json=payload)
             response.raise_for_status()  # Levanta um erro para códigos de status HTTP ruins (4xx ou 5xx)
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -38,7 +39,7 @@ class MCPSequentialThinkingManager:
             "user_input": user_input
         }
         try:
-            response = requests.post(endpoint, json=payload)
+            response = http_client_pool.get_sync_session().post(endpoint, json=payload)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -50,7 +51,7 @@ class MCPSequentialThinkingManager:
         endpoint = f"{self.base_url}/status"
         payload = {"process_id": process_id}
         try:
-            response = requests.post(endpoint, json=payload)
+            response = http_client_pool.get_sync_session().post(endpoint, json=payload)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
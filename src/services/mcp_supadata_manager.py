@@ -6,12 +6,12 @@ Cliente para pesquisa REAL em redes sociais com extração universal
 """
 
 import os
-import requests
 import logging
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 import json
 import time
+from services.http_client_pool import http_client_pool
 
 logger = logging.getLogger(__name__)
 
@@ -107,7 +107,7 @@ class MCPSupadataManager:
                 'X-With-Generated-Alt': 'false'
             }
 
-            response = requests.get(jina_url, headers=headers, timeout=30)
+            response = http_client_pool.get_sync_session().get(jina_url, headers=headers, timeout=30)
 
             if response.status_code == 200:
                 content = response.text
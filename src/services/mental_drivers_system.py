@@ -784,6 +784,8 @@ class MentalDriversSystem:
         try:
             # Implementar chamada real para API
             # Por enquanto retorna exemplo
+            # Sem chamada real ao provedor: devolve a reserva da chave sem registrar resultado
+            self.api_manager.release(api)
             return '{"roteiro_ativacao": {"pergunta_abertura": "Exemplo"}, "instalacao_cpls": {}, "ancoragem_personalizada": [], "prova_especifica": {}}'
         except Exception as e:
             logger.error(f"❌ Erro na geração: {e}")
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Network Analyzer
+Análise de rede escalável: poda do grafo, centralidade aproximada, PageRank esparso e orçamento de tempo por métrica
+(checado dentro de cada algoritmo, entre fontes/iterações/níveis)
+"""
+
+import os
+import math
+import time
+import random
+import logging
+from collections import Counter, defaultdict, deque
+from typing import Dict, List, Any, Callable, Tuple, Optional
+
+try:
+    import networkx as nx
+    HAS_NETWORKX = True
+except ImportError:
+    HAS_NETWORKX = False
+
+try:
+    import numpy as np
+    import scipy.sparse as sp
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+logger = logging.getLogger(__name__)
+
+
+class MetricBudgetExceeded(Exception):
+    """Métrica sem resultado aproveitável dentro do orçamento de tempo"""
+
+
+def _expired(deadline: Optional[float]) -> bool:
+    return bool(deadline) and time.time() > deadline
+
+
+def aggregate_relationships(entities: List[Dict[str, Any]], relationships: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], Counter]:
+    """Agrega entidades (tipo mais frequente, menções) e soma forças de arestas repetidas"""
+    mentions = Counter()
+    types = defaultdict(Counter)
+    sources = defaultdict(set)
+    for entity in entities:
+        name = entity.get('name')
+        if not name:
+            continue
+        mentions[name] += 1
+        if entity.get('type'):
+            types[name][entity['type']] += 1
+        if entity.get('source'):
+            sources[name].add(entity['source'])
+
+    weights = Counter()
+    for relationship in relationships:
+        a, b = relationship.get('source'), relationship.get('target')
+        if not a or not b or a == b:
+            continue
+        weights[(a, b) if a < b else (b, a)] += float(relationship.get('strength', 1.0))
+
+    nodes = {
+        name: {
+            'type': types[name].most_common(1)[0][0] if types[name] else None,
+            'mentions': count,
+            'sources': len(sources[name])
+        }
+        for name, count in mentions.items()
+    }
+    return nodes, weights
+
+
+def pagerank_csr(adjacency, alpha: float = 0.85, tol: float = 1e-6, max_iter: int = 100, deadline: float = None):
+    """PageRank por iteração de potência sobre matriz de adjacência esparsa (CSR) simétrica ou dirigida"""
+    n = adjacency.shape[0]
+    out_weight = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inv_out = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+    # Matriz de transição transposta: rank_novo = alpha * P^T * rank + teleporte
+    transition_t = (sp.diags(inv_out) @ adjacency).T.tocsr()
+
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        if deadline and time.time() > deadline:
+            break
+        new_rank = alpha * (transition_t @ rank + rank[dangling].sum() / n) + (1 - alpha) / n
+        converged = np.abs(new_rank - rank).sum() < n * tol
+        rank = new_rank
+        if converged:
+            break
+
+    return rank / rank.sum()
+
+
+def sparse_pagerank(G, alpha: float = 0.85, tol: float = 1e-6, max_iter: int = 100, deadline: float = None) -> Dict[Any, float]:
+    """PageRank ponderado de um grafo NetworkX via matriz esparsa"""
+    nodes = list(G.nodes())
+    n = len(nodes)
+    if n == 0:
+        return {}
+    index = {node: i for i, node in enumerate(nodes)}
+
+    rows, cols, data = [], [], []
+    for u, v, w in G.edges(data='weight', default=1.0):
+        i, j = index[u], index[v]
+        rows.extend((i, j))
+        cols.extend((j, i))
+        data.extend((w, w))
+
+    adjacency = sp.csr_matrix((data, (rows, cols)), shape=(n, n), dtype=float)
+    rank = pagerank_csr(adjacency, alpha, tol, max_iter, deadline)
+    return dict(zip(nodes, rank.tolist()))
+
+
+def _pagerank_python(G, alpha: float = 0.85, tol: float = 1e-6, max_iter: int = 100, deadline: float = None) -> Dict[Any, float]:
+    """PageRank ponderado em listas de adjacência (sem SciPy)"""
+    n = G.number_of_nodes()
+    if n == 0:
+        return {}
+    out_weight = {u: sum(w for _, _, w in G.edges(u, data='weight', default=1.0)) for u in G}
+    rank = {u: 1.0 / n for u in G}
+    for _ in range(max_iter):
+        if deadline and time.time() > deadline:
+            break
+        dangling_sum = sum(rank[u] for u in G if out_weight[u] == 0)
+        new_rank = {u: (1 - alpha) / n + alpha * dangling_sum / n for u in G}
+        for u in G:
+            if out_weight[u]:
+                share = alpha * rank[u] / out_weight[u]
+                for _, v, w in G.edges(u, data='weight', default=1.0):
+                    new_rank[v] += share * w
+        converged = sum(abs(new_rank[u] - rank[u]) for u in G) < n * tol
+        rank = new_rank
+        if converged:
+            break
+    total = sum(rank.values())
+    return {u: r / total for u, r in rank.items()}
+
+
+def budgeted_betweenness(G, sources: List[Any], deadline: float = None) -> Dict[Any, float]:
+    """
+    Betweenness normalizada (Brandes, sem pesos) acumulada fonte a fonte; ao estourar o prazo
+    devolve a estimativa reescalada pelas fontes já processadas (como nx com k amostras)
+    """
+    betweenness = dict.fromkeys(G, 0.0)
+    processed = 0
+    for source in sources:
+        if processed and _expired(deadline):
+            break
+        order = []
+        predecessors = {source: []}
+        sigma = {source: 1.0}
+        distance = {source: 0}
+        queue = deque([source])
+        while queue:
+            v = queue.popleft()
+            order.append(v)
+            for w in G[v]:
+                if w not in distance:
+                    distance[w] = distance[v] + 1
+                    sigma[w] = 0.0
+                    predecessors[w] = []
+                    queue.append(w)
+                if distance[w] == distance[v] + 1:
+                    sigma[w] += sigma[v]
+                    predecessors[w].append(v)
+        delta = dict.fromkeys(order, 0.0)
+        while order:
+            w = order.pop()
+            coefficient = (1 + delta[w]) / sigma[w]
+            for v in predecessors[w]:
+                delta[v] += sigma[v] * coefficient
+            if w != source:
+                betweenness[w] += delta[w]
+        processed += 1
+
+    n = len(betweenness)
+    if n > 2 and processed:
+        scale = 1 / ((n - 1) * (n - 2)) * n / processed
+        betweenness = {node: value * scale for node, value in betweenness.items()}
+    return betweenness
+
+
+def exact_closeness(G, deadline: float = None) -> Dict[Any, float]:
+    """Closeness exata (wf_improved, como nx) com BFS por nó checando o prazo"""
+    n = G.number_of_nodes()
+    closeness = {}
+    for node in G:
+        if _expired(deadline):
+            raise MetricBudgetExceeded('closeness')
+        lengths = nx.single_source_shortest_path_length(G, node)
+        total = sum(lengths.values())
+        reachable = len(lengths) - 1
+        closeness[node] = (reachable / total) * (reachable / (n - 1)) if total > 0 and n > 1 else 0.0
+    return closeness
+
+
+def sampled_closeness(G, k: int, seed: int = 42, deadline: float = None) -> Dict[Any, float]:
+    """Closeness aproximada a partir de BFS de k pivôs amostrados (estimador de Eppstein-Wang)"""
+    nodes = list(G.nodes())
+    pivots = random.Random(seed).sample(nodes, min(k, len(nodes)))
+    distance_sum = defaultdict(int)
+    reached = defaultdict(int)
+    used = 0
+    for pivot in pivots:
+        if used and _expired(deadline):
+            break
+        for node, distance in nx.single_source_shortest_path_length(G, pivot).items():
+            if node != pivot:
+                distance_sum[node] += distance
+                reached[node] += 1
+        used += 1
+
+    closeness = {}
+    for node in nodes:
+        if reached[node]:
+            # Fração alcançável (como wf_improved) vezes o inverso da distância média
+            closeness[node] = (reached[node] / used) * (reached[node] / distance_sum[node])
+        else:
+            closeness[node] = 0.0
+    return closeness
+
+
+def eigenvector_power(G, max_iter: int = 1000, tol: float = 1e-6, deadline: float = None) -> Dict[Any, float]:
+    """Centralidade de autovetor por iteração de potência (mesma de nx, sem pesos) checando o prazo"""
+    n = G.number_of_nodes()
+    x = {node: 1.0 / n for node in G}
+    for _ in range(max_iter):
+        if _expired(deadline):
+            raise MetricBudgetExceeded('eigenvector')
+        last = x
+        x = dict(last)
+        for node in x:
+            for neighbor in G[node]:
+                x[neighbor] += last[node]
+        norm = math.sqrt(sum(value * value for value in x.values())) or 1.0
+        x = {node: value / norm for node, value in x.items()}
+        if sum(abs(x[node] - last[node]) for node in x) < n * tol:
+            return x
+    raise nx.PowerIterationFailedConvergence(max_iter)
+
+
+def budgeted_communities(G, seed: int = 42, deadline: float = None) -> List[set]:
+    """
+    Comunidades por níveis do Louvain, parando no último nível completo quando o prazo estoura;
+    sem Louvain, propagação de rótulos com o prazo checado a cada varredura
+    """
+    if hasattr(nx.community, 'louvain_partitions'):
+        found = [{node} for node in G]
+        for partition in nx.community.louvain_partitions(G, seed=seed):
+            found = partition
+            if _expired(deadline):
+                break
+        return list(found)
+
+    rng = random.Random(seed)
+    labels = {node: node for node in G}
+    nodes = list(G)
+    for _ in range(100):
+        if _expired(deadline):
+            break
+        rng.shuffle(nodes)
+        changed = False
+        for node in nodes:
+            counts = Counter(labels[neighbor] for neighbor in G[node])
+            if not counts:
+                continue
+            best = max(counts.values())
+            choices = [label for label, count in counts.items() if count == best]
+            if labels[node] not in choices:
+                labels[node] = rng.choice(choices)
+                changed = True
+        if not changed:
+            break
+    groups = defaultdict(set)
+    for node, label in labels.items():
+        groups[label].add(node)
+    return list(groups.values())
+
+
+def budgeted_clustering(G, seed: int = 42, deadline: float = None, chunk: int = 100) -> float:
+    """Clustering médio exato em blocos de nós; no prazo, média dos nós já medidos (ordem aleatória)"""
+    nodes = list(G)
+    random.Random(seed).shuffle(nodes)
+    total = 0.0
+    measured = 0
+    for start in range(0, len(nodes), chunk):
+        if measured and _expired(deadline):
+            break
+        block = nodes[start:start + chunk]
+        total += sum(nx.clustering(G, block).values())
+        measured += len(block)
+    return total / measured if measured else 0.0
+
+
+class NetworkAnalyzer:
+    """Calcula métricas de rede limitando tamanho do grafo e tempo por métrica"""
+
+    def __init__(self):
+        """Inicializa com configuração do ambiente"""
+        self.config = {
+            'max_nodes': int(os.getenv('NETWORK_MAX_NODES', '2000')),
+            'max_edges': int(os.getenv('NETWORK_MAX_EDGES', '20000')),
+            'exact_limit': int(os.getenv('NETWORK_EXACT_LIMIT', '500')),
+            'betweenness_samples': int(os.getenv('NETWORK_BETWEENNESS_SAMPLES', '200')),
+            'metric_budget': float(os.getenv('NETWORK_METRIC_BUDGET', '5.0')),
+            'max_communities_listed': 50
+        }
+
+    def build_graph(self, entities: List[Dict[str, Any]], relationships: List[Dict[str, Any]]):
+        """Monta grafo ponderado e poda arestas fracas e nós de baixo grau até os limites"""
+        nodes, weights = aggregate_relationships(entities, relationships)
+        pruning = {'original_nodes': len(nodes), 'original_edges': len(weights), 'min_edge_weight': 0.0, 'min_degree': 0}
+
+        # Mantém as arestas mais fortes quando o limite é excedido
+        if len(weights) > self.config['max_edges']:
+            strongest = weights.most_common(self.config['max_edges'])
+            pruning['min_edge_weight'] = strongest[-1][1]
+            weights = Counter(dict(strongest))
+
+        G = nx.Graph()
+        for name, attributes in nodes.items():
+            G.add_node(name, **attributes)
+        G.add_weighted_edges_from((a, b, w) for (a, b), w in weights.items())
+
+        # Remove nós isolados/de baixo grau (k-core crescente) até caber no limite de nós
+        min_degree = 0
+        while G.number_of_nodes() > self.config['max_nodes']:
+            min_degree += 1
+            core = nx.k_core(G, k=min_degree)
+            if core.number_of_nodes() == 0:
+                # Núcleo vazio: mantém os nós mais conectados
+                ranked = sorted(G.degree(weight='weight'), key=lambda item: item[1], reverse=True)
+                G = G.subgraph(n for n, _ in ranked[:self.config['max_nodes']]).copy()
+                break
+            G = core
+        pruning['min_degree'] = min_degree
+        pruning['pruned'] = G.number_of_nodes() < pruning['original_nodes'] or G.number_of_edges() < pruning['original_edges']
+        return G, pruning
+
+    def _budgeted(self, name: str, func: Callable[[float], Any], timings: Dict[str, Any]) -> Any:
+        """
+        Executa métrica na própria thread passando o prazo; o algoritmo checa o prazo e para
+        (resultado parcial) ou levanta MetricBudgetExceeded (retorna None)
+        """
+        start = time.time()
+        deadline = start + self.config['metric_budget']
+        try:
+            value = func(deadline)
+            elapsed = time.time() - start
+            timings[name] = {'seconds': round(elapsed, 3), 'status': 'partial' if time.time() > deadline else 'ok'}
+            return value
+        except MetricBudgetExceeded:
+            timings[name] = {'seconds': round(time.time() - start, 3), 'status': 'timeout'}
+            logger.warning(f"⏱️ Métrica de rede '{name}' excedeu {self.config['metric_budget']}s e foi descartada")
+        except Exception as e:
+            timings[name] = {'seconds': round(time.time() - start, 3), 'status': 'error', 'error': str(e)}
+            logger.warning(f"⚠️ Métrica de rede '{name}' falhou: {e}")
+        return None
+
+    def analyze(self, entities_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Calcula tamanho, densidade, centralidades, PageRank, comunidades e clustering"""
+        G, pruning = self.build_graph(entities_data.get('entities', []), entities_data.get('relationships', []))
+        n = G.number_of_nodes()
+        exact = n <= self.config['exact_limit']
+        timings: Dict[str, Any] = {}
+
+        results: Dict[str, Any] = {
+            "network_nodes": n,
+            "network_edges": G.number_of_edges(),
+            "network_density": nx.density(G) if n > 1 else 0,
+            "graph_pruning": pruning,
+            "analysis_mode": "exact" if exact else "approximate",
+            "metric_timings": timings
+        }
+        if n == 0:
+            return results
+
+        k = min(n, self.config['betweenness_samples'])
+        centrality = {"degree": nx.degree_centrality(G)}
+
+        def betweenness_sources():
+            nodes = list(G)
+            if exact:
+                random.Random(42).shuffle(nodes)
+                return nodes
+            return random.Random(42).sample(nodes, k)
+
+        betweenness = self._budgeted(
+            'betweenness',
+            lambda deadline: budgeted_betweenness(G, betweenness_sources(), deadline),
+            timings
+        )
+        if betweenness is not None:
+            centrality["betweenness"] = betweenness
+
+        closeness = self._budgeted(
+            'closeness',
+            lambda deadline: exact_closeness(G, deadline) if exact else sampled_closeness(G, k, deadline=deadline),
+            timings
+        )
+        if closeness is not None:
+            centrality["closeness"] = closeness
+
+        def pagerank(deadline):
+            # Interrompe a iteração no prazo e devolve a melhor aproximação até ali
+            if HAS_SCIPY:
+                return sparse_pagerank(G, deadline=deadline)
+            return _pagerank_python(G, deadline=deadline)
+
+        influence = self._budgeted('pagerank', pagerank, timings)
+        if influence is not None:
+            centrality["pagerank"] = influence
+
+        if exact:
+            eigenvector = self._budgeted('eigenvector', lambda deadline: eigenvector_power(G, deadline=deadline), timings)
+            if eigenvector is not None:
+                centrality["eigenvector"] = eigenvector
+
+        results["centrality_metrics"] = centrality
+
+        def communities(deadline):
+            # Louvain também no modo exato: greedy_modularity não pode ser interrompido no prazo
+            found = sorted(budgeted_communities(G, deadline=deadline), key=len, reverse=True)
+            return {
+                "num_communities": len(found),
+                "modularity": nx.community.modularity(G, found),
+                "communities": [list(community) for community in found[:self.config['max_communities_listed']]]
+            }
+
+        community_detection = self._budgeted('communities', communities, timings)
+        if community_detection is not None:
+            results["community_detection"] = community_detection
+
+        def clustering(deadline):
+            if exact:
+                return budgeted_clustering(G, deadline=deadline)
+            from networkx.algorithms import approximation
+            return approximation.average_clustering(G, trials=1000, seed=42)
+
+        clustering_coefficient = self._budgeted('clustering', clustering, timings)
+        if clustering_coefficient is not None:
+            results["clustering_coefficient"] = clustering_coefficient
+
+        return results
+
+
+# Instância global
+network_analyzer = NetworkAnalyzer()
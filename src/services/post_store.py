@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Columnar Post Store
+Armazenamento colunar de posts sociais e itens virais (arrays NumPy por métrica)
+com score viral, engajamento e agregação por plataforma vetorizados
+"""
+
+import logging
+from typing import Dict, List, Any, Optional, Iterable, Sequence, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+
+def _as_int(value: Any) -> float:
+    """Mesma conversão do cálculo por item (int(valor or 0)); valor inválido vira NaN"""
+    try:
+        return int(value or 0)
+    except (ValueError, TypeError):
+        return float('nan')
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (ValueError, TypeError):
+        return float('nan')
+
+
+# Colunas extraídas dos dicts de resultados (viral_content_analyzer): nome -> (campo, campo alternativo)
+DICT_COLUMNS: Dict[str, Tuple[str, Optional[str]]] = {
+    'view_count': ('view_count', None),
+    'like_count': ('like_count', None),
+    'comment_count': ('comment_count', None),
+    'likes': ('likes', None),
+    'comments': ('comments', None),
+    'shares': ('shares', None),
+    'retweets': ('retweets', None),
+    'replies': ('replies', None),
+    'relevance_score': ('relevance_score', None),
+    # Totais de engajamento: campo da API da plataforma com fallback (por presença) para o nome genérico
+    'total_views': ('view_count', 'views'),
+    'total_likes': ('like_count', 'likes'),
+    'total_comments': ('comment_count', 'comments'),
+    'total_shares': ('shares', None),
+}
+FLOAT_DICT_COLUMNS = {'relevance_score'}
+
+# Totais de engajamento (lidos só para o subconjunto viral)
+ENGAGEMENT_TOTAL_COLUMNS = ('total_views', 'total_likes', 'total_comments', 'total_shares')
+
+
+def _dict_column(rows: Sequence[Dict[str, Any]], name: str) -> 'np.ndarray':
+    """Coluna float64 a partir dos dicts: conversão em lote e, se houver valor não numérico, item a item"""
+    key, fallback = DICT_COLUMNS[name]
+    if fallback is None:
+        raw = [row.get(key, 0) for row in rows]
+    else:
+        raw = [row[key] if key in row else row.get(fallback, 0) for row in rows]
+    is_float = name in FLOAT_DICT_COLUMNS
+    try:
+        values = np.array(raw, dtype=np.float64)
+    except (ValueError, TypeError):
+        # Só os valores que não são números nativos passam pela conversão item a item
+        convert, native = (_as_float, (int, float)) if is_float else (_as_int, (int,))
+        return np.array([value if type(value) in native else convert(value) for value in raw], dtype=np.float64)
+    # Lote sem erros: NaN só vem de None (int(None or 0) == 0); inteiros truncam como int()
+    values = np.nan_to_num(values, nan=0.0)
+    return values if is_float else np.trunc(values)
+
+
+# Colunas de SocialPost (massive_social_search_engine)
+POST_COLUMNS = ('likes', 'comments', 'shares', 'views', 'engagement_rate')
+
+# Fórmulas de score viral por plataforma: termos (coluna, divisor), divisor final
+# (mesmas fórmulas de ViralContentAnalyzer._calculate_viral_score)
+VIRAL_FORMULAS = {
+    'youtube': ((('view_count', 1000), ('like_count', 100), ('comment_count', 10)), 100),
+    'instagram': ((('likes', 100), ('comments', 10), ('shares', 5)), 50),
+    'facebook': ((('likes', 100), ('comments', 10), ('shares', 5)), 50),
+    'twitter': ((('retweets', 10), ('likes', 50), ('replies', 5)), 20),
+    'tiktok': ((('view_count', 10000), ('likes', 500), ('shares', 100)), 50),
+}
+
+VIRAL_CATEGORIES = ((9.0, 'MEGA_VIRAL'), (7.0, 'VIRAL'), (5.0, 'TRENDING'))
+
+
+class PostStore:
+    """Posts em colunas: códigos de plataforma + um array float64 por métrica (itens originais só referenciados)"""
+
+    __slots__ = ('items', 'platforms', 'platform_ids', 'columns')
+
+    def __init__(self, items: Sequence[Any], platforms: List[str], platform_ids: 'np.ndarray',
+                 columns: Dict[str, 'np.ndarray']):
+        if not HAS_NUMPY:
+            raise RuntimeError("PostStore requer NumPy")
+        self.items = items
+        self.platforms = platforms
+        self.platform_ids = platform_ids
+        self.columns = columns
+
+    @classmethod
+    def _encode_platforms(cls, platforms: Iterable[str], count: int):
+        """Plataforma vira código int32 (vocabulário na ordem de primeira aparição)"""
+        vocabulary: Dict[str, int] = {}
+        platform_ids = np.fromiter(
+            (vocabulary.setdefault(platform, len(vocabulary)) for platform in platforms),
+            dtype=np.int32, count=count
+        )
+        return list(vocabulary), platform_ids
+
+    @classmethod
+    def from_dicts(cls, items: Iterable[Any], default_platform: str = 'web') -> 'PostStore':
+        """
+        Itens de resultados de busca (dicts); itens que não são dict são descartados
+
+        As colunas de score só são lidas nas linhas das plataformas cuja fórmula as usa
+        (demais linhas ficam 0), então cada item custa as mesmas 3 leituras do cálculo por item
+        """
+        rows = []
+        for item in items:
+            if isinstance(item, dict):
+                rows.append(item)
+            else:
+                logger.warning("Item de conteúdo não é um dicionário, pulando.")
+        platforms, platform_ids = cls._encode_platforms(
+            (row.get('platform', default_platform) for row in rows), len(rows)
+        )
+
+        columns: Dict[str, 'np.ndarray'] = {}
+        for code, platform in enumerate(platforms):
+            indices = np.flatnonzero(platform_ids == code)
+            subset = [rows[i] for i in indices]
+            terms = VIRAL_FORMULAS[platform][0] if platform in VIRAL_FORMULAS else (('relevance_score', 1),)
+            for name, _ in terms:
+                column = columns.setdefault(name, np.zeros(len(rows), dtype=np.float64))
+                column[indices] = _dict_column(subset, name)
+        return cls(rows, platforms, platform_ids, columns)
+
+    @classmethod
+    def from_posts(cls, posts: Sequence[Any]) -> 'PostStore':
+        """Objetos SocialPost (ou qualquer objeto com os atributos de POST_COLUMNS)"""
+        platforms, platform_ids = cls._encode_platforms((post.platform for post in posts), len(posts))
+        columns = {
+            name: np.fromiter((getattr(post, name) for post in posts), dtype=np.float64, count=len(posts))
+            for name in POST_COLUMNS
+        }
+        return cls(posts, platforms, platform_ids, columns)
+
+    def load_dict_columns(self, names: Iterable[str]) -> 'PostStore':
+        """Lê colunas adicionais dos dicts de origem (ex.: totais de engajamento só do subconjunto viral)"""
+        for name in names:
+            if name not in self.columns:
+                self.columns[name] = _dict_column(self.items, name)
+        return self
+
+    def __len__(self) -> int:
+        return len(self.platform_ids)
+
+    def column(self, name: str) -> 'np.ndarray':
+        return self.columns[name]
+
+    def with_column(self, name: str, values: 'np.ndarray') -> 'PostStore':
+        self.columns[name] = np.asarray(values, dtype=np.float64)
+        return self
+
+    def take(self, indices: 'np.ndarray') -> 'PostStore':
+        """Subconjunto de linhas (máscara booleana ou índices) com plataformas recodificadas na ordem de aparição"""
+        indices = np.flatnonzero(indices) if indices.dtype == bool else np.asarray(indices)
+        ids = self.platform_ids[indices]
+        present, first_seen = np.unique(ids, return_index=True)
+        order = present[np.argsort(first_seen)]
+        remap = np.empty(len(self.platforms), dtype=np.int32)
+        remap[order] = np.arange(len(order), dtype=np.int32)
+        return PostStore(
+            [self.items[i] for i in indices],
+            [self.platforms[code] for code in order],
+            remap[ids] if len(ids) else ids,
+            {name: values[indices] for name, values in self.columns.items()}
+        )
+
+    # ------------------------------------------------------------------
+    # Operações vetorizadas
+    # ------------------------------------------------------------------
+
+    def viral_scores(self) -> 'np.ndarray':
+        """Score viral 0-10 por linha com a fórmula da plataforma; métrica inválida zera o score da linha"""
+        scores = np.zeros(len(self), dtype=np.float64)
+        for code, platform in enumerate(self.platforms):
+            mask = self.platform_ids == code
+            if platform in VIRAL_FORMULAS:
+                terms, divisor = VIRAL_FORMULAS[platform]
+                raw = sum(self.columns[name][mask] / scale for name, scale in terms)
+                platform_scores = np.where(raw > 0, np.minimum(10.0, raw / divisor), 0.0)
+            else:
+                # Conteúdo web: score baseado em relevância
+                platform_scores = self.columns['relevance_score'][mask] * 10
+            scores[mask] = platform_scores
+        return np.nan_to_num(scores, nan=0.0)
+
+    @staticmethod
+    def viral_categories(scores: 'np.ndarray') -> 'np.ndarray':
+        """Categoria viral por faixa de score"""
+        return np.select(
+            [scores >= threshold for threshold, _ in VIRAL_CATEGORIES],
+            [category for _, category in VIRAL_CATEGORIES],
+            default='POPULAR'
+        )
+
+    @staticmethod
+    def viral_category_counts(scores: 'np.ndarray') -> Dict[str, int]:
+        categories, counts = np.unique(PostStore.viral_categories(scores), return_counts=True)
+        return {str(category): int(count) for category, count in zip(categories, counts)}
+
+    def platform_counts(self) -> 'np.ndarray':
+        return np.bincount(self.platform_ids, minlength=len(self.platforms))
+
+    def sum_by_platform(self, values: 'np.ndarray') -> 'np.ndarray':
+        """Soma de um vetor por código de plataforma (NaN conta como zero)"""
+        return np.bincount(self.platform_ids, weights=np.nan_to_num(values), minlength=len(self.platforms))
+
+    def platform_sums(self, names: Iterable[str]) -> Dict[str, 'np.ndarray']:
+        """Soma de cada coluna por código de plataforma"""
+        return {name: self.sum_by_platform(self.columns[name]) for name in names}
+
+    def chained_columns(self, names: Sequence[str]) -> Dict[str, 'np.ndarray']:
+        """
+        Colunas com a semântica do laço por item que soma métricas em sequência dentro de um try:
+        a primeira métrica inválida (NaN) descarta ela e as seguintes daquele item (coluna ausente conta como 0)
+        """
+        valid = np.ones(len(self), dtype=bool)
+        chained = {}
+        for name in names:
+            values = self.columns.get(name, np.zeros(len(self)))
+            valid &= ~np.isnan(values)
+            chained[name] = np.where(valid, values, 0.0)
+        return chained
+
+    def totals(self, names: Iterable[str]) -> Dict[str, float]:
+        return {name: float(np.nansum(self.columns[name])) for name in names}
+
+    def top_indices(self, name: str, k: Optional[int] = None, mask: Optional['np.ndarray'] = None) -> 'np.ndarray':
+        """Índices das k linhas de maior valor (ordenação estável, como sorted(..., reverse=True))"""
+        candidates = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        order = candidates[np.argsort(-self.columns[name][candidates], kind='stable')]
+        return order if k is None else order[:k]
+
+    def top_items(self, name: str, k: Optional[int] = None, mask: Optional['np.ndarray'] = None) -> List[Any]:
+        return [self.items[i] for i in self.top_indices(name, k, mask)]
+
+    def engagement_stats(self) -> Dict[str, Any]:
+        """Estatísticas de engajamento de SocialPost (totais e média por plataforma)"""
+        counts = self.platform_counts()
+        sums = self.platform_sums(POST_COLUMNS)
+        totals = self.totals(POST_COLUMNS)
+        return {
+            'total_posts': len(self),
+            'total_likes': int(totals['likes']),
+            'total_comments': int(totals['comments']),
+            'total_shares': int(totals['shares']),
+            'total_views': int(totals['views']),
+            'avg_engagement_rate': totals['engagement_rate'] / len(self),
+            'platform_breakdown': {
+                platform: {
+                    'posts': int(counts[code]),
+                    'avg_likes': float(sums['likes'][code] / counts[code]),
+                    'avg_comments': float(sums['comments'][code] / counts[code]),
+                    'avg_engagement': float(sums['engagement_rate'][code] / counts[code])
+                }
+                for code, platform in enumerate(self.platforms)
+            }
+        }
+
+    def memory_bytes(self) -> int:
+        """Bytes ocupados pelas colunas (sem os itens originais referenciados)"""
+        return int(self.platform_ids.nbytes + sum(values.nbytes for values in self.columns.values()))
@@ -8,13 +8,17 @@ Gerenciador de busca para produção com múltiplos provedores e fallbacks
 import os
 import logging
 import time
-import requests
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, List, Optional, Any
 from urllib.parse import quote_plus
 from bs4 import BeautifulSoup
 import json
 import random
 from services.exa_client import exa_client
+from services.http_client_pool import http_client_pool
+from services.search_cache import search_cache
 
 logger = logging.getLogger(__name__)
 
@@ -67,61 +71,186 @@ class ProductionSearchManager:
             'Connection': 'keep-alive'
         }
 
-        self.cache = {}
-        self.cache_ttl = 3600  # 1 hora
+        # Cliente HTTP compartilhado (keep-alive, HTTP/2 quando disponível)
+        self.http = http_client_pool.get_sync_client()
+
+        # Cache persistente compartilhado entre workers (ver services/search_cache.py)
+        self.cache = search_cache
+
+        # Hedged requests: dispara o próximo provedor se o atual passar do seu p90
+        self.hedge_config = {
+            'enabled': os.getenv('SEARCH_HEDGE_ENABLED', 'true').lower() == 'true',
+            'budget': float(os.getenv('SEARCH_HEDGE_BUDGET', '0.2')),  # hedges por busca
+            'max_tokens': float(os.getenv('SEARCH_HEDGE_MAX_BURST', '3')),
+            'default_delay': float(os.getenv('SEARCH_HEDGE_DEFAULT_DELAY', '2.0')),
+            'min_delay': float(os.getenv('SEARCH_HEDGE_MIN_DELAY', '0.3')),
+            'max_parallel': int(os.getenv('SEARCH_HEDGE_MAX_PARALLEL', '2')),
+            # Perdedores já em execução não podem ser interrompidos: limitam novos hedges até terminarem
+            'max_abandoned': int(os.getenv('SEARCH_HEDGE_MAX_ABANDONED', '4'))
+        }
+        # Timeout por chamada: limita quanto tempo um perdedor abandonado segura uma thread do pool
+        self.request_timeout = float(os.getenv('SEARCH_PROVIDER_TIMEOUT', '15'))
+        self.hedge_tokens = 1.0
+        self.hedge_stats = {'searches': 0, 'hedges': 0, 'hedge_wins': 0, 'budget_denied': 0, 'abandoned': 0}
+        self.abandoned_inflight = 0
+        self.provider_latencies = {name: deque(maxlen=50) for name in self.providers}
+        self._hedge_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='search-hedge')
 
         enabled_count = sum(1 for p in self.providers.values() if p['enabled'])
         logger.info(f"Production Search Manager inicializado com {enabled_count} provedores")
 
     def search_with_fallback(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
-        """Realiza busca com sistema de fallback automático"""
-
-        # Verifica cache primeiro
-        cache_key = f"{query}_{max_results}"
-        if cache_key in self.cache:
-            cache_data = self.cache[cache_key]
-            if time.time() - cache_data['timestamp'] < self.cache_ttl:
-                logger.info(f"🔄 Resultado do cache para: {query}")
-                return cache_data['results']
-
-        # Busca com fallback
-        for provider_name in self._get_provider_order():
-            if not self._is_provider_available(provider_name):
-                continue
+        """Realiza busca com fallback automático e hedged requests entre provedores"""
 
-            try:
-                logger.info(f"🔍 Buscando com {provider_name}: {query}")
-
-                if provider_name == 'google':
-                    results = self._search_google(query, max_results)
-                elif provider_name == 'serper':
-                    results = self._search_serper(query, max_results)
-                elif provider_name == 'bing':
-                    results = self._search_bing(query, max_results)
+        search_methods = {
+            'google': self._search_google,
+            'serper': self._search_serper,
+            'bing': self._search_bing
+        }
+
+        order = [name for name in self._get_provider_order() if name in search_methods]
+        if not order:
+            logger.error("❌ Nenhum provedor de busca disponível")
+            return []
+
+        with self._hedge_lock:
+            self.hedge_stats['searches'] += 1
+            self.hedge_tokens = min(self.hedge_config['max_tokens'], self.hedge_tokens + self.hedge_config['budget'])
+
+        pending = {}
+        next_index = 0
+        hedge_blocked = not self.hedge_config['enabled']
+        hedged = False
+        primary = order[0]
+        cancelled = threading.Event()
+
+        def launch():
+            nonlocal next_index
+            provider_name = order[next_index]
+            next_index += 1
+            logger.info(f"🔍 Buscando com {provider_name}: {query}")
+            future = self._executor.submit(
+                self._run_provider, provider_name, search_methods[provider_name], query, max_results, cancelled
+            )
+            pending[future] = provider_name
+            return provider_name
+
+        last_launched = launch()
+
+        while pending:
+            can_hedge = (
+                not hedge_blocked
+                and next_index < len(order)
+                and len(pending) < self.hedge_config['max_parallel']
+                and self.abandoned_inflight < self.hedge_config['max_abandoned']
+            )
+            timeout = self._hedge_delay(last_launched) if can_hedge else None
+
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Provedor atual passou do p90: dispara hedge se houver orçamento
+                if self._take_hedge_token():
+                    logger.info(f"⏱️ {last_launched} lento, disparando hedge")
+                    hedged = True
+                    last_launched = launch()
                 else:
-                    continue
+                    hedge_blocked = True
+                continue
 
-                if results:
-                    # Cache resultado
-                    self.cache[cache_key] = {
-                        'results': results,
-                        'timestamp': time.time(),
-                        'provider': provider_name
-                    }
+            for future in done:
+                provider_name = pending.pop(future)
+                results = future.result()
 
+                if results:
+                    # Primeiro resultado aceitável vence: perdedores na fila são cancelados e os
+                    # já em execução terminam sozinhos (até request_timeout), contando contra o orçamento
+                    cancelled.set()
+                    for loser in pending:
+                        if not loser.cancel():
+                            self._track_abandoned(loser)
+                    if hedged and provider_name != primary:
+                        with self._hedge_lock:
+                            self.hedge_stats['hedge_wins'] += 1
                     logger.info(f"✅ {provider_name}: {len(results)} resultados")
                     return results
-                else:
-                    logger.warning(f"⚠️ {provider_name}: 0 resultados")
 
-            except Exception as e:
-                logger.error(f"❌ Erro em {provider_name}: {str(e)}")
-                self._record_provider_error(provider_name)
-                continue
+            # Falha ou resultado vazio: fallback imediato para o próximo provedor
+            if not pending and next_index < len(order):
+                last_launched = launch()
 
         logger.error("❌ Todos os provedores de busca falharam")
         return []
 
+    def _run_provider(
+        self, provider_name: str, search_method, query: str, max_results: int,
+        cancelled: Optional[threading.Event] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Executa um provedor (via cache) registrando latência e erros; não inicia se a busca já foi decidida"""
+        if cancelled is not None and cancelled.is_set():
+            return None
+
+        def fetch():
+            start_time = time.time()
+            try:
+                return search_method(query, max_results)
+            finally:
+                self.provider_latencies[provider_name].append(time.time() - start_time)
+
+        try:
+            results = self.cache.get_or_fetch(provider_name, query, {'max_results': max_results}, fetch)
+            if not results:
+                logger.warning(f"⚠️ {provider_name}: 0 resultados")
+            return results
+        except Exception as e:
+            logger.error(f"❌ Erro em {provider_name}: {str(e)}")
+            self._record_provider_error(provider_name)
+            return None
+
+    def _track_abandoned(self, future):
+        """Conta um perdedor em execução até ele terminar"""
+        with self._hedge_lock:
+            self.abandoned_inflight += 1
+            self.hedge_stats['abandoned'] += 1
+
+        def done(_):
+            with self._hedge_lock:
+                self.abandoned_inflight -= 1
+
+        future.add_done_callback(done)
+
+    def _hedge_delay(self, provider_name: str) -> float:
+        """Atraso adaptativo antes do hedge: p90 de latência observada do provedor"""
+        samples = sorted(self.provider_latencies.get(provider_name, ()))
+        if len(samples) < 5:
+            return self.hedge_config['default_delay']
+        p90 = samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+        return max(self.hedge_config['min_delay'], p90)
+
+    def _take_hedge_token(self) -> bool:
+        """Consome uma unidade do orçamento de hedge"""
+        with self._hedge_lock:
+            if self.hedge_tokens >= 1.0:
+                self.hedge_tokens -= 1.0
+                self.hedge_stats['hedges'] += 1
+                return True
+            self.hedge_stats['budget_denied'] += 1
+            return False
+
+    def get_hedge_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas de hedge e latências p90 por provedor"""
+        return {
+            **self.hedge_stats,
+            'config': self.hedge_config,
+            'available_tokens': round(self.hedge_tokens, 2),
+            'abandoned_inflight': self.abandoned_inflight,
+            'p90_latency': {
+                name: round(self._hedge_delay(name), 3)
+                for name, samples in self.provider_latencies.items() if samples
+            }
+        }
+
     def _get_provider_order(self) -> List[str]:
         """Retorna provedores ordenados por prioridade"""
         available_providers = [
@@ -162,11 +291,11 @@ class ProductionSearchManager:
             'safe': 'off'
         }
 
-        response = requests.get(
+        response = self.http.get(
             provider['base_url'],
             params=params,
             headers=self.headers,
-            timeout=15
+            timeout=self.request_timeout
         )
 
         if response.status_code == 200:
@@ -202,11 +331,11 @@ class ProductionSearchManager:
             'num': max_results
         }
 
-        response = requests.post(
+        response = self.http.post(
             provider['base_url'],
             json=payload,
             headers=headers,
-            timeout=15
+            timeout=self.request_timeout
         )
 
         if response.status_code == 200:
@@ -229,7 +358,7 @@ class ProductionSearchManager:
         """Busca usando Bing (scraping)"""
         search_url = f"{self.providers['bing']['base_url']}?q={quote_plus(query)}&cc=br&setlang=pt-br&count={max_results}"
 
-        response = requests.get(search_url, headers=self.headers, timeout=15)
+        response = self.http.get(search_url, headers=self.headers, timeout=self.request_timeout)
 
         if response.status_code == 200:
             soup = BeautifulSoup(response.content, 'html.parser')
@@ -294,8 +423,11 @@ class ProductionSearchManager:
 
     def clear_cache(self):
         """Limpa cache de busca"""
-        self.cache = {}
-        logger.info("🧹 Cache de busca limpo")
+        self.cache.clear()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do cache de busca"""
+        return self.cache.get_stats()
 
     def test_provider(self, provider_name: str) -> bool:
         """Testa um provedor específico"""
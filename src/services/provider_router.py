@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Provider Router
+Roteamento adaptativo entre provedores e chaves de API: janela deslizante de latência
+e erros por chave, escolha da opção saudável mais rápida dentro da cota e cooldown
+exponencial para chaves que falham em sequência
+"""
+
+import os
+import re
+import time
+import random
+import hashlib
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Limites (segundos) dos baldes do histograma de latência
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Erros que indicam cota/limite de taxa (a chave sai de circulação até o reset, sem backoff)
+RATE_LIMIT_PATTERN = re.compile(r'\b429\b|rate.?limit|quota|too many requests', re.IGNORECASE)
+
+# Chaves escolhidas durante uma chamada medida, com o instante da escolha (ver ProviderRouter.ameasure)
+_leases: contextvars.ContextVar[Optional[List[Tuple[str, str, float]]]] = contextvars.ContextVar('provider_leases', default=None)
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _KeyStats:
+    """Janela deslizante de chamadas de uma chave (latência, sucesso) e estado de saúde"""
+
+    __slots__ = ('key_id', 'samples', 'requests', 'in_flight', 'calls', 'errors',
+                 'consecutive_failures', 'cooldown_until', 'cooldown_seconds', 'last_error', 'last_used')
+
+    def __init__(self, key_id: str, window: int):
+        self.key_id = key_id
+        self.samples: deque = deque(maxlen=window)  # (timestamp, latência, sucesso)
+        self.requests: deque = deque()  # timestamps das escolhas no último minuto (cota)
+        self.in_flight: deque = deque()  # timestamps de chamadas ainda sem resultado
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.cooldown_seconds = 0.0
+        self.last_error: Optional[str] = None
+        self.last_used: Optional[float] = None
+
+    def recent(self, now: float, horizon: float) -> List[Tuple[float, Optional[float], bool]]:
+        return [sample for sample in self.samples if now - sample[0] <= horizon]
+
+    def prune(self, now: float, lease_timeout: float):
+        while self.requests and now - self.requests[0] > 60:
+            self.requests.popleft()
+        while self.in_flight and now - self.in_flight[0] > lease_timeout:
+            self.in_flight.popleft()
+
+
+class ProviderRouter:
+    """Camada única de roteamento para pools de chaves (busca, extração e LLMs)"""
+
+    def __init__(self):
+        """Inicializa o roteador"""
+        self.window = int(os.getenv('ROUTER_WINDOW', '200'))
+        self.horizon = float(os.getenv('ROUTER_HORIZON_SECONDS', '900'))
+        self.prior_latency = float(os.getenv('ROUTER_PRIOR_LATENCY', '3.0'))
+        self.error_penalty = float(os.getenv('ROUTER_ERROR_PENALTY', '4.0'))
+        self.explore_ratio = float(os.getenv('ROUTER_EXPLORE_RATIO', '0.05'))
+        self.min_samples = int(os.getenv('ROUTER_MIN_SAMPLES', '3'))
+        self.failure_threshold = int(os.getenv('ROUTER_FAILURE_THRESHOLD', '3'))
+        self.base_cooldown = float(os.getenv('ROUTER_COOLDOWN_SECONDS', '30'))
+        self.max_cooldown = float(os.getenv('ROUTER_MAX_COOLDOWN_SECONDS', '600'))
+        self.lease_timeout = float(os.getenv('ROUTER_LEASE_TIMEOUT', '120'))
+
+        self._lock = threading.Lock()
+        self._pools: Dict[str, Dict[str, _KeyStats]] = {}
+        self._secrets: Dict[str, Dict[str, str]] = {}
+        self._quotas: Dict[str, Optional[int]] = {}
+
+        logger.info("🧭 Provider Router inicializado")
+
+    # ------------------------------------------------------------------
+    # Registro de pools
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def key_id(key: str) -> str:
+        """Identificador estável e não sensível da chave (usado nas estatísticas)"""
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:10]
+
+    def register_pool(self, pool: str, keys: Iterable[str], quota_per_minute: Optional[int] = None) -> List[str]:
+        """Registra (ou amplia) o pool de chaves de um provedor; idempotente"""
+        pool = pool.upper()
+        keys = [key for key in keys if key]
+        env_quota = os.getenv(f"ROUTER_QUOTA_{pool}")
+        with self._lock:
+            stats = self._pools.setdefault(pool, {})
+            secrets = self._secrets.setdefault(pool, {})
+            for key in keys:
+                key_id = self.key_id(key)
+                if key_id not in stats:
+                    stats[key_id] = _KeyStats(key_id, self.window)
+                    secrets[key_id] = key
+            if env_quota:
+                self._quotas[pool] = int(env_quota)
+            elif quota_per_minute or pool not in self._quotas:
+                self._quotas[pool] = quota_per_minute
+        return keys
+
+    def load_env_keys(self, provider: str, quota_per_minute: Optional[int] = None) -> List[str]:
+        """Carrega <PROVIDER>_API_KEY e <PROVIDER>_API_KEY_1..N do ambiente e registra o pool"""
+        keys = []
+        main_key = os.getenv(f"{provider}_API_KEY")
+        if main_key:
+            keys.append(main_key)
+        counter = 1
+        while True:
+            numbered_key = os.getenv(f"{provider}_API_KEY_{counter}")
+            if not numbered_key:
+                break
+            keys.append(numbered_key)
+            counter += 1
+        # Remove duplicatas preservando a ordem
+        keys = list(dict.fromkeys(keys))
+        if keys:
+            self.register_pool(provider, keys, quota_per_minute)
+        return keys
+
+    # ------------------------------------------------------------------
+    # Pontuação e escolha
+    # ------------------------------------------------------------------
+
+    def _score(self, stats: _KeyStats, now: float) -> float:
+        """Latência esperada (p90 recente) penalizada por taxa de erro e chamadas em andamento"""
+        recent = stats.recent(now, self.horizon)
+        latencies = [latency for _, latency, ok in recent if ok and latency is not None]
+        latency = _percentile(latencies, 0.9) if latencies else self.prior_latency
+        error_rate = sum(1 for _, _, ok in recent if not ok) / (len(recent) + 1)
+        return latency * (1 + self.error_penalty * error_rate) * (1 + 0.25 * len(stats.in_flight))
+
+    def _available(self, pool: str, stats: _KeyStats, now: float) -> bool:
+        quota = self._quotas.get(pool)
+        return stats.cooldown_until <= now and (not quota or len(stats.requests) < quota)
+
+    def choose_key(self, pool: str, candidates: Optional[Iterable[str]] = None,
+                   lease: Optional[bool] = None) -> Optional[str]:
+        """
+        Escolhe a chave saudável de menor pontuação no pool (com pequena exploração);
+        sem opções saudáveis, devolve a que sai do cooldown primeiro
+
+        A escolha abre uma chamada em andamento (lease) que deve ser fechada por exatamente um
+        record() ou release(). Por padrão isso só acontece dentro de measure/ameasure, que registram
+        o resultado; fora delas passe lease=True apenas se o chamador for registrar o resultado.
+        """
+        pool = pool.upper()
+        now = time.time()
+        leases = _leases.get()
+        if lease is None:
+            lease = leases is not None
+        with self._lock:
+            pool_stats = self._pools.get(pool)
+            if not pool_stats:
+                return None
+            allowed = None if candidates is None else {self.key_id(key) for key in candidates if key}
+            options = [stats for key_id, stats in pool_stats.items() if allowed is None or key_id in allowed]
+            if not options:
+                return None
+            for stats in options:
+                stats.prune(now, self.lease_timeout)
+
+            healthy = [stats for stats in options if self._available(pool, stats, now)]
+            if healthy:
+                if len(healthy) > 1 and random.random() < self.explore_ratio:
+                    chosen = random.choice(healthy)
+                else:
+                    # Chaves do mesmo pool são equivalentes: as pouco amostradas são experimentadas primeiro
+                    chosen = min(healthy, key=lambda stats: (
+                        0.0 if len(stats.samples) < self.min_samples else self._score(stats, now),
+                        len(stats.in_flight), len(stats.requests)
+                    ))
+            else:
+                chosen = min(options, key=lambda stats: max(stats.cooldown_until, stats.requests[0] + 60 if stats.requests else 0))
+                logger.warning(f"⚠️ {pool}: nenhuma chave saudável dentro da cota, usando {chosen.key_id}")
+
+            chosen.requests.append(now)
+            if lease:
+                chosen.in_flight.append(now)
+            chosen.last_used = now
+            key = self._secrets[pool][chosen.key_id]
+
+        if lease and leases is not None:
+            leases.append((pool, key, time.perf_counter()))
+        return key
+
+    def release(self, pool: str, key: str):
+        """Fecha a chamada em andamento de uma chave que acabou não sendo usada (sem registrar resultado)"""
+        with self._lock:
+            stats = self._pools.get(pool.upper(), {}).get(self.key_id(key)) if key else None
+            if stats is not None and stats.in_flight:
+                stats.in_flight.popleft()
+
+    def rank(self, pools: List[str], priorities: Optional[Dict[str, int]] = None) -> List[str]:
+        """
+        Ordena provedores: saudáveis primeiro, pela melhor pontuação entre suas chaves,
+        com a prioridade configurada como desempate; indisponíveis ao final
+        """
+        priorities = priorities or {}
+        now = time.time()
+        ranked = []
+        with self._lock:
+            for position, name in enumerate(pools):
+                pool_stats = list(self._pools.get(name.upper(), {}).values())
+                for stats in pool_stats:
+                    stats.prune(now, self.lease_timeout)
+                healthy = [stats for stats in pool_stats if self._available(name.upper(), stats, now)]
+                if healthy or not pool_stats:
+                    score = min((self._score(stats, now) for stats in healthy), default=self.prior_latency)
+                    ranked.append((0, score, priorities.get(name, position), name))
+                else:
+                    recovery = min(stats.cooldown_until for stats in pool_stats)
+                    ranked.append((1, recovery, priorities.get(name, position), name))
+        ranked.sort()
+        return [name for _, _, _, name in ranked]
+
+    def is_healthy(self, pool: str) -> bool:
+        """Há ao menos uma chave fora de cooldown e dentro da cota"""
+        pool = pool.upper()
+        now = time.time()
+        with self._lock:
+            pool_stats = self._pools.get(pool, {})
+            for stats in pool_stats.values():
+                stats.prune(now, self.lease_timeout)
+            return not pool_stats or any(self._available(pool, stats, now) for stats in pool_stats.values())
+
+    # ------------------------------------------------------------------
+    # Registro de resultados
+    # ------------------------------------------------------------------
+
+    def record(self, pool: str, key: str, latency: Optional[float], success: bool,
+               error: Optional[str] = None, rate_limited: bool = False, retry_after: Optional[float] = None,
+               leased: bool = True):
+        """
+        Registra o resultado de uma chamada feita com a chave (erros de cota são detectados pela mensagem);
+        leased=True fecha a chamada em andamento aberta pelo choose_key correspondente
+        """
+        pool = pool.upper()
+        rate_limited = rate_limited or bool(error and RATE_LIMIT_PATTERN.search(error))
+        now = time.time()
+        with self._lock:
+            stats = self._pools.get(pool, {}).get(self.key_id(key)) if key else None
+            if stats is None:
+                return
+            if leased and stats.in_flight:
+                stats.in_flight.popleft()
+            stats.samples.append((now, latency, success))
+            stats.calls += 1
+
+            if success:
+                stats.consecutive_failures = 0
+                stats.cooldown_seconds = 0.0
+                return
+
+            stats.errors += 1
+            stats.consecutive_failures += 1
+            stats.last_error = (error or '')[:200] or None
+
+            if rate_limited:
+                stats.cooldown_until = now + (retry_after or 60)
+                logger.warning(f"⏳ {pool}/{stats.key_id} limitada por cota até +{retry_after or 60:.0f}s")
+            elif stats.consecutive_failures >= self.failure_threshold:
+                stats.cooldown_seconds = min(self.max_cooldown, max(self.base_cooldown, stats.cooldown_seconds * 2))
+                stats.cooldown_until = now + stats.cooldown_seconds
+                logger.warning(f"🧊 {pool}/{stats.key_id} em cooldown por {stats.cooldown_seconds:.0f}s "
+                               f"após {stats.consecutive_failures} falhas seguidas")
+
+    @staticmethod
+    def _result_ok(result: Any) -> bool:
+        return not (isinstance(result, dict) and result.get('success') is False)
+
+    @contextmanager
+    def measure(self, pool: str, key: Optional[str] = None):
+        """Mede uma chamada síncrona; exceção conta como falha (chave explícita ou escolhida dentro do bloco)"""
+        leases: List[Tuple[str, str, float]] = []
+        token = _leases.set(leases)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self._record_leases(pool, key, leases, started, False, str(e))
+            raise
+        else:
+            self._record_leases(pool, key, leases, started, True, None)
+        finally:
+            _leases.reset(token)
+
+    async def ameasure(self, pool: str, call: Callable[[], Awaitable[Any]], key: Optional[str] = None,
+                       is_success: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Executa e mede uma chamada assíncrona; as chaves escolhidas com choose_key durante
+        a chamada recebem a latência e o resultado (dict com success=False conta como falha)
+        """
+        leases: List[Tuple[str, str, float]] = []
+        token = _leases.set(leases)
+        started = time.perf_counter()
+        try:
+            result = await call()
+        except Exception as e:
+            self._record_leases(pool, key, leases, started, False, str(e))
+            raise
+        finally:
+            _leases.reset(token)
+
+        success = (is_success or self._result_ok)(result)
+        error = str(result.get('error')) if not success and isinstance(result, dict) and result.get('error') else None
+        self._record_leases(pool, key, leases, started, success, error)
+        return result
+
+    def _record_leases(self, pool: str, key: Optional[str], leases: List[Tuple[str, str, float]],
+                       started: float, success: bool, error: Optional[str]):
+        """
+        Um registro por chave escolhida, com o resultado da própria tentativa: uma chave trocada
+        por outra do mesmo pool durante a chamada falhou (latência até a troca); a última do pool
+        recebe o resultado final e a latência desde a sua escolha
+        """
+        finished = time.perf_counter()
+        if key and not any(lease_key == key for _, lease_key, _ in leases):
+            # Chave explícita sem escolha pelo roteador: registra sem fechar chamadas de outros
+            self.record(pool, key, finished - started, success, error=error, leased=False)
+
+        for index, (lease_pool, lease_key, chosen_at) in enumerate(leases):
+            replaced_at = next((other_at for other_pool, _, other_at in leases[index + 1:] if other_pool == lease_pool), None)
+            if replaced_at is not None:
+                self.record(lease_pool, lease_key, replaced_at - chosen_at, False, error='substituída por outra chave')
+            else:
+                self.record(lease_pool, lease_key, finished - chosen_at, success, error=error)
+
+    # ------------------------------------------------------------------
+    # Estatísticas
+    # ------------------------------------------------------------------
+
+    def _key_report(self, pool: str, stats: _KeyStats, now: float) -> Dict[str, Any]:
+        recent = stats.recent(now, self.horizon)
+        latencies = [latency for _, latency, ok in recent if ok and latency is not None]
+        histogram = {f"<={bound}s": 0 for bound in LATENCY_BUCKETS}
+        histogram[f">{LATENCY_BUCKETS[-1]}s"] = 0
+        for _, latency, _ in recent:
+            if latency is None:
+                continue
+            label = next((f"<={bound}s" for bound in LATENCY_BUCKETS if latency <= bound), f">{LATENCY_BUCKETS[-1]}s")
+            histogram[label] += 1
+        recent_errors = sum(1 for _, _, ok in recent if not ok)
+
+        return {
+            'key_id': stats.key_id,
+            'healthy': self._available(pool, stats, now),
+            'score': round(self._score(stats, now), 4),
+            'calls': stats.calls,
+            'errors': stats.errors,
+            'window_calls': len(recent),
+            'window_error_rate': round(recent_errors / len(recent), 4) if recent else 0.0,
+            'latency_p50': _percentile(latencies, 0.5),
+            'latency_p90': _percentile(latencies, 0.9),
+            'latency_p99': _percentile(latencies, 0.99),
+            'latency_histogram': histogram,
+            'in_flight': len(stats.in_flight),
+            'requests_last_minute': len(stats.requests),
+            'consecutive_failures': stats.consecutive_failures,
+            'cooldown_remaining': round(max(0.0, stats.cooldown_until - now), 1),
+            'last_error': stats.last_error,
+            'last_used': stats.last_used
+        }
+
+    def get_stats(self, pool: Optional[str] = None) -> Dict[str, Any]:
+        """Estatísticas por pool e por chave (chaves identificadas apenas pelo hash)"""
+        now = time.time()
+        report = {}
+        with self._lock:
+            for name, pool_stats in self._pools.items():
+                if pool and name != pool.upper():
+                    continue
+                for stats in pool_stats.values():
+                    stats.prune(now, self.lease_timeout)
+                keys = sorted((self._key_report(name, stats, now) for stats in pool_stats.values()),
+                              key=lambda item: (not item['healthy'], item['score']))
+                latencies = [latency for stats in pool_stats.values()
+                             for _, latency, ok in stats.recent(now, self.horizon) if ok and latency is not None]
+                report[name] = {
+                    'keys': keys,
+                    'total_keys': len(keys),
+                    'healthy_keys': sum(1 for item in keys if item['healthy']),
+                    'preferred_key': keys[0]['key_id'] if keys and keys[0]['healthy'] else None,
+                    'quota_per_minute': self._quotas.get(name),
+                    'calls': sum(item['calls'] for item in keys),
+                    'errors': sum(item['errors'] for item in keys),
+                    'latency_p50': _percentile(latencies, 0.5),
+                    'latency_p90': _percentile(latencies, 0.9),
+                    'latency_p99': _percentile(latencies, 0.99)
+                }
+        return report
+
+
+# Instância global
+provider_router = ProviderRouter()
@@ -7,9 +7,9 @@ Cliente para extração de PDF usando PyMuPDF
 
 import os
 import logging
-import requests
 import tempfile
 from typing import Dict, Any, Optional
+from services.http_client_pool import http_client_pool
 
 logger = logging.getLogger(__name__)
 
@@ -40,7 +40,7 @@ class PyMuPDFClient:
             import fitz
             
             # Baixa PDF
-            response = requests.get(url, timeout=30)
+            response = http_client_pool.get_sync_session().get(url, timeout=30)
             response.raise_for_status()
             
             # Salva temporariamente
@@ -8,7 +8,6 @@ Orquestrador de busca REAL massiva com rotação de APIs e captura visual
 import os
 import logging
 import asyncio
-import aiohttp
 import time
 from typing import Dict, List, Any, Optional
 from datetime import datetime
@@ -16,6 +15,13 @@ from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote_plus
 import json
 
+from services.http_client_pool import http_client_pool
+from services.url_canonicalizer import session_deduplicator
+from services.search_cache import search_cache
+from services.tracing import tracer
+from services.session_persistence_manager import session_manager
+from services.provider_router import provider_router
+
 logger = logging.getLogger(__name__)
 
 class RealSearchOrchestrator:
@@ -24,7 +30,6 @@ class RealSearchOrchestrator:
     def __init__(self):
         """Inicializa orquestrador com todas as APIs reais"""
         self.api_keys = self._load_all_api_keys()
-        self.key_indices = {provider: 0 for provider in self.api_keys.keys()}
 
         # Provedores em ordem de prioridade
         self.providers = [
@@ -65,22 +70,8 @@ class RealSearchOrchestrator:
         api_keys = {}
 
         for provider in ['FIRECRAWL', 'JINA', 'GOOGLE', 'EXA', 'SERPER', 'YOUTUBE', 'SUPADATA', 'X']:
-            keys = []
-
-            # Chave principal
-            main_key = os.getenv(f"{provider}_API_KEY")
-            if main_key:
-                keys.append(main_key)
-
-            # Chaves numeradas
-            counter = 1
-            while True:
-                numbered_key = os.getenv(f"{provider}_API_KEY_{counter}")
-                if numbered_key:
-                    keys.append(numbered_key)
-                    counter += 1
-                else:
-                    break
+            # Chave principal e numeradas, registradas no roteador compartilhado
+            keys = provider_router.load_env_keys(provider)
 
             if keys:
                 api_keys[provider] = keys
@@ -89,25 +80,18 @@ class RealSearchOrchestrator:
         return api_keys
 
     def get_next_api_key(self, provider: str) -> Optional[str]:
-        """Obtém próxima chave de API com rotação automática"""
+        """Obtém a chave mais rápida e saudável do provedor (roteamento por latência e erros)"""
         if provider not in self.api_keys or not self.api_keys[provider]:
             return None
 
-        keys = self.api_keys[provider]
-        current_index = self.key_indices[provider]
-
-        # Obtém chave atual
-        key = keys[current_index]
-
-        # Rotaciona para próxima
-        self.key_indices[provider] = (current_index + 1) % len(keys)
+        key = provider_router.choose_key(provider)
 
         # Atualiza estatísticas
         if provider not in self.session_stats['api_rotations']:
             self.session_stats['api_rotations'][provider] = 0
         self.session_stats['api_rotations'][provider] += 1
 
-        logger.debug(f"🔄 {provider}: Usando chave {current_index + 1}/{len(keys)}")
+        logger.debug(f"🔄 {provider}: Usando chave {provider_router.key_id(key) if key else None}")
         return key
 
     async def execute_massive_real_search(
@@ -141,15 +125,20 @@ class RealSearchOrchestrator:
             }
         }
 
+        # URLs canônicas e corpos já vistos nesta sessão (compartilhados entre provedores)
+        seen_urls = session_deduplicator.urls(session_id)
+        content_filter = session_deduplicator.contents(session_id)
+
+        websailor_task = None
         try:
-            # FASE 1: Busca com Alibaba WebSailor (prioritária)
-            logger.info("🔍 FASE 1: Busca com Alibaba WebSailor")
-            websailor_results = await self._search_alibaba_websailor(query, context)
-            
-            if websailor_results.get('success'):
-                search_results['web_results'].extend(websailor_results['results'])
-                search_results['providers_used'].append('ALIBABA_WEBSAILOR')
-                logger.info(f"✅ Alibaba WebSailor retornou {len(websailor_results['results'])} resultados")
+            # FASE 1: Alibaba WebSailor (prioritário) como produtor assíncrono em thread; as fases 2 e 3
+            # rodam junto com ele, sem bloquear o event loop
+            logger.info("🔍 FASE 1: Busca com Alibaba WebSailor (em paralelo com as fases 2 e 3)")
+            websailor_task = asyncio.ensure_future(session_manager.acheckpoint(
+                session_id, 'search', f"ALIBABA_WEBSAILOR:{query}",
+                lambda: self._stream_alibaba_websailor(query, context, session_id, search_results['statistics']),
+                is_valid=lambda r: bool(r.get('success'))
+            ))
 
             # FASE 2: Busca Web Massiva Simultânea (provedores restantes)
             logger.info("🌐 FASE 2: Busca web massiva simultânea")
@@ -157,36 +146,23 @@ class RealSearchOrchestrator:
 
             # Firecrawl
             if 'FIRECRAWL' in self.api_keys:
-                web_tasks.append(self._search_firecrawl(query))
+                web_tasks.append(self._cached_search('FIRECRAWL', query, self._search_firecrawl, session_id))
 
             # Jina
             if 'JINA' in self.api_keys:
-                web_tasks.append(self._search_jina(query))
+                web_tasks.append(self._cached_search('JINA', query, self._search_jina, session_id))
 
             # Google
             if 'GOOGLE' in self.api_keys:
-                web_tasks.append(self._search_google(query))
+                web_tasks.append(self._cached_search('GOOGLE', query, self._search_google, session_id))
 
             # Exa
             if 'EXA' in self.api_keys:
-                web_tasks.append(self._search_exa(query))
+                web_tasks.append(self._cached_search('EXA', query, self._search_exa, session_id))
 
             # Serper
             if 'SERPER' in self.api_keys:
-                web_tasks.append(self._search_serper(query))
-
-            # Executa todas as buscas web simultaneamente
-            if web_tasks:
-                web_results = await asyncio.gather(*web_tasks, return_exceptions=True)
-
-                for result in web_results:
-                    if isinstance(result, Exception):
-                        logger.error(f"❌ Erro na busca web: {result}")
-                        continue
-
-                    if result.get('success') and result.get('results'):
-                        search_results['web_results'].extend(result['results'])
-                        search_results['providers_used'].append(result.get('provider', 'unknown'))
+                web_tasks.append(self._cached_search('SERPER', query, self._search_serper, session_id))
 
             # FASE 3: Busca em Redes Sociais
             logger.info("📱 FASE 3: Busca massiva em redes sociais")
@@ -194,26 +170,52 @@ class RealSearchOrchestrator:
 
             # YouTube
             if 'YOUTUBE' in self.api_keys:
-                social_tasks.append(self._search_youtube(query))
+                social_tasks.append(self._cached_search('YOUTUBE', query, self._search_youtube, session_id))
 
             # Supadata (Instagram, Facebook, TikTok)
             # if 'SUPADATA' in self.api_keys:
             #     social_tasks.append(self._search_supadata(query))
 
-            # Executa buscas sociais
-            if social_tasks:
-                social_results = await asyncio.gather(*social_tasks, return_exceptions=True)
+            # Executa buscas web e sociais simultaneamente (e junto com o WebSailor)
+            web_results, social_results = await asyncio.gather(
+                asyncio.gather(*web_tasks, return_exceptions=True),
+                asyncio.gather(*social_tasks, return_exceptions=True)
+            )
 
-                for result in social_results:
-                    if isinstance(result, Exception):
-                        logger.error(f"❌ Erro na busca social: {result}")
-                        continue
+            # Resultados do WebSailor entram primeiro, como na execução sequencial: a deduplicação
+            # dos demais provedores só acontece depois dele, preservando a precedência das suas URLs
+            try:
+                websailor_results = await websailor_task
+            except Exception as e:
+                logger.error(f"❌ Erro Alibaba WebSailor: {e}")
+                websailor_results = {'success': False, 'error': str(e)}
 
-                    if result.get('success'):
-                        if result.get('platform') == 'youtube':
-                            search_results['youtube_results'].extend(result.get('results', []))
-                        else:
-                            search_results['social_results'].extend(result.get('results', []))
+            if websailor_results.get('success'):
+                search_results['web_results'].extend(websailor_results['results'])
+                search_results['providers_used'].append('ALIBABA_WEBSAILOR')
+                logger.info(f"✅ Alibaba WebSailor retornou {len(websailor_results['results'])} resultados")
+
+            for result in web_results:
+                if isinstance(result, Exception):
+                    logger.error(f"❌ Erro na busca web: {result}")
+                    continue
+
+                if result.get('success') and result.get('results'):
+                    new_results = content_filter.filter(seen_urls.filter_new(result['results']))
+                    search_results['web_results'].extend(new_results)
+                    search_results['providers_used'].append(result.get('provider', 'unknown'))
+
+            for result in social_results:
+                if isinstance(result, Exception):
+                    logger.error(f"❌ Erro na busca social: {result}")
+                    continue
+
+                if result.get('success'):
+                    new_results = seen_urls.filter_new(result.get('results', []))
+                    if result.get('platform') == 'youtube':
+                        search_results['youtube_results'].extend(new_results)
+                    else:
+                        search_results['social_results'].extend(new_results)
 
             # FASE 4: Identificação de Conteúdo Viral
             logger.info("🔥 FASE 4: Identificando conteúdo viral")
@@ -232,11 +234,13 @@ class RealSearchOrchestrator:
             # Calcula estatísticas finais
             search_duration = time.time() - start_time
             all_results = search_results['web_results'] + search_results['social_results'] + search_results['youtube_results']
-            unique_urls = list(set(r.get('url', '') for r in all_results if r.get('url')))
+            dedup_stats = session_deduplicator.get_stats(session_id)
 
             search_results['statistics'].update({
                 'total_sources': len(all_results),
-                'unique_urls': len(unique_urls),
+                'unique_urls': len(seen_urls),
+                'duplicate_urls_skipped': dedup_stats['duplicate_urls_skipped'],
+                'near_duplicate_bodies_dropped': dedup_stats['near_duplicate_bodies_dropped'],
                 'content_extracted': sum(len(r.get('content', '')) for r in all_results),
                 'api_calls_made': sum(self.session_stats['api_rotations'].values()),
                 'search_duration': search_duration
@@ -251,51 +255,63 @@ class RealSearchOrchestrator:
         except Exception as e:
             logger.error(f"❌ ERRO CRÍTICO na busca massiva: {e}")
             raise
+        finally:
+            # Busca cancelada (prazo da etapa) ou com erro: para a thread do WebSailor antes de a sessão
+            # liberar o deduplicador e o loop fechar
+            if websailor_task is not None and not websailor_task.done():
+                websailor_task.cancel()
+
+    async def _cached_search(self, provider: str, query: str, search_func, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Executa busca do provedor passando pelo checkpoint da sessão e pelo cache persistente de resultados"""
+        is_valid = lambda r: bool(isinstance(r, dict) and r.get('success') and r.get('results'))
+        with tracer.span('search', kind='call', provider=provider, query=query[:200]) as span:
+            result = await session_manager.acheckpoint(
+                session_id, 'search', f"{provider}:{query}",
+                lambda: search_cache.aget_or_fetch(
+                    provider, query, None,
+                    lambda: provider_router.ameasure(provider, lambda: search_func(query)),
+                    is_valid=is_valid
+                ),
+                is_valid=is_valid
+            )
+            span.set(results=len(result.get('results') or []) if isinstance(result, dict) else 0)
+            return result
 
-    async def _search_alibaba_websailor(self, query: str, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Busca REAL usando Alibaba WebSailor Agent"""
+    async def _stream_alibaba_websailor(
+        self,
+        query: str,
+        context: Dict[str, Any],
+        session_id: Optional[str] = None,
+        statistics: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Consome o WebSailor como produtor assíncrono (páginas chegam enquanto os outros provedores rodam)"""
         try:
-            # Importa o agente WebSailor
             from services.alibaba_websailor import alibaba_websailor
-            
+
             if not alibaba_websailor or not alibaba_websailor.enabled:
                 logger.warning("⚠️ Alibaba WebSailor não está habilitado")
                 return {'success': False, 'error': 'Alibaba WebSailor não habilitado'}
 
-            # Executa a pesquisa profunda - CORRIGIDO: método síncrono, removendo await
-            research_result = alibaba_websailor.navigate_and_research_deep(
-                query=query,
-                context=context,
-                max_pages=30,
-                depth_levels=2,
-                session_id=None # Ou passe session_id se o método aceitar
-            )
-
-            if not research_result or not research_result.get('conteudo_consolidado'):
-                return {'success': False, 'error': 'Nenhum resultado da pesquisa WebSailor'}
+            research_result = None
+            pages = 0
+            with tracer.span('websailor', kind='call', provider='ALIBABA_WEBSAILOR', query=query[:200]) as span:
+                async for event in alibaba_websailor.research_stream(
+                    query=query,
+                    context=context,
+                    max_pages=30,
+                    depth_levels=2,
+                    session_id=session_id
+                ):
+                    if event['type'] == 'page':
+                        pages += 1
+                        if statistics is not None:
+                            statistics['websailor_pages_streamed'] = pages
+                        logger.info(f"📄 WebSailor página {pages}: {event['page'].get('url', '')}")
+                    else:
+                        research_result = event['research']
+                span.set(pages=pages)
 
-            # Converte resultados do WebSailor para formato padrão
-            results = []
-            fontes_detalhadas = research_result.get('conteudo_consolidado', {}).get('fontes_detalhadas', [])
-            
-            for fonte in fontes_detalhadas:
-                results.append({
-                    'title': fonte.get('title', ''),
-                    'url': fonte.get('url', ''),
-                    'snippet': '',  # WebSailor não fornece snippet diretamente
-                    'source': 'alibaba_websailor',
-                    'relevance_score': fonte.get('quality_score', 0.7),
-                    'content_length': fonte.get('content_length', 0)
-                })
-
-            logger.info(f"✅ Alibaba WebSailor processado com {len(results)} resultados")
-            
-            return {
-                'success': True,
-                'provider': 'ALIBABA_WEBSAILOR',
-                'results': results,
-                'raw_data': research_result
-            }
+            return self._convert_websailor_research(research_result)
 
         except ImportError:
             logger.warning("⚠️ Alibaba WebSailor não encontrado")
@@ -304,6 +320,33 @@ class RealSearchOrchestrator:
             logger.error(f"❌ Erro Alibaba WebSailor: {e}")
             return {'success': False, 'error': str(e)}
 
+    def _convert_websailor_research(self, research_result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Converte o resultado consolidado do WebSailor para o formato padrão de provedor"""
+        if not research_result or not research_result.get('conteudo_consolidado'):
+            return {'success': False, 'error': 'Nenhum resultado da pesquisa WebSailor'}
+
+        results = []
+        fontes_detalhadas = research_result.get('conteudo_consolidado', {}).get('fontes_detalhadas', [])
+
+        for fonte in fontes_detalhadas:
+            results.append({
+                'title': fonte.get('title', ''),
+                'url': fonte.get('url', ''),
+                'snippet': '',  # WebSailor não fornece snippet diretamente
+                'source': 'alibaba_websailor',
+                'relevance_score': fonte.get('quality_score', 0.7),
+                'content_length': fonte.get('content_length', 0)
+            })
+
+        logger.info(f"✅ Alibaba WebSailor processado com {len(results)} resultados")
+
+        return {
+            'success': True,
+            'provider': 'ALIBABA_WEBSAILOR',
+            'results': results,
+            'raw_data': research_result
+        }
+
     async def _search_firecrawl(self, query: str) -> Dict[str, Any]:
         """Busca REAL usando Firecrawl"""
         try:
@@ -314,7 +357,7 @@ class RealSearchOrchestrator:
             # Busca no Google e extrai com Firecrawl
             search_url = f"https://www.google.com/search?q={quote_plus(query)}&hl=pt-BR&gl=BR"
 
-            async with aiohttp.ClientSession() as session:
+            async with http_client_pool.session() as session:
                 headers = {
                     'Authorization': f'Bearer {api_key}',
                     'Content-Type': 'application/json'
@@ -373,7 +416,7 @@ class RealSearchOrchestrator:
 
             results = []
 
-            async with aiohttp.ClientSession() as session:
+            async with http_client_pool.session() as session:
                 for search_url in search_urls:
                     try:
                         jina_url = f"{self.service_urls['JINA']}{search_url}"
@@ -415,7 +458,7 @@ class RealSearchOrchestrator:
             if not api_key or not cse_id:
                 return {'success': False, 'error': 'Google API não configurada'}
 
-            async with aiohttp.ClientSession() as session:
+            async with http_client_pool.session() as session:
                 params = {
                     'key': api_key,
                     'cx': cse_id,
@@ -467,7 +510,7 @@ class RealSearchOrchestrator:
             if not api_key:
                 return {'success': False, 'error': 'YouTube API key não disponível'}
 
-            async with aiohttp.ClientSession() as session:
+            async with http_client_pool.session() as session:
                 params = {
                     'part': "snippet,id",
                     'q': f"{query} Brasil",
@@ -528,7 +571,7 @@ class RealSearchOrchestrator:
             logger.error(f"❌ Erro YouTube: {e}")
             return {'success': False, 'error': str(e)}
 
-    async def _get_youtube_video_stats(self, video_id: str, api_key: str, session: aiohttp.ClientSession) -> Dict[str, Any]:
+    async def _get_youtube_video_stats(self, video_id: str, api_key: str, session) -> Dict[str, Any]:
         """Obtém estatísticas detalhadas de um vídeo do YouTube"""
         try:
             params = {
@@ -561,7 +604,7 @@ class RealSearchOrchestrator:
             if not api_key:
                 return {'success': False, 'error': 'Supadata API key não disponível'}
 
-            async with aiohttp.ClientSession() as session:
+            async with http_client_pool.session() as session:
                 headers = {
                     'Authorization': f'Bearer {api_key}',
                     'Content-Type': 'application/json'
@@ -626,7 +669,7 @@ class RealSearchOrchestrator:
             if not api_key:
                 return {'success': False, 'error': 'X API key não disponível'}
 
-            async with aiohttp.ClientSession() as session:
+            async with http_client_pool.session() as session:
                 headers = {
                     'Authorization': f'Bearer {api_key}',
                     'Content-Type': 'application/json'
@@ -694,7 +737,7 @@ class RealSearchOrchestrator:
             if not api_key:
                 return {'success': False, 'error': 'Exa API key não disponível'}
 
-            async with aiohttp.ClientSession() as session:
+            async with http_client_pool.session() as session:
                 headers = {
                     'x-api-key': api_key,
                     'Content-Type': 'application/json'
@@ -754,7 +797,7 @@ class RealSearchOrchestrator:
             if not api_key:
                 return {'success': False, 'error': 'Serper API key não disponível'}
 
-            async with aiohttp.ClientSession() as session:
+            async with http_client_pool.session() as session:
                 headers = {
                     'X-API-KEY': api_key,
                     'Content-Type': 'application/json'
@@ -17,6 +17,7 @@ import re
 import tempfile
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from services.auto_save_manager import salvar_etapa, salvar_erro
+from services.tracing import tracer
 
 # Imports condicionais para não quebrar se não estiver instalado
 try:
@@ -63,6 +64,7 @@ except ImportError:
     HAS_PYMUPDF = False
 
 from services.url_resolver import url_resolver
+from services.http_client_pool import http_client_pool
 
 logger = logging.getLogger(__name__)
 
@@ -70,8 +72,7 @@ class RobustContentExtractor:
     """Extrator de conteúdo multicamadas e robusto com suporte aprimorado a PDF"""
 
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.session = http_client_pool.create_sync_session({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
@@ -104,6 +105,9 @@ class RobustContentExtractor:
         logger.info("🔧 Robust Content Extractor inicializado")
         logger.info(f"📚 Extratores disponíveis: {self._get_available_extractors()}")
 
+    @tracer.traced('extract_content', kind='call',
+                   attributes=lambda self, url: {'url': url, 'host': urlparse(url).netloc if url else None},
+                   result=lambda content: {'chars': len(content or ''), 'bytes': len((content or '').encode('utf-8'))})
     def extract_content(self, url: str) -> Optional[str]:
         """
         Extrai conteúdo usando múltiplos extratores em ordem de prioridade
@@ -901,7 +905,7 @@ class RobustContentExtractor:
         results = {}
 
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_url = {executor.submit(self.extract_content, url): url for url in urls}
+            future_to_url = {executor.submit(tracer.wrap(self.extract_content), url): url for url in urls}
 
             for future in as_completed(future_to_url):
                 url = future_to_url[future]
@@ -954,10 +958,8 @@ class RobustContentExtractor:
         return result
 
     def clear_cache(self):
-        """Limpa cache de sessão"""
-        self.session.close()
-        self.session = requests.Session()
-        self.session.headers.update({
+        """Limpa cache de sessão (cookies/headers; o pool de conexões compartilhado não é fechado)"""
+        self.session = http_client_pool.create_sync_session({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         })
         logger.info("🧹 Cache de extração limpo")
@@ -9,9 +9,14 @@ import os
 import logging
 from typing import Dict, List, Optional, Any
 import asyncio
-import aiohttp
 from datetime import datetime
 
+from services.http_client_pool import http_client_pool
+from services.url_canonicalizer import session_deduplicator
+from services.search_cache import search_cache
+from services.tracing import tracer
+from services.provider_router import provider_router
+
 logger = logging.getLogger(__name__)
 
 class SearchAPIManager:
@@ -20,7 +25,6 @@ class SearchAPIManager:
     def __init__(self):
         """Inicializa o gerenciador com rotação de chaves"""
         self.api_keys: Dict[str, List[str]] = {}
-        self.key_indices: Dict[str, int] = {}
         self.providers = ['FIRECRAWL', 'JINA', 'GOOGLE', 'EXA']
 
         self._load_api_keys()
@@ -29,26 +33,11 @@ class SearchAPIManager:
     def _load_api_keys(self):
         """Carrega todas as chaves de API do ambiente"""
         for provider in self.providers:
-            keys = []
-
-            # Carrega chave principal
-            main_key = os.getenv(f"{provider}_API_KEY")
-            if main_key:
-                keys.append(main_key)
-
-            # Carrega chaves numeradas (1, 2, 3, etc.)
-            counter = 1
-            while True:
-                numbered_key = os.getenv(f"{provider}_API_KEY_{counter}")
-                if numbered_key:
-                    keys.append(numbered_key)
-                    counter += 1
-                else:
-                    break
+            # Chave principal e numeradas (1, 2, 3, etc.), registradas no roteador compartilhado
+            keys = provider_router.load_env_keys(provider)
 
             if keys:
                 self.api_keys[provider] = keys
-                self.key_indices[provider] = 0
                 logger.info(f"✅ {provider}: {len(keys)} chaves carregadas")
             else:
                 if provider == 'GOOGLE':
@@ -57,27 +46,19 @@ class SearchAPIManager:
                     logger.warning(f"⚠️ {provider}: Nenhuma chave encontrada")
 
     def get_next_key(self, provider: str) -> Optional[str]:
-        """Retorna a próxima chave de API disponível para um provedor"""
+        """Retorna a chave mais rápida e saudável do provedor (roteamento por latência e erros)"""
         if provider not in self.api_keys or not self.api_keys[provider]:
             logger.error(f"❌ Nenhuma chave disponível para {provider}")
             return None
 
-        keys = self.api_keys[provider]
-        current_index = self.key_indices[provider]
-
-        # Obtém a chave atual
-        key = keys[current_index]
-
-        # Rotaciona para a próxima chave
-        self.key_indices[provider] = (current_index + 1) % len(keys)
-
-        logger.debug(f"🔄 {provider}: Usando chave {current_index + 1}/{len(keys)}")
+        key = provider_router.choose_key(provider)
+        logger.debug(f"🔄 {provider}: Usando chave {provider_router.key_id(key) if key else None}")
         return key
 
     async def _search_firecrawl(self, query: str, api_key: str) -> Dict[str, Any]:
         """Busca usando Firecrawl"""
         try:
-            async with aiohttp.ClientSession() as session:
+            async with http_client_pool.session() as session:
                 headers = {
                     'Authorization': f'Bearer {api_key}',
                     'Content-Type': 'application/json'
@@ -117,7 +98,7 @@ class SearchAPIManager:
     async def _search_jina(self, query: str, api_key: str) -> Dict[str, Any]:
         """Busca usando Jina AI"""
         try:
-            async with aiohttp.ClientSession() as session:
+            async with http_client_pool.session() as session:
                 headers = {
                     'Authorization': f'Bearer {api_key}',
                     'Accept': 'application/json'
@@ -169,7 +150,7 @@ class SearchAPIManager:
             if not cx_id:
                 return {'provider': 'GOOGLE', 'success': False, 'error': 'CSE_ID não configurado'}
 
-            async with aiohttp.ClientSession() as session:
+            async with http_client_pool.session() as session:
                 params = {
                     'key': api_key,
                     'cx': cx_id,
@@ -202,7 +183,7 @@ class SearchAPIManager:
     async def _search_exa(self, query: str, api_key: str) -> Dict[str, Any]:
         """Busca usando Exa"""
         try:
-            async with aiohttp.ClientSession() as session:
+            async with http_client_pool.session() as session:
                 headers = {
                     'x-api-key': api_key,
                     'Content-Type': 'application/json'
@@ -236,9 +217,10 @@ class SearchAPIManager:
             logger.error(f"❌ Erro Exa: {e}")
             return {'provider': 'EXA', 'success': False, 'error': str(e)}
 
-    async def interleaved_search(self, query: str) -> Dict[str, Any]:
+    async def interleaved_search(self, query: str, session_id: Optional[str] = None) -> Dict[str, Any]:
         """Orquestra buscas intercaladas entre provedores"""
         logger.info(f"🔍 Iniciando busca intercalada para: {query}")
+        seen_urls = session_deduplicator.urls(session_id)
 
         search_tasks = []
         results = {
@@ -261,8 +243,7 @@ class SearchAPIManager:
 
         for provider in self.providers:
             if provider in self.api_keys:
-                api_key = self.get_next_key(provider)
-                if api_key and provider in search_methods:
+                if provider in search_methods:
                     # Inicializa índices e contagens de retentativa para Jina se necessário
                     if provider == 'JINA':
                         if not hasattr(self, '_jina_key_index'):
@@ -270,7 +251,14 @@ class SearchAPIManager:
                         if not hasattr(self, '_jina_retry_count'):
                             self._jina_retry_count = 0
 
-                    task = search_methods[provider](query, api_key)
+                    # A chave só é escolhida (e medida) quando o cache não responde
+                    task = tracer.trace_coro('search', search_cache.aget_or_fetch(
+                        provider, query, None,
+                        lambda method=search_methods[provider], provider=provider: provider_router.ameasure(
+                            provider, lambda: method(query, self.get_next_key(provider))
+                        ),
+                        is_valid=lambda r: bool(r.get('success'))
+                    ), kind='call', provider=provider, query=query[:200])
                     search_tasks.append(task)
                     results['providers_used'].append(provider)
 
@@ -294,7 +282,7 @@ class SearchAPIManager:
                                 for item in provider_results:
                                     if isinstance(item, dict):
                                         url = item.get('url') or item.get('link')
-                                        if url and url not in results['consolidated_urls']:
+                                        if url and seen_urls.add(url):
                                             results['consolidated_urls'].append(url)
                         else:
                             results['failed_searches'] += 1
@@ -322,13 +310,12 @@ class SearchAPIManager:
             if provider in self.api_keys:
                 stats[provider] = {
                     'total_keys': len(self.api_keys[provider]),
-                    'current_index': self.key_indices[provider],
-                    'available': True
+                    'available': provider_router.is_healthy(provider),
+                    'routing': provider_router.get_stats(provider).get(provider)
                 }
             else:
                 stats[provider] = {
                     'total_keys': 0,
-                    'current_index': 0,
                     'available': False
                 }
         return stats
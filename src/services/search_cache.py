@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Search Cache
+Cache persistente de resultados de busca (SQLite/LRU) com stale-while-revalidate
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Normaliza query para chave de cache (unicode, caixa e espaços)"""
+    query = unicodedata.normalize('NFKC', query or '').lower().strip()
+    return re.sub(r'\s+', ' ', query)
+
+
+class SearchCache:
+    """Cache de busca em disco compartilhado entre workers, com LRU por tamanho"""
+
+    def __init__(self):
+        """Inicializa cache com configuração do ambiente"""
+        cache_dir = os.getenv('SEARCH_CACHE_DIR', 'cache')
+        self.db_path = os.path.join(cache_dir, 'search_cache.sqlite3')
+        self.enabled = os.getenv('SEARCH_CACHE_ENABLED', 'true').lower() == 'true'
+        self.ttl = int(os.getenv('SEARCH_CACHE_TTL', str(6 * 3600)))
+        self.stale_ttl = int(os.getenv('SEARCH_CACHE_STALE_TTL', str(7 * 24 * 3600)))
+        self.max_bytes = int(os.getenv('SEARCH_CACHE_MAX_MB', '256')) * 1024 * 1024
+        self.max_entries = int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '50000'))
+
+        self._local = threading.local()
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._background_tasks = set()
+        self._writes_since_eviction = 0
+
+        if self.enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._init_db()
+            logger.info(f"💾 Search Cache inicializado em {self.db_path} (TTL {self.ttl}s, stale {self.stale_ttl}s)")
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexão SQLite por thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                query TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS provider_stats (
+                provider TEXT PRIMARY KEY,
+                hits INTEGER DEFAULT 0,
+                stale_hits INTEGER DEFAULT 0,
+                misses INTEGER DEFAULT 0,
+                refreshes INTEGER DEFAULT 0
+            )
+        """)
+
+    def make_key(self, provider: str, query: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """Gera chave a partir de provedor, query normalizada e parâmetros"""
+        raw = json.dumps([provider.lower(), normalize_query(query), params or {}], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _count(self, provider: str, column: str):
+        try:
+            self._conn().execute(
+                f"INSERT INTO provider_stats(provider, {column}) VALUES (?, 1) "
+                f"ON CONFLICT(provider) DO UPDATE SET {column} = {column} + 1",
+                (provider.lower(),)
+            )
+        except sqlite3.Error as e:
+            logger.debug(f"⚠️ Falha ao registrar estatística do cache: {e}")
+
+    def get(self, provider: str, query: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Any, Optional[str]]:
+        """Retorna (valor, estado) onde estado é 'fresh', 'stale' ou None"""
+        if not self.enabled:
+            return None, None
+
+        key = self.make_key(provider, query, params)
+        try:
+            row = self._conn().execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None, None
+
+            age = time.time() - row[1]
+            if age > self.ttl + self.stale_ttl:
+                self._conn().execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None, None
+
+            self._conn().execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0]), ('fresh' if age <= self.ttl else 'stale')
+
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"⚠️ Erro ao ler cache de busca: {e}")
+            return None, None
+
+    def set(self, provider: str, query: str, params: Optional[Dict[str, Any]], value: Any):
+        """Armazena resultado no cache"""
+        if not self.enabled:
+            return
+
+        try:
+            payload = json.dumps(value, ensure_ascii=False, default=str)
+            now = time.time()
+            self._conn().execute(
+                "INSERT OR REPLACE INTO entries(key, provider, query, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.make_key(provider, query, params), provider.lower(), normalize_query(query),
+                 payload, len(payload), now, now)
+            )
+            self._writes_since_eviction += 1
+            if self._writes_since_eviction >= 50:
+                self._evict()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Erro ao gravar cache de busca: {e}")
+
+    def _evict(self):
+        """Remove entradas expiradas e as menos acessadas até caber nos limites"""
+        self._writes_since_eviction = 0
+        conn = self._conn()
+        conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl - self.stale_ttl,))
+
+        total_size, total_count = conn.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries").fetchone()
+        if total_size <= self.max_bytes and total_count <= self.max_entries:
+            return
+
+        removed = 0
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC").fetchall():
+            if total_size <= self.max_bytes * 0.9 and total_count <= self.max_entries * 0.9:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total_size -= size
+            total_count -= 1
+            removed += 1
+        logger.info(f"🧹 Cache de busca: {removed} entradas removidas por LRU")
+
+    def _should_refresh(self, key: str) -> bool:
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _refresh_done(self, key: str):
+        with self._refresh_lock:
+            self._refreshing.discard(key)
+
+    def get_or_fetch(
+        self,
+        provider: str,
+        query: str,
+        params: Optional[Dict[str, Any]],
+        fetch: Callable[[], Any],
+        is_valid: Callable[[Any], bool] = bool
+    ) -> Any:
+        """Versão síncrona: serve do cache, revalida em background se velho, busca se ausente"""
+        value, state = self.get(provider, query, params)
+
+        if state == 'fresh':
+            self._count(provider, 'hits')
+            logger.info(f"💾 Cache HIT {provider}: {query}")
+            return value
+
+        if state == 'stale':
+            self._count(provider, 'stale_hits')
+            key = self.make_key(provider, query, params)
+            if self._should_refresh(key):
+                def refresh():
+                    try:
+                        fresh = fetch()
+                        if is_valid(fresh):
+                            self.set(provider, query, params, fresh)
+                            self._count(provider, 'refreshes')
+                    except Exception as e:
+                        logger.warning(f"⚠️ Revalidação do cache {provider} falhou: {e}")
+                    finally:
+                        self._refresh_done(key)
+                threading.Thread(target=refresh, daemon=True).start()
+            logger.info(f"💾 Cache STALE {provider}: {query} (revalidando)")
+            return value
+
+        self._count(provider, 'misses')
+        fresh = fetch()
+        if is_valid(fresh):
+            self.set(provider, query, params, fresh)
+        return fresh
+
+    async def aget_or_fetch(
+        self,
+        provider: str,
+        query: str,
+        params: Optional[Dict[str, Any]],
+        fetch: Callable[[], Awaitable[Any]],
+        is_valid: Callable[[Any], bool] = bool
+    ) -> Any:
+        """Versão assíncrona de get_or_fetch (fetch é uma fábrica de corrotina)"""
+        value, state = self.get(provider, query, params)
+
+        if state == 'fresh':
+            self._count(provider, 'hits')
+            logger.info(f"💾 Cache HIT {provider}: {query}")
+            return value
+
+        if state == 'stale':
+            self._count(provider, 'stale_hits')
+            key = self.make_key(provider, query, params)
+            if self._should_refresh(key):
+                async def refresh():
+                    try:
+                        fresh = await fetch()
+                        if is_valid(fresh):
+                            self.set(provider, query, params, fresh)
+                            self._count(provider, 'refreshes')
+                    except Exception as e:
+                        logger.warning(f"⚠️ Revalidação do cache {provider} falhou: {e}")
+                    finally:
+                        self._refresh_done(key)
+                task = asyncio.get_running_loop().create_task(refresh())
+                self._background_tasks.add(task)
+                task.add_done_callback(self._background_tasks.discard)
+            logger.info(f"💾 Cache STALE {provider}: {query} (revalidando)")
+            return value
+
+        self._count(provider, 'misses')
+        fresh = await fetch()
+        if is_valid(fresh):
+            self.set(provider, query, params, fresh)
+        return fresh
+
+    def clear(self, provider: Optional[str] = None):
+        """Limpa o cache (todo ou de um provedor)"""
+        if not self.enabled:
+            return
+        if provider:
+            self._conn().execute("DELETE FROM entries WHERE provider = ?", (provider.lower(),))
+        else:
+            self._conn().execute("DELETE FROM entries")
+        logger.info(f"🧹 Cache de busca limpo{f' ({provider})' if provider else ''}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna tamanho do cache e taxa de acerto por provedor"""
+        if not self.enabled:
+            return {'enabled': False}
+
+        conn = self._conn()
+        total_size, total_count = conn.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries").fetchone()
+        providers = {}
+        for provider, hits, stale_hits, misses, refreshes in conn.execute(
+            "SELECT provider, hits, stale_hits, misses, refreshes FROM provider_stats"
+        ).fetchall():
+            lookups = hits + stale_hits + misses
+            providers[provider] = {
+                'hits': hits,
+                'stale_hits': stale_hits,
+                'misses': misses,
+                'refreshes': refreshes,
+                'hit_rate': round((hits + stale_hits) / lookups, 4) if lookups else 0.0
+            }
+
+        return {
+            'enabled': True,
+            'entries': total_count,
+            'size_bytes': total_size,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'stale_ttl': self.stale_ttl,
+            'providers': providers
+        }
+
+
+# Instância global
+search_cache = SearchCache()
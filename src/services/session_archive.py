@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Session Archive
+Camada de compactação para sessões finalizadas: empacota os arquivos da sessão
+(analyses_data e relatorios_intermediarios) em um único ZIP com índice, deduplica
+snapshots intermediários repetidos e mantém leitura transparente pelo caminho original
+"""
+
+import os
+import re
+import json
+import time
+import glob
+import hashlib
+import logging
+import zipfile
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple, Iterator
+
+from services.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+# Raízes com dados por sessão (relativas ao diretório de trabalho, como no restante do app)
+SESSION_ROOTS = ('analyses_data', 'relatorios_intermediarios')
+
+# Subdiretórios de analyses_data que não são sessões
+RESERVED_DIRS = {
+    'analyses', 'anti_objecao', 'avatars', 'completas', 'concorrencia', 'drivers_mentais',
+    'files', 'funil_vendas', 'insights', 'logs', 'metadata', 'metricas', 'palavras_chave',
+    'pesquisa_web', 'plano_acao', 'posicionamento', 'pre_pitch', 'predicoes_futuro',
+    'progress', 'provas_visuais', 'reports', 'users', 'screenshots', 'viral_images_data', 'geral'
+}
+
+# Campos de topo que mudam a cada snapshot sem alterar o conteúdo (ver serializar_dados_seguros)
+VOLATILE_FIELDS = ('timestamp',)
+
+
+def _glob_to_regex(pattern: str) -> 're.Pattern':
+    """Converte padrão glob (com suporte a **) em regex sobre caminhos com '/'"""
+    regex = ''
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return re.compile(regex + r'\Z')
+
+
+def _normalize(path: str) -> str:
+    """Caminho relativo ao diretório de trabalho com separador '/'"""
+    if os.path.isabs(path):
+        path = os.path.relpath(path)
+    return os.path.normpath(path).replace(os.sep, '/')
+
+
+def _has_session_token(session_id: str, text: str) -> bool:
+    """ID da sessão como token do nome/caminho (entre '_', '/', '.' ou extremos), não como substring"""
+    return re.search(r'(^|[_/])' + re.escape(session_id) + r'([_./*]|$)', text) is not None
+
+
+class SessionArchiveManager:
+    """Compacta sessões finalizadas em um arquivo por sessão e resolve leituras no arquivo"""
+
+    def __init__(self):
+        """Inicializa a camada de compactação"""
+        self.archive_path = os.getenv('SESSION_ARCHIVE_DIR', 'sessions_archive')
+        self.min_age_hours = float(os.getenv('SESSION_ARCHIVE_MIN_AGE_HOURS', '24'))
+        self.compresslevel = int(os.getenv('SESSION_ARCHIVE_COMPRESSION', '9'))
+        self.catalog_file = f"{self.archive_path}/catalog.json"
+        self._lock = threading.RLock()
+        # Compactação/restauração e o catálogo são compartilhados com os workers da fila (outros processos)
+        self._process_lock = FileLock(f"{self.archive_path}/.lock")
+        self._catalog: Optional[Dict[str, Dict[str, Any]]] = None
+        self._catalog_mtime = 0.0
+        self._indexes: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+        os.makedirs(self.archive_path, exist_ok=True)
+        logger.info(f"🗜️ Session Archive inicializado: {self.archive_path}")
+
+    # ------------------------------------------------------------------
+    # Catálogo e índices
+    # ------------------------------------------------------------------
+
+    def _archive_file(self, session_id: str) -> str:
+        if not re.fullmatch(r'[\w\-]+', session_id or ''):
+            raise ValueError(f"Identificador de sessão inválido: {session_id!r}")
+        return f"{self.archive_path}/{session_id}.zip"
+
+    def _load_catalog(self) -> Dict[str, Dict[str, Any]]:
+        """Catálogo de sessões arquivadas, recarregado quando outro processo o altera"""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.catalog_file)
+            except OSError:
+                mtime = 0.0
+            if self._catalog is None or mtime != self._catalog_mtime:
+                catalog = {}
+                if mtime:
+                    try:
+                        with open(self.catalog_file, 'r', encoding='utf-8') as f:
+                            catalog = json.load(f)
+                    except Exception as e:
+                        logger.error(f"❌ Catálogo de arquivos ilegível: {e}")
+                self._catalog = catalog
+                self._catalog_mtime = mtime
+            return self._catalog
+
+    def _save_catalog(self, catalog: Dict[str, Dict[str, Any]]):
+        tmp_file = f"{self.catalog_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(catalog, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.catalog_file)
+        self._catalog = catalog
+        self._catalog_mtime = os.path.getmtime(self.catalog_file)
+
+    def is_archived(self, session_id: str) -> bool:
+        return session_id in self._load_catalog()
+
+    def get_archive_file(self, session_id: str) -> Optional[str]:
+        """Caminho do ZIP da sessão, se ela estiver compactada"""
+        if not self.is_archived(session_id):
+            return None
+        archive_file = self._archive_file(session_id)
+        return archive_file if os.path.exists(archive_file) else None
+
+    def _get_index(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Índice (caminho original → blob) do arquivo da sessão, com cache por mtime"""
+        archive_file = self._archive_file(session_id)
+        try:
+            mtime = os.path.getmtime(archive_file)
+        except OSError:
+            return None
+        cached = self._indexes.get(session_id)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with zipfile.ZipFile(archive_file, 'r') as archive:
+            index = json.loads(archive.read('index.json'))
+        self._indexes[session_id] = (mtime, index)
+        return index
+
+    def _sessions_for(self, path: str) -> List[str]:
+        """Sessões arquivadas cujo ID aparece no caminho ou padrão"""
+        return [session_id for session_id in self._load_catalog() if _has_session_token(session_id, path)]
+
+    # ------------------------------------------------------------------
+    # Descoberta de arquivos por sessão
+    # ------------------------------------------------------------------
+
+    def session_files(self, session_id: str) -> List[str]:
+        """Lista exata de arquivos em disco pertencentes à sessão"""
+        found = set()
+
+        def _walk(directory: str):
+            for root, dirs, files in os.walk(directory):
+                for filename in files:
+                    found.add(_normalize(os.path.join(root, filename)))
+
+        for base in SESSION_ROOTS:
+            if not os.path.isdir(base):
+                continue
+            # Diretório próprio da sessão (analyses_data/<sessão>)
+            if os.path.isdir(f"{base}/{session_id}"):
+                _walk(f"{base}/{session_id}")
+            for entry in os.scandir(base):
+                if not entry.is_dir() or entry.name == session_id:
+                    continue
+                # Subdiretório por categoria (relatorios_intermediarios/<categoria>/<sessão>, analyses_data/files/<sessão>)
+                if os.path.isdir(f"{entry.path}/{session_id}"):
+                    _walk(f"{entry.path}/{session_id}")
+                # Arquivos planos com o ID da sessão no nome
+                for child in os.scandir(entry.path):
+                    if child.is_file() and _has_session_token(session_id, child.name):
+                        found.add(_normalize(child.path))
+
+        return sorted(found)
+
+    def list_candidate_sessions(self) -> List[str]:
+        """Sessões com dados em disco (diretórios por sessão nas raízes conhecidas)"""
+        candidates = set()
+        if os.path.isdir('analyses_data'):
+            for entry in os.scandir('analyses_data'):
+                if entry.is_dir() and entry.name not in RESERVED_DIRS and re.fullmatch(r'[\w\-]+', entry.name):
+                    candidates.add(entry.name)
+        if os.path.isdir('relatorios_intermediarios'):
+            for category in os.scandir('relatorios_intermediarios'):
+                if not category.is_dir():
+                    continue
+                for entry in os.scandir(category.path):
+                    if entry.is_dir() and re.fullmatch(r'[\w\-]+', entry.name):
+                        candidates.add(entry.name)
+        return sorted(candidates)
+
+    def is_finished(self, session_id: str) -> bool:
+        """Sessão concluída (relatório final ou persistência) e sem jobs pendentes"""
+        completed = any(
+            os.path.exists(f"analyses_data/{session_id}/{name}")
+            for name in ('relatorio_final.md', 'relatorio_final_completo.md')
+        ) or os.path.exists(f"sessions_data/completed/{session_id}.json")
+        if not completed:
+            return False
+
+        try:
+            from services.job_queue import job_queue
+            active = [job for job in job_queue.list_jobs(session_id=session_id, limit=50)
+                      if job.get('status') in ('queued', 'running')]
+            return not active
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível consultar jobs da sessão {session_id}: {e}")
+            return False
+
+    # ------------------------------------------------------------------
+    # Deduplicação de snapshots
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _split_volatile(path: str, raw: bytes) -> Tuple[bytes, Optional[Dict[str, Any]]]:
+        """
+        Separa campos voláteis de snapshots JSON para que cópias com o mesmo conteúdo
+        compartilhem um blob; só aplica quando a reconstrução reproduz os bytes originais
+        """
+        if not path.endswith('.json'):
+            return raw, None
+        try:
+            data = json.loads(raw)
+        except Exception:
+            return raw, None
+        if not isinstance(data, dict) or not any(field in data for field in VOLATILE_FIELDS):
+            return raw, None
+
+        keys = list(data.keys())
+        volatile = {field: {'value': data.pop(field), 'position': keys.index(field)}
+                    for field in VOLATILE_FIELDS if field in data}
+        stripped = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        if SessionArchiveManager._restore_volatile(stripped, volatile) != raw:
+            return raw, None
+        return stripped, volatile
+
+    @staticmethod
+    def _restore_volatile(blob: bytes, volatile: Optional[Dict[str, Any]]) -> bytes:
+        if not volatile:
+            return blob
+        items = list(json.loads(blob).items())
+        for field, info in sorted(volatile.items(), key=lambda item: item[1]['position']):
+            items.insert(info['position'], (field, info['value']))
+        return json.dumps(dict(items), ensure_ascii=False, indent=2).encode('utf-8')
+
+    # ------------------------------------------------------------------
+    # Compactação e restauração
+    # ------------------------------------------------------------------
+
+    def compact_session(self, session_id: str, dry_run: bool = False) -> Dict[str, Any]:
+        """Empacota os arquivos da sessão em um ZIP deduplicado e remove os originais"""
+        archive_file = self._archive_file(session_id)
+
+        with self._process_lock:
+            # Sessão já arquivada que voltou a ter arquivos em disco: reincorpora o arquivo atual
+            if not dry_run and self.is_archived(session_id) and self.session_files(session_id):
+                self.restore_session(session_id)
+
+            files = self.session_files(session_id)
+            if not files:
+                return {'session_id': session_id, 'compacted': False, 'reason': 'sem arquivos em disco'}
+
+            original_bytes = sum(os.path.getsize(path) for path in files)
+            if dry_run:
+                return {'session_id': session_id, 'compacted': False, 'dry_run': True,
+                        'files': len(files), 'original_bytes': original_bytes}
+
+            index: Dict[str, Any] = {'session_id': session_id, 'created_at': datetime.now().isoformat(), 'files': {}}
+            written_blobs = set()
+            tmp_file = f"{archive_file}.tmp"
+
+            with zipfile.ZipFile(tmp_file, 'w', compression=zipfile.ZIP_DEFLATED,
+                                 compresslevel=self.compresslevel) as archive:
+                for path in files:
+                    with open(path, 'rb') as f:
+                        raw = f.read()
+                    blob, volatile = self._split_volatile(path, raw)
+                    digest = hashlib.sha1(blob).hexdigest()
+                    if digest not in written_blobs:
+                        archive.writestr(f"blobs/{digest}", blob)
+                        written_blobs.add(digest)
+                    entry = {'blob': digest, 'size': len(raw), 'mtime': os.path.getmtime(path)}
+                    if volatile:
+                        entry['volatile'] = volatile
+                    index['files'][path] = entry
+
+                index['blobs'] = len(written_blobs)
+                index['original_bytes'] = original_bytes
+                archive.writestr('index.json', json.dumps(index, ensure_ascii=False))
+
+            with zipfile.ZipFile(tmp_file, 'r') as archive:
+                corrupted = archive.testzip()
+            if corrupted:
+                os.remove(tmp_file)
+                raise IOError(f"Arquivo da sessão {session_id} corrompido em {corrupted}")
+
+            os.replace(tmp_file, archive_file)
+            archive_bytes = os.path.getsize(archive_file)
+
+            catalog = dict(self._load_catalog())
+            catalog[session_id] = {
+                'archive': archive_file,
+                'files': len(files),
+                'blobs': len(written_blobs),
+                'original_bytes': original_bytes,
+                'archive_bytes': archive_bytes,
+                'compacted_at': index['created_at']
+            }
+            self._save_catalog(catalog)
+
+            self._remove_originals(session_id, files)
+
+        logger.info(f"🗜️ Sessão {session_id} compactada: {len(files)} arquivos → {len(written_blobs)} blobs, "
+                    f"{original_bytes / 1024:.1f}KB → {archive_bytes / 1024:.1f}KB")
+
+        return {
+            'session_id': session_id,
+            'compacted': True,
+            'files': len(files),
+            'blobs': len(written_blobs),
+            'original_bytes': original_bytes,
+            'archive_bytes': archive_bytes
+        }
+
+    @staticmethod
+    def _remove_originals(session_id: str, files: List[str]):
+        """Remove arquivos já arquivados e os diretórios da sessão que ficaram vazios"""
+        directories = set()
+        for path in files:
+            try:
+                os.remove(path)
+                directories.add(os.path.dirname(path))
+            except OSError as e:
+                logger.warning(f"⚠️ Não foi possível remover {path}: {e}")
+
+        # Sobe até o diretório com o nome da sessão; pastas de categoria permanecem
+        for directory in sorted(directories, key=len, reverse=True):
+            while session_id in directory.split('/'):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+
+    def restore_session(self, session_id: str) -> int:
+        """Extrai o arquivo da sessão de volta aos caminhos originais (ex.: para reexecutar etapas)"""
+        with self._process_lock:
+            index = self._get_index(session_id)
+            if index is None:
+                return 0
+
+            restored = 0
+            with zipfile.ZipFile(self._archive_file(session_id), 'r') as archive:
+                for path, entry in index['files'].items():
+                    if os.path.exists(path):
+                        continue
+                    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                    with open(path, 'wb') as f:
+                        f.write(self._restore_volatile(archive.read(f"blobs/{entry['blob']}"), entry.get('volatile')))
+                    os.utime(path, (entry['mtime'], entry['mtime']))
+                    restored += 1
+
+            os.remove(self._archive_file(session_id))
+            self._indexes.pop(session_id, None)
+            catalog = dict(self._load_catalog())
+            catalog.pop(session_id, None)
+            self._save_catalog(catalog)
+
+        logger.info(f"📤 Sessão {session_id} restaurada do arquivo: {restored} arquivos")
+        return restored
+
+    def ensure_restored(self, session_id: str) -> bool:
+        """Garante que a sessão está em disco antes de uma nova escrita"""
+        if session_id and self.is_archived(session_id):
+            return self.restore_session(session_id) > 0
+        return False
+
+    def compact_finished(self, min_age_hours: Optional[float] = None, dry_run: bool = False,
+                         session_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Compacta sessões finalizadas sem alterações há pelo menos min_age_hours"""
+        min_age_hours = self.min_age_hours if min_age_hours is None else min_age_hours
+        cutoff = time.time() - min_age_hours * 3600
+        results = []
+        skipped = 0
+
+        for session_id in session_ids or self.list_candidate_sessions():
+            try:
+                if session_id in RESERVED_DIRS or not re.fullmatch(r'[\w\-]+', str(session_id)):
+                    raise ValueError(f"session_id inválido: {session_id!r}")
+                if not self.is_finished(session_id):
+                    skipped += 1
+                    continue
+                files = self.session_files(session_id)
+                if not files or max(os.path.getmtime(path) for path in files) > cutoff:
+                    skipped += 1
+                    continue
+                results.append(self.compact_session(session_id, dry_run=dry_run))
+            except Exception as e:
+                logger.error(f"❌ Erro ao compactar sessão {session_id}: {e}")
+                results.append({'session_id': session_id, 'compacted': False, 'error': str(e)})
+
+        original = sum(r.get('original_bytes', 0) for r in results)
+        archived = sum(r.get('archive_bytes', 0) for r in results)
+        return {
+            'sessions': results,
+            'compacted': sum(1 for r in results if r.get('compacted')),
+            'skipped': skipped,
+            'original_bytes': original,
+            'reclaimed_bytes': original - archived if not dry_run else 0,
+            'dry_run': dry_run
+        }
+
+    # ------------------------------------------------------------------
+    # Leitura transparente (disco primeiro, depois arquivo da sessão)
+    # ------------------------------------------------------------------
+
+    def _lookup(self, path: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        normalized = _normalize(path)
+        for session_id in self._sessions_for(normalized):
+            index = self._get_index(session_id)
+            if index and normalized in index['files']:
+                return session_id, index['files'][normalized]
+        return None
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(path) or self._lookup(path) is not None
+
+    def read_bytes(self, path: str) -> bytes:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return f.read()
+        found = self._lookup(path)
+        if found is None:
+            raise FileNotFoundError(path)
+        session_id, entry = found
+        with zipfile.ZipFile(self._archive_file(session_id), 'r') as archive:
+            return self._restore_volatile(archive.read(f"blobs/{entry['blob']}"), entry.get('volatile'))
+
+    def read_text(self, path: str) -> str:
+        return self.read_bytes(path).decode('utf-8')
+
+    def read_json(self, path: str) -> Any:
+        return json.loads(self.read_bytes(path))
+
+    def getmtime(self, path: str) -> float:
+        if os.path.exists(path):
+            return os.path.getmtime(path)
+        found = self._lookup(path)
+        if found is None:
+            raise FileNotFoundError(path)
+        return found[1]['mtime']
+
+    def getsize(self, path: str) -> int:
+        if os.path.exists(path):
+            return os.path.getsize(path)
+        found = self._lookup(path)
+        if found is None:
+            raise FileNotFoundError(path)
+        return found[1]['size']
+
+    def glob(self, pattern: str, recursive: bool = False) -> List[str]:
+        """glob.glob que também encontra arquivos de sessões arquivadas"""
+        matches = glob.glob(pattern, recursive=recursive)
+        sessions = self._sessions_for(pattern)
+        if sessions:
+            regex = _glob_to_regex(_normalize(pattern) if recursive else _normalize(pattern).replace('**', '*'))
+            seen = {_normalize(match) for match in matches}
+            for session_id in sessions:
+                index = self._get_index(session_id) or {'files': {}}
+                for path in index['files']:
+                    if path not in seen and regex.match(path):
+                        matches.append(path)
+                        seen.add(path)
+        return matches
+
+    def iter_files(self, directory: str) -> Iterator[Tuple[str, int]]:
+        """Percorre (caminho, tamanho) de um diretório, incluindo arquivos arquivados"""
+        seen = set()
+        if os.path.isdir(directory):
+            for root, dirs, files in os.walk(directory):
+                for filename in files:
+                    path = os.path.join(root, filename)
+                    seen.add(_normalize(path))
+                    yield path, os.path.getsize(path)
+
+        prefix = _normalize(directory) + '/'
+        for session_id in self._sessions_for(prefix):
+            index = self._get_index(session_id) or {'files': {}}
+            for path, entry in sorted(index['files'].items()):
+                if path.startswith(prefix) and path not in seen:
+                    yield path, entry['size']
+
+    def get_stats(self) -> Dict[str, Any]:
+        catalog = self._load_catalog()
+        original = sum(entry.get('original_bytes', 0) for entry in catalog.values())
+        archived = sum(entry.get('archive_bytes', 0) for entry in catalog.values())
+        return {
+            'archived_sessions': len(catalog),
+            'files': sum(entry.get('files', 0) for entry in catalog.values()),
+            'blobs': sum(entry.get('blobs', 0) for entry in catalog.values()),
+            'original_mb': round(original / (1024 * 1024), 2),
+            'archive_mb': round(archived / (1024 * 1024), 2),
+            'reclaimed_mb': round((original - archived) / (1024 * 1024), 2),
+            'archive_dir': self.archive_path
+        }
+
+
+# Instância global
+session_archive = SessionArchiveManager()
@@ -6,11 +6,14 @@ Sistema completo de persistência e gerenciamento de sessões
 """
 
 import os
+import re
 import json
+import uuid
+import hashlib
 import logging
 import glob
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable, Awaitable
 from pathlib import Path
 import shutil
 
@@ -23,6 +26,8 @@ class SessionPersistenceManager:
         """Inicializa o gerenciador de persistência"""
         self.sessions_path = "sessions_data"
         self.backup_path = "sessions_backup"
+        self.checkpoints_path = f"{self.sessions_path}/checkpoints"
+        self.resume_enabled = os.getenv('CHECKPOINT_RESUME', 'true').lower() == 'true'
         self._ensure_directories()
         
         logger.info("💾 Session Persistence Manager inicializado")
@@ -34,7 +39,8 @@ class SessionPersistenceManager:
             self.backup_path,
             f"{self.sessions_path}/active",
             f"{self.sessions_path}/completed",
-            f"{self.sessions_path}/metadata"
+            f"{self.sessions_path}/metadata",
+            self.checkpoints_path
         ]
         
         for directory in directories:
@@ -374,6 +380,9 @@ class SessionPersistenceManager:
             metadata_file = f"{self.sessions_path}/metadata/{session_id}.json"
             if os.path.exists(metadata_file):
                 os.remove(metadata_file)
+
+            # Remove checkpoints
+            self.clear_checkpoints(session_id)
             
             if deleted:
                 logger.info(f"🗑️ Sessão {session_id} deletada")
@@ -431,6 +440,146 @@ class SessionPersistenceManager:
         
         return False
 
+    # ------------------------------------------------------------------
+    # Checkpoints por unidade (provedor, lote de URLs, síntese, módulo)
+    # ------------------------------------------------------------------
+
+    def _checkpoint_dir(self, session_id: str, kind: Optional[str] = None) -> str:
+        """Diretório de checkpoints; session_id e kind vêm de requisições e não podem sair da pasta"""
+        for part in (session_id, kind):
+            if part is not None and not re.fullmatch(r'[\w\-]+', part):
+                raise ValueError(f"Identificador inválido para checkpoint: {part!r}")
+        base = f"{self.checkpoints_path}/{session_id}"
+        return f"{base}/{kind}" if kind else base
+
+    def _checkpoint_file(self, session_id: str, kind: str, key: str) -> str:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+        return f"{self._checkpoint_dir(session_id, kind)}/{digest}.json"
+
+    def save_checkpoint(self, session_id: str, kind: str, key: str, data: Any) -> bool:
+        """
+        Salva o resultado de uma unidade concluída (escrita atômica)
+
+        Args:
+            session_id: ID da sessão
+            kind: Tipo da unidade ('search', 'extraction', 'synthesis', 'module')
+            key: Identificador da unidade dentro do tipo (ex.: 'SERPER:<query>', 'avatars')
+            data: Resultado serializável em JSON
+        """
+        if not session_id:
+            return False
+        try:
+            checkpoint_file = self._checkpoint_file(session_id, kind, key)
+            os.makedirs(os.path.dirname(checkpoint_file), exist_ok=True)
+            tmp_file = f"{checkpoint_file}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "kind": kind,
+                    "key": key,
+                    "saved_at": datetime.now().isoformat(),
+                    "data": data
+                }, f, ensure_ascii=False, default=str)
+            os.replace(tmp_file, checkpoint_file)
+            logger.debug(f"📌 Checkpoint {kind}/{key} salvo ({session_id})")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao salvar checkpoint {kind}/{key}: {e}")
+            return False
+
+    def load_checkpoint(self, session_id: str, kind: str, key: str) -> Optional[Any]:
+        """Retorna o resultado salvo da unidade ou None se ainda não foi concluída"""
+        if not session_id or not self.resume_enabled:
+            return None
+        try:
+            checkpoint_file = self._checkpoint_file(session_id, kind, key)
+            if not os.path.exists(checkpoint_file):
+                return None
+            with open(checkpoint_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get('data')
+        except Exception as e:
+            logger.warning(f"⚠️ Checkpoint {kind}/{key} ilegível, unidade será refeita: {e}")
+            return None
+
+    def checkpoint(self, session_id: str, kind: str, key: str, compute: Callable[[], Any],
+                   is_valid: Callable[[Any], bool] = bool) -> Any:
+        """Retorna a unidade do checkpoint (retomada, se ainda válida) ou executa compute e salva se o resultado for válido"""
+        saved = self.load_checkpoint(session_id, kind, key)
+        if saved is not None and is_valid(saved):
+            logger.info(f"⏭️ Retomando {kind}/{key} do checkpoint ({session_id})")
+            return saved
+        result = compute()
+        if session_id and is_valid(result):
+            self.save_checkpoint(session_id, kind, key, result)
+        return result
+
+    async def acheckpoint(self, session_id: str, kind: str, key: str, compute: Callable[[], Awaitable[Any]],
+                          is_valid: Callable[[Any], bool] = bool) -> Any:
+        """Versão assíncrona de checkpoint (compute retorna corrotina)"""
+        saved = self.load_checkpoint(session_id, kind, key)
+        if saved is not None and is_valid(saved):
+            logger.info(f"⏭️ Retomando {kind}/{key} do checkpoint ({session_id})")
+            return saved
+        result = await compute()
+        if session_id and is_valid(result):
+            self.save_checkpoint(session_id, kind, key, result)
+        return result
+
+    def list_checkpoints(self, session_id: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Unidades concluídas da sessão agrupadas por tipo"""
+        units: Dict[str, List[Dict[str, Any]]] = {}
+        for checkpoint_file in glob.glob(f"{self._checkpoint_dir(session_id)}/*/*.json"):
+            try:
+                with open(checkpoint_file, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                units.setdefault(entry['kind'], []).append({
+                    "key": entry['key'],
+                    "saved_at": entry.get('saved_at'),
+                    "bytes": os.path.getsize(checkpoint_file)
+                })
+            except Exception:
+                continue
+        for entries in units.values():
+            entries.sort(key=lambda entry: entry['saved_at'] or '')
+        return units
+
+    def clear_checkpoints(self, session_id: str, kinds: Optional[List[str]] = None) -> int:
+        """Remove checkpoints da sessão (todos ou só dos tipos informados) para forçar execução do zero"""
+        removed = 0
+        base = self._checkpoint_dir(session_id)
+        for kind in (kinds or (os.listdir(base) if os.path.isdir(base) else [])):
+            kind_dir = self._checkpoint_dir(session_id, kind)
+            if os.path.isdir(kind_dir):
+                removed += len(glob.glob(f"{kind_dir}/*.json"))
+                shutil.rmtree(kind_dir, ignore_errors=True)
+        if removed:
+            logger.info(f"🧹 {removed} checkpoints removidos ({session_id})")
+        return removed
+
+    def has_persisted_state(self, session_id: str) -> bool:
+        """Indica se a sessão já tem estado salvo (checkpoints, estado da sessão ou pasta em analyses_data)"""
+        if not re.fullmatch(r'[\w\-]+', session_id or ''):
+            return False
+        return any(os.path.exists(path) for path in (
+            self._checkpoint_dir(session_id),
+            f"{self.sessions_path}/active/{session_id}.json",
+            f"{self.sessions_path}/completed/{session_id}.json",
+            f"analyses_data/{session_id}"
+        ))
+
+    def get_resume_status(self, session_id: str) -> Dict[str, Any]:
+        """Etapas concluídas e unidades com checkpoint: o que será pulado ao reexecutar cada etapa"""
+        session_data = self.load_session_state(session_id) or {}
+        completed_steps = session_data.get('metadata', {}).get('completed_steps', [])
+        units = self.list_checkpoints(session_id)
+        return {
+            "session_id": session_id,
+            "resume_enabled": self.resume_enabled,
+            "completed_steps": completed_steps,
+            "can_continue_from": [step for step in (1, 2, 3) if all(prev in completed_steps for prev in range(1, step))],
+            "checkpoints": {kind: len(entries) for kind, entries in units.items()},
+            "units": units
+        }
+
     def _save_session_metadata(self, session_id: str, session_data: Dict[str, Any]):
         """Salva metadados resumidos da sessão"""
         try:
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Tracing
+Spans encadeados (sessão → etapa → fase → chamada) propagados por contextvars entre threads e tasks,
+exportados em JSONL rotativo (um arquivo por processo) e consultáveis como waterfall com caminho crítico
+"""
+
+import os
+import glob
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import functools
+import contextvars
+from collections import OrderedDict, defaultdict
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('arqv30_current_span', default=None)
+
+
+class Span:
+    """Intervalo medido com atributos; como context manager vira o span corrente do contexto"""
+
+    __slots__ = ('tracer', 'trace_id', 'span_id', 'parent_id', 'name', 'kind', 'start', 'end',
+                 'attributes', 'status', 'error', 'thread', 'activate', '_token')
+
+    def __init__(self, tracer: 'Tracer', name: str, kind: str, session_id: Optional[str],
+                 parent: Optional['Span'], attributes: Dict[str, Any], activate: bool = True):
+        self.tracer = tracer
+        self.trace_id = session_id or (parent.trace_id if parent else None)
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.status = 'ok'
+        self.error = None
+        self.thread = threading.current_thread().name
+        self.activate = activate
+        self.start = time.time()
+        self.end = None
+        self._token = None
+
+    def set(self, **attributes):
+        """Adiciona/atualiza atributos (provider, url, tokens, bytes...)"""
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException):
+        self.status = 'error'
+        self.error = f"{type(error).__name__}: {error}"[:500]
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.time()
+            self.tracer._export(self)
+
+    def __enter__(self) -> 'Span':
+        if self.activate:
+            self._token = _current_span.set(self)
+        self.tracer._register(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_error(exc)
+        if self._token is not None:
+            try:
+                _current_span.reset(self._token)
+            except ValueError:
+                # Saída em outro contexto (ex.: gerador consumido em outra task): só limpa o corrente
+                _current_span.set(None)
+            self._token = None
+        self.finish()
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.end or time.time()
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start': self.start,
+            'end': end,
+            'duration_ms': round((end - self.start) * 1000, 2),
+            'status': self.status,
+            'error': self.error,
+            'thread': self.thread,
+            'process': os.getpid(),
+            'attributes': self.attributes,
+            'in_progress': self.end is None
+        }
+
+
+class Tracer:
+    """Cria spans, exporta para JSONL rotativo e mantém as sessões recentes em memória"""
+
+    # Spans estruturais também são exportados ao iniciar: o processo web enxerga etapas em andamento nos workers
+    START_RECORD_KINDS = ('session', 'stage', 'phase')
+
+    def __init__(self):
+        """Inicializa com configuração do ambiente"""
+        self.enabled = os.getenv('TRACING_ENABLED', 'true').lower() == 'true'
+        self.trace_dir = os.getenv('TRACE_DIR', os.path.join('logs', 'traces'))
+        self.max_bytes = int(os.getenv('TRACE_MAX_MB', '20')) * 1024 * 1024
+        self.backup_count = int(os.getenv('TRACE_BACKUPS', '5'))
+        self.retention_days = float(os.getenv('TRACE_RETENTION_DAYS', '7'))
+        self.memory_sessions = int(os.getenv('TRACE_MEMORY_SESSIONS', '20'))
+        self.max_spans_per_session = 20000
+
+        self._lock = threading.Lock()
+        self._sessions: OrderedDict = OrderedDict()
+        self._active: Dict[str, Span] = {}
+        self._export_logger = None
+        self._export_pid = None
+        self.trace_file = None
+
+        if self.enabled:
+            self._prune_old_files()
+            self._open_export()
+            if self._export_logger:
+                logger.info(f"🧭 Tracing ativo (exportando para {self.trace_file})")
+
+    def _open_export(self):
+        """
+        Abre o JSONL deste processo; a rotação do RotatingFileHandler não é segura entre processos,
+        então cada processo (web, workers da fila) escreve e rotaciona apenas o próprio arquivo
+        """
+        pid = os.getpid()
+        self._export_pid = pid
+        self.trace_file = os.path.join(self.trace_dir, f"traces-{pid}.jsonl")
+        try:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            handler = RotatingFileHandler(
+                self.trace_file, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding='utf-8'
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            export_logger = logging.getLogger(f"arqv30.traces.{pid}")
+            export_logger.handlers = [handler]
+            export_logger.setLevel(logging.INFO)
+            export_logger.propagate = False
+            self._export_logger = export_logger
+        except OSError as e:
+            self._export_logger = None
+            logger.warning(f"⚠️ Exportação de traces indisponível: {e}")
+
+    def _trace_files(self) -> List[str]:
+        return glob.glob(os.path.join(self.trace_dir, 'traces*.jsonl*'))
+
+    def _prune_old_files(self):
+        """Remove arquivos de processos antigos além da retenção"""
+        limit = time.time() - self.retention_days * 86400
+        for path in self._trace_files():
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    # ------------------------------------------------------------------ spans
+
+    def current(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def span(self, name: str, kind: str = 'call', session_id: Optional[str] = None,
+             activate: bool = True, **attributes) -> Span:
+        """Novo span filho do corrente; use com `with` (funciona em código síncrono e assíncrono)"""
+        return Span(self, name, kind, session_id, _current_span.get(), attributes, activate)
+
+    def traced(self, name: Optional[str] = None, kind: str = 'call',
+               attributes: Optional[Callable[..., Dict[str, Any]]] = None,
+               result: Optional[Callable[[Any], Dict[str, Any]]] = None):
+        """
+        Decorador para funções síncronas ou assíncronas
+
+        Args:
+            attributes: Recebe os argumentos da chamada e retorna atributos (chave 'session_id' define a sessão)
+            result: Recebe o retorno e retorna atributos adicionais (ex.: bytes)
+        """
+        def decorator(func):
+            span_name = name or func.__name__
+
+            def start(args, kwargs) -> Span:
+                attrs = {}
+                if attributes:
+                    try:
+                        attrs = dict(attributes(*args, **kwargs) or {})
+                    except Exception:
+                        attrs = {}
+                session_id = attrs.pop('session_id', None)
+                return self.span(span_name, kind, session_id=session_id, **attrs)
+
+            def annotate(span: Span, value: Any):
+                if result:
+                    try:
+                        span.set(**(result(value) or {}))
+                    except Exception:
+                        pass
+
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    with start(args, kwargs) as span:
+                        value = await func(*args, **kwargs)
+                        annotate(span, value)
+                        return value
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with start(args, kwargs) as span:
+                    value = func(*args, **kwargs)
+                    annotate(span, value)
+                    return value
+            return wrapper
+
+        return decorator
+
+    async def trace_coro(self, name: str, coro, kind: str = 'phase', **attributes):
+        """Executa a corrotina dentro de um span (para loop.run_until_complete / gather)"""
+        with self.span(name, kind, **attributes):
+            return await coro
+
+    def wrap(self, func: Callable) -> Callable:
+        """Propaga o contexto atual (span corrente) para outra thread/executor"""
+        context = contextvars.copy_context()
+
+        @functools.wraps(func)
+        def runner(*args, **kwargs):
+            return context.run(func, *args, **kwargs)
+        return runner
+
+    def bind(self, func: Callable, name: str, kind: str = 'stage', session_id: Optional[str] = None, **attributes) -> Callable:
+        """Alvo de thread que executa `func` dentro de um span raiz da sessão"""
+        @functools.wraps(func)
+        def runner(*args, **kwargs):
+            with self.span(name, kind, session_id=session_id, **attributes):
+                return func(*args, **kwargs)
+        return self.wrap(runner)
+
+    # --------------------------------------------------------------- export
+
+    def _register(self, span: Span):
+        if self.enabled:
+            with self._lock:
+                self._active[span.span_id] = span
+            if span.trace_id and span.kind in self.START_RECORD_KINDS:
+                self._write(span.to_dict())
+
+    def _export(self, span: Span):
+        if not self.enabled:
+            return
+        record = span.to_dict()
+        with self._lock:
+            self._active.pop(span.span_id, None)
+            if span.trace_id:
+                spans = self._sessions.get(span.trace_id)
+                if spans is None:
+                    spans = self._sessions[span.trace_id] = []
+                    while len(self._sessions) > self.memory_sessions:
+                        self._sessions.popitem(last=False)
+                else:
+                    self._sessions.move_to_end(span.trace_id)
+                if len(spans) < self.max_spans_per_session:
+                    spans.append(record)
+
+        self._write(record)
+
+    def _write(self, record: Dict[str, Any]):
+        if self._export_pid != os.getpid():
+            # Processo filho criado por fork herdou o handler do pai: passa a usar o próprio arquivo
+            self._open_export()
+        if self._export_logger:
+            try:
+                self._export_logger.info(json.dumps(record, ensure_ascii=False, default=str))
+            except Exception as e:
+                logger.debug(f"Falha ao exportar span: {e}")
+
+    def _load_from_files(self, session_id: str) -> List[Dict[str, Any]]:
+        """Busca os spans da sessão nos arquivos JSONL de todos os processos (atuais e rotacionados)"""
+        spans = []
+        needle = f'"trace_id": "{session_id}"'
+        for path in self._trace_files():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if needle in line:
+                            try:
+                                spans.append(json.loads(line))
+                            except ValueError:
+                                continue
+            except OSError:
+                continue
+        return spans
+
+    def get_spans(self, session_id: str) -> List[Dict[str, Any]]:
+        """
+        Spans concluídos e em andamento da sessão: memória deste processo mais os arquivos de todos
+        os processos (workers da fila); o registro final de um span prevalece sobre o de início
+        """
+        with self._lock:
+            finished = list(self._sessions.get(session_id, []))
+            active = [span.to_dict() for span in self._active.values() if span.trace_id == session_id]
+
+        merged: Dict[str, Dict[str, Any]] = {}
+        for span in self._load_from_files(session_id) + finished + active:
+            current = merged.get(span['span_id'])
+            if current is None or current.get('in_progress') or not span.get('in_progress'):
+                merged[span['span_id']] = span
+        return list(merged.values())
+
+    # ------------------------------------------------------------- análise
+
+    def get_trace(self, session_id: str) -> Dict[str, Any]:
+        """Waterfall e resumo do caminho crítico da sessão"""
+        spans = sorted(self.get_spans(session_id), key=lambda s: s['start'])
+        if not spans:
+            return {'session_id': session_id, 'span_count': 0, 'waterfall': [], 'summary': {}}
+
+        by_id = {span['span_id']: span for span in spans}
+        children = defaultdict(list)
+        roots = []
+        for span in spans:
+            if span['parent_id'] in by_id:
+                children[span['parent_id']].append(span)
+            else:
+                roots.append(span)
+
+        t0 = spans[0]['start']
+        t_end = max(span['end'] for span in spans)
+
+        depth = {}
+        waterfall = []
+
+        def visit(span, level):
+            depth[span['span_id']] = level
+            waterfall.append({
+                'span_id': span['span_id'],
+                'parent_id': span['parent_id'],
+                'name': span['name'],
+                'kind': span['kind'],
+                'depth': level,
+                'offset_ms': round((span['start'] - t0) * 1000, 2),
+                'duration_ms': span['duration_ms'],
+                'status': span['status'],
+                'error': span.get('error'),
+                'thread': span.get('thread'),
+                'in_progress': span.get('in_progress', False),
+                'attributes': span.get('attributes', {})
+            })
+            for child in children[span['span_id']]:
+                visit(child, level + 1)
+
+        for root in roots:
+            visit(root, 0)
+
+        critical_path = self._critical_path(roots, children, t_end)
+
+        by_kind = defaultdict(lambda: {'count': 0, 'total_ms': 0.0})
+        by_name = defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'errors': 0})
+        for span in spans:
+            by_kind[span['kind']]['count'] += 1
+            by_kind[span['kind']]['total_ms'] += span['duration_ms']
+            key = span['name']
+            provider = span.get('attributes', {}).get('provider')
+            if provider:
+                key = f"{key}:{provider}"
+            by_name[key]['count'] += 1
+            by_name[key]['total_ms'] += span['duration_ms']
+            if span['status'] == 'error':
+                by_name[key]['errors'] += 1
+
+        return {
+            'session_id': session_id,
+            'span_count': len(spans),
+            'waterfall': waterfall,
+            'summary': {
+                'total_ms': round((t_end - t0) * 1000, 2),
+                'in_progress': any(span.get('in_progress') for span in spans),
+                'errors': sum(1 for span in spans if span['status'] == 'error'),
+                'critical_path': critical_path,
+                'by_kind': {kind: {**v, 'total_ms': round(v['total_ms'], 2)} for kind, v in by_kind.items()},
+                'top_operations': sorted(
+                    ({'name': name, **v, 'total_ms': round(v['total_ms'], 2)} for name, v in by_name.items()),
+                    key=lambda item: item['total_ms'], reverse=True
+                )[:15]
+            }
+        }
+
+    def _critical_path(self, roots: List[Dict[str, Any]], children: Dict[str, List[Dict[str, Any]]], end: float) -> List[Dict[str, Any]]:
+        """
+        Caminho crítico: partindo do fim, escolhe o span que termina por último, depois o que termina
+        antes do início dele, e assim por diante; cada span escolhido é expandido pelos filhos
+        """
+        def chain(candidates: List[Dict[str, Any]], limit: float) -> List[Dict[str, Any]]:
+            selected = []
+            remaining = sorted(candidates, key=lambda s: s['end'])
+            while remaining:
+                eligible = [s for s in remaining if s['end'] <= limit + 1e-6]
+                if not eligible:
+                    break
+                last = eligible[-1]
+                selected.append(last)
+                limit = last['start']
+                remaining = [s for s in remaining if s['end'] <= limit + 1e-6]
+            return list(reversed(selected))
+
+        path = []
+
+        def expand(span: Dict[str, Any], level: int):
+            critical_children = chain(children.get(span['span_id'], []), span['end'])
+            child_ms = sum(child['duration_ms'] for child in critical_children)
+            path.append({
+                'name': span['name'],
+                'kind': span['kind'],
+                'depth': level,
+                'duration_ms': span['duration_ms'],
+                'self_ms': round(max(span['duration_ms'] - child_ms, 0), 2),
+                'attributes': span.get('attributes', {})
+            })
+            for child in critical_children:
+                expand(child, level + 1)
+
+        for root in chain(roots, end):
+            expand(root, 0)
+        return path
+
+
+# Instância global
+tracer = Tracer()
@@ -11,6 +11,7 @@ import httpx
 import asyncio
 from typing import Dict, Any, Optional
 from datetime import datetime
+from services.http_client_pool import http_client_pool
 
 logger = logging.getLogger(__name__)
 
@@ -31,8 +32,7 @@ class TrendFinderClient:
     def _check_connectivity(self) -> bool:
         """Verifica se o serviço está acessível"""
         try:
-            import requests
-            response = requests.get(self.base_url, timeout=5)
+            response = http_client_pool.get_sync_session().get(self.base_url, timeout=5)
             return response.status_code == 200
         except Exception:
             return False
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - URL Canonicalizer
+Canonicalização de URLs, conjunto de URLs vistas por sessão e filtro de quase-duplicatas (SimHash)
+"""
+
+import re
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Set, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros de rastreamento removidos da query string
+TRACKING_PARAMS = frozenset([
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', 'ref', 'ref_src', 'ref_url', 'referrer',
+    'spm', 'share', 'si', 'feature', 'cmpid', 'cmp', 'ito', 'xtor', 'ncid',
+    '_ga', '_gl', '_hsenc', '_hsmi', 'hsctatracking', 'vero_id', 'oly_anon_id',
+    'oly_enc_id', 'rb_clickid', 's_cid', 'amp', 'outputtype', 'usqp'
+])
+TRACKING_PREFIXES = ('utm_', 'pk_', 'mtm_', 'hmb_', 'at_', 'trk_')
+
+# Subdomínios equivalentes ao domínio principal
+EQUIVALENT_SUBDOMAINS = ('www.', 'm.', 'mobile.', 'amp.')
+
+# Parâmetros que identificam o conteúdo e nunca são removidos
+CONTENT_PARAMS = frozenset(['v', 'id', 'p', 'q', 'page', 'list', 'story_fbid'])
+
+_AMP_PATH_SUFFIX = re.compile(r'/amp/?$', re.IGNORECASE)
+_AMP_EXTENSION = re.compile(r'\.amp(\.html?)?$', re.IGNORECASE)
+_AMP_CACHE_HOST = re.compile(r'\.cdn\.ampproject\.org$', re.IGNORECASE)
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def canonicalize_url(url: str) -> str:
+    """Normaliza URL: esquema, host, porta, AMP, parâmetros de rastreamento e barra final"""
+    if not url or not isinstance(url, str):
+        return ''
+
+    url = url.strip()
+    if url.startswith('//'):
+        url = 'https:' + url
+
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https'):
+        return url
+    scheme = 'https'
+
+    host = (parts.hostname or '').lower().rstrip('.')
+    path = parts.path or '/'
+
+    # Só páginas sabidamente AMP perdem o sufixo/prefixo /amp: em outros sites é uma seção real
+    is_amp = (
+        host.startswith('amp.')
+        or bool(_AMP_EXTENSION.search(path))
+        or any(key.lower() == 'amp' for key, _ in parse_qsl(parts.query, keep_blank_values=True))
+    )
+
+    # Cache AMP do Google: *.cdn.ampproject.org/c/s/<host>/<path> e google.com/amp/s/<host>/<path>
+    if _AMP_CACHE_HOST.search(host) or (host.endswith('google.com') and path.startswith('/amp/')):
+        is_amp = True
+        match = re.match(r'^/(?:c/|v/|i/|amp/)*(?:s/)?([^/]+)(/.*)?$', path)
+        if match:
+            host = match.group(1).lower()
+            path = match.group(2) or '/'
+
+    for prefix in EQUIVALENT_SUBDOMAINS:
+        if host.startswith(prefix) and host.count('.') >= 2:
+            host = host[len(prefix):]
+            break
+
+    port = parts.port
+    netloc = host if port in (None, 80, 443) else f"{host}:{port}"
+
+    # Versões AMP do mesmo artigo
+    if is_amp:
+        path = _AMP_PATH_SUFFIX.sub('', path)
+        path = _AMP_EXTENSION.sub(lambda m: m.group(1) or '', path)
+        if path.startswith('/amp/'):
+            path = path[4:]
+
+    path = re.sub(r'/{2,}', '/', unquote(path))
+    if len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/')
+    if not path:
+        path = '/'
+
+    query_items = []
+    for key, value in parse_qsl(parts.query, keep_blank_values=True):
+        key_lower = key.lower()
+        if key_lower not in CONTENT_PARAMS and (key_lower in TRACKING_PARAMS or key_lower.startswith(TRACKING_PREFIXES)):
+            continue
+        query_items.append((key, value))
+    query_items.sort()
+
+    return urlunsplit((scheme, netloc, path, urlencode(query_items), ''))
+
+
+class URLSeenSet:
+    """Conjunto O(1) de URLs canônicas já vistas, seguro entre threads"""
+
+    def __init__(self):
+        self._seen: Set[str] = set()
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    def add(self, url: str) -> bool:
+        """Registra URL; retorna True se ainda não tinha sido vista"""
+        canonical = canonicalize_url(url)
+        if not canonical:
+            return False
+        with self._lock:
+            if canonical in self._seen:
+                self.duplicates += 1
+                return False
+            self._seen.add(canonical)
+            return True
+
+    def __contains__(self, url: str) -> bool:
+        return canonicalize_url(url) in self._seen
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def filter_new(self, items: List[Dict[str, Any]], keys: Tuple[str, ...] = ('url', 'link')) -> List[Dict[str, Any]]:
+        """Mantém apenas itens cuja URL ainda não foi vista (itens sem URL são mantidos)"""
+        kept = []
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            url = next((item.get(k) for k in keys if item.get(k)), None)
+            if url is None or self.add(url):
+                kept.append(item)
+        return kept
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """Calcula fingerprint SimHash de 64 bits sobre shingles de palavras"""
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return 0
+
+    if len(words) < shingle_size:
+        shingles = [' '.join(words)]
+    else:
+        shingles = [' '.join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+
+    vector = [0] * 64
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(64):
+            vector[bit] += 1 if (h >> bit) & 1 else -1
+
+    fingerprint = 0
+    for bit in range(64):
+        if vector[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Distância de Hamming entre dois fingerprints"""
+    return bin(a ^ b).count('1')
+
+
+class NearDuplicateFilter:
+    """Filtro de quase-duplicatas por SimHash com índice de bandas (Hamming <= threshold)"""
+
+    def __init__(self, threshold: int = 3, min_length: int = 200):
+        self.threshold = threshold
+        self.min_length = min_length
+        # threshold + 1 bandas garantem, pelo princípio da casa dos pombos, que duplicatas compartilham uma banda
+        self.bands = threshold + 1
+        self.band_bits = 64 // self.bands
+        self._index: List[Dict[int, List[int]]] = [{} for _ in range(self.bands)]
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (i * self.band_bits)) & mask for i in range(self.bands)]
+
+    def is_duplicate(self, text: str) -> bool:
+        """Verifica e registra o texto; retorna True se já existe corpo quase idêntico"""
+        if not text or len(text) < self.min_length:
+            return False
+
+        fingerprint = simhash(text)
+        keys = self._band_keys(fingerprint)
+
+        with self._lock:
+            for band, key in enumerate(keys):
+                for candidate in self._index[band].get(key, ()):
+                    if hamming_distance(fingerprint, candidate) <= self.threshold:
+                        self.dropped += 1
+                        return True
+            for band, key in enumerate(keys):
+                self._index[band].setdefault(key, []).append(fingerprint)
+        return False
+
+    def filter(self, items: List[Any], text_key: str = 'content') -> List[Any]:
+        """Remove itens cujo corpo é quase duplicata de um item anterior"""
+        kept = []
+        for item in items:
+            text = item.get(text_key, '') if isinstance(item, dict) else str(item)
+            if not self.is_duplicate(text or ''):
+                kept.append(item)
+        return kept
+
+
+class SessionDeduplicator:
+    """Registro de conjuntos de URLs e filtros de conteúdo compartilhados por sessão"""
+
+    def __init__(self):
+        self._url_sets: Dict[str, URLSeenSet] = {}
+        self._content_filters: Dict[str, NearDuplicateFilter] = {}
+        self._lock = threading.Lock()
+
+    def urls(self, session_id: Optional[str]) -> URLSeenSet:
+        """Retorna o conjunto de URLs vistas da sessão (novo conjunto se sessão for None)"""
+        if not session_id:
+            return URLSeenSet()
+        with self._lock:
+            if session_id not in self._url_sets:
+                self._url_sets[session_id] = URLSeenSet()
+            return self._url_sets[session_id]
+
+    def contents(self, session_id: Optional[str]) -> NearDuplicateFilter:
+        """Retorna o filtro de quase-duplicatas da sessão"""
+        if not session_id:
+            return NearDuplicateFilter()
+        with self._lock:
+            if session_id not in self._content_filters:
+                self._content_filters[session_id] = NearDuplicateFilter()
+            return self._content_filters[session_id]
+
+    def get_stats(self, session_id: str) -> Dict[str, int]:
+        """Retorna estatísticas de deduplicação da sessão"""
+        url_set = self._url_sets.get(session_id)
+        content_filter = self._content_filters.get(session_id)
+        return {
+            'unique_urls': len(url_set) if url_set else 0,
+            'duplicate_urls_skipped': url_set.duplicates if url_set else 0,
+            'near_duplicate_bodies_dropped': content_filter.dropped if content_filter else 0
+        }
+
+    def release(self, session_id: str):
+        """Libera estruturas da sessão"""
+        with self._lock:
+            self._url_sets.pop(session_id, None)
+            self._content_filters.pop(session_id, None)
+
+
+# Instância global
+session_deduplicator = SessionDeduplicator()
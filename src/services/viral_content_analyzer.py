@@ -14,6 +14,8 @@ from datetime import datetime
 from pathlib import Path
 import json
 
+from services.post_store import PostStore, ENGAGEMENT_TOTAL_COLUMNS, HAS_NUMPY
+
 # Selenium imports
 try:
     from selenium import webdriver
@@ -127,13 +129,18 @@ class ViralContentAnalyzer:
                 else:
                     logger.warning(f"Dados inesperados para {platform_results}: esperado uma lista, obtido {type(content_list)}")
 
-            # Analisa viralidade
-            viral_content = self._identify_viral_content(all_content)
+            # Analisa viralidade (com NumPy: store colunar e scores vetorizados)
+            if HAS_NUMPY:
+                viral_store = self._identify_viral_store(PostStore.from_dicts(all_content))
+                viral_content = viral_store.items
+            else:
+                viral_store = None
+                viral_content = self._identify_viral_content(all_content)
             analysis_results['viral_content_identified'] = viral_content
 
             # FASE 2: Análise por Plataforma
             logger.info("📊 FASE 2: Análise detalhada por plataforma")
-            platform_analysis = self._analyze_by_platform(viral_content)
+            platform_analysis = self._analyze_by_platform(viral_content, viral_store)
             analysis_results['platform_analysis'] = platform_analysis
 
             # FASE 3: Captura de Screenshots
@@ -161,18 +168,21 @@ class ViralContentAnalyzer:
             # FASE 4: Métricas e Insights
             logger.info("📈 FASE 4: Calculando métricas virais")
 
-            viral_metrics = self._calculate_viral_metrics(viral_content)
+            viral_metrics = self._calculate_viral_metrics(viral_content, viral_store)
             analysis_results['viral_metrics'] = viral_metrics
 
-            engagement_insights = self._extract_engagement_insights(viral_content)
+            engagement_insights = self._extract_engagement_insights(viral_content, viral_store)
             analysis_results['engagement_insights'] = engagement_insights
 
             # Top performers
-            analysis_results['top_performers'] = sorted(
-                viral_content,
-                key=lambda x: x.get('viral_score', 0),
-                reverse=True
-            )[:10]
+            if viral_store is not None:
+                analysis_results['top_performers'] = viral_store.top_items('viral_score', 10)
+            else:
+                analysis_results['top_performers'] = sorted(
+                    viral_content,
+                    key=lambda x: x.get('viral_score', 0),
+                    reverse=True
+                )[:10]
 
             logger.info(f"✅ Análise viral concluída: {len(viral_content)} conteúdos identificados")
             logger.info(f"📸 {len(analysis_results['screenshots_captured'])} screenshots capturados")
@@ -202,6 +212,20 @@ class ViralContentAnalyzer:
 
         return viral_content
 
+    def _identify_viral_store(self, store: PostStore) -> PostStore:
+        """Versão vetorizada de _identify_viral_content: retorna o store só com os itens virais"""
+        scores = store.viral_scores()
+        viral_mask = scores >= 5.0  # Threshold viral
+        viral_store = store.take(viral_mask).with_column('viral_score', scores[viral_mask])
+        viral_store.load_dict_columns(ENGAGEMENT_TOTAL_COLUMNS)
+
+        categories = PostStore.viral_categories(viral_store.column('viral_score'))
+        for content, viral_score, category in zip(viral_store.items, viral_store.column('viral_score').tolist(), categories.tolist()):
+            content['viral_score'] = viral_score
+            content['viral_category'] = category
+
+        return viral_store
+
     def _calculate_viral_score(self, content: Dict[str, Any], platform: str) -> float:
         """Calcula score viral baseado na plataforma"""
 
@@ -266,9 +290,12 @@ class ViralContentAnalyzer:
         else:
             return 'POPULAR'
 
-    def _analyze_by_platform(self, viral_content: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _analyze_by_platform(self, viral_content: List[Dict[str, Any]], store: Optional[PostStore] = None) -> Dict[str, Any]:
         """Analisa conteúdo viral por plataforma"""
 
+        if store is not None:
+            return self._analyze_by_platform_columnar(store)
+
         platform_stats = {}
 
         for content in viral_content:
@@ -451,7 +478,40 @@ class ViralContentAnalyzer:
         logger.info(f"📸 {len(screenshots)} screenshots capturados com sucesso")
         return screenshots
 
-    def _calculate_viral_metrics(self, viral_content: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _analyze_by_platform_columnar(self, store: PostStore) -> Dict[str, Any]:
+        """Agregação por plataforma com bincount (mesmo formato de _analyze_by_platform)"""
+
+        counts = store.platform_counts()
+        score_sums = store.sum_by_platform(store.column('viral_score'))
+        youtube = store.chained_columns(('view_count', 'like_count'))
+        social = store.chained_columns(('likes', 'comments'))
+        platform_stats = {}
+
+        for code, platform in enumerate(store.platforms):
+            if platform == 'youtube':
+                engagement_metrics = {
+                    'total_views': int(store.sum_by_platform(youtube['view_count'])[code]),
+                    'total_likes': int(store.sum_by_platform(youtube['like_count'])[code])
+                }
+            elif platform in ['instagram', 'facebook']:
+                engagement_metrics = {
+                    'total_likes': int(store.sum_by_platform(social['likes'])[code]),
+                    'total_comments': int(store.sum_by_platform(social['comments'])[code])
+                }
+            else:
+                engagement_metrics = {}
+
+            platform_stats[platform] = {
+                'total_content': int(counts[code]),
+                'avg_viral_score': float(score_sums[code] / counts[code]),
+                'top_content': store.top_items('viral_score', 5, mask=store.platform_ids == code),
+                'engagement_metrics': engagement_metrics,
+                'content_themes': []
+            }
+
+        return platform_stats
+
+    def _calculate_viral_metrics(self, viral_content: List[Dict[str, Any]], store: Optional[PostStore] = None) -> Dict[str, Any]:
         """Calcula métricas gerais de viralidade"""
 
         if not viral_content:
@@ -476,6 +536,21 @@ class ViralContentAnalyzer:
             'top_viral_score': 0.0
         }
 
+        if store is not None:
+            scores = store.column('viral_score')
+            metrics['viral_distribution'].update(PostStore.viral_category_counts(scores))
+            metrics['platform_distribution'] = dict(zip(store.platforms, map(int, store.platform_counts())))
+            totals = store.chained_columns(ENGAGEMENT_TOTAL_COLUMNS)
+            metrics['engagement_totals'] = {
+                'total_views': int(totals['total_views'].sum()),
+                'total_likes': int(totals['total_likes'].sum()),
+                'total_comments': int(totals['total_comments'].sum()),
+                'total_shares': int(totals['total_shares'].sum())
+            }
+            metrics['top_viral_score'] = max(0.0, float(scores.max()))
+            metrics['avg_viral_score'] = float(scores.mean())
+            return metrics
+
         total_score = 0.0
 
         for content in viral_content:
@@ -511,7 +586,7 @@ class ViralContentAnalyzer:
 
         return metrics
 
-    def _extract_engagement_insights(self, viral_content: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _extract_engagement_insights(self, viral_content: List[Dict[str, Any]], store: Optional[PostStore] = None) -> Dict[str, Any]:
         """Extrai insights de engajamento"""
 
         insights = {
@@ -525,19 +600,31 @@ class ViralContentAnalyzer:
         # Analisa performance por plataforma
         platform_performance = {}
 
-        for content in viral_content:
-            platform = content.get('platform', 'web')
-            viral_score = content.get('viral_score', 0)
-
-            if platform not in platform_performance:
-                platform_performance[platform] = {
-                    'total_score': 0.0,
-                    'content_count': 0,
+        if store is not None:
+            counts = store.platform_counts()
+            score_sums = store.platform_sums(('viral_score',))['viral_score']
+            platform_performance = {
+                platform: {
+                    'total_score': float(score_sums[code]),
+                    'content_count': int(counts[code]),
                     'avg_score': 0.0
                 }
-
-            platform_performance[platform]['total_score'] += viral_score
-            platform_performance[platform]['content_count'] += 1
+                for code, platform in enumerate(store.platforms)
+            }
+        else:
+            for content in viral_content:
+                platform = content.get('platform', 'web')
+                viral_score = content.get('viral_score', 0)
+
+                if platform not in platform_performance:
+                    platform_performance[platform] = {
+                        'total_score': 0.0,
+                        'content_count': 0,
+                        'avg_score': 0.0
+                    }
+
+                platform_performance[platform]['total_score'] += viral_score
+                platform_performance[platform]['content_count'] += 1
 
         # Calcula médias e ordena
         for platform, data in platform_performance.items():
@@ -10,10 +10,9 @@ import json
 import time
 import asyncio
 import logging
-import ssl
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
-from urllib.parse import urlparse, parse_qs, unquote, urljoin
+from urllib.parse import parse_qs, unquote, urljoin
 from dataclasses import dataclass, asdict
 import hashlib
 
@@ -38,13 +37,11 @@ except ImportError:
 # Imports assíncronos
 try:
     import aiohttp
-    import aiofiles
     HAS_ASYNC_DEPS = True
 except ImportError:
-    import requests
     HAS_ASYNC_DEPS = False
     logger = logging.getLogger(__name__)
-    logger.warning("aiohttp/aiofiles não encontrados. Usando requests síncrono como fallback.")
+    logger.warning("aiohttp não encontrado. Usando requests síncrono como fallback.")
 
 # BeautifulSoup para parsing HTML
 try:
@@ -55,6 +52,9 @@ except ImportError:
     logger = logging.getLogger(__name__)
     logger.warning("BeautifulSoup4 não encontrado.")
 
+from services.http_client_pool import http_client_pool
+from services.image_store import image_store
+
 # Carregar variáveis de ambiente
 from dotenv import load_dotenv
 load_dotenv()
@@ -103,8 +103,7 @@ class ViralImageFinder:
         self._ensure_directories()
         # Configurar sessão HTTP síncrona para fallbacks
         if not HAS_ASYNC_DEPS:
-            import requests
-            self.session = requests.Session()
+            self.session = http_client_pool.create_sync_session()
             self.setup_session()
 
     def _load_config(self) -> Dict:
@@ -473,7 +472,7 @@ class ViralImageFinder:
                 try:
                     if HAS_ASYNC_DEPS:
                         timeout = aiohttp.ClientTimeout(total=self.config['timeout'])
-                        async with aiohttp.ClientSession(timeout=timeout) as session:
+                        async with http_client_pool.session(timeout=timeout) as session:
                             async with session.post(url, headers=headers, json=payload) as response:
                                 response.raise_for_status()
                                 data = await response.json()
@@ -572,7 +571,7 @@ class ViralImageFinder:
         try:
             if HAS_ASYNC_DEPS:
                 timeout = aiohttp.ClientTimeout(total=self.config['timeout'])
-                async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with http_client_pool.session(timeout=timeout) as session:
                     async with session.get(url, params=params) as response:
                         response.raise_for_status()
                         data = await response.json()
@@ -618,7 +617,7 @@ class ViralImageFinder:
             try:
                 if HAS_ASYNC_DEPS:
                     timeout = aiohttp.ClientTimeout(total=30)
-                    async with aiohttp.ClientSession(timeout=timeout) as session:
+                    async with http_client_pool.session(timeout=timeout) as session:
                         async with session.get(url, headers=headers, params=params) as response:
                             if response.status == 200:
                                 data = await response.json()
@@ -687,7 +686,7 @@ class ViralImageFinder:
                         
                         if HAS_ASYNC_DEPS:
                             timeout = aiohttp.ClientTimeout(total=30)
-                            async with aiohttp.ClientSession(timeout=timeout) as session:
+                            async with http_client_pool.session(timeout=timeout) as session:
                                 async with session.post(url, json=payload, headers=headers) as response:
                                     if response.status == 200:
                                         data = await response.json()
@@ -799,7 +798,7 @@ class ViralImageFinder:
                         
                         if HAS_ASYNC_DEPS:
                             timeout = aiohttp.ClientTimeout(total=30)
-                            async with aiohttp.ClientSession(timeout=timeout) as session:
+                            async with http_client_pool.session(timeout=timeout) as session:
                                 async with session.post(url, json=payload, headers=headers) as response:
                                     if response.status == 200:
                                         data = await response.json()
@@ -885,7 +884,7 @@ class ViralImageFinder:
                         
                         if HAS_ASYNC_DEPS:
                             timeout = aiohttp.ClientTimeout(total=30)
-                            async with aiohttp.ClientSession(timeout=timeout) as session:
+                            async with http_client_pool.session(timeout=timeout) as session:
                                 async with session.post(url, json=payload, headers=headers) as response:
                                     if response.status == 200:
                                         data = await response.json()
@@ -959,7 +958,7 @@ class ViralImageFinder:
             
             if HAS_ASYNC_DEPS:
                 timeout = aiohttp.ClientTimeout(total=30)
-                async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with http_client_pool.session(timeout=timeout) as session:
                     async with session.post(api_url, json=payload) as response:
                         if response.status == 200:
                             data = await response.json()
@@ -1025,7 +1024,7 @@ class ViralImageFinder:
                 
                 if HAS_ASYNC_DEPS:
                     timeout = aiohttp.ClientTimeout(total=30)
-                    async with aiohttp.ClientSession(timeout=timeout) as session:
+                    async with http_client_pool.session(timeout=timeout) as session:
                         async with session.get(embed_url) as response:
                             if response.status == 200:
                                 html_content = await response.text()
@@ -1071,7 +1070,7 @@ class ViralImageFinder:
                 try:
                     if HAS_ASYNC_DEPS:
                         timeout = aiohttp.ClientTimeout(total=30)
-                        async with aiohttp.ClientSession(timeout=timeout) as session:
+                        async with http_client_pool.session(timeout=timeout) as session:
                             async with session.get(url) as response:
                                 if response.status == 200:
                                     data = await response.json()
@@ -1176,7 +1175,7 @@ class ViralImageFinder:
             
             if HAS_ASYNC_DEPS:
                 timeout = aiohttp.ClientTimeout(total=30)
-                async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with http_client_pool.session(timeout=timeout) as session:
                     async with session.get(embed_url) as response:
                         if response.status == 200:
                             html_content = await response.text()
@@ -1220,7 +1219,7 @@ class ViralImageFinder:
                 headers = {
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
                 }
-                async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
+                async with http_client_pool.session(timeout=timeout, headers=headers) as session:
                     async with session.get(post_url) as response:
                         if response.status == 200:
                             html_content = await response.text()
@@ -1327,7 +1326,7 @@ class ViralImageFinder:
             try:
                 if HAS_ASYNC_DEPS:
                     timeout = aiohttp.ClientTimeout(total=30)
-                    async with aiohttp.ClientSession(timeout=timeout) as session:
+                    async with http_client_pool.session(timeout=timeout) as session:
                         async with session.get(apify_url, params=params) as response:
                             # Status 200 (OK) e 201 (Created) são ambos sucessos
                             if response.status in [200, 201]:
@@ -1393,7 +1392,7 @@ class ViralImageFinder:
             embed_url = f"https://api.instagram.com/oembed/?url=https://www.instagram.com/p/{shortcode}/"
             if HAS_ASYNC_DEPS:
                 timeout = aiohttp.ClientTimeout(total=15)
-                async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with http_client_pool.session(timeout=timeout) as session:
                     async with session.get(embed_url) as response:
                         if response.status == 200:
                             data = await response.json()
@@ -1436,7 +1435,7 @@ class ViralImageFinder:
             }
             if HAS_ASYNC_DEPS:
                 timeout = aiohttp.ClientTimeout(total=20)
-                async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with http_client_pool.session(timeout=timeout) as session:
                     async with session.get(post_url, headers=headers) as response:
                         if response.status == 200:
                             content = await response.text()
@@ -1969,13 +1968,13 @@ class ViralImageFinder:
         else:
             return f"{name_without_ext}.{ext}"
 
-    async def extract_image_data(self, image_url: str, post_url: str, platform: str) -> Optional[str]:
+    async def extract_image_data(self, image_url: str, post_url: str, platform: str, session_id: Optional[str] = None) -> Optional[str]:
         """Extrai imagem com múltiplas estratégias robustas"""
         if not self.config.get('extract_images', True) or not image_url:
             return await self.take_screenshot(post_url, platform)
         # Estratégia 1: Download direto com SSL bypass
         try:
-            image_path = await self._download_image_robust(image_url, post_url)
+            image_path = await self._download_image_robust(image_url, post_url, session_id)
             if image_path:
                 logger.info(f"✅ Imagem baixada: {image_path}")
                 return image_path
@@ -1986,7 +1985,7 @@ class ViralImageFinder:
             try:
                 real_image_url = await self._extract_real_image_url(post_url, platform)
                 if real_image_url and real_image_url != image_url:
-                    image_path = await self._download_image_robust(real_image_url, post_url)
+                    image_path = await self._download_image_robust(real_image_url, post_url, session_id)
                     if image_path:
                         logger.info(f"✅ Imagem real extraída: {image_path}")
                         return image_path
@@ -1996,8 +1995,8 @@ class ViralImageFinder:
         logger.info(f"📸 Usando screenshot para {post_url}")
         return await self.take_screenshot(post_url, platform)
 
-    async def _download_image_robust(self, image_url: str, post_url: str) -> Optional[str]:
-        """Download robusto de imagem com tratamento de SSL"""
+    async def _download_image_robust(self, image_url: str, post_url: str, session_id: Optional[str] = None) -> Optional[str]:
+        """Download robusto de imagem via store endereçado por conteúdo (sem baixar de novo URLs/imagens já vistas)"""
         # Validação prévia da URL
         if not self._is_valid_image_url(image_url):
             logger.warning(f"URL não parece ser de imagem: {image_url}")
@@ -2012,86 +2011,45 @@ class ViralImageFinder:
         }
         try:
             if HAS_ASYNC_DEPS:
-                # Configurar SSL context permissivo
-                ssl_context = ssl.create_default_context()
-                ssl_context.check_hostname = False
-                ssl_context.verify_mode = ssl.CERT_NONE
-                connector = aiohttp.TCPConnector(ssl=ssl_context)
+                # Streaming em disco com limite de 15MB e SSL permissivo, na sessão compartilhada
                 timeout = aiohttp.ClientTimeout(total=self.config['timeout'])
-                async with aiohttp.ClientSession(
-                    connector=connector,
-                    timeout=timeout,
-                    headers=headers
-                ) as session:
-                    async with session.get(image_url) as response:
-                        response.raise_for_status()
-                        content_type = response.headers.get('content-type', '').lower()
-                        # Limpar charset com aspas duplas do content-type
-                        content_type_clean = content_type.split(';')[0].strip()
-                        # Verificar se é realmente uma imagem
-                        if 'image' not in content_type_clean:
-                            # URLs especiais do Instagram podem retornar HTML/JSON válido
-                            if 'lookaside.instagram.com' in image_url or 'instagram.com/seo/' in image_url:
-                                # Para URLs do Instagram lookaside, tentar processar como dados estruturados
-                                if 'text/html' in content_type_clean or 'application/json' in content_type_clean:
-                                    logger.info(f"URL Instagram especial detectada: {image_url}")
-                                    # Não é uma imagem direta, mas pode conter dados úteis
-                                    return None
-                            # Se não é imagem mas é HTML, pode ser uma página de erro ou redirecionamento
-                            elif 'text/html' in content_type_clean:
-                                logger.warning(f"Recebido HTML em vez de imagem: {content_type}")
-                                return None
-                            logger.warning(f"Content-Type inválido: {content_type}")
-                            return None
-                        # Verificar tamanho
-                        content_length = int(response.headers.get('content-length', 0))
-                        if content_length > 15 * 1024 * 1024:  # 15MB max
-                            logger.warning(f"Imagem muito grande: {content_length} bytes")
-                            return None
-                        # Gerar nome de arquivo
-                        parsed_url = urlparse(image_url)
-                        filename = os.path.basename(parsed_url.path) or 'image'
-                        filename = self._generate_unique_filename(filename, content_type, image_url)
-                        filepath = os.path.join(self.config['images_dir'], filename)
-                        # Salvar arquivo
-                        async with aiofiles.open(filepath, 'wb') as f:
-                            async for chunk in response.content.iter_chunked(8192):
-                                await f.write(chunk)
-                        # Verificar se arquivo foi salvo corretamente
-                        if os.path.exists(filepath) and os.path.getsize(filepath) > 1024:
-                            return filepath
-                        else:
-                            logger.warning(f"Arquivo salvo incorretamente: {filepath}")
-                            return None
-            else:
-                # Fallback síncrono com SSL bypass
-                import requests
-                from requests.adapters import HTTPAdapter
-                from requests.packages.urllib3.util.retry import Retry
-                session = requests.Session()
-                session.verify = False  # Bypass SSL
-                # Configurar retry
-                retry_strategy = Retry(
-                    total=3,
-                    backoff_factor=1,
-                    status_forcelist=[429, 500, 502, 503, 504],
+                result = await image_store.fetch(
+                    image_url, headers=headers, timeout=timeout, verify_ssl=False, session_id=session_id
                 )
-                adapter = HTTPAdapter(max_retries=retry_strategy)
-                session.mount("http://", adapter)
-                session.mount("https://", adapter)
-                response = session.get(image_url, headers=headers, timeout=self.config['timeout'])
-                response.raise_for_status()
-                content_type = response.headers.get('content-type', '').lower()
-                if 'image' in content_type:
-                    parsed_url = urlparse(image_url)
-                    filename = os.path.basename(parsed_url.path) or 'image'
-                    filename = self._generate_unique_filename(filename, content_type, image_url)
-                    filepath = os.path.join(self.config['images_dir'], filename)
-                    with open(filepath, 'wb') as f:
-                        f.write(response.content)
-                    if os.path.exists(filepath) and os.path.getsize(filepath) > 1024:
-                        return filepath
-                return None
+                if not result['success']:
+                    content_type = result.get('content_type') or ''
+                    if 'lookaside.instagram.com' in image_url or 'instagram.com/seo/' in image_url:
+                        # URLs especiais do Instagram retornam HTML/JSON em vez da imagem direta
+                        logger.info(f"URL Instagram especial detectada: {image_url}")
+                    elif 'text/html' in content_type:
+                        logger.warning(f"Recebido HTML em vez de imagem: {content_type}")
+                    else:
+                        logger.warning(f"Download de imagem falhou: {result.get('error')}")
+                    return None
+                blob = result['blob']
+                if result['source'] == 'cache':
+                    logger.info(f"🗄️ Imagem reaproveitada do store: {image_url}")
+            else:
+                # Fallback síncrono com SSL bypass (sessão compartilhada com retry)
+                blob = image_store.lookup_url(image_url)
+                if not blob:
+                    session = http_client_pool.get_sync_session()
+                    response = session.get(image_url, headers=headers, timeout=self.config['timeout'], verify=False)
+                    response.raise_for_status()
+                    content_type = response.headers.get('content-type', '').lower()
+                    if 'image' not in content_type:
+                        return None
+                    blob = image_store.store_bytes(response.content, image_url, content_type, session_id)
+                    if not blob:
+                        return None
+
+            # Sessões (ou o próprio images_dir, sem sessão) referenciam o blob compartilhado por
+            # hardlink + manifesto, mantendo a imagem onde serve_viral_image procura
+            if session_id:
+                target_dir = os.path.join(self.config['images_dir'], 'sessions', session_id)
+            else:
+                target_dir = self.config['images_dir']
+            return image_store.link_into_session(blob, target_dir, image_url)
         except Exception as e:
             logger.error(f"❌ Erro no download robusto: {e}")
             return None
@@ -2211,7 +2169,7 @@ class ViralImageFinder:
             logger.error(f"❌ Erro ao capturar screenshot: {e}")
             return None
 
-    async def find_viral_images(self, query: str) -> Tuple[List[ViralImage], str]:
+    async def find_viral_images(self, query: str, session_id: Optional[str] = None) -> Tuple[List[ViralImage], str]:
         """Função principal otimizada para encontrar conteúdo viral"""
         logger.info(f"🔥 BUSCA VIRAL INICIADA: {query}")
         # Buscar resultados com estratégia aprimorada
@@ -2239,7 +2197,7 @@ class ViralImageFinder:
                     screenshot_path = None
                     image_url = result.get('image_url', '')
                     if self.config.get('extract_images', True):
-                        extracted_path = await self.extract_image_data(image_url, page_url, platform)
+                        extracted_path = await self.extract_image_data(image_url, page_url, platform, session_id)
                         if extracted_path:
                             if 'screenshot' in extracted_path:
                                 screenshot_path = extracted_path
@@ -2398,6 +2356,7 @@ def find_viral_images_sync(query: str) -> Tuple[List[ViralImage], str]:
                         viral_integration_service.find_viral_images(query)
                     )
                 finally:
+                    new_loop.run_until_complete(http_client_pool.close_current())
                     new_loop.close()
             with concurrent.futures.ThreadPoolExecutor() as executor:
                 future = executor.submit(run_async_in_thread)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Visual Analysis Pipeline
+OCR e análise de cores em pool de processos, com cache por hash perceptual e descarte de imagens quase idênticas
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+try:
+    import pytesseract
+    HAS_TESSERACT = True
+except ImportError:
+    HAS_TESSERACT = False
+
+try:
+    import numpy as np
+    import cv2
+    HAS_OPENCV = True
+except ImportError:
+    HAS_OPENCV = False
+
+logger = logging.getLogger(__name__)
+
+# Versão do pré-processamento; mudanças invalidam entradas antigas do cache
+PIPELINE_VERSION = 1
+
+
+def perceptual_hash(image) -> int:
+    """dHash de 64 bits (gradiente horizontal em 9x8 tons de cinza)"""
+    small = image.convert('L').resize((9, 8), Image.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (1 if pixels[offset + col] > pixels[offset + col + 1] else 0)
+    return value
+
+
+def _hash_image(path: str) -> Optional[int]:
+    """Calcula hash perceptual de um arquivo (executado no worker)"""
+    try:
+        with Image.open(path) as image:
+            image.draft('L', (256, 256))
+            return perceptual_hash(image)
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao calcular hash de {path}: {e}")
+        return None
+
+
+def _dominant_colors(image, k: int = 5) -> Dict[str, Any]:
+    """Cores predominantes via KMeans em miniatura 100x100"""
+    pixels = np.float32(np.asarray(image.convert('RGB').resize((100, 100))).reshape((-1, 3)))
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
+    _, labels, centers = cv2.kmeans(pixels, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
+    centers = np.uint8(centers)
+    counts = Counter(labels.flatten())
+
+    return {
+        "dominant_colors": [
+            {"rgb": centers[i].tolist(), "percentage": (count / len(pixels)) * 100}
+            for i, count in sorted(counts.items(), key=lambda x: x[1], reverse=True)
+        ]
+    }
+
+
+def _analyze_image(path: str, max_side: int, lang: str, with_colors: bool) -> Dict[str, Any]:
+    """OCR e cores a partir de uma única leitura da imagem (executado no worker)"""
+    result = {'ocr_text': '', 'color_analysis': {}, 'error': None}
+    try:
+        with Image.open(path) as image:
+            image.load()
+
+            if with_colors and HAS_OPENCV:
+                result['color_analysis'] = _dominant_colors(image)
+
+            # Tons de cinza e redução de resolução aceleram o Tesseract sem perda relevante em screenshots
+            gray = image.convert('L')
+            scale = max_side / max(gray.size)
+            if scale < 1:
+                gray = gray.resize((int(gray.width * scale), int(gray.height * scale)), Image.LANCZOS)
+
+            if HAS_TESSERACT:
+                result['ocr_text'] = pytesseract.image_to_string(gray, lang=lang)
+
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+class VisualAnalysisPipeline:
+    """Executa OCR/cores em paralelo e reaproveita resultados de imagens já vistas"""
+
+    def __init__(self):
+        """Inicializa pipeline com configuração do ambiente"""
+        self.workers = int(os.getenv('VISUAL_OCR_WORKERS', str(os.cpu_count() or 1)))
+        self.max_side = int(os.getenv('VISUAL_OCR_MAX_SIDE', '1600'))
+        self.lang = os.getenv('VISUAL_OCR_LANG', 'por')
+        self.duplicate_distance = int(os.getenv('VISUAL_DUPLICATE_DISTANCE', '4'))
+        self.db_path = os.path.join(os.getenv('SEARCH_CACHE_DIR', 'cache'), 'visual_cache.sqlite3')
+
+        self._local = threading.local()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.stats = {
+            'images_seen': 0,
+            'cache_hits': 0,
+            'near_duplicates_skipped': 0,
+            'images_processed': 0,
+            'failures': 0
+        }
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS visual_cache (
+                phash TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                ocr_text TEXT NOT NULL,
+                color_analysis TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (phash, version)
+            )
+        """)
+
+    @property
+    def available(self) -> bool:
+        return HAS_PIL and HAS_TESSERACT
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexão SQLite por thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _cache_get(self, phash: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT ocr_text, color_analysis FROM visual_cache WHERE phash = ? AND version = ?",
+            (phash, PIPELINE_VERSION)
+        ).fetchone()
+        if not row:
+            return None
+        return {'ocr_text': row[0], 'color_analysis': json.loads(row[1])}
+
+    def _cache_set(self, phash: str, ocr_text: str, color_analysis: Dict[str, Any]):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO visual_cache(phash, version, ocr_text, color_analysis, created_at) VALUES (?, ?, ?, ?, ?)",
+            (phash, PIPELINE_VERSION, ocr_text, json.dumps(color_analysis), time.time())
+        )
+
+    def analyze(self, image_paths: List[str], with_colors: bool = True) -> List[Dict[str, Any]]:
+        """
+        Analisa imagens: hash perceptual, cache, descarte de quase-duplicatas e OCR/cores em paralelo
+
+        Returns:
+            List[Dict]: Por imagem: file, phash, ocr_text, color_analysis, source ('cache'|'ocr'|'duplicate')
+        """
+        if not image_paths:
+            return []
+        if not HAS_PIL:
+            logger.warning("⚠️ PIL não disponível - análise visual desabilitada")
+            return []
+
+        executor = self._get_executor()
+        paths = [str(p) for p in image_paths]
+        hashes = list(executor.map(_hash_image, paths))
+        self.stats['images_seen'] += len(paths)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        representatives: List[tuple] = []  # (hash, path) das imagens que serão processadas
+        duplicates: Dict[str, str] = {}
+        pending = []
+
+        for path, value in zip(paths, hashes):
+            if value is None:
+                self.stats['failures'] += 1
+                continue
+            phash = f"{value:016x}"
+
+            cached = self._cache_get(phash)
+            if cached is not None:
+                self.stats['cache_hits'] += 1
+                results[path] = {**cached, 'phash': phash, 'source': 'cache'}
+                continue
+
+            # Screenshots quase idênticos no mesmo lote reaproveitam o resultado do representante
+            twin = next(
+                (rep_path for rep_value, rep_path in representatives
+                 if bin(rep_value ^ value).count('1') <= self.duplicate_distance),
+                None
+            )
+            if twin is not None:
+                self.stats['near_duplicates_skipped'] += 1
+                duplicates[path] = twin
+                results[path] = {'phash': phash, 'source': 'duplicate', 'duplicate_of': os.path.basename(twin)}
+                continue
+
+            representatives.append((value, path))
+            pending.append((path, phash))
+
+        if pending:
+            logger.info(f"🔍 OCR de {len(pending)} imagens em {self.workers} processos")
+            analyzed = executor.map(
+                _analyze_image,
+                [p for p, _ in pending],
+                [self.max_side] * len(pending),
+                [self.lang] * len(pending),
+                [with_colors] * len(pending)
+            )
+            for (path, phash), analysis in zip(pending, analyzed):
+                if analysis['error']:
+                    self.stats['failures'] += 1
+                    logger.error(f"❌ Erro na análise visual de {os.path.basename(path)}: {analysis['error']}")
+                    continue
+                self.stats['images_processed'] += 1
+                self._cache_set(phash, analysis['ocr_text'], analysis['color_analysis'])
+                results[path] = {
+                    'ocr_text': analysis['ocr_text'],
+                    'color_analysis': analysis['color_analysis'],
+                    'phash': phash,
+                    'source': 'ocr'
+                }
+
+        for path, twin in duplicates.items():
+            if twin in results and 'ocr_text' in results[twin]:
+                results[path].update(ocr_text=results[twin]['ocr_text'], color_analysis=results[twin]['color_analysis'])
+            else:
+                results.pop(path, None)
+
+        return [{'file': os.path.basename(p), **results[p]} for p in paths if p in results]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do pipeline"""
+        return {**self.stats, 'workers': self.workers, 'max_side': self.max_side}
+
+
+# Instância global
+visual_analysis_pipeline = VisualAnalysisPipeline()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Zip Stream
+Geração de arquivos ZIP em streaming, sem arquivos temporários, com suporte a download por faixa de bytes
+"""
+
+import io
+import os
+import json
+import time
+import zlib
+import hashlib
+import logging
+import zipfile
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from services.session_archive import session_archive
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', str(256 * 1024)))
+SIZE_CACHE_LIMIT = int(os.getenv('EXPORT_SIZE_CACHE_LIMIT', '256'))
+DEFAULT_COMPRESSION = 6
+# ZIP não representa datas anteriores a 1980 (mtime 0, arquivos extraídos sem data etc.)
+MIN_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class _ChunkSink:
+    """Destino não-posicionável do ZipFile: acumula bytes até o gerador drená-los"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _set_compresslevel(zinfo: zipfile.ZipInfo, level: int):
+    """Define o nível de compressão por entrada (atributo renomeado no Python 3.13)"""
+    if hasattr(zinfo, 'compress_level'):
+        zinfo.compress_level = level
+    else:
+        zinfo._compresslevel = level
+
+
+def _open_entry(path: str, arcname: str) -> Tuple[zipfile.ZipInfo, BinaryIO]:
+    """Entrada do ZIP a partir do disco ou, para sessões compactadas, do arquivo da sessão"""
+    if os.path.exists(path):
+        return zipfile.ZipInfo.from_file(path, arcname, strict_timestamps=False), open(path, 'rb')
+    data = session_archive.read_bytes(path)
+    date_time = max(tuple(time.localtime(session_archive.getmtime(path))[:6]), MIN_DATE_TIME)
+    zinfo = zipfile.ZipInfo(arcname, date_time=date_time)
+    zinfo.external_attr = 0o644 << 16
+    zinfo.file_size = len(data)
+    return zinfo, io.BytesIO(data)
+
+
+class ZipStream:
+    """ZIP determinístico gerado sob demanda a partir de uma lista exata de arquivos (em disco ou arquivados)"""
+
+    # Tamanho total por ETag, aprendido em downloads completos (retomadas não recomprimem tudo)
+    _sizes: 'OrderedDict[str, int]' = OrderedDict()
+    _sizes_lock = threading.Lock()
+
+    def __init__(self, files: List[Tuple[str, str]], compresslevel: int = DEFAULT_COMPRESSION):
+        if not 0 <= compresslevel <= 9:
+            raise ValueError("Nível de compressão deve estar entre 0 e 9")
+
+        self.files = files
+        self.compresslevel = compresslevel
+        self.compression = zipfile.ZIP_STORED if compresslevel == 0 else zipfile.ZIP_DEFLATED
+        self.etag = self._compute_etag()
+
+    def _compute_etag(self) -> str:
+        """ETag forte: nomes, tamanhos e mtimes dos arquivos mais o nível de compressão"""
+        manifest = []
+        for path, arcname in self.files:
+            manifest.append([arcname, session_archive.getsize(path), int(session_archive.getmtime(path) * 1e9)])
+        payload = json.dumps({
+            'files': manifest,
+            'level': self.compresslevel,
+            'zlib': zlib.ZLIB_RUNTIME_VERSION
+        }, sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    @property
+    def known_size(self) -> Optional[int]:
+        with self._sizes_lock:
+            return self._sizes.get(self.etag)
+
+    def _remember_size(self, size: int):
+        with self._sizes_lock:
+            self._sizes[self.etag] = size
+            self._sizes.move_to_end(self.etag)
+            while len(self._sizes) > SIZE_CACHE_LIMIT:
+                self._sizes.popitem(last=False)
+
+    def iter_bytes(self) -> Iterator[bytes]:
+        """Gera o ZIP em blocos; memória limitada a um bloco por vez"""
+        sink = _ChunkSink()
+        written = 0
+
+        with zipfile.ZipFile(sink, 'w', compression=self.compression) as archive:
+            for path, arcname in self.files:
+                try:
+                    zinfo, source = _open_entry(path, arcname)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"⚠️ Arquivo ignorado na exportação {arcname}: {str(e)}")
+                    continue
+
+                zinfo.compress_type = self.compression
+                _set_compresslevel(zinfo, self.compresslevel)
+
+                with source, archive.open(zinfo, 'w') as target:
+                    while True:
+                        chunk = source.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            written += len(data)
+                            yield data
+
+                data = sink.drain()
+                if data:
+                    written += len(data)
+                    yield data
+
+        # Diretório central gravado no fechamento do ZipFile
+        data = sink.drain()
+        if data:
+            written += len(data)
+            yield data
+
+        self._remember_size(written)
+
+    def total_size(self) -> int:
+        """Tamanho final do ZIP; calculado em streaming quando ainda desconhecido"""
+        size = self.known_size
+        if size is None:
+            size = sum(len(chunk) for chunk in self.iter_bytes())
+        return size
+
+    def iter_range(self, start: int, stop: int) -> Iterator[bytes]:
+        """Gera apenas os bytes [start, stop) do ZIP, descartando o prefixo"""
+        position = 0
+        stream = self.iter_bytes()
+        try:
+            for chunk in stream:
+                chunk_end = position + len(chunk)
+                if chunk_end > start:
+                    yield chunk[max(0, start - position):stop - position]
+                position = chunk_end
+                if position >= stop:
+                    break
+        finally:
+            stream.close()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARQV30 Enhanced v3.0 - Job Workers
+Executa o pool de workers da fila de etapas fora do processo web
+
+Com JOB_WORKERS_EMBEDDED=false no servidor web, os jobs sobrevivem a reloads/restarts do web:
+    python worker.py --workers 4
+
+Recomendado com gunicorn -w N: no modo embutido cada um dos N processos web sobe seu próprio pool
+de JOB_WORKERS processos, enquanto aqui há um único pool para toda a fila.
+"""
+
+import os
+import sys
+import time
+import signal
+import logging
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Pool de workers da fila de etapas do workflow')
+    parser.add_argument('--workers', type=int, default=None, help='Número de processos (padrão: JOB_WORKERS)')
+    args = parser.parse_args()
+
+    # Carrega variáveis de ambiente antes de subir os workers (herdadas pelos processos filhos)
+    from services.environment_loader import environment_loader
+    from services.job_queue import job_queue, worker_pool
+
+    if args.workers:
+        worker_pool.size = args.workers
+
+    stopping = []
+
+    def handle_signal(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    worker_pool.start()
+    logger.info(f"📬 Consumindo fila em {job_queue.db_path}")
+
+    while not stopping:
+        time.sleep(1)
+
+    logger.info("🛑 Encerrando workers...")
+    worker_pool.stop()
+
+
+if __name__ == '__main__':
+    main()